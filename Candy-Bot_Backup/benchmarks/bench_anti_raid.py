@@ -0,0 +1,147 @@
+"""
+load test: anti-raid detection latency under a synthetic message storm.
+
+replays messages at a fixed rate across many channels against a simulated clock
+and times every `AntiRaidSystem.is_raid_detected` call. the old implementation
+(one global list rescanned per message) is replayed for comparison.
+
+usage:
+    python benchmarks/bench_anti_raid.py [--rate 10000] [--channels 500] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.security.anti_raid import AntiRaidSystem  # noqa: E402
+from modules.security.rate_window import ChannelRateTracker  # noqa: E402
+
+GUILDS = 50
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LegacyDetector:
+    """the previous list-scan detector, minus its logging."""
+
+    def __init__(self, settings: dict, clock: FakeClock):
+        self.settings = settings
+        self.clock = clock
+        self.message_history = []
+
+    def _now(self) -> datetime:
+        return datetime(2025, 1, 1) + timedelta(seconds=self.clock())
+
+    async def is_raid_detected(self, message) -> bool:
+        self.message_history.append((self._now(), message.author.id, message.channel.id))
+        time_threshold = self._now() - timedelta(seconds=self.settings['time_window'])
+        recent = [
+            m for m in self.message_history
+            if m[0] > time_threshold and m[2] == message.channel.id
+        ]
+        {m[1] for m in recent}
+        return len(recent) >= self.settings['message_threshold']
+
+    def cleanup(self) -> None:
+        cutoff = self._now() - timedelta(minutes=5)
+        self.message_history = [m for m in self.message_history if m[0] >= cutoff]
+
+
+def build_messages(channels: int, users: int, count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    guilds = [SimpleNamespace(id=g) for g in range(GUILDS)]
+    chans = [SimpleNamespace(id=10_000 + c, guild=guilds[c % GUILDS]) for c in range(channels)]
+    authors = [SimpleNamespace(id=100_000 + u, bot=False) for u in range(users)]
+    messages = []
+    for _ in range(count):
+        channel = rng.choice(chans)
+        messages.append(SimpleNamespace(guild=channel.guild, channel=channel, author=rng.choice(authors)))
+    return messages
+
+
+async def replay(detector, messages: list, rate: int, clock: FakeClock, cleanup=None) -> dict:
+    latencies = []
+    detections = 0
+    step = 1.0 / rate
+    next_cleanup = 60.0
+    for message in messages:
+        clock.now += step
+        if cleanup and clock.now >= next_cleanup:
+            cleanup()
+            next_cleanup += 60.0
+        start = time.perf_counter()
+        if await detector.is_raid_detected(message):
+            detections += 1
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    latencies.sort()
+    return {
+        'messages': len(messages),
+        'detections': detections,
+        'p50_us': statistics.median(latencies),
+        'p99_us': latencies[int(len(latencies) * 0.99) - 1],
+        'max_us': latencies[-1],
+        'total_s': sum(latencies) / 1_000_000,
+    }
+
+
+async def main_async(args) -> None:
+    settings = {
+        'enabled': True,
+        'message_threshold': args.threshold,
+        'time_window': args.window,
+        'lock_duration': 300,
+        'exempt_roles': []
+    }
+
+    clock = FakeClock()
+    bot = SimpleNamespace(loop=asyncio.get_running_loop(), is_closed=lambda: True)
+    system = AntiRaidSystem(bot)
+    system.rate_tracker = ChannelRateTracker(clock=clock)
+    system.default_settings = settings
+
+    print(f"storm: {args.rate} msg/s across {args.channels} channels, "
+          f"threshold {args.threshold} msgs in {args.window}s")
+    print(f"{'impl':<8} {'msgs':>8} {'detect':>7} {'p50 us':>9} {'p99 us':>9} {'max us':>10} {'cpu s':>7} {'windows':>8}")
+    messages = build_messages(args.channels, args.users, int(args.rate * args.seconds))
+    r = await replay(system, messages, args.rate, clock, cleanup=system.rate_tracker.prune_idle)
+    print(f"{'window':<8} {r['messages']:>8} {r['detections']:>7} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} "
+          f"{r['max_us']:>10.1f} {r['total_s']:>7.2f} {len(system.rate_tracker):>8}")
+
+    if args.legacy_seconds > 0:
+        clock = FakeClock()
+        legacy = LegacyDetector(settings, clock)
+        messages = build_messages(args.channels, args.users, int(args.rate * args.legacy_seconds))
+        r = await replay(legacy, messages, args.rate, clock, cleanup=legacy.cleanup)
+        print(f"{'legacy':<8} {r['messages']:>8} {r['detections']:>7} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} "
+              f"{r['max_us']:>10.1f} {r['total_s']:>7.2f} {'-':>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=10000, help='messages per simulated second')
+    parser.add_argument('--channels', type=int, default=500)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=10.0, help='simulated storm length')
+    parser.add_argument('--legacy-seconds', type=float, default=1.0,
+                        help='storm length for the old detector (it is quadratic, keep this short)')
+    parser.add_argument('--threshold', type=int, default=250)
+    parser.add_argument('--window', type=int, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+benchmark: admin_action_logs insert throughput, one commit per row vs batched.
+
+simulates a nuke attempt where many admin actions are logged concurrently.
+
+    per-row   await db.execute(...) for every row (one commit, and fsync, per row)
+    batched   await db.queue_write(...) with the write-behind queue
+
+usage:
+    python benchmarks/bench_audit_inserts.py [--rows 5000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database.database import DatabaseManager  # noqa: E402
+
+INSERT = """
+    INSERT INTO admin_action_logs
+    (guild_id, user_id, action, target_id, timestamp, details)
+    VALUES (?, ?, ?, ?, datetime('now'), NULL)
+"""
+
+
+def prepare(db: DatabaseManager) -> None:
+    db.execute_query(
+        """CREATE TABLE admin_action_logs (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id INTEGER, user_id INTEGER, action TEXT,
+               target_id INTEGER, timestamp TEXT, details TEXT)""",
+        commit=True
+    )
+
+
+async def worker(db: DatabaseManager, mode: str, rows: range) -> None:
+    for i in rows:
+        params = (1, i % 10, 'channel_delete', i)
+        if mode == 'batched':
+            await db.queue_write(INSERT, params)
+        else:
+            await db.execute(INSERT, params)
+
+
+async def run(mode: str, rows: int, concurrency: int, synchronous: str) -> dict:
+    import modules.database.database as database
+    database.DB_SYNCHRONOUS = synchronous
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        prepare(db)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(db, mode, range(n, rows, concurrency)) for n in range(concurrency)
+        ))
+        await db.flush_writes()
+        elapsed = time.perf_counter() - start
+
+        count = (await db.fetchone("SELECT COUNT(*) FROM admin_action_logs"))[0]
+        await db.aclose()
+
+    return {'mode': mode, 'rows': count, 'elapsed_s': elapsed, 'rows_s': count / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--synchronous', default='FULL', help='sqlite synchronous pragma for the run')
+    args = parser.parse_args()
+
+    print(f"synchronous={args.synchronous}")
+    print(f"{'mode':<8} {'rows':>7} {'elapsed s':>10} {'rows/s':>10}")
+    for mode in ('per-row', 'batched'):
+        r = asyncio.run(run(mode, args.rows, args.concurrency, args.synchronous))
+        print(f"{r['mode']:<8} {r['rows']:>7} {r['elapsed_s']:>10.3f} {r['rows_s']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
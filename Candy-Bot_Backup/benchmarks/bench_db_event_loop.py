@@ -0,0 +1,187 @@
+"""
+benchmark: event loop lag while the bot is hammering the database.
+
+simulates on_message handlers (a guild's admin role lookup, --roles rows out of
+--guilds guilds) and on_member_update handlers (admin action log inserts) against a throwaway database, once through the blocking
+`execute_query` shim and once through the async api, and reports how late a 1ms
+ticker fires while they run and how long each handler took from dispatch to done.
+
+events are dispatched the way the gateway delivers them: --rate per second, each
+one a task of its own, with at most --max-inflight handlers running (a blocked loop
+stops reading the websocket, so dispatches back up rather than piling into memory).
+
+the ticker's lags are weighted by how long each one lasted. a loop blocked for a
+whole second only wakes the ticker once, so an unweighted percentile over ticks
+would count that second as a single sample and make the mode that blocks the loop
+most look best. weighted, a percentile is how late a timer (or a heartbeat, or the
+next dispatch) that comes due at a random moment during the run would fire.
+
+usage:
+    python benchmarks/bench_db_event_loop.py [--messages 5000] [--updates 1000] [--rate 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database.database import DatabaseManager  # noqa: E402
+
+TICK = 0.001
+
+
+def prepare(db: DatabaseManager, guilds: int, roles: int) -> None:
+    """create the tables touched by the hot paths and seed admin roles for every guild."""
+    db.execute_query(
+        "CREATE TABLE bot_admins (guild_id INTEGER, role_id INTEGER, PRIMARY KEY (guild_id, role_id))",
+        commit=True
+    )
+    db.execute_query(
+        """CREATE TABLE admin_action_logs (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id INTEGER, user_id INTEGER, action TEXT,
+               target_id INTEGER, timestamp TEXT, details TEXT)""",
+        commit=True
+    )
+    with db._lock:
+        db.connect()
+        db.connection.executemany(
+            "INSERT INTO bot_admins VALUES (?, ?)",
+            ((guild, guild * 1000 + role) for guild in range(guilds) for role in range(roles))
+        )
+        db.connection.commit()
+
+
+async def ticker(stop: asyncio.Event, lags: list) -> None:
+    """record how far past its deadline each tick wakes up."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def on_message_sync(db: DatabaseManager, guild: int, i: int) -> None:
+    db.execute_query("SELECT role_id FROM bot_admins WHERE guild_id = ?", (guild,), fetch=True)
+
+
+async def on_message_async(db: DatabaseManager, guild: int, i: int) -> None:
+    await db.fetch("SELECT role_id FROM bot_admins WHERE guild_id = ?", (guild,))
+
+
+async def on_member_update_sync(db: DatabaseManager, guild: int, i: int) -> None:
+    db.execute_query(
+        "INSERT INTO admin_action_logs (guild_id, user_id, action, target_id, timestamp) "
+        "VALUES (?, ?, 'role_update', ?, datetime('now'))",
+        (guild, i, i),
+        commit=True
+    )
+
+
+async def on_member_update_async(db: DatabaseManager, guild: int, i: int) -> None:
+    await db.execute(
+        "INSERT INTO admin_action_logs (guild_id, user_id, action, target_id, timestamp) "
+        "VALUES (?, ?, 'role_update', ?, datetime('now'))",
+        (guild, i, i)
+    )
+
+
+def weighted_percentile(lags: list, q: float) -> float:
+    """the lag in progress at quantile q of the run's wall time."""
+    weighted = sorted((lag, TICK * 1000 + lag) for lag in lags)
+    total = sum(weight for _, weight in weighted)
+    seen = 0.0
+    for lag, weight in weighted:
+        seen += weight
+        if seen >= total * q:
+            return lag
+    return weighted[-1][0] if weighted else 0.0
+
+
+async def run(mode: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        prepare(db, args.guilds, args.roles)
+
+        on_message = on_message_async if mode == 'async' else on_message_sync
+        on_member_update = on_member_update_async if mode == 'async' else on_member_update_sync
+
+        lags: list = []
+        latencies: list = []
+        stop = asyncio.Event()
+        tick_task = asyncio.create_task(ticker(stop, lags))
+        await asyncio.sleep(0.05)
+
+        # interleave the two event types the way the gateway would dispatch them
+        ratio = max(1, args.messages // max(1, args.updates))
+        events = []
+        for i in range(args.messages):
+            events.append((on_message, (i % args.guilds, i)))
+            if i % ratio == 0 and len(events) < args.messages + args.updates:
+                events.append((on_member_update, (i % args.guilds, i)))
+
+        room = asyncio.Semaphore(args.max_inflight)
+
+        async def handle(handler, extra, dispatched: float) -> None:
+            try:
+                await handler(db, *extra)
+            finally:
+                latencies.append((time.perf_counter() - dispatched) * 1000)
+                room.release()
+
+        tasks = []
+        start = time.perf_counter()
+        for n, (handler, extra) in enumerate(events):
+            delay = start + n / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await room.acquire()
+            tasks.append(asyncio.create_task(handle(handler, extra, time.perf_counter())))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await tick_task
+        await db.aclose()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'events': len(events),
+        'elapsed_s': elapsed,
+        'blocked': sum(lags) / 1000 / elapsed,
+        'p50_ms': weighted_percentile(lags, 0.5),
+        'p99_ms': weighted_percentile(lags, 0.99),
+        'max_ms': max(lags, default=0.0),
+        'handler_p50_ms': statistics.median(latencies),
+        'handler_p99_ms': latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--guilds', type=int, default=100)
+    parser.add_argument('--roles', type=int, default=5, help='admin roles per guild')
+    parser.add_argument('--rate', type=float, default=2000, help='events dispatched per second')
+    parser.add_argument('--max-inflight', type=int, default=100, help='handlers running at once')
+    args = parser.parse_args()
+
+    print(f"{args.messages + args.updates} events at {args.rate:.0f}/s, at most {args.max_inflight} in flight")
+    print(f"{'mode':<6} {'elapsed s':>10} {'blocked':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} "
+          f"{'handler p50':>12} {'handler p99':>12}")
+    for mode in ('sync', 'async'):
+        r = asyncio.run(run(mode, args))
+        print(
+            f"{r['mode']:<6} {r['elapsed_s']:>10.3f} {r['blocked']:>8.0%} {r['p50_ms']:>6.2f}ms {r['p99_ms']:>6.2f}ms "
+            f"{r['max_ms']:>6.2f}ms {r['handler_p50_ms']:>10.2f}ms {r['handler_p99_ms']:>10.2f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+benchmark: read and write throughput with and without the tuned connection pool.
+
+runs concurrent readers (a list_events style scan) and writers (mute inserts and
+deletes, like check_mutes) against a throwaway database for a fixed duration.
+
+    baseline  single shared connection, sqlite default pragmas
+    pooled    wal + configured pragmas, one writer and a read-only pool
+
+usage:
+    python benchmarks/bench_db_pool.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database.database import DatabaseManager  # noqa: E402
+
+
+class BaselineDatabaseManager(DatabaseManager):
+    """the manager as it behaved before: one connection and no pragmas."""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path, read_pool_size=0)
+
+    def _apply_pragmas(self, connection, writer):
+        pass
+
+
+def prepare(db: DatabaseManager, events: int) -> None:
+    """create and seed the tables used by the workload."""
+    db.execute_query(
+        """CREATE TABLE events (
+               event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id INTEGER, name TEXT, event_time TEXT,
+               timezone TEXT, description TEXT)""",
+        commit=True
+    )
+    db.execute_query(
+        """CREATE TABLE mutes (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               guild_id INTEGER, user_id INTEGER, expires_at TEXT)""",
+        commit=True
+    )
+    db.connect()
+    db.connection.executemany(
+        "INSERT INTO events (guild_id, name, event_time, timezone, description) VALUES (?, ?, ?, 'UTC', ?)",
+        [(i % 20, f'event {i}', f'2025-01-{i % 28 + 1:02d}T20:00:00', 'x' * 200) for i in range(events)]
+    )
+    db.connection.commit()
+
+
+async def reader(db: DatabaseManager, deadline: float, counts: dict) -> None:
+    i = 0
+    while time.perf_counter() < deadline:
+        await db.fetch(
+            "SELECT * FROM events WHERE guild_id = ? AND name LIKE ? ORDER BY event_time",
+            (i % 20, '%1%')
+        )
+        counts['reads'] += 1
+        i += 1
+
+
+async def writer(db: DatabaseManager, deadline: float, counts: dict, latencies: list) -> None:
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        row_id = await db.execute(
+            "INSERT INTO mutes (guild_id, user_id, expires_at) VALUES (?, ?, datetime('now'))",
+            (1, i)
+        )
+        await db.execute("DELETE FROM mutes WHERE id = ?", (row_id,))
+        latencies.append((time.perf_counter() - start) * 1000)
+        counts['writes'] += 2
+        i += 1
+
+
+async def run(name: str, factory, seconds: float, readers: int, writers: int, events: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = factory(os.path.join(tmp, 'bench.db'))
+        prepare(db, events)
+
+        counts = {'reads': 0, 'writes': 0}
+        latencies: list = []
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(
+            *(reader(db, deadline, counts) for _ in range(readers)),
+            *(writer(db, deadline, counts, latencies) for _ in range(writers))
+        )
+        await db.aclose()
+
+    latencies.sort()
+    return {
+        'name': name,
+        'reads_s': counts['reads'] / seconds,
+        'writes_s': counts['writes'] / seconds,
+        'write_p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'write_p99_ms': latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--events', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'reads/s':>10} {'writes/s':>10} {'write p50 ms':>13} {'write p99 ms':>13}")
+    for name, factory in (('baseline', BaselineDatabaseManager), ('pooled', DatabaseManager)):
+        r = asyncio.run(run(name, factory, args.seconds, args.readers, args.writers, args.events))
+        print(
+            f"{r['name']:<9} {r['reads_s']:>10.0f} {r['writes_s']:>10.0f} "
+            f"{r['write_p50_ms']:>13.2f} {r['write_p99_ms']:>13.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
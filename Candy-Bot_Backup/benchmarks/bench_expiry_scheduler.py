@@ -0,0 +1,155 @@
+"""
+timing harness: shared expiry scheduler against a simulated clock.
+
+fills a temp database with mutes, temp bans, lockdowns and quarantines that expire
+at random times over a simulated day, rebuilds the expiry heap from it, cancels a
+slice of them (manual unmutes/unbans) and then steps the fake clock from one due
+time to the next. every fire is checked against its expiry: nothing may fire early,
+nothing cancelled may fire, and lateness should be zero. the old polling loops are
+modelled for comparison (a row is only noticed on the next poll after it expires).
+
+usage:
+    python benchmarks/bench_expiry_scheduler.py [--expiries 100000] [--cancel 0.1]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database.database import DatabaseManager  # noqa: E402
+from utils.expiry_service import ExpiryService  # noqa: E402
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+DAY = 24 * 60 * 60
+
+# kind -> (table, target column, expiry column and type, previous poll interval in seconds)
+KINDS = {
+    'mute': ('mutes', 'user_id', 'expires_at TIMESTAMP', 30),
+    'tempban': ('temp_bans', 'user_id', 'expires_at TIMESTAMP', 30),
+    'lockdown': ('lockdowns', 'target_id', 'expires_at TIMESTAMP', 60),
+    'quarantine': ('admin_quarantine', 'user_id', 'quarantined_until DATETIME', 300),
+}
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def prepare(db: DatabaseManager, expiries: int, seed: int) -> dict:
+    """create one table per kind and fill it. returns key -> due timestamp."""
+    rng = random.Random(seed)
+    expected = {}
+    rows = {kind: [] for kind in KINDS}
+    kinds = list(KINDS)
+    for i in range(expiries):
+        kind = kinds[i % len(kinds)]
+        guild_id = rng.randrange(1, 200)
+        target_id = 10_000 + i
+        due = EPOCH + rng.uniform(1, DAY)
+        expires_at = datetime.fromtimestamp(due, timezone.utc).replace(tzinfo=None)
+        expected[(kind, guild_id, target_id)] = expires_at.replace(tzinfo=timezone.utc).timestamp()
+        # quarantines are stored with isoformat(), the rest through the sqlite adapter
+        stored = expires_at.isoformat() if kind == 'quarantine' else str(expires_at)
+        rows[kind].append((guild_id, target_id, stored))
+
+    for kind, (table, column, expiry_column, _) in KINDS.items():
+        await db.execute(f"CREATE TABLE {table} (guild_id INTEGER, {column} INTEGER, {expiry_column})")
+        await db.executemany(f"INSERT INTO {table} VALUES (?, ?, ?)", rows[kind])
+    return expected
+
+
+def make_loader(db: DatabaseManager, kind: str):
+    table, column, expiry_column, _ = KINDS[kind]
+
+    async def loader():
+        rows = await db.fetch(f"SELECT guild_id, {column}, {expiry_column.split()[0]} FROM {table}")
+        return [(row[0], row[1], row[2]) for row in rows]
+    return loader
+
+
+async def main_async(args) -> None:
+    clock = FakeClock(EPOCH)
+    service = ExpiryService(clock=clock)
+    fired = {}
+
+    def make_handler(kind):
+        async def handler(guild_id, target_id):
+            fired[(kind, guild_id, target_id)] = clock()
+        return handler
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        expected = await prepare(db, args.expiries, args.seed)
+
+        start = time.perf_counter()
+        for kind in KINDS:
+            await service.register(kind, make_handler(kind), make_loader(db, kind), autostart=False)
+        rebuild_s = time.perf_counter() - start
+        await db.aclose()
+
+    assert len(service) == len(expected), f"heap has {len(service)} entries, expected {len(expected)}"
+
+    rng = random.Random(args.seed + 1)
+    cancelled = set(rng.sample(sorted(expected), int(len(expected) * args.cancel)))
+    start = time.perf_counter()
+    for key in cancelled:
+        service.cancel(*key)
+    cancel_s = time.perf_counter() - start
+
+    # step straight to each due time, the way the runner sleeps until next_due
+    steps = 0
+    start = time.perf_counter()
+    while True:
+        due = service.timers.next_due()
+        if due is None:
+            break
+        clock.now = due
+        await service.run_due()
+        steps += 1
+    fire_s = time.perf_counter() - start
+
+    live = {key: due for key, due in expected.items() if key not in cancelled}
+    missing = set(live) - set(fired)
+    wrongly_fired = cancelled & set(fired)
+    lateness = [fired[key] - live[key] for key in live if key in fired]
+    early = sum(1 for late in lateness if late < 0)
+
+    print(f"expiries={len(expected)} cancelled={len(cancelled)} fired={len(fired)} steps={steps}")
+    print(f"rebuild from db   {rebuild_s * 1000:9.1f} ms")
+    print(f"cancel            {cancel_s * 1000:9.1f} ms ({cancel_s / max(len(cancelled), 1) * 1e6:.2f} us each)")
+    print(f"fire all          {fire_s * 1000:9.1f} ms ({len(fired) / fire_s:,.0f} expiries/s)")
+    print(f"missing={len(missing)} cancelled_but_fired={len(wrongly_fired)} early={early}")
+    print(f"lateness (s)      max={max(lateness):.6f} mean={statistics.fmean(lateness):.6f}")
+
+    print(f"\n{'kind':<11} {'poll s':>7} {'old mean late s':>16} {'old max late s':>15}")
+    for kind, (_, _, _, interval) in KINDS.items():
+        polled = [math.ceil(due / interval) * interval - due for key, due in live.items() if key[0] == kind]
+        print(f"{kind:<11} {interval:>7} {statistics.fmean(polled):>16.1f} {max(polled):>15.1f}")
+
+    if missing or wrongly_fired or early:
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--expiries', type=int, default=100_000)
+    parser.add_argument('--cancel', type=float, default=0.1, help='fraction cancelled before they are due')
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,480 @@
+"""
+benchmark: replay gateway dispatches into the real security and welcome cogs.
+
+feeds a recording made by utils/gateway_recorder.py (GATEWAY_RECORD_PATH) to a bot
+that never connects. the payloads go through discord.py's own parsers, so the cogs
+get real Message and Member objects and run unchanged: the security module
+(AntiRaidCog.on_message, the security_events listeners, admin_security.on_member_update,
+AdminActionCog.on_member_update and on_member_ban) and WelcomeCog.on_member_join.
+the http layer is replaced by a fake that answers every discord api call after
+--http-ms, and the database is a temporary copy of --db (an empty schema if omitted).
+
+without --recording a synthetic one is generated and recorded through the same
+recorder: --guilds guilds with --members members each, and --events dispatches
+(mostly messages, some joins, role changes, admin role grants and bans) spread over
+--seconds.
+
+    --speed 0   as fast as the listeners keep up, at most --max-inflight running
+    --speed 1   at the recorded pace; 10 is ten times faster
+
+per listener it reports calls, errors, p50/p99 latency, throughput (calls per
+second of listener time), database statements and discord api calls per call.
+--save writes the numbers as json, and --compare checks them against a saved run
+and exits 1 if a listener's p99 grew by more than --tolerance or it runs more
+statements or api calls per call than before.
+
+usage:
+    python benchmarks/bench_gateway_replay.py [--recording data/gateway.jsonl.gz] [--speed 0]
+    python benchmarks/bench_gateway_replay.py --save baseline.json
+    python benchmarks/bench_gateway_replay.py --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+from discord.ext import commands  # noqa: E402
+
+import config  # noqa: E402
+from modules.database.database import db  # noqa: E402
+from utils.gateway_recorder import STATE_EVENTS, GatewayRecorder, read_recording  # noqa: E402
+
+EXTENSIONS = ('modules.security', 'modules.welcome')
+DISCORD_EPOCH_MS = 1420070400000
+
+# audit log action types the fake answers with the last matching dispatch
+AUDIT_BAN, AUDIT_ROLE_UPDATE = 22, 25
+
+current_listener = contextvars.ContextVar('current_listener', default=None)
+
+
+class ListenerStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.queries = 0
+        self.http = 0
+
+    def row(self) -> dict:
+        latencies = sorted(self.latencies)
+        calls = len(latencies)
+        busy = sum(latencies)
+        return {
+            'calls': calls,
+            'errors': self.errors,
+            'p50_ms': statistics.median(latencies) * 1000 if calls else 0.0,
+            'p99_ms': latencies[min(calls - 1, int(calls * 0.99))] * 1000 if calls else 0.0,
+            'per_second': calls / busy if busy else 0.0,
+            'queries_per_call': self.queries / calls if calls else 0.0,
+            'http_per_call': self.http / calls if calls else 0.0,
+        }
+
+
+def listener_name(coro) -> str:
+    func = getattr(coro, '__func__', coro)
+    module = func.__module__.rsplit('.', 1)[-1]
+    return f"{module}.{func.__qualname__.replace('setup.<locals>.', '')}"
+
+
+class ReplayBot(commands.Bot):
+    """a bot whose listener tasks are timed and counted."""
+
+    def __init__(self, max_inflight: int, **options):
+        super().__init__(**options)
+        self.stats = defaultdict(ListenerStats)
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._room = asyncio.Event()
+        self._room.set()
+
+    def _schedule_event(self, coro, event_name, *args, **kwargs):
+        return super()._schedule_event(self._timed(coro), event_name, *args, **kwargs)
+
+    def _timed(self, coro):
+        name = listener_name(coro)
+        stats = self.stats[name]
+        self.inflight += 1
+        self._idle.clear()
+        if self.inflight >= self.max_inflight:
+            self._room.clear()
+
+        async def timed(*args, **kwargs):
+            current_listener.set(name)
+            started = time.perf_counter()
+            try:
+                return await coro(*args, **kwargs)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.latencies.append(time.perf_counter() - started)
+                self.inflight -= 1
+                if self.inflight < self.max_inflight:
+                    self._room.set()
+                if not self.inflight:
+                    self._idle.set()
+
+        return timed
+
+    async def room(self) -> None:
+        await self._room.wait()
+
+    async def idle(self) -> None:
+        await self._idle.wait()
+
+
+class FakeDiscord:
+    """answers the bot's api calls after a fixed latency, as discord would."""
+
+    def __init__(self, bot: ReplayBot, latency: float):
+        self.bot = bot
+        self.latency = latency
+        self.calls = defaultdict(int)
+        # (guild id, audit action type) -> (actor id, target id, added role ids) of the last matching dispatch
+        self.audit = {}
+        self._ids = snowflakes()
+
+    def user(self, user_id) -> dict:
+        return {'id': str(user_id), 'username': 'x', 'discriminator': '0', 'global_name': None, 'avatar': None}
+
+    def message(self, channel_id) -> dict:
+        return {
+            'id': str(next(self._ids)), 'channel_id': str(channel_id), 'author': self.user(self.bot.user.id),
+            'content': '', 'timestamp': iso(datetime.now(timezone.utc)), 'edited_timestamp': None,
+            'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [],
+            'embeds': [], 'pinned': False, 'type': 0, 'flags': 0, 'components': [],
+        }
+
+    def audit_logs(self, guild_id, action_type) -> dict:
+        empty = {
+            'audit_log_entries': [], 'users': [], 'integrations': [], 'webhooks': [], 'threads': [],
+            'guild_scheduled_events': [], 'application_commands': [], 'auto_moderation_rules': [],
+        }
+        last = self.audit.get((int(guild_id), action_type))
+        if last is None:
+            return empty
+        actor, target, roles = last
+        changes = [{'key': '$add', 'new_value': [{'id': str(r), 'name': 'x'} for r in roles]}] if roles else []
+        empty['audit_log_entries'] = [{
+            'id': str(next(self._ids)), 'user_id': str(actor), 'target_id': str(target),
+            'action_type': action_type, 'changes': changes, 'reason': None,
+        }]
+        empty['users'] = [self.user(actor), self.user(target)]
+        return empty
+
+    async def request(self, route, **kwargs):
+        listener = current_listener.get()
+        if listener is not None:
+            self.bot.stats[listener].http += 1
+        self.calls[f"{route.method} {route.path}"] += 1
+        await asyncio.sleep(self.latency)
+        path = route.path
+        if path == '/users/{user_id}':
+            return self.user(route.url.rsplit('/', 1)[-1])
+        if path == '/users/@me/channels':
+            recipient = kwargs.get('json', {}).get('recipient_id')
+            return {'id': str(next(self._ids)), 'type': 1, 'recipients': [self.user(recipient)], 'last_message_id': None}
+        if path == '/channels/{channel_id}/messages':
+            return self.message(route.channel_id)
+        if path == '/guilds/{guild_id}/audit-logs':
+            return self.audit_logs(route.guild_id, int(kwargs.get('params', {}).get('action_type') or 0))
+        return None
+
+
+def snowflakes():
+    base = int(time.time() * 1000 - DISCORD_EPOCH_MS) << 22
+    n = 0
+    while True:
+        n += 1
+        yield base + n
+
+
+def iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def synthesize(path: str, args) -> None:
+    """write a recording of synthetic guilds and a burst of dispatches to path."""
+    rng = random.Random(args.seed)
+    ids = snowflakes()
+    recorder = GatewayRecorder(path, events=())
+    now = datetime.now(timezone.utc)
+
+    def user(bot=False) -> dict:
+        uid = next(ids)
+        return {'id': str(uid), 'username': f"user{uid % 100000}", 'discriminator': '0',
+                'global_name': None, 'avatar': None, 'bot': bot}
+
+    def member(u: dict, roles: list, **extra) -> dict:
+        return {'user': u, 'roles': [str(r) for r in roles], 'joined_at': iso(now - timedelta(days=30)),
+                'nick': None, 'deaf': False, 'mute': False, 'flags': 0, **extra}
+
+    me = user(bot=True)
+    recorder.record('READY', {'user': me}, at=0)
+    guilds = []
+    for _ in range(args.guilds):
+        guild_id = next(ids)
+        admin, manager = next(ids), next(ids)
+        ordinary = [next(ids) for _ in range(6)]
+        roles = [
+            {'id': str(guild_id), 'name': '@everyone', 'permissions': '104324673', 'position': 0},
+            {'id': str(admin), 'name': 'Admin', 'permissions': '8', 'position': 9},
+            {'id': str(manager), 'name': 'Manager', 'permissions': '32', 'position': 8},
+        ] + [{'id': str(r), 'name': f"role {i}", 'permissions': '0', 'position': i + 1} for i, r in enumerate(ordinary)]
+        for role in roles:
+            role.update(color=0, hoist=False, managed=False, mentionable=False, flags=0)
+        channels = [next(ids) for _ in range(args.channels)]
+        owner, moderator = user(), user()
+        members = {
+            me['id']: member(me, [admin]),
+            owner['id']: member(owner, []),
+            moderator['id']: member(moderator, [admin]),
+        }
+        for _ in range(args.members):
+            u = user()
+            members[u['id']] = member(u, rng.sample(ordinary, rng.randint(0, 3)))
+        recorder.record('GUILD_CREATE', {
+            'id': str(guild_id), 'name': 'guild', 'owner_id': owner['id'], 'roles': roles,
+            'channels': [{'id': str(c), 'type': 0, 'name': 'chat', 'position': i, 'permission_overwrites': []}
+                         for i, c in enumerate(channels)],
+            'members': list(members.values()), 'member_count': len(members), 'large': False,
+            'unavailable': False, 'emojis': [], 'stickers': [], 'features': [], 'presences': [],
+            'voice_states': [], 'threads': [], 'stage_instances': [], 'guild_scheduled_events': [],
+            'premium_tier': 0, 'mfa_level': 0, 'verification_level': 0, 'explicit_content_filter': 0,
+            'default_message_notifications': 0, 'system_channel_flags': 0, 'preferred_locale': 'en-US',
+        }, at=0)
+        guilds.append({'id': guild_id, 'admin': admin, 'manager': manager, 'ordinary': ordinary,
+                       'channels': channels, 'members': members, 'moderator': moderator['id']})
+
+    kinds = ['MESSAGE_CREATE', 'GUILD_MEMBER_ADD', 'GUILD_MEMBER_UPDATE', 'GUILD_BAN_ADD']
+    for n in range(args.events):
+        at = args.seconds * n / args.events
+        guild = rng.choice(guilds)
+        kind = rng.choices(kinds, (90, 4, 5, 1))[0]
+        people = [m for key, m in guild['members'].items() if key not in (me['id'], guild['moderator'])]
+        if kind == 'MESSAGE_CREATE':
+            author = rng.choice(people)
+            recorder.record(kind, {
+                'id': str(next(ids)), 'channel_id': str(rng.choice(guild['channels'])), 'guild_id': str(guild['id']),
+                'author': author['user'], 'member': {k: v for k, v in author.items() if k != 'user'},
+                'content': ' '.join('word' for _ in range(rng.randint(1, 12))), 'timestamp': iso(now),
+                'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+                'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0,
+                'flags': 0, 'components': [],
+            }, at=at)
+        elif kind == 'GUILD_MEMBER_ADD':
+            u = user()
+            guild['members'][u['id']] = joined = member(u, [])
+            recorder.record(kind, {**joined, 'guild_id': str(guild['id'])}, at=at)
+        elif kind == 'GUILD_MEMBER_UPDATE':
+            target = rng.choice(people)
+            # one in five role changes hands out an admin or manager role
+            role = rng.choice([guild['admin'], guild['manager']]) if rng.random() < 0.2 else rng.choice(guild['ordinary'])
+            if str(role) not in target['roles']:
+                target['roles'] = target['roles'] + [str(role)]
+            recorder.record(kind, {**target, 'guild_id': str(guild['id'])}, at=at)
+        else:
+            target = rng.choice(people)
+            recorder.record(kind, {'guild_id': str(guild['id']), 'user': target['user']}, at=at)
+    recorder.close()
+
+
+def remember_audit(upstream: FakeDiscord, state, event: str, data: dict) -> None:
+    """note the audit log entry discord would have for a ban or role change."""
+    guild_id = int(data.get('guild_id') or 0)
+    guild = state._get_guild(guild_id)
+    if guild is None:
+        return
+    # the first admin who isn't the owner or the bot stands in as the moderator
+    moderator = next((
+        m.id for m in guild.members
+        if m.guild_permissions.administrator and m.id not in (guild.owner_id, state.user.id)
+    ), guild.owner_id)
+    target = int(data['user']['id'])
+    if event == 'GUILD_BAN_ADD':
+        upstream.audit[(guild_id, AUDIT_BAN)] = (moderator, target, [])
+    else:
+        member = guild.get_member(target)
+        before = {r.id for r in member.roles} if member else set()
+        added = [int(r) for r in data.get('roles', []) if int(r) not in before]
+        if added:
+            upstream.audit[(guild_id, AUDIT_ROLE_UPDATE)] = (moderator, target, added)
+
+
+def apply_state(state, event: str, data: dict) -> None:
+    if event == 'READY':
+        state.user = discord.ClientUser(state=state, data=data['user'])
+    elif event == 'GUILD_CREATE':
+        state._add_guild_from_data(data)
+    else:
+        state.parsers[event](data)
+
+
+async def replay(args, recording: str) -> tuple:
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.presences = True
+    bot = ReplayBot(args.max_inflight, command_prefix=config.BOT_PREFIX, intents=intents,
+                    chunk_guilds_at_startup=False)
+    await bot._async_setup_hook()
+    state = bot._connection
+    upstream = FakeDiscord(bot, args.http_ms / 1000)
+    bot.http.request = upstream.request
+
+    def trace(statement: str) -> None:
+        listener = current_listener.get()
+        if listener is not None:
+            bot.stats[listener].queries += 1
+
+    events = list(read_recording(recording))
+    for _, event, data in events:
+        if event == 'READY':
+            apply_state(state, event, data)
+            break
+    else:
+        state.user = discord.ClientUser(state=state, data=FakeDiscord.user(upstream, next(snowflakes())))
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for extension in EXTENSIONS:
+            await bot.load_extension(extension)
+        bot._ready.set()
+        for _, event, data in events:
+            if event in STATE_EVENTS and event != 'READY':
+                apply_state(state, event, data)
+        # let the cogs finish loading their settings before the clock starts
+        await asyncio.sleep(0.5)
+        await db.flush_writes()
+        bot.stats.clear()
+        db.set_trace_callback(trace)
+
+        dispatched = 0
+        started = time.perf_counter()
+        for at, event, data in events:
+            if event in STATE_EVENTS:
+                continue
+            parse = state.parsers.get(event)
+            if parse is None:
+                continue
+            if args.speed:
+                delay = started + at / args.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await bot.room()
+            if event in ('GUILD_BAN_ADD', 'GUILD_MEMBER_UPDATE'):
+                remember_audit(upstream, state, event, data)
+            parse(data)
+            dispatched += 1
+            await asyncio.sleep(0)
+        await bot.idle()
+        await db.flush_writes()
+        elapsed = time.perf_counter() - started
+        db.set_trace_callback(None)
+    return bot, upstream, dispatched, elapsed
+
+
+def report(bot: ReplayBot, upstream: FakeDiscord, dispatched: int, elapsed: float) -> dict:
+    rows = {name: stats.row() for name, stats in sorted(bot.stats.items())}
+    print(f"{dispatched} dispatches replayed in {elapsed:.2f}s ({dispatched / elapsed:.0f}/s), "
+          f"{sum(upstream.calls.values())} discord api calls")
+    print(f"{'listener':<48} {'calls':>6} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'per s':>8} "
+          f"{'db/call':>8} {'api/call':>8}")
+    for name, r in rows.items():
+        print(f"{name:<48} {r['calls']:>6} {r['errors']:>6} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['per_second']:>8.0f} {r['queries_per_call']:>8.2f} {r['http_per_call']:>8.2f}")
+    return rows
+
+
+def compare(rows: dict, baseline: dict, tolerance: float) -> bool:
+    """print regressions against a saved run. True if there were none."""
+    ok = True
+    for name, before in baseline.items():
+        after = rows.get(name)
+        if after is None or not after['calls']:
+            continue
+        problems = []
+        # sub-0.5ms differences are scheduling noise, whatever the ratio
+        if after['p99_ms'] > max(before['p99_ms'] * (1 + tolerance), before['p99_ms'] + 0.5):
+            problems.append(f"p99 {before['p99_ms']:.2f} -> {after['p99_ms']:.2f}ms")
+        for key, label in (('queries_per_call', 'db/call'), ('http_per_call', 'api/call')):
+            if after[key] > before[key] + 0.01:
+                problems.append(f"{label} {before[key]:.2f} -> {after[key]:.2f}")
+        if problems:
+            ok = False
+            print(f"REGRESSION {name}: {', '.join(problems)}")
+    if ok:
+        print(f"no regressions against the baseline (tolerance {tolerance:.0%})")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recording', help='a GATEWAY_RECORD_PATH file; synthetic if omitted')
+    parser.add_argument('--db', help='database to copy for the run; an empty schema if omitted')
+    parser.add_argument('--speed', type=float, default=0, help='0 as fast as possible, 1 recorded pace')
+    parser.add_argument('--max-inflight', type=int, default=200, help='listener tasks running at once')
+    parser.add_argument('--http-ms', type=float, default=0, help='latency of every fake discord api call')
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--members', type=int, default=200)
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=60, help='span of the synthetic recording')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write the results to this json file')
+    parser.add_argument('--compare', help='a json file from --save to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed p99 growth for --compare')
+    parser.add_argument('--verbose', action='store_true', help='keep the cogs\' logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.db_path = os.path.join(tmp, 'replay.db')
+        if args.db:
+            shutil.copyfile(args.db, db.db_path)
+        db.create_tables()
+        recording = args.recording
+        if recording is None:
+            recording = os.path.join(tmp, 'synthetic.jsonl.gz')
+            synthesize(recording, args)
+            print(f"synthetic recording: {args.guilds} guilds x {args.members} members, {args.events} dispatches "
+                  f"({os.path.getsize(recording) / 1024:.0f} KiB)")
+
+        async def run():
+            result = await replay(args, recording)
+            await db.aclose()
+            return result
+
+        bot, upstream, dispatched, elapsed = asyncio.run(run())
+
+    rows = report(bot, upstream, dispatched, elapsed)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(rows, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            if not compare(rows, json.load(file), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
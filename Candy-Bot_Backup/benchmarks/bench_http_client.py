@@ -0,0 +1,132 @@
+"""
+benchmark: request latency, new session per call vs the shared http client.
+
+starts a local stand-in for the radioboss endpoints (https with a throwaway
+self-signed certificate when openssl is available, plain http otherwise) and times
+song-search style GETs.
+
+    per-call   a new aiohttp.ClientSession (and tcp + tls handshake) for every request
+    shared     utils.http_client.HTTPClient, keep-alive pool reused between requests
+
+usage:
+    python benchmarks/bench_http_client.py [--requests 500] [--concurrency 1,8] [--no-tls]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_client import HTTPClient  # noqa: E402
+
+TRACKS = json.dumps({'tracks': [{'id': 1000 + i, 'title': f'artist {i} - track {i}'} for i in range(25)]})
+
+
+async def song_search(request: web.Request) -> web.Response:
+    return web.Response(text=TRACKS, content_type='application/json')
+
+
+def make_ssl_context(tmp: str):
+    """a server context with a fresh self-signed certificate, or None without openssl."""
+    if shutil.which('openssl') is None:
+        return None
+    cert, key = os.path.join(tmp, 'cert.pem'), os.path.join(tmp, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def start_server(ssl_context):
+    app = web.Application()
+    app.router.add_get('/w/songrequestsearch', song_search)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0, ssl_context=ssl_context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    scheme = 'https' if ssl_context else 'http'
+    return runner, f'{scheme}://127.0.0.1:{port}/w/songrequestsearch'
+
+
+async def per_call(url: str) -> None:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, params={'u': 560, 'q': 'track'}, ssl=False) as response:
+            await response.text()
+
+
+def shared(client: HTTPClient):
+    async def call(url: str) -> None:
+        async with client.get(url, params={'u': 560, 'q': 'track'}, ssl=False) as response:
+            await response.text()
+    return call
+
+
+async def run(call, url: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    queue = list(range(requests))
+
+    async def worker():
+        while queue:
+            queue.pop()
+            start = time.perf_counter()
+            await call(url)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'req_s': requests / elapsed,
+    }
+
+
+async def main_async(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        ssl_context = None if args.no_tls else make_ssl_context(tmp)
+        runner, url = await start_server(ssl_context)
+        print(f"stand-in server at {url}")
+        print(f"{'mode':<9} {'conc':>5} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>9}")
+        try:
+            for concurrency in args.concurrency:
+                client = HTTPClient()
+                # one warm-up request so the shared pool starts with a connection
+                await shared(client)(url)
+                for mode, call in (('per-call', per_call), ('shared', shared(client))):
+                    r = await run(call, url, args.requests, concurrency)
+                    print(f"{mode:<9} {concurrency:>5} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['req_s']:>9.0f}")
+                print(f"{'':<9} pool after run: {client.pool_stats()}")
+                await client.close()
+        finally:
+            await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=lambda v: [int(c) for c in v.split(',')], default=[1, 8])
+    parser.add_argument('--no-tls', action='store_true', help='serve plain http instead of https')
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
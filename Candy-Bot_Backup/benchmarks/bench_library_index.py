@@ -0,0 +1,131 @@
+"""
+benchmark: local song library index search speed and typo tolerance.
+
+builds a synthetic "artist - title" library, records it into a temp database
+through LibraryIndex, reloads it (as on a restart) and then runs three kinds of
+query against the trigram index, each aimed at one known track:
+
+    exact      a few whole words of the title
+    partial    word prefixes, the way people type into autocomplete
+    typo       words with a dropped, doubled or swapped letter
+
+plus `missing` queries of made-up words, standing in for songs the crawl never
+found.
+
+reports latency percentiles, how often the aimed-for track is the first result
+(top1) or in the first five (top5), and how often `find` would answer from the
+index without asking radioboss (local). typos should be answered locally and
+missing songs should not.
+
+usage:
+    python benchmarks/bench_library_index.py [--tracks 50000] [--queries 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.radioboss.library_index as library_index_module  # noqa: E402
+from modules.database.database import DatabaseManager  # noqa: E402
+from modules.radioboss.library_index import LibraryIndex  # noqa: E402
+
+# consonant + vowel (+ consonant) syllables, roughly as varied as real artist and track names
+SYLLABLES = [c + v + e for c in 'bdfgklmnprstvz' for v in 'aeiou' for e in ('', 'n', 'r', 'x')]
+STATION = 'BENCH'
+
+
+def make_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def make_library(tracks: int, rng: random.Random) -> list:
+    artists = [' '.join(make_word(rng) for _ in range(rng.randint(1, 2))).title() for _ in range(tracks // 8)]
+    library = []
+    for i in range(tracks):
+        title = ' '.join(make_word(rng) for _ in range(rng.randint(2, 4))).title()
+        library.append({'id': str(100000 + i), 'title': f"{rng.choice(artists)} - {title}"})
+    return library
+
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(('drop', 'double', 'swap'))
+    if kind == 'drop':
+        return word[:i] + word[i + 1:]
+    if kind == 'double':
+        return word[:i] + word[i] + word[i:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def make_query(track: dict, kind: str, rng: random.Random) -> str:
+    if kind == 'missing':
+        # made of the same syllables as the library, but almost certainly not a title in it
+        return ' '.join(make_word(rng) for _ in range(3))
+    words = track['title'].replace(' - ', ' ').lower().split()
+    start = rng.randrange(0, max(1, len(words) - 2))
+    picked = words[start:start + 3]
+    if kind == 'partial':
+        return ' '.join(w[:max(3, len(w) - 2)] for w in picked)
+    if kind == 'typo':
+        return ' '.join(typo(w, rng) for w in picked)
+    return ' '.join(picked)
+
+
+async def main_async(args) -> None:
+    rng = random.Random(args.seed)
+    tracks = make_library(args.tracks, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library_index_module.db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        index = LibraryIndex()
+        start = time.perf_counter()
+        await index.record(tracks, STATION)
+        print(f"indexed {len(tracks)} tracks in {time.perf_counter() - start:.2f}s")
+
+        reloaded = LibraryIndex()
+        start = time.perf_counter()
+        await reloaded.load()
+        print(f"reloaded from sqlite in {time.perf_counter() - start:.2f}s")
+        library = reloaded.library(STATION)
+
+        library.synced_at = time.time()
+        print(f"{'kind':<8} {'p50 ms':>7} {'p99 ms':>7} {'top1':>6} {'top5':>6} {'local':>6}")
+        for kind in ('exact', 'partial', 'typo', 'missing'):
+            latencies, top1, top5, local = [], 0, 0, 0
+            for _ in range(args.queries):
+                track = rng.choice(tracks)
+                query = make_query(track, kind, rng)
+                start = time.perf_counter()
+                results = library.search(query, limit=25)
+                latencies.append(time.perf_counter() - start)
+                ids = [r['id'] for r in results]
+                top1 += ids[:1] == [track['id']]
+                top5 += track['id'] in ids[:5]
+                local += LibraryIndex.confident(reloaded.search(query, STATION))
+            latencies.sort()
+            print(f"{kind:<8} {statistics.median(latencies) * 1000:>7.2f} "
+                  f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.2f} "
+                  f"{top1 / args.queries:>6.1%} {top5 / args.queries:>6.1%} {local / args.queries:>6.1%}")
+
+        await library_index_module.db.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+benchmark: /stats from hourly and daily rollups vs from every raw sample.
+
+--days of listener counts, one sample every --sample-seconds for --stations
+stations, are fed through both stores with a simulated clock:
+
+    raw      every sample is kept in memory as a list of tuples and written, in
+             batches every --flush-seconds, as a row of a listener_samples table;
+             /stats groups the rows of the last day and week
+    rollup   ListenerStats: samples go into the ring buffer, every --flush-seconds
+             they're folded into the hourly and daily rollups, and /stats reads 24
+             and 7 rollup rows plus what's still buffered
+
+reports rows stored, python memory held per station, write time per sample and
+the time to build the 24h and 7d charts for one station.
+
+usage:
+    python benchmarks/bench_listener_stats.py [--days 90] [--stations 4] [--sample-seconds 60]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.radioboss.listener_stats as listener_stats_module  # noqa: E402
+from modules.database.database import DatabaseManager  # noqa: E402
+from modules.radioboss.listener_stats import DAY, HOUR, ListenerStats, sparkline  # noqa: E402
+
+
+def samples(args, now: int):
+    """(at, station, count) in time order, with a daily cycle and noise."""
+    rng = random.Random(args.seed)
+    start = now - args.days * DAY
+    for at in range(start, now, args.sample_seconds):
+        for n in range(args.stations):
+            daily = 1 + math.sin((at % DAY) / DAY * 2 * math.pi)
+            yield at, f"S{n}", max(0, int(20 * (n + 1) * daily + rng.gauss(0, 3)))
+
+
+async def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+async def run_raw(args, now: int, db: DatabaseManager) -> dict:
+    await db.execute(
+        "CREATE TABLE listener_samples (station TEXT NOT NULL, at INTEGER NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (station, at)) WITHOUT ROWID"
+    )
+    tracemalloc.start()
+    held = []
+    write = 0.0
+    batch = []
+    next_flush = now - args.days * DAY + args.flush_seconds
+    for at, station, count in samples(args, now):
+        started = time.perf_counter()
+        held.append((station, at, count))
+        batch.append((station, at, count))
+        if at >= next_flush:
+            await db.executemany("INSERT INTO listener_samples (station, at, count) VALUES (?, ?, ?)", batch)
+            next_flush += args.flush_seconds
+            batch = []
+        write += time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    async def chart():
+        for period, count in ((HOUR, 24), (DAY, 7)):
+            first = now // period - count + 1
+            rows = await db.fetch(
+                "SELECT at / ? AS slot, AVG(count), MAX(count), MIN(count) FROM listener_samples "
+                "WHERE station = ? AND at >= ? GROUP BY slot",
+                (period, 'S0', first * period)
+            )
+            averages = {row[0]: row[1] for row in rows}
+            sparkline([averages.get(slot) for slot in range(first, first + count)])
+
+    return {
+        'rows': len(held), 'memory': memory / args.stations, 'write': write * 1e6 / len(held),
+        'chart': await timed(chart, args.repeat),
+    }
+
+
+async def run_rollup(args, now: int) -> dict:
+    clock = {'now': 0}
+    stats = ListenerStats(clock=lambda: clock['now'])
+    stats._ensure_tables()
+    tracemalloc.start()
+    write = 0.0
+    recorded = 0
+    next_flush = now - args.days * DAY + args.flush_seconds
+    for at, station, count in samples(args, now):
+        clock['now'] = at
+        started = time.perf_counter()
+        stats.record(station, count)
+        if at >= next_flush:
+            await stats.flush()
+            next_flush += args.flush_seconds
+        write += time.perf_counter() - started
+        recorded += 1
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    clock['now'] = now
+
+    async def chart():
+        for period, count in ((HOUR, 24), (DAY, 7)):
+            rollups = await stats.series('S0', period, count)
+            sparkline([r.average for r in rollups])
+
+    db = listener_stats_module.db
+    rows = 0
+    for table in ('listener_stats_hourly', 'listener_stats_daily'):
+        rows += (await db.fetchone(f"SELECT COUNT(*) FROM {table}"))[0]
+    return {
+        'rows': rows, 'memory': memory / args.stations, 'write': write * 1e6 / recorded,
+        'chart': await timed(chart, args.repeat),
+        'buffer': stats.buffers['S0'].nbytes,
+    }
+
+
+async def run(args) -> None:
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_db = DatabaseManager(os.path.join(tmp, 'raw.db'))
+        raw = await run_raw(args, now, raw_db)
+        await raw_db.aclose()
+        listener_stats_module.db = DatabaseManager(os.path.join(tmp, 'rollup.db'))
+        rolled = await run_rollup(args, now)
+        await listener_stats_module.db.aclose()
+
+    print(f"{args.days} days, {args.stations} stations, a sample every {args.sample_seconds}s "
+          f"(ring buffer {rolled['buffer'] / 1024:.1f} KiB per station)")
+    print(f"{'store':<7} {'rows':>9} {'memory/station':>15} {'write/sample':>13} {'24h+7d chart':>13}")
+    for name, r in (('raw', raw), ('rollup', rolled)):
+        print(f"{name:<7} {r['rows']:>9} {r['memory'] / 1024:>12.1f}KiB {r['write']:>11.1f}us {r['chart']:>11.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--sample-seconds', type=int, default=60)
+    parser.add_argument('--flush-seconds', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+benchmark: now playing lookups, a radioboss request per command vs the cached service.
+
+simulates bursts of /currently-playing style lookups from many guilds against a
+stand-in radioboss fetcher with a configurable latency (and a slow spell part way
+through, to show stale answers being served while the refresh is pending).
+
+    direct    every lookup awaits its own upstream request
+    service   NowPlayingService: ttl cache, single-flight refresh, stale-while-revalidate
+
+usage:
+    python benchmarks/bench_now_playing.py [--bursts 30] [--callers 50] [--latency-ms 250]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.radioboss.now_playing import NowPlayingService  # noqa: E402
+
+
+class FakeRadioBoss:
+    """an upstream that answers after a delay and counts requests."""
+
+    def __init__(self, latency: float, slow_latency: float):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow = False
+        self.requests = 0
+
+    async def fetch(self):
+        self.requests += 1
+        await asyncio.sleep(self.slow_latency if self.slow else self.latency)
+        return {'currenttrack_info': {'@attributes': {'ARTIST': 'artist', 'TITLE': f'track {self.requests}'}}}
+
+
+async def run(lookup, upstream: FakeRadioBoss, args) -> dict:
+    rng = random.Random(args.seed)
+    latencies = []
+
+    async def caller():
+        # callers in a burst arrive spread over a short window
+        await asyncio.sleep(rng.random() * args.spread_ms / 1000)
+        start = time.perf_counter()
+        await lookup()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for burst in range(args.bursts):
+        upstream.slow = args.bursts // 2 <= burst < args.bursts // 2 + 3
+        await asyncio.gather(*(caller() for _ in range(args.callers)))
+        await asyncio.sleep(args.gap_ms / 1000)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': upstream.requests,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'elapsed': elapsed,
+    }
+
+
+async def main_async(args) -> None:
+    print(f"bursts={args.bursts} callers={args.callers} latency={args.latency_ms}ms "
+          f"slow={args.slow_latency_ms}ms ttl={args.ttl}s gap={args.gap_ms}ms")
+    print(f"{'mode':<8} {'upstream':>9} {'p50 ms':>8} {'p99 ms':>8} {'wall s':>7}")
+
+    upstream = FakeRadioBoss(args.latency_ms / 1000, args.slow_latency_ms / 1000)
+    r = await run(upstream.fetch, upstream, args)
+    print(f"{'direct':<8} {r['requests']:>9} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['elapsed']:>7.1f}")
+
+    upstream = FakeRadioBoss(args.latency_ms / 1000, args.slow_latency_ms / 1000)
+    service = NowPlayingService('bench', upstream.fetch, ttl=args.ttl, stale_for=args.stale_for,
+                                refresh_wait=args.refresh_wait)
+    r = await run(service.get, upstream, args)
+    print(f"{'service':<8} {r['requests']:>9} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['elapsed']:>7.1f}")
+    print(f"service stats: {service.stats.summary()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bursts', type=int, default=30)
+    parser.add_argument('--callers', type=int, default=50, help='lookups per burst')
+    parser.add_argument('--spread-ms', type=float, default=200, help='how spread out callers in a burst are')
+    parser.add_argument('--gap-ms', type=float, default=400, help='pause between bursts')
+    parser.add_argument('--latency-ms', type=float, default=250)
+    parser.add_argument('--slow-latency-ms', type=float, default=3000, help='upstream latency during the slow spell')
+    parser.add_argument('--ttl', type=float, default=2.0)
+    parser.add_argument('--stale-for', type=float, default=30.0)
+    parser.add_argument('--refresh-wait', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+benchmark: server lockdown overwrite edits, one at a time vs the bulk engine.
+
+channels and roles are stand-ins whose `set_permissions` goes through a mocked
+http layer with request latency, a global request limit and a per-channel bucket,
+both answered with a simulated 429 + retry_after when exceeded (discord.py sleeps
+and retries these, so the mock does the same). a fraction of the channels are
+already locked down so the no-op skipping shows up in the request counts.
+
+    sequential   the old loop: await one edit per channel/role, no skipping
+    bulk         PermissionPlan + PermissionBulkEngine
+
+after the bulk run the plan is rolled back and every overwrite is compared with the
+starting state.
+
+usage:
+    python benchmarks/bench_permission_bulk.py [--channels 300] [--latency-ms 150] [--time-scale 0.1]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from utils.permission_bulk import PermissionBulkEngine, PermissionPlan  # noqa: E402
+
+LOCK = {'send_messages': False, 'add_reactions': False, 'create_public_threads': False}
+BOT = {'send_messages': True, 'manage_messages': True, 'manage_channels': True}
+
+
+class MockHTTP:
+    """latency plus sliding-window rate limits, global and per channel."""
+
+    def __init__(self, latency: float, global_limit: int, bucket_limit: int, bucket_window: float, scale: float):
+        self.latency = latency * scale
+        self.global_limit = global_limit
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window * scale
+        self.global_window = 1.0 * scale
+        self.scale = scale
+        self.global_hits = deque()
+        self.buckets = {}
+        self.requests = 0
+        self.rate_limited = 0
+
+    @staticmethod
+    def _retry_after(hits: deque, limit: int, window: float, now: float) -> float:
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) < limit:
+            hits.append(now)
+            return 0.0
+        return hits[0] + window - now
+
+    async def request(self, bucket: int) -> None:
+        while True:
+            now = time.monotonic()
+            hits = self.buckets.setdefault(bucket, deque())
+            wait = self._retry_after(self.global_hits, self.global_limit, self.global_window, now)
+            if not wait:
+                wait = self._retry_after(hits, self.bucket_limit, self.bucket_window, now)
+                if wait:
+                    # give back the global slot taken above
+                    self.global_hits.pop()
+            if not wait:
+                break
+            self.rate_limited += 1
+            await asyncio.sleep(wait)
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+
+
+class FakeTarget:
+    def __init__(self, target_id: int, name: str):
+        self.id = target_id
+        self.name = name
+
+    def __hash__(self) -> int:
+        return self.id
+
+    def __eq__(self, other) -> bool:
+        return getattr(other, 'id', None) == self.id
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, http: MockHTTP):
+        self.id = channel_id
+        self.name = f'channel-{channel_id}'
+        self.http = http
+        self._overwrites = {}
+
+    @property
+    def overwrites(self):
+        return dict(self._overwrites)
+
+    def overwrites_for(self, target) -> discord.PermissionOverwrite:
+        return self._overwrites.get(target, discord.PermissionOverwrite())
+
+    async def set_permissions(self, target, *, overwrite=None, reason=None) -> None:
+        await self.http.request(self.id)
+        if overwrite is None:
+            self._overwrites.pop(target, None)
+        else:
+            self._overwrites[target] = overwrite
+
+    def state(self):
+        return {t.id: ow.pair() for t, ow in self._overwrites.items()}
+
+
+def build_server(channels: int, locked_fraction: float, http: MockHTTP, seed: int):
+    rng = random.Random(seed)
+    everyone = FakeTarget(1, '@everyone')
+    bot = FakeTarget(2, 'bot')
+    moderators = FakeTarget(3, 'moderators')
+    server = []
+    for i in range(channels):
+        channel = FakeChannel(1000 + i, http)
+        # existing overwrites that a lockdown must not clobber
+        if rng.random() < 0.5:
+            channel._overwrites[moderators] = discord.PermissionOverwrite(manage_messages=True)
+        if rng.random() < 0.3:
+            channel._overwrites[everyone] = discord.PermissionOverwrite(attach_files=False)
+        if rng.random() < locked_fraction:
+            # already locked from an earlier incident
+            merged = channel.overwrites_for(everyone)
+            merged.update(**LOCK)
+            channel._overwrites[everyone] = merged
+            channel._overwrites[bot] = discord.PermissionOverwrite(**BOT)
+        server.append(channel)
+    return server, everyone, bot
+
+
+async def run_sequential(server, everyone, bot) -> None:
+    for channel in server:
+        merged = channel.overwrites_for(everyone)
+        merged.update(**LOCK)
+        await channel.set_permissions(everyone, overwrite=merged)
+        await channel.set_permissions(bot, overwrite=discord.PermissionOverwrite(**BOT))
+
+
+async def run_bulk(server, everyone, bot, concurrency: int) -> PermissionPlan:
+    plan = PermissionPlan()
+    for channel in server:
+        plan.update(channel, everyone, **LOCK)
+        plan.update(channel, bot, **BOT)
+    await PermissionBulkEngine(concurrency).apply(plan)
+    return plan
+
+
+async def main_async(args) -> None:
+    print(f"channels={args.channels} latency={args.latency_ms}ms global={args.global_limit}/s "
+          f"bucket={args.bucket_limit}/{args.bucket_window}s already locked={args.locked:.0%}")
+    print(f"{'mode':<11} {'requests':>9} {'429s':>6} {'sim s':>8}")
+
+    def http():
+        return MockHTTP(args.latency_ms / 1000, args.global_limit, args.bucket_limit,
+                        args.bucket_window, args.time_scale)
+
+    mock = http()
+    server, everyone, bot = build_server(args.channels, args.locked, mock, args.seed)
+    start = time.perf_counter()
+    await run_sequential(server, everyone, bot)
+    elapsed = (time.perf_counter() - start) / args.time_scale
+    print(f"{'sequential':<11} {mock.requests:>9} {mock.rate_limited:>6} {elapsed:>8.1f}")
+
+    mock = http()
+    server, everyone, bot = build_server(args.channels, args.locked, mock, args.seed)
+    before = [channel.state() for channel in server]
+    start = time.perf_counter()
+    plan = await run_bulk(server, everyone, bot, args.concurrency)
+    elapsed = (time.perf_counter() - start) / args.time_scale
+    print(f"{'bulk':<11} {mock.requests:>9} {mock.rate_limited:>6} {elapsed:>8.1f}")
+
+    mock.requests = 0
+    start = time.perf_counter()
+    await PermissionBulkEngine(args.concurrency).apply(plan.rollback())
+    elapsed = (time.perf_counter() - start) / args.time_scale
+    exact = [channel.state() for channel in server] == before
+    print(f"{'rollback':<11} {mock.requests:>9} {'':>6} {elapsed:>8.1f}  exact={exact}")
+    if not exact:
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=300)
+    parser.add_argument('--locked', type=float, default=0.2, help='fraction of channels already locked')
+    parser.add_argument('--latency-ms', type=float, default=150)
+    parser.add_argument('--global-limit', type=int, default=50, help='requests per second across the bot')
+    parser.add_argument('--bucket-limit', type=int, default=5, help='requests per bucket window per channel')
+    parser.add_argument('--bucket-window', type=float, default=5.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--time-scale', type=float, default=0.1, help='run the simulation faster than real time')
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+benchmark: play history queries on a year of plays.
+
+a temporary database is filled with --days of history for --stations stations,
+--plays-per-day plays each, drawn from --tracks tracks with a zipf-like skew and
+--djs djs taking turns. the history and the daily counters are written the way
+PlayHistory.record leaves them. then:
+
+    record       PlayHistory.record for new track changes (track upsert, history
+                 row and counters in one transaction)
+    page         /recent: the newest page, and a page --depth pages back, read with
+                 the played_at keyset against LIMIT/OFFSET
+    top tracks   /top-tracks over 7 and 365 days, from the daily counters against a
+                 GROUP BY over the history rows in the range
+    dj plays     /dj-plays over 7 and 365 days, same comparison
+
+usage:
+    python benchmarks/bench_play_history.py [--days 365] [--stations 4] [--plays-per-day 400]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.radioboss.play_history as play_history_module  # noqa: E402
+from modules.database.database import DatabaseManager  # noqa: E402
+from modules.radioboss.play_history import DAY, PlayHistory  # noqa: E402
+from modules.radioboss.track_events import TrackChange  # noqa: E402
+
+
+def populate(args, now: int):
+    """a function filling the tables with the generated history, for run_in_transaction."""
+    rng = random.Random(args.seed)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(args.tracks)))
+    stations = [f"S{n}" for n in range(args.stations)]
+    djs = [f"dj {n}" for n in range(args.djs)]
+    start = now - args.days * DAY
+    step = DAY // args.plays_per_day
+
+    def fill(connection):
+        connection.executemany(
+            "INSERT INTO play_tracks (id, artist, title, duration) VALUES (?, ?, ?, 200)",
+            ((n + 1, f"artist {n % 500}", f"title {n}") for n in range(args.tracks))
+        )
+        history, counts, dj_counts = [], {}, {}
+        for station in stations:
+            picks = rng.choices(range(1, args.tracks + 1), cum_weights=weights, k=args.days * args.plays_per_day)
+            for n, track in enumerate(picks):
+                played_at = start + n * step + rng.randrange(step // 2)
+                dj = djs[(played_at // 7200) % len(djs)]
+                history.append((station, played_at, track, dj))
+                day = played_at // DAY
+                counts[(station, day, track)] = counts.get((station, day, track), 0) + 1
+                dj_counts[(station, day, dj)] = dj_counts.get((station, day, dj), 0) + 1
+        connection.executemany(
+            "INSERT INTO play_history (station, played_at, track, dj) VALUES (?, ?, ?, ?)", history
+        )
+        connection.executemany(
+            "INSERT INTO play_counts_daily (station, day, track, plays) VALUES (?, ?, ?, ?)",
+            (key + (plays,) for key, plays in counts.items())
+        )
+        connection.executemany(
+            "INSERT INTO dj_plays_daily (station, day, dj, plays) VALUES (?, ?, ?, ?)",
+            (key + (plays,) for key, plays in dj_counts.items())
+        )
+        return len(history)
+
+    return fill
+
+
+async def timed(fn, repeat: int) -> float:
+    """median ms of fn() over repeat runs."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+async def run(args) -> None:
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        db = play_history_module.db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        history = PlayHistory()
+        history._ensure_tables()
+        started = time.perf_counter()
+        plays = await db.run_in_transaction(populate(args, now))
+        print(f"{plays} plays, {args.stations} stations, {args.days} days, {args.tracks} tracks "
+              f"(filled in {time.perf_counter() - started:.1f}s)")
+        await history.load()
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(os.path.join(tmp, 'bench.db'))
+        print(f"database {size / 1e6:.1f} MB, {size / plays:.0f} bytes per play")
+        print(f"{'query':<28} {'median ms':>10}")
+
+        # record new plays a few minutes apart, after the generated history
+        changes = iter(range(1, 10_000))
+
+        async def record():
+            n = next(changes)
+            await history.record(TrackChange(
+                'S0', f"artist {n % 500}", f"title {n % args.tracks}", 200, detected_at=now + n * 240
+            ))
+
+        print(f"{'record':<28} {await timed(record, args.repeat):>10.2f}")
+
+        station, page = 'S1', 10
+        offset = args.depth * page
+        before = (await db.fetchone(
+            "SELECT played_at FROM play_history WHERE station = ? ORDER BY played_at DESC LIMIT 1 OFFSET ?",
+            (station, offset - 1)
+        ))['played_at']
+        offset_query = """
+            SELECT h.station, h.played_at, t.artist, t.title, t.duration, h.dj
+            FROM play_history AS h JOIN play_tracks AS t ON t.id = h.track
+            WHERE h.station = ? ORDER BY h.played_at DESC LIMIT ? OFFSET ?
+        """
+        rows = [
+            ('page 1 keyset', lambda: history.recent(station, limit=page)),
+            ('page 1 offset', lambda: db.fetch(offset_query, (station, page, 0))),
+            (f"page {args.depth + 1} keyset", lambda: history.recent(station, before=before, limit=page)),
+            (f"page {args.depth + 1} offset", lambda: db.fetch(offset_query, (station, page, offset))),
+        ]
+        for days in (7, 365):
+            since = now - days * DAY
+            rows += [
+                (f"top tracks {days}d counters", lambda days=days: history.top_tracks(station, days)),
+                (f"top tracks {days}d group by", lambda since=since: db.fetch(
+                    """
+                    SELECT t.artist, t.title, c.plays FROM (
+                        SELECT track, COUNT(*) AS plays FROM play_history
+                        WHERE station = ? AND played_at >= ? GROUP BY track ORDER BY plays DESC LIMIT 10
+                    ) AS c JOIN play_tracks AS t ON t.id = c.track
+                    """,
+                    (station, since)
+                )),
+                (f"dj plays {days}d counters", lambda days=days: history.dj_plays(station, days)),
+                (f"dj plays {days}d group by", lambda since=since: db.fetch(
+                    "SELECT dj, COUNT(*) AS plays FROM play_history WHERE station = ? AND played_at >= ? "
+                    "GROUP BY dj ORDER BY plays DESC LIMIT 10",
+                    (station, since)
+                )),
+            ]
+        for name, fn in rows:
+            print(f"{name:<28} {await timed(fn, args.repeat):>10.2f}")
+        await db.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--plays-per-day', type=int, default=400)
+    parser.add_argument('--tracks', type=int, default=20_000)
+    parser.add_argument('--djs', type=int, default=12)
+    parser.add_argument('--depth', type=int, default=5000, help='pages back for the deep page')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+benchmark: radioboss api calls while the upstream degrades, fixed timeout vs breaker.
+
+a local aiohttp server stands in for the radioboss api and injects faults by phase:
+
+    healthy   answers track/current in --latency-ms
+    hang      accepts requests and never answers (a degraded c4.radioboss.fm)
+    errors    answers 500 at once
+    recovered healthy again
+
+a caller asks for track/current every --interval seconds, like /currently-playing
+traffic, without waiting for earlier calls to finish.
+
+    fixed      the old _make_request: one attempt with a fixed --fixed-timeout
+    breaker    RadioBossAPIClient._make_request with the circuit breaker, adaptive
+               timeout, retry budget and the cached response while the breaker is open
+
+per phase it reports how long callers waited, how many got fresh data, cached data
+or an error, how many requests reached the upstream and the most that were in
+flight at once (sockets held open; the bot's pool allows 8 per host).
+
+usage:
+    python benchmarks/bench_radioboss_breaker.py [--interval 0.1] [--fixed-timeout 10]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import modules.radioboss.radioboss_api as radioboss_api  # noqa: E402
+from modules.radioboss.radioboss_api import RadioBossAPIClient, RadioBossAPIError  # noqa: E402
+from utils.circuit_breaker import BreakerRegistry  # noqa: E402
+from utils.http_client import http_client  # noqa: E402
+
+PHASES = (('healthy', 3), ('hang', 6), ('errors', 3), ('recovered', 6))
+
+
+class FaultyUpstream:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.phase = 'healthy'
+        self.hits = {name: 0 for name, _ in PHASES}
+        self.inflight = 0
+        self.peak = {name: 0 for name, _ in PHASES}
+        self.track = 0
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        phase = self.phase
+        self.hits[phase] += 1
+        self.inflight += 1
+        self.peak[phase] = max(self.peak[phase], self.inflight)
+        try:
+            if phase == 'hang':
+                # hold the socket until the caller gives up on it
+                while request.transport is not None and not request.transport.is_closing():
+                    await asyncio.sleep(0.05)
+                return web.Response()
+            if phase == 'errors':
+                return web.Response(status=500, text='internal error')
+            await asyncio.sleep(self.latency)
+            self.track += 1
+            return web.json_response({'title': f"track {self.track}"})
+        finally:
+            self.inflight -= 1
+
+
+async def fixed_request(base_url: str, timeout: float) -> dict:
+    """the _make_request this replaced: one attempt, fixed timeout."""
+    url = f"{base_url}/api/track/current"
+    async with http_client.get(url, params={'station': '1'}, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        if response.status != 200:
+            raise RadioBossAPIError(f"API request failed with status {response.status}")
+        return await response.json()
+
+
+async def run(mode: str, args) -> dict:
+    upstream = FaultyUpstream(args.latency_ms / 1000)
+    app = web.Application()
+    app.router.add_get('/api/track/current', upstream.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    radioboss_api.breakers = BreakerRegistry(open_for=args.open_seconds)
+    client = RadioBossAPIClient(base_url=base_url, api_key='bench', station_id='1')
+    results = {name: [] for name, _ in PHASES}
+    latest = {'track': None}
+
+    async def call(phase: str) -> None:
+        started = time.perf_counter()
+        try:
+            if mode == 'fixed':
+                data = await fixed_request(base_url, args.fixed_timeout)
+            else:
+                data = await client._make_request('track/current')
+            outcome = 'cached' if data['title'] == latest['track'] and phase != 'healthy' else 'fresh'
+            latest['track'] = data['title']
+        except (RadioBossAPIError, aiohttp.ClientError, asyncio.TimeoutError):
+            outcome = 'error'
+        results[phase].append(((time.perf_counter() - started) * 1000, outcome))
+
+    tasks = []
+    for phase, seconds in PHASES:
+        upstream.phase = phase
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            tasks.append(asyncio.create_task(call(phase)))
+            await asyncio.sleep(args.interval)
+    await asyncio.gather(*tasks)
+    await http_client.close()
+    await runner.cleanup()
+    return {'results': results, 'hits': upstream.hits, 'peak': upstream.peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between calls')
+    parser.add_argument('--latency-ms', type=float, default=50, help='healthy upstream latency')
+    parser.add_argument('--fixed-timeout', type=float, default=10)
+    parser.add_argument('--open-seconds', type=float, default=2, help='breaker open time for this run')
+    args = parser.parse_args()
+
+    print(f"a call every {args.interval * 1000:.0f}ms, phases "
+          + ', '.join(f"{name} {seconds}s" for name, seconds in PHASES))
+    print(f"{'mode':<8} {'phase':<10} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+          f"{'fresh':>6} {'cached':>7} {'error':>6} {'upstream':>9} {'peak':>5}")
+    for mode in ('fixed', 'breaker'):
+        r = asyncio.run(run(mode, args))
+        for phase, _ in PHASES:
+            rows = r['results'][phase]
+            waits = sorted(wait for wait, _ in rows)
+            outcomes = [outcome for _, outcome in rows]
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            print(f"{mode:<8} {phase:<10} {len(rows):>6} {statistics.median(waits):>8.0f} {p95:>8.0f} "
+                  f"{waits[-1]:>8.0f} {outcomes.count('fresh'):>6} {outcomes.count('cached'):>7} "
+                  f"{outcomes.count('error'):>6} {r['hits'][phase]:>9} {r['peak'][phase]:>5}")
+
+
+if __name__ == '__main__':
+    main()
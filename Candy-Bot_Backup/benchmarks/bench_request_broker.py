@@ -0,0 +1,140 @@
+"""
+benchmark: a burst of /request confirms, sent straight to radioboss vs through the broker.
+
+a fake songrequestmake answers after --upstream-ms. a burst of confirmed requests
+comes in over --seconds: --users regular listeners make a few requests each and
+--spammers make --spam requests each, spread over --guilds guilds. tracks are
+picked with a zipf-like skew, so popular tracks are asked for many times, as when a
+dj asks the chat for requests.
+
+    direct   the old /request: every confirm waits on its own songrequestmake call
+    broker   RequestBroker with a temporary database: confirms get their place in
+             the queue at once, duplicates are folded, buckets limit each user and
+             guild, and the queue is sent one request every --interval-ms
+
+reports how long users waited for the reply, how many calls reached radioboss and
+how many requests were folded or rate limited.
+
+usage:
+    python benchmarks/bench_request_broker.py [--users 50] [--spammers 5] [--upstream-ms 300]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.radioboss.request_broker as request_broker_module  # noqa: E402
+from modules.database.database import DatabaseManager  # noqa: E402
+from modules.radioboss.request_broker import RequestBroker  # noqa: E402
+
+
+class FakeRadioBoss:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.tracks = []
+        self.inflight = 0
+        self.peak = 0
+
+    async def send(self, station_key: str, track_id: str) -> bool:
+        self.calls += 1
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            await asyncio.sleep(self.latency)
+            self.tracks.append(track_id)
+            return True
+        finally:
+            self.inflight -= 1
+
+
+def burst(args) -> list:
+    """(delay, user, guild, track) for every confirm in the burst, in time order."""
+    rng = random.Random(args.seed)
+    weights = [1 / (rank + 1) for rank in range(args.tracks)]
+    users = [(user, 1 + user % args.guilds, rng.randint(1, 3)) for user in range(args.users)]
+    users += [(10_000 + spammer, 1, args.spam) for spammer in range(args.spammers)]
+    confirms = []
+    for user, guild, count in users:
+        for _ in range(count):
+            track = rng.choices(range(args.tracks), weights)[0]
+            confirms.append((rng.uniform(0, args.seconds), user, guild, str(track)))
+    return sorted(confirms)
+
+
+async def replay(confirms: list, handle) -> list:
+    started = time.perf_counter()
+    waits = []
+
+    async def confirm(delay: float, user: int, guild: int, track: str) -> None:
+        await asyncio.sleep(max(0.0, started + delay - time.perf_counter()))
+        begin = time.perf_counter()
+        outcome = await handle(user, guild, track)
+        waits.append(((time.perf_counter() - begin) * 1000, outcome))
+
+    await asyncio.gather(*(confirm(*c) for c in confirms))
+    return waits
+
+
+async def run(mode: str, args, confirms: list) -> dict:
+    upstream = FakeRadioBoss(args.upstream_ms / 1000)
+    if mode == 'direct':
+        async def handle(user, guild, track):
+            return 'sent' if await upstream.send('BENCH', track) else 'error'
+        waits = await replay(confirms, handle)
+        return {'waits': waits, 'upstream': upstream}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        request_broker_module.db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+        broker = RequestBroker(sender=upstream.send, interval=args.interval_ms / 1000)
+        await broker.load()
+
+        async def handle(user, guild, track):
+            result = await broker.submit(track, f"track {track}", user, guild, station_key='BENCH')
+            return result.status
+
+        waits = await replay(confirms, handle)
+        while broker.queue('BENCH'):
+            await asyncio.sleep(0.01)
+        broker.stop()
+        await request_broker_module.db.aclose()
+    return {'waits': waits, 'upstream': upstream}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--spammers', type=int, default=5)
+    parser.add_argument('--spam', type=int, default=10, help='requests per spammer')
+    parser.add_argument('--guilds', type=int, default=5)
+    parser.add_argument('--tracks', type=int, default=40, help='distinct tracks people ask for')
+    parser.add_argument('--seconds', type=float, default=10, help='length of the burst')
+    parser.add_argument('--upstream-ms', type=float, default=300)
+    parser.add_argument('--interval-ms', type=float, default=20, help='broker send interval for this run')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    confirms = burst(args)
+    print(f"{len(confirms)} confirms over {args.seconds:.0f}s from {args.users + args.spammers} users, "
+          f"{len({c[3] for c in confirms})} distinct tracks, radioboss answers in {args.upstream_ms:.0f}ms")
+    print(f"{'mode':<7} {'reply p50':>10} {'p95':>8} {'radioboss calls':>16} {'peak':>5} "
+          f"{'folded':>7} {'limited':>8} {'full':>5}")
+    for mode in ('direct', 'broker'):
+        r = asyncio.run(run(mode, args, confirms))
+        waits = sorted(wait for wait, _ in r['waits'])
+        outcomes = [outcome for _, outcome in r['waits']]
+        folded = outcomes.count('duplicate') + outcomes.count('already_sent')
+        print(f"{mode:<7} {statistics.median(waits):>8.1f}ms {waits[int(len(waits) * 0.95)]:>6.1f}ms "
+              f"{r['upstream'].calls:>16} {r['upstream'].peak:>5} {folded:>7} "
+              f"{outcomes.count('rate_limited'):>8} {outcomes.count('full'):>5}")
+
+
+if __name__ == '__main__':
+    main()
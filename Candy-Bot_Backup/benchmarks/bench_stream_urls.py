@@ -0,0 +1,126 @@
+"""
+benchmark: finding a working stream url, one at a time vs raced.
+
+a local aiohttp server stands in for a station's mounts:
+
+    /dead     accepts the request and never answers (a mount behind a dead relay)
+    /html     answers at once with an html error page (a mount that's been moved)
+    /stream   answers after --stream-ms with audio/mpeg and keeps sending
+
+the station lists them in that order, like a configured url that's down followed by
+its fallbacks.
+
+    sequential   the old lookup: try each url in turn, each with the full timeout
+    race         StreamURLProber, cold cache: candidates start --stagger-ms apart
+                 (sooner when one fails) and the first to send audio wins
+    backed off   race again once the winner expired, with the dead and html mounts
+                 still backed off from earlier failures: they're skipped
+    cached       resolve while the winner is still cached
+
+usage:
+    python benchmarks/bench_stream_urls.py [--rounds 5] [--timeout 4]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+from modules.radioboss.stream_urls import StreamURLProber  # noqa: E402
+from utils.http_client import HTTPClient  # noqa: E402
+
+
+async def dead(request: web.Request) -> web.StreamResponse:
+    await asyncio.sleep(3600)
+    return web.Response()
+
+
+async def html(request: web.Request) -> web.StreamResponse:
+    return web.Response(text='<html>moved</html>', content_type='text/html')
+
+
+def stream(delay: float):
+    async def handler(request: web.Request) -> web.StreamResponse:
+        await asyncio.sleep(delay)
+        response = web.StreamResponse(headers={'Content-Type': 'audio/mpeg', 'icy-name': 'bench'})
+        await response.prepare(request)
+        try:
+            while True:
+                await response.write(bytes(418))
+                await asyncio.sleep(0.026)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+    return handler
+
+
+async def run(args) -> None:
+    app = web.Application()
+    app.router.add_get('/dead', dead)
+    app.router.add_get('/html', html)
+    app.router.add_get('/stream', stream(args.stream_ms / 1000))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    stations = {'BENCH': {'url': f"{base}/dead", 'fallback_urls': [f"{base}/html", f"{base}/stream"]}}
+    urls = [stations['BENCH']['url'], *stations['BENCH']['fallback_urls']]
+
+    results = {'sequential': [], 'race': [], 'backed off': [], 'cached': []}
+    for _ in range(args.rounds):
+        client = HTTPClient()
+        prober = StreamURLProber(client=client, timeout=args.timeout, stagger=args.stagger_ms / 1000, stations=stations)
+
+        start = time.perf_counter()
+        for url in urls:
+            if await prober._check(url):
+                break
+        results['sequential'].append((time.perf_counter() - start) * 1000)
+
+        # the sequential run's failures are what a later race would know about
+        failures = dict(prober._failures)
+        prober._failures.clear()
+        start = time.perf_counter()
+        winner = await prober.resolve('BENCH')
+        results['race'].append((time.perf_counter() - start) * 1000)
+        assert winner.endswith('/stream'), winner
+
+        start = time.perf_counter()
+        await prober.resolve('BENCH')
+        results['cached'].append((time.perf_counter() - start) * 1000)
+
+        prober._winners.clear()
+        prober._failures.update(failures)
+        start = time.perf_counter()
+        await prober.resolve('BENCH')
+        results['backed off'].append((time.perf_counter() - start) * 1000)
+        await client.close()
+
+    await runner.cleanup()
+    print(f"rounds={args.rounds} timeout={args.timeout:.0f}s stagger={args.stagger_ms:.0f}ms "
+          f"working mount answers in {args.stream_ms:.0f}ms")
+    print(f"{'mode':<11} {'median ms':>10} {'max ms':>8}")
+    for mode, times in results.items():
+        print(f"{mode:<11} {statistics.median(times):>10.1f} {max(times):>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=4, help='per url timeout')
+    parser.add_argument('--stagger-ms', type=float, default=250)
+    parser.add_argument('--stream-ms', type=float, default=150, help='time the working mount takes to answer')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
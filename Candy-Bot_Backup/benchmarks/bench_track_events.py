@@ -0,0 +1,148 @@
+"""
+benchmark: track change detection, fixed polling per guild vs one adaptive poller.
+
+a stand-in station plays a random playlist (track lengths 2.5 to 5.5 minutes) and
+both approaches watch it for a simulated stretch of time, run faster than real time:
+
+    fixed      every guild's panel polls radioboss itself on a fixed interval
+    adaptive   one TrackPoller for the station publishing TRACK_CHANGED on the bus,
+               with every guild subscribed
+
+reports upstream requests, requests per track change, how late changes are noticed
+and how many message edits were made (the adaptive path only edits on a change).
+
+usage:
+    python benchmarks/bench_track_events.py [--guilds 50] [--minutes 120] [--fixed-interval 15]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.radioboss.now_playing import NowPlayingService  # noqa: E402
+from modules.radioboss.track_events import TRACK_CHANGED, TrackPoller  # noqa: E402
+from utils.event_bus import EventBus  # noqa: E402
+
+
+class FakeStation:
+    """a playlist laid out on a simulated clock."""
+
+    def __init__(self, minutes: float, scale: float, seed: int):
+        rng = random.Random(seed)
+        self.scale = scale
+        self.starts = []
+        self.durations = []
+        t = 0.0
+        while t < minutes * 60:
+            duration = rng.randint(150, 330)
+            self.starts.append(t)
+            self.durations.append(duration)
+            t += duration
+        self.began = time.monotonic()
+        self.requests = 0
+
+    def now(self) -> float:
+        return (time.monotonic() - self.began) / self.scale
+
+    def index(self, t: float) -> int:
+        lo, hi = 0, len(self.starts) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.starts[mid] <= t:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    async def fetch(self):
+        self.requests += 1
+        i = self.index(self.now())
+        minutes, seconds = divmod(self.durations[i], 60)
+        return {'currenttrack_info': {'@attributes': {
+            'ARTIST': f'artist {i}', 'TITLE': f'track {i}', 'DURATION': f'{minutes}:{seconds:02d}'
+        }}}
+
+
+def lag(station: FakeStation, title: str) -> float:
+    i = int(title.split()[-1])
+    return station.now() - station.starts[i]
+
+
+async def run_fixed(args) -> dict:
+    station = FakeStation(args.minutes, args.scale, args.seed)
+    lags, edits = [], 0
+
+    async def guild():
+        nonlocal edits
+        shown = None
+        while station.now() < args.minutes * 60:
+            data = await station.fetch()
+            title = data['currenttrack_info']['@attributes']['TITLE']
+            if title != shown:
+                if shown is not None:
+                    lags.append(lag(station, title))
+                shown = title
+                edits += 1
+            await asyncio.sleep(args.fixed_interval * args.scale)
+
+    await asyncio.gather(*(guild() for _ in range(args.guilds)))
+    return {'requests': station.requests, 'changes': len(station.starts) - 1, 'lags': lags, 'edits': edits}
+
+
+async def run_adaptive(args) -> dict:
+    station = FakeStation(args.minutes, args.scale, args.seed)
+    bus = EventBus()
+    lags, edits = [], 0
+    # the service and poller run on the simulated clock; only the sleeps are scaled down
+    service = NowPlayingService('bench', station.fetch, ttl=0, stale_for=0, clock=station.now)
+    poller = TrackPoller('bench', service, bus, clock=station.now,
+                         sleep=lambda delay: asyncio.sleep(delay * args.scale))
+
+    async def panel(track):
+        nonlocal edits
+        edits += 1
+
+    async def record_lag(track):
+        # the first track is already playing when the poller starts
+        if track.previous is not None:
+            lags.append(lag(station, track.title))
+
+    for _ in range(args.guilds):
+        bus.subscribe(TRACK_CHANGED, panel)
+    bus.subscribe(TRACK_CHANGED, record_lag)
+
+    task = asyncio.create_task(poller.run())
+    while station.now() < args.minutes * 60:
+        await asyncio.sleep(10 * args.scale)
+    task.cancel()
+    return {'requests': station.requests, 'changes': len(station.starts) - 1, 'lags': lags, 'edits': edits}
+
+
+async def main_async(args) -> None:
+    print(f"guilds={args.guilds} simulated={args.minutes}min fixed interval={args.fixed_interval}s")
+    print(f"{'mode':<9} {'requests':>9} {'req/change':>11} {'lag p50 s':>10} {'lag max s':>10} {'edits':>7}")
+    for mode, run in (('fixed', run_fixed), ('adaptive', run_adaptive)):
+        r = await run(args)
+        lags = r['lags'] or [0.0]
+        print(f"{mode:<9} {r['requests']:>9} {r['requests'] / max(1, r['changes']):>11.1f} "
+              f"{statistics.median(lags):>10.1f} {max(lags):>10.1f} {r['edits']:>7}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=50)
+    parser.add_argument('--minutes', type=float, default=120, help='simulated time to watch the station for')
+    parser.add_argument('--fixed-interval', type=float, default=15, help='per-guild poll interval, seconds')
+    parser.add_argument('--scale', type=float, default=0.002, help='real seconds per simulated second')
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
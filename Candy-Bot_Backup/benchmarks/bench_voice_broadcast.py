@@ -0,0 +1,195 @@
+"""
+benchmark: cpu and memory per guild, ffmpeg per guild vs one shared station broadcast.
+
+needs ffmpeg on PATH (and libopus for discord.py to encode the per-guild mode the way
+the voice player does). a short mp3 test tone is rendered once and served in a loop,
+paced at its bitrate, from a local http server standing in for the radioboss mount.
+each "guild" is a player thread that reads a packet every 20 ms like discord.py's
+AudioPlayer, without a real voice connection.
+
+    per-guild   discord.FFmpegPCMAudio per guild (the old /join), pcm encoded to opus
+    broadcast   modules.voice.broadcaster: one FFmpegOpusAudio per station, packets copied
+
+cpu and rss are summed over this process and its ffmpeg children (linux /proc).
+
+usage:
+    python benchmarks/bench_voice_broadcast.py [--guilds 1,5,10,20] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from modules.voice.broadcaster import BroadcastManager  # noqa: E402
+
+FFMPEG_OPTIONS = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
+    'options': '-vn -loglevel warning -af volume=1.0',
+}
+BITRATE = 128_000
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def render_tone(path: str) -> None:
+    subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=30',
+         '-ac', '2', '-ar', '44100', '-b:a', '128k', path],
+        check=True
+    )
+
+
+async def start_stream_server(mp3: bytes):
+    async def stream(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={'Content-Type': 'audio/mpeg'})
+        await response.prepare(request)
+        chunk = BITRATE // 8 // 10  # 100 ms of audio
+        offset = 0
+        try:
+            while True:
+                await response.write(mp3[offset:offset + chunk])
+                offset = (offset + chunk) % len(mp3)
+                await asyncio.sleep(0.1)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_get('/stream', stream)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/stream'
+
+
+def _children(pid: int):
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == pid:
+                yield int(entry)
+        except (OSError, IndexError, ValueError):
+            continue
+
+
+def _usage(pid: int):
+    """(cpu seconds, rss bytes) of one process."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        with open(f'/proc/{pid}/status') as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+        return cpu, rss
+    except (OSError, StopIteration, IndexError, ValueError):
+        return 0.0, 0
+
+
+def tree_usage():
+    pids = [os.getpid(), *_children(os.getpid())]
+    usage = [_usage(pid) for pid in pids]
+    return sum(u[0] for u in usage), sum(u[1] for u in usage), len(pids) - 1
+
+
+class Player(threading.Thread):
+    """reads a packet every 20 ms, encoding pcm to opus when the source isn't opus."""
+
+    def __init__(self, source: discord.AudioSource, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.source = source
+        self.stop = stop
+        self.encoder = None
+        if not source.is_opus() and discord.opus.is_loaded():
+            self.encoder = discord.opus.Encoder()
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        loops = 0
+        while not self.stop.is_set():
+            data = self.source.read()
+            if not data:
+                break
+            if self.encoder is not None:
+                self.encoder.encode(data, self.encoder.SAMPLES_PER_FRAME)
+            loops += 1
+            time.sleep(max(0.0, start + 0.02 * loops - time.perf_counter()))
+        self.source.cleanup()
+
+
+def measure(make_source, guilds: int, seconds: float) -> dict:
+    stop = threading.Event()
+    players = [Player(make_source(i), stop) for i in range(guilds)]
+    for player in players:
+        player.start()
+    time.sleep(2)  # let ffmpeg connect and settle
+    cpu_before, _, _ = tree_usage()
+    start = time.perf_counter()
+    time.sleep(seconds)
+    cpu_after, rss, processes = tree_usage()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for player in players:
+        player.join(timeout=5)
+    return {'cpu_pct': (cpu_after - cpu_before) / elapsed * 100, 'rss_mb': rss / 2**20, 'ffmpeg': processes}
+
+
+async def main_async(args) -> None:
+    if shutil.which('ffmpeg') is None:
+        sys.exit('ffmpeg is needed on PATH for this benchmark')
+    try:
+        discord.opus._load_default()
+    except Exception:
+        pass
+    if not discord.opus.is_loaded():
+        print('note: libopus not found, per-guild mode is measured without the opus encode')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tone.mp3')
+        render_tone(path)
+        with open(path, 'rb') as f:
+            runner, url = await start_stream_server(f.read())
+
+        loop = asyncio.get_running_loop()
+        print(f"{'mode':<10} {'guilds':>6} {'ffmpeg':>6} {'cpu %':>7} {'rss MB':>7} {'cpu %/guild':>12}")
+        try:
+            for mode in ('per-guild', 'broadcast'):
+                manager = BroadcastManager()
+                if mode == 'per-guild':
+                    def make_source(guild_id):
+                        return discord.FFmpegPCMAudio(url, **FFMPEG_OPTIONS)
+                else:
+                    def make_source(guild_id):
+                        return manager.subscribe('BENCH', url, guild_id)
+                for guilds in args.guilds:
+                    r = await loop.run_in_executor(None, measure, make_source, guilds, args.seconds)
+                    print(f"{mode:<10} {guilds:>6} {r['ffmpeg']:>6} {r['cpu_pct']:>7.1f} {r['rss_mb']:>7.1f} "
+                          f"{r['cpu_pct'] / guilds:>12.2f}")
+        finally:
+            await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=lambda v: [int(g) for g in v.split(',')], default=[1, 5, 10, 20])
+    parser.add_argument('--seconds', type=float, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+benchmark: in-process volume changes on the voice path.
+
+a 440 Hz test tone is played through a GainTransformer frame by frame (20 ms of
+48 kHz stereo pcm each) while a burst of volume button presses lands at random
+points, the way a guild spamming the buttons would. reports:
+
+    cost       time to process one frame at 100%, at a fixed volume and mid-ramp
+    latency    time from a press to the first frame played at the new setting
+    click      largest jump between neighbouring samples on mute, ramped vs switched hard
+    reencode   per-frame decode, scale and encode for a broadcast listener below
+               100% (only when libopus is available)
+
+the old buttons restarted ffmpeg on every press: one new process and one new
+upstream connection each, with the gap while it reconnected.
+
+usage:
+    python benchmarks/bench_voice_gain.py [--presses 20] [--frames 2000]
+"""
+
+import argparse
+import array
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from modules.voice.gain import GainStage, GainTransformer  # noqa: E402
+
+SAMPLES_PER_FRAME = 960
+FRAME_SECONDS = 0.02
+
+
+class ToneSource(discord.AudioSource):
+    """an endless sine wave as 16-bit stereo pcm."""
+
+    def __init__(self, frequency: float = 440.0, level: float = 0.8):
+        self.frequency = frequency
+        self.level = level
+        self.position = 0
+
+    def read(self) -> bytes:
+        samples = array.array('h')
+        for i in range(self.position, self.position + SAMPLES_PER_FRAME):
+            value = int(32767 * self.level * math.sin(2 * math.pi * self.frequency * i / 48000))
+            samples.extend((value, value))
+        self.position += SAMPLES_PER_FRAME
+        return samples.tobytes()
+
+
+def frame_costs(frames: int) -> dict:
+    pcm = ToneSource().read()
+    results = {}
+    for label, setup in (
+        ('100%', lambda g: None),
+        ('50%', lambda g: (g.set(0.5), g.apply(pcm))),
+        ('ramp', None),
+    ):
+        times = []
+        for _ in range(frames):
+            gain = GainStage()
+            if setup is None:
+                gain.set(0.5)
+            else:
+                setup(gain)
+            start = time.perf_counter()
+            if not gain.passthrough:
+                gain.apply(pcm)
+            times.append(time.perf_counter() - start)
+        results[label] = statistics.median(times) * 1e6
+    return results
+
+
+def max_jump(data: bytes) -> int:
+    samples = array.array('h', data)[::2]
+    return max(abs(b - a) for a, b in zip(samples, samples[1:]))
+
+
+def click_test(frames: int = 50) -> dict:
+    """largest sample to sample jump around a mute, over mutes landing at different points of the wave."""
+    tone = ToneSource()
+    natural = max_jump(tone.read())
+    ramped = 0
+    hard = 0
+    for offset in range(frames):
+        source = GainTransformer(ToneSource())
+        source.original.position = offset * 7
+        last = array.array('h', source.read())[-2]
+        source.gain.mute()
+        faded = source.read()
+        ramped = max(ramped, max_jump(faded), abs(array.array('h', faded)[0] - last))
+        # switching hard drops from wherever the wave is to nothing
+        hard = max(hard, abs(last))
+    return {'natural': natural, 'ramped': ramped, 'hard': hard}
+
+
+def press_latency(presses: int, seed: int) -> list:
+    """play frames on a 20 ms clock and time each press until a frame at its setting."""
+    rng = random.Random(seed)
+    source = GainTransformer(ToneSource())
+    press_times = sorted(rng.uniform(0, presses * 0.1) for _ in range(presses))
+    volume = 1.0
+    latencies = []
+    pending = []
+    clock = 0.0
+    while press_times or pending:
+        # presses that land before this frame is read
+        while press_times and press_times[0] <= clock:
+            volume = max(0.1, min(1.0, volume + rng.choice((-0.1, 0.1))))
+            source.gain.set(volume)
+            pending.append(press_times.pop(0))
+        start = time.perf_counter()
+        source.read()
+        spent = time.perf_counter() - start
+        for pressed in pending:
+            latencies.append((clock - pressed) + spent)
+        pending.clear()
+        clock += FRAME_SECONDS
+    return latencies
+
+
+def reencode_cost(frames: int):
+    try:
+        encoder = discord.opus.Encoder()
+        decoder = discord.opus.Decoder()
+    except discord.opus.OpusNotLoaded:
+        return None
+    tone = ToneSource()
+    gain = GainStage()
+    gain.set(0.5)
+    times = []
+    for _ in range(frames):
+        packet = encoder.encode(tone.read(), SAMPLES_PER_FRAME)
+        start = time.perf_counter()
+        pcm = decoder.decode(packet, fec=False)
+        encoder.encode(gain.apply(pcm), SAMPLES_PER_FRAME)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--presses', type=int, default=20)
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    costs = frame_costs(args.frames)
+    print('cost per 20 ms frame (median):')
+    for label, micros in costs.items():
+        print(f"  {label:<6} {micros:>8.1f} us")
+
+    latencies = press_latency(args.presses, args.seed)
+    print(f"latency over {args.presses} presses: p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms, ffmpeg restarts 0 (was {args.presses})")
+
+    clicks = click_test()
+    print(f"largest sample jump on mute: ramped {clicks['ramped']}, hard switch {clicks['hard']} "
+          f"(the tone itself moves up to {clicks['natural']})")
+
+    reencode = reencode_cost(min(args.frames, 500))
+    if reencode is None:
+        print('reencode: libopus not found, skipped')
+    else:
+        print(f"reencode per frame for a listener below 100%: {reencode:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+benchmark: /join time to first audio, cold vs warm stations.
+
+a fake upstream stands in for ffmpeg: connecting takes --connect-ms, then it sends
+a burst of --burst-seconds of packets (like icecast's burst on connect) and one
+packet every 20 ms after that. each join starts a player thread that reads a packet
+every 20 ms like discord.py's AudioPlayer, and the time from the join to the first
+real packet played goes into a histogram.
+
+    per-guild   the old /join: a new upstream per guild, confirmed after a fixed
+                one second sleep
+    cold        a shared broadcast that isn't running yet (first guild, or the
+                station lingered out)
+    warm        a running (lingering or VOICE_WARM_STATIONS) broadcast; the guild's
+                buffer is preloaded with the station's latest packets
+
+usage:
+    python benchmarks/bench_voice_join.py [--joins 20] [--connect-ms 400]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from modules.voice.broadcaster import OPUS_SILENCE, BroadcastManager  # noqa: E402
+from utils.histogram import Histogram  # noqa: E402
+
+PACKET = b'\xfc' + bytes(160)
+
+
+class FakeSource(discord.AudioSource):
+    """an upstream that takes a while to connect, bursts, then runs in real time."""
+
+    def __init__(self, connect: float, burst: float):
+        self.connect = connect
+        self.burst = int(burst / 0.02)
+        self.closed = threading.Event()
+        self.started = None
+        self.sent = 0
+
+    def read(self) -> bytes:
+        if self.started is None:
+            if self.closed.wait(self.connect):
+                return b''
+            self.started = time.monotonic() - self.burst * 0.02
+        if self.closed.wait(max(0.0, self.started + self.sent * 0.02 - time.monotonic())):
+            return b''
+        self.sent += 1
+        return PACKET
+
+    def cleanup(self) -> None:
+        self.closed.set()
+
+
+def play_until_audio(source: discord.AudioSource, joined: float) -> float:
+    """read every 20 ms until a real packet comes out, returns ms since joined."""
+    start = time.perf_counter()
+    loops = 0
+    while True:
+        packet = source.read()
+        if packet and packet != OPUS_SILENCE:
+            return (time.perf_counter() - joined) * 1000
+        loops += 1
+        time.sleep(max(0.0, start + 0.02 * loops - time.perf_counter()))
+
+
+def per_guild(args, histogram: Histogram, confirm: Histogram) -> None:
+    for _ in range(args.joins):
+        joined = time.perf_counter()
+        source = FakeSource(args.connect_ms / 1000, args.burst_seconds)
+        histogram.record(play_until_audio(source, joined))
+        # the old /join confirmed after asyncio.sleep(1) whatever happened
+        confirm.record(1000)
+        source.cleanup()
+
+
+def shared(args, histogram: Histogram, confirm: Histogram, warm: bool) -> None:
+    manager = BroadcastManager(source_factory=lambda station: FakeSource(args.connect_ms / 1000, args.burst_seconds))
+    for _ in range(args.joins):
+        if warm:
+            station = manager.warm('BENCH', 'fake://station')
+            while not station.primed:
+                time.sleep(0.01)
+        joined = time.perf_counter()
+        listener = manager.subscribe('BENCH', 'fake://station', 1)
+        listener.wait_for_audio(10)
+        confirm.record((time.perf_counter() - joined) * 1000)
+        histogram.record(play_until_audio(listener, joined))
+        listener.cleanup()
+        if not warm:
+            # as if the station had lingered out before the next join
+            manager.stop_all()
+    manager.stop_all()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--joins', type=int, default=20)
+    parser.add_argument('--connect-ms', type=float, default=400, help='time for an upstream to connect')
+    parser.add_argument('--burst-seconds', type=float, default=2, help='audio sent at once on connect')
+    args = parser.parse_args()
+
+    print(f"joins={args.joins} upstream connect {args.connect_ms:.0f}ms")
+    print(f"{'mode':<10} {'first audio mean':>17} {'p95':>7} {'confirmed mean':>15}")
+    bounds = (5, 10, 25, 50, 100, 200, 300, 400, 450, 500, 750, 1000, 2000)
+    for mode in ('per-guild', 'cold', 'warm'):
+        histogram = Histogram(bounds=bounds)
+        confirm = Histogram(bounds=bounds)
+        if mode == 'per-guild':
+            per_guild(args, histogram, confirm)
+        else:
+            shared(args, histogram, confirm, warm=mode == 'warm')
+        print(f"{mode:<10} {histogram.mean:>15.0f}ms {histogram.quantile(0.95):>5.0f}ms "
+              f"{confirm.mean:>13.0f}ms")
+        print('\n'.join('    ' + line for line in histogram.render().splitlines()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+benchmark: cpu cost of one station broadcast, transcoding vs opus passthrough.
+
+needs ffmpeg on PATH (and libopus for discord.py to encode the pcm mode). a test
+tone is rendered once as ogg opus and once as mp3 and each is served in a loop,
+paced to real time, from a local http server standing in for a radioboss mount.
+
+first the stream probe is pointed at both mounts to show which mode each would
+get, then one reader thread pulls a packet every 20 ms from the ogg opus mount in
+each mode:
+
+    pcm           FFmpegPCMAudio, pcm encoded to opus in process (the old /join)
+    transcode     FFmpegOpusAudio decoding and re-encoding in ffmpeg
+    passthrough   FFmpegOpusAudio with codec='copy'
+
+cpu is summed over this process and its ffmpeg children (linux /proc).
+
+usage:
+    python benchmarks/bench_voice_passthrough.py [--seconds 20]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from modules.voice.broadcaster import BEFORE_OPTIONS, VOICE_OPUS_BITRATE  # noqa: E402
+from modules.voice.stream_probe import StreamProbe  # noqa: E402
+from utils.http_client import HTTPClient  # noqa: E402
+
+TONE_SECONDS = 30
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def render(path: str, codec_args: list) -> None:
+    subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={TONE_SECONDS}',
+         '-ac', '2', '-ar', '48000', *codec_args, path],
+        check=True
+    )
+
+
+async def start_server(files: dict):
+    def handler(data: bytes, content_type: str):
+        async def stream(request: web.Request) -> web.StreamResponse:
+            response = web.StreamResponse(headers={'Content-Type': content_type})
+            await response.prepare(request)
+            chunk = len(data) // (TONE_SECONDS * 10)  # 100 ms of audio
+            offset = 0
+            try:
+                while True:
+                    await response.write(data[offset:offset + chunk])
+                    offset += chunk
+                    if offset >= len(data):
+                        offset = 0
+                    await asyncio.sleep(0.1)
+            except (ConnectionResetError, asyncio.CancelledError):
+                pass
+            return response
+        return stream
+
+    app = web.Application()
+    for name, (data, content_type) in files.items():
+        app.router.add_get(f'/{name}', handler(data, content_type))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}'
+
+
+def cpu_seconds() -> float:
+    """cpu time of this process and its direct children."""
+    me = os.getpid()
+    total = 0.0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(entry) == me or int(fields[1]) == me:
+            total += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return total
+
+
+def measure(source: discord.AudioSource, seconds: float) -> dict:
+    encoder = None
+    if not source.is_opus() and discord.opus.is_loaded():
+        encoder = discord.opus.Encoder()
+    packets = 0
+    stop = threading.Event()
+
+    def player():
+        nonlocal packets
+        start = time.perf_counter()
+        while not stop.is_set():
+            data = source.read()
+            if not data:
+                break
+            if encoder is not None:
+                encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+            packets += 1
+            time.sleep(max(0.0, start + 0.02 * packets - time.perf_counter()))
+
+    thread = threading.Thread(target=player, daemon=True)
+    thread.start()
+    time.sleep(2)  # let ffmpeg connect and settle
+    before, counted, start = cpu_seconds(), packets, time.perf_counter()
+    time.sleep(seconds)
+    used, elapsed = cpu_seconds() - before, time.perf_counter() - start
+    played = packets - counted
+    stop.set()
+    thread.join(timeout=5)
+    source.cleanup()
+    return {'cpu_pct': used / elapsed * 100, 'packets': played}
+
+
+async def main_async(args) -> None:
+    if shutil.which('ffmpeg') is None:
+        sys.exit('ffmpeg is needed on PATH for this benchmark')
+    try:
+        discord.opus._load_default()
+    except Exception:
+        pass
+    if not discord.opus.is_loaded():
+        print('note: libopus not found, pcm mode is measured without the opus encode')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ogg, mp3 = os.path.join(tmp, 'tone.ogg'), os.path.join(tmp, 'tone.mp3')
+        render(ogg, ['-c:a', 'libopus', '-b:a', '128k', '-frame_duration', '20'])
+        render(mp3, ['-b:a', '128k'])
+        with open(ogg, 'rb') as f_ogg, open(mp3, 'rb') as f_mp3:
+            runner, base = await start_server({
+                'ogg': (f_ogg.read(), 'application/ogg'),
+                'mp3': (f_mp3.read(), 'audio/mpeg'),
+            })
+
+        client = HTTPClient()
+        probe = StreamProbe(client=client, enabled=True)
+        loop = asyncio.get_running_loop()
+        try:
+            for name in ('ogg', 'mp3'):
+                fmt = await probe.get(f'{base}/{name}')
+                mode = 'passthrough' if fmt.passthrough else 'transcode'
+                print(f"probe /{name}: {fmt.codec}, {fmt.channels} ch, {fmt.frame_ms} ms packets -> {mode}")
+
+            url = f'{base}/ogg'
+            sources = {
+                'pcm': lambda: discord.FFmpegPCMAudio(url, before_options=BEFORE_OPTIONS, options='-vn'),
+                'transcode': lambda: discord.FFmpegOpusAudio(
+                    url, bitrate=VOICE_OPUS_BITRATE, before_options=BEFORE_OPTIONS, options='-vn'),
+                'passthrough': lambda: discord.FFmpegOpusAudio(
+                    url, codec='copy', before_options=BEFORE_OPTIONS, options='-vn'),
+            }
+            print(f"{'mode':<12} {'cpu %':>7} {'packets':>8}")
+            for mode, make in sources.items():
+                r = await loop.run_in_executor(None, measure, make(), args.seconds)
+                print(f"{mode:<12} {r['cpu_pct']:>7.2f} {r['packets']:>8}")
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=20)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
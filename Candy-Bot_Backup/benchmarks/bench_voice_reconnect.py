@@ -0,0 +1,161 @@
+"""
+benchmark: what guilds hear when a station's upstream drops.
+
+a fake upstream stands in for ffmpeg: connecting takes --connect-ms, then it sends a
+burst of --burst-seconds of packets (like icecast's burst on connect) and one packet
+every 20 ms after that. during the run it drops the connection twice and stalls
+once (stops sending without closing). guild player threads read a packet every
+20 ms like discord.py's AudioPlayer.
+
+    end on drop   no reconnects and no jitter buffer: a drop ends playback, and the
+                  guild is silent until someone runs /join again
+    supervised    jitter buffer, stall watchdog and reconnects (the defaults)
+
+reports time to first audio, underruns, reconnects and seconds of silence per guild
+after the first audio.
+
+usage:
+    python benchmarks/bench_voice_reconnect.py [--guilds 5] [--seconds 30]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+import modules.voice.broadcaster as broadcast  # noqa: E402
+from modules.voice.broadcaster import OPUS_SILENCE, BroadcastManager  # noqa: E402
+
+PACKET = b'\xfc' + bytes(160)
+
+
+class FakeUpstream:
+    """a station mount that drops or stalls at scheduled times."""
+
+    def __init__(self, connect: float, burst: float, drops: list, stalls: list):
+        self.connect = connect
+        self.burst = int(burst / 0.02)
+        self.drops = list(drops)
+        self.stalls = list(stalls)
+        self.began = time.monotonic()
+        self.connections = 0
+
+    def source(self, station) -> 'FakeSource':
+        self.connections += 1
+        return FakeSource(self)
+
+
+class FakeSource(discord.AudioSource):
+    def __init__(self, upstream: FakeUpstream):
+        self.upstream = upstream
+        self.closed = threading.Event()
+        self.started = None
+        self.sent = 0
+
+    def read(self) -> bytes:
+        upstream = self.upstream
+        if self.started is None:
+            if self.closed.wait(upstream.connect):
+                return b''
+            self.started = time.monotonic() - upstream.burst * 0.02
+        now = time.monotonic() - upstream.began
+        if upstream.drops and now >= upstream.drops[0]:
+            upstream.drops.pop(0)
+            return b''
+        if upstream.stalls and now >= upstream.stalls[0]:
+            upstream.stalls.pop(0)
+            # hang until the watchdog kills us
+            self.closed.wait()
+            return b''
+        due = self.started + self.sent * 0.02
+        if self.closed.wait(max(0.0, due - time.monotonic())):
+            return b''
+        self.sent += 1
+        return PACKET
+
+    def cleanup(self) -> None:
+        self.closed.set()
+
+
+def run(mode: str, args) -> dict:
+    supervised = mode == 'supervised'
+    broadcast.VOICE_STALL_SECONDS = args.stall_seconds if supervised else 1e9
+    third = args.seconds / 3
+    upstream = FakeUpstream(args.connect_ms / 1000, args.burst_seconds, drops=[third, 2 * third], stalls=[2.5 * third])
+
+    def source(station):
+        if not supervised and upstream.connections:
+            # the first drop ends every guild's playback
+            for listener in station.listeners:
+                listener.close()
+            station.stop()
+        return upstream.source(station)
+
+    manager = BroadcastManager(source_factory=source)
+
+    stop = threading.Event()
+    results = []
+
+    def guild(guild_id: int):
+        listener = manager.subscribe('BENCH', 'fake://station', guild_id)
+        if not supervised:
+            listener.prefill = 0
+        heard = False
+        silent = 0
+        start = time.perf_counter()
+        loops = 0
+        while not stop.is_set():
+            packet = listener.read()
+            if packet and packet != OPUS_SILENCE:
+                heard = True
+            elif heard:
+                silent += 1
+            loops += 1
+            time.sleep(max(0.0, start + 0.02 * loops - time.perf_counter()))
+        results.append({
+            'first_ms': listener.stats.first_packet_ms or 0.0,
+            'underruns': listener.stats.underruns,
+            'reconnects': listener.stats.reconnects,
+            'silent': silent * 0.02,
+        })
+        listener.cleanup()
+
+    threads = [threading.Thread(target=guild, args=(i,), daemon=True) for i in range(args.guilds)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    manager.stop_all()
+    return {'results': results, 'connections': upstream.connections}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=5)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--connect-ms', type=float, default=400, help='time for the upstream to (re)connect')
+    parser.add_argument('--burst-seconds', type=float, default=2, help='audio sent at once on connect')
+    parser.add_argument('--stall-seconds', type=float, default=1, help='watchdog threshold for this run')
+    args = parser.parse_args()
+
+    print(f"guilds={args.guilds} run={args.seconds:.0f}s, 2 drops and 1 stall, connect {args.connect_ms:.0f}ms")
+    print(f"{'mode':<13} {'first ms':>9} {'underruns':>10} {'reconnects':>11} {'silent s':>9} {'upstreams':>10}")
+    for mode in ('end on drop', 'supervised'):
+        r = run(mode, args)
+        rows = r['results']
+        print(f"{mode:<13} {statistics.median(x['first_ms'] for x in rows):>9.0f} "
+              f"{sum(x['underruns'] for x in rows) / len(rows):>10.1f} "
+              f"{sum(x['reconnects'] for x in rows) / len(rows):>11.1f} "
+              f"{statistics.mean(x['silent'] for x in rows):>9.1f} {r['connections']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -61,6 +61,110 @@ STATIONS = {
 DEFAULT_STATION = 'LPM'
 RADIOBOSS_STREAM_URL = STATIONS[DEFAULT_STATION]['url']
 
+# database tuning (applied when the bot database connections are opened)
+DB_JOURNAL_MODE = 'WAL'  # wal lets readers run while a write is in progress
+DB_SYNCHRONOUS = 'NORMAL'  # safe with wal, avoids an fsync on every commit
+DB_BUSY_TIMEOUT_MS = 5000  # how long a connection waits on a lock before erroring
+DB_CACHE_SIZE_KIB = 16384  # page cache per connection, in KiB
+DB_MMAP_SIZE = 64 * 1024 * 1024  # bytes of the database file to memory-map
+DB_TEMP_STORE = 'MEMORY'  # keep temp tables and sort spill in memory
+DB_READ_POOL_SIZE = 4  # number of read-only connections used by the async api
+DB_WRITE_BATCH_INTERVAL_MS = 250  # max delay before queued audit/log writes are committed
+DB_WRITE_BATCH_MAX_ROWS = 500  # commit queued writes early once this many are waiting
+
+# event reminder dms
+EVENT_DM_CONCURRENCY = 8  # dms in flight at once
+EVENT_DM_RATE_PER_SEC = 20  # discord api requests per second for reminder dms
+
+# bulk permission overwrite edits (lockdowns, raid locks, mute role setup)
+PERMISSION_BULK_CONCURRENCY = 8  # channels edited at once; edits within a channel share a rate limit bucket
+
+# shared http client (radioboss and other outbound requests)
+HTTP_POOL_LIMIT = 64  # open connections across all hosts
+HTTP_POOL_LIMIT_PER_HOST = 8  # open connections to any single host
+HTTP_KEEPALIVE_SECONDS = 60  # how long idle connections are kept for reuse
+HTTP_TIMEOUT_SECONDS = 10  # total time allowed for a request
+HTTP_CONNECT_TIMEOUT_SECONDS = 5  # time allowed to get a connection from the pool and connect
+
+# circuit breakers and adaptive timeouts for radioboss requests (per host and per endpoint)
+BREAKER_WINDOW = 20  # recent calls a breaker looks at
+BREAKER_MIN_CALLS = 5  # calls needed in the window before a breaker can open
+BREAKER_FAILURE_RATIO = 0.5  # share of failed calls in the window that opens the breaker
+BREAKER_OPEN_SECONDS = 30  # how long an open breaker fails fast before letting one call through
+BREAKER_MIN_TIMEOUT_SECONDS = 1  # lower bound for the adaptive timeout
+BREAKER_MAX_TIMEOUT_SECONDS = 10  # upper bound, and the timeout until enough latencies are known
+BREAKER_TIMEOUT_MULTIPLIER = 3  # timeout is this many times the recent p99 latency
+BREAKER_RETRIES = 2  # retries for requests that are safe to repeat
+BREAKER_RETRY_RATIO = 0.2  # retries earned per request, so retries stay a fraction of the traffic
+BREAKER_RETRY_BACKOFF_SECONDS = 0.2  # base for the jittered exponential backoff between retries
+
+# now playing cache (one per station)
+NOW_PLAYING_TTL_SECONDS = 10  # how long fetched track info is served without asking radioboss again
+NOW_PLAYING_STALE_SECONDS = 120  # how long expired track info may still be served while a refresh runs
+NOW_PLAYING_REFRESH_WAIT_SECONDS = 1.5  # how long a caller waits on a refresh before taking stale info
+
+# track change polling (one poller per station, shared by presence, voice panels and pinned embeds)
+TRACK_POLL_MIN_SECONDS = 5  # poll interval around the expected end of a track
+TRACK_POLL_MAX_SECONDS = 60  # longest wait between polls while a long track plays
+TRACK_POLL_DEFAULT_SECONDS = 20  # poll interval when the track length is unknown
+TRACK_POLL_END_LEAD_SECONDS = 10  # start polling fast this long before a track should end
+
+# local play history (every track change, with daily play counts per track and dj)
+PLAY_HISTORY_DJ_FIELD = ''  # currenttrack_info attribute holding the dj name, e.g. a custom field; '' turns dj counts off
+PLAY_HISTORY_PAGE_SIZE = 10  # plays per /recent page
+PLAY_HISTORY_REPEAT_SECONDS = 600  # the same track seen again within this long (a restart) isn't counted again
+
+# listener counts per station (sampled into a ring buffer, written as hourly and daily rollups)
+LISTENER_SAMPLE_SECONDS = 60  # how often each station's listener count is sampled
+LISTENER_BUFFER_SAMPLES = 1440  # samples kept in memory per station; must cover LISTENER_FLUSH_SECONDS
+LISTENER_FLUSH_SECONDS = 300  # how often buffered samples are folded into the rollups on disk
+
+# shared station broadcasts for voice channels (one ffmpeg per station, fanned out to every guild)
+VOICE_OPUS_BITRATE = 128  # kbps of the opus stream sent to discord
+VOICE_LISTENER_BUFFER_FRAMES = 250  # 20 ms packets buffered per guild before the oldest are dropped
+VOICE_JITTER_FRAMES = 25  # packets a guild buffers before it starts, or resumes after an underrun
+VOICE_STALL_SECONDS = 5  # restart a station's upstream after this long without a packet
+VOICE_RECONNECT_ATTEMPTS = 8  # upstream reconnects in a row with backoff; after that a station keeps retrying at the max delay while guilds listen, and stops once none do
+VOICE_RECONNECT_MAX_DELAY_SECONDS = 15  # longest backoff between upstream reconnects
+VOICE_FIRST_PACKET_TIMEOUT_SECONDS = 10  # how long /join waits for the first audio from a station
+VOICE_LINGER_SECONDS = 300  # keep a station running this long after its last guild leaves, so a rejoin is instant
+VOICE_WARM_STATIONS = []  # station keys to keep running even with no guilds listening, e.g. ['LPM']
+VOICE_GAIN_RAMP_MS = 20  # how long a volume change, mute or unmute takes to fade in
+VOICE_PASSTHROUGH = True  # copy opus packets as they are when a station's mount already serves ogg opus
+VOICE_PROBE_TIMEOUT_SECONDS = 3  # time allowed to read the start of a stream to find its format
+VOICE_PROBE_TTL_MINUTES = 60  # how long a station's probed stream format is trusted
+
+# working stream url per station (the configured url, 'fallback_urls' and the radioboss url variants, raced)
+STREAM_URL_CACHE_SECONDS = 600  # how long the url that answered first is reused before racing again
+STREAM_URL_TIMEOUT_SECONDS = 4  # time a candidate url gets to start sending audio
+STREAM_URL_STAGGER_MS = 250  # head start each candidate gets before the next one is tried
+STREAM_URL_BACKOFF_MAX_SECONDS = 600  # longest a failing url is left out of races
+
+# local song library index used by /request
+LIBRARY_SYNC_INTERVAL_MINUTES = 60  # how often the library is re-synced from radioboss
+LIBRARY_STALE_AFTER_MINUTES = 180  # searches fall back to radioboss when the last sync is older than this
+LIBRARY_PRUNE_AFTER_DAYS = 7  # tracks not seen by a sync for this long are dropped from the index
+LIBRARY_SYNC_QUERIES = list('abcdefghijklmnopqrstuvwxyz0123456789')  # searches used to crawl the library
+LIBRARY_MIN_LOCAL_SCORE = 0.5  # a fresh index answers alone when its best match scores this (typos score ~0.6-0.8, unrelated titles ~0.3-0.5), below it radioboss is asked too
+
+# song request queue (one per station, sent to radioboss one at a time)
+REQUEST_SUBMIT_INTERVAL_SECONDS = 30  # one queued request is sent to a station this often
+REQUEST_DEDUP_MINUTES = 30  # a track sent this recently isn't queued again, the new request is folded into it
+REQUEST_USER_BURST = 3  # requests a user can make at once
+REQUEST_USER_PER_HOUR = 6  # how fast a user's allowance comes back
+REQUEST_GUILD_BURST = 10  # requests a guild can make at once
+REQUEST_GUILD_PER_HOUR = 40  # how fast a guild's allowance comes back
+REQUEST_MAX_ATTEMPTS = 5  # sends tried before a request is dropped
+REQUEST_QUEUE_MAX = 50  # queued requests per station
+
+# anonymised gateway recordings, replayed offline by benchmarks/bench_gateway_replay.py
+GATEWAY_RECORD_PATH = ''  # e.g. 'data/gateway.jsonl.gz'; '' turns recording off
+GATEWAY_RECORD_EVENTS = [  # dispatches written to the recording
+    'READY', 'GUILD_CREATE', 'GUILD_MEMBERS_CHUNK', 'MESSAGE_CREATE', 'GUILD_MEMBER_ADD',
+    'GUILD_MEMBER_UPDATE', 'GUILD_MEMBER_REMOVE', 'GUILD_BAN_ADD', 'GUILD_ROLE_CREATE',
+    'GUILD_ROLE_UPDATE', 'GUILD_ROLE_DELETE', 'CHANNEL_CREATE', 'CHANNEL_DELETE',
+]
+
 # validate required configuration
 required_configs = {
     'DISCORD_BOT_TOKEN': DISCORD_BOT_TOKEN,
@@ -56,6 +56,12 @@ import json
 import os
 import sys
 from utils.logger import get_logger
+from modules.database.database import db
+from utils.http_client import http_client
+from utils.event_bus import event_bus
+from utils.gateway_recorder import GatewayRecorder
+from modules.radioboss.track_events import TRACK_CHANGED, track_events
+from modules.radioboss.listener_stats import listener_stats
 from utils.bot_admin import setup as setup_bot_admin
 
 # set up logging
@@ -191,6 +197,18 @@ async def load_extensions():
     
     return loaded_modules, failed_modules
 
+async def update_presence(track) -> None:
+    """show the default station's current track as the bot status."""
+    if track.station_key != config.DEFAULT_STATION:
+        return
+    activity = discord.Activity(
+        type=discord.ActivityType.listening,
+        name=f'{track.display} | {config.BOT_PREFIX}help'[:128]
+    )
+    await bot.change_presence(activity=activity)
+
+event_bus.subscribe(TRACK_CHANGED, update_presence)
+
 @bot.event
 async def on_ready():
     """Event triggered when the bot is ready."""
@@ -212,6 +230,11 @@ async def on_ready():
     logger.info('Loading extensions...')
     await load_extensions()
     
+    # one poller per station publishes track changes to the presence, voice panels and pinned embeds
+    track_events.start()
+    # listener counts for /stats, sampled from the same now playing info
+    listener_stats.start()
+    
     logger.info('Bot is ready and operational')
     
     # Sync commands with detailed logging
@@ -247,6 +270,12 @@ async def main():
     """main function to start the bot"""
     logger.info('Starting bot...')
     
+    # installed before connecting so the recording starts with the guilds the bot is in
+    recorder = None
+    if getattr(config, 'GATEWAY_RECORD_PATH', ''):
+        recorder = GatewayRecorder(config.GATEWAY_RECORD_PATH)
+        recorder.install(bot)
+    
     try:
         async with bot:
             logger.info('Bot instance created, starting connection...')
@@ -258,6 +287,13 @@ async def main():
         logger.critical(f'Unexpected error: {str(e)}', exc_info=True)
         sys.exit(1)
     finally:
+        # stop polling, close pooled http connections and commit any queued audit/log writes before exiting
+        await track_events.stop()
+        await listener_stats.stop()
+        await http_client.close()
+        await db.aclose()
+        if recorder is not None:
+            recorder.close()
         logger.info('Bot has shut down')
 
 if __name__ == '__main__':
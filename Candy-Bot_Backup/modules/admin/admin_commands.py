@@ -9,6 +9,7 @@ import datetime
 import logging
 from modules.database import db
 from modules.security.settings import AdminSecuritySettings
+from modules.security.role_cache import role_cache
 from modules.admin.anti_raid_ui import AntiRaidSettingsView
 
 # set up logging
@@ -111,6 +112,7 @@ class AddRoleSelect(ui.RoleSelect):
                         commit=True
                     )
                     logger.debug(f"Role insert result: {result}")
+                    role_cache.add_admin_role(interaction.guild.id, role.id)
                     
                 except Exception as e:
                     logger.error(f"Error adding admin role: {str(e)}", exc_info=True)
@@ -186,6 +188,7 @@ class RemoveRoleSelect(ui.RoleSelect):
                     commit=True
                 )
                 logger.debug(f"Database delete result: {result}")
+                role_cache.remove_admin_role(interaction.guild.id, role.id)
                 
                 await interaction.followup.send(
                     f"✅ Removed {role.mention} from admin roles.",
@@ -418,6 +421,7 @@ class RemoveRoleButton(ui.Button):
                             commit=True
                         )
                         logger.debug(f"Role {selected_role.name} removed from admins")
+                        role_cache.remove_admin_role(select_interaction.guild.id, selected_role.id)
                         
                         await select_interaction.followup.send(
                             f"✅ Removed {selected_role.mention} from admin roles.",
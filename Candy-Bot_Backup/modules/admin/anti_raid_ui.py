@@ -60,6 +60,7 @@ class AntiRaidSettingsView(ui.View):
     async def save_settings(self):
         """save settings to the databaase"""
         from modules.database.database import db
+        from modules.security.role_cache import role_cache
         
         try:
             db.execute_query(
@@ -84,6 +85,7 @@ class AntiRaidSettingsView(ui.View):
                 ),
                 commit=True
             )
+            role_cache.set_exempt_roles(self.guild_id, self.settings['exempt_roles'])
             return True
         except Exception as e:
             print(f"Error saving anti-raid settings: {e}")
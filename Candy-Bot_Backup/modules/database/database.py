@@ -2,30 +2,192 @@
 database module for handling all database operations.
 
 this module provides a database manager class to interact with the sqlite database.
+
+the synchronous `execute_query` api is kept for existing callers. coroutines should
+prefer the awaitable `fetch`, `fetchone`, `execute`, `executemany` and `transaction`
+helpers, which run on a dedicated database worker thread so queries never block the
+event loop.
+
+connections are tuned with explicit pragmas (see the DB_* settings in config.py). all
+writes go through a single writer connection, while async reads are spread over a
+small pool of read-only connections so a slow select never waits behind a write.
+
+high-frequency inserts that can tolerate a short delay (audit logs, dm logs) should use
+`queue_write`, which buffers rows and commits them in one transaction every
+DB_WRITE_BATCH_INTERVAL_MS or DB_WRITE_BATCH_MAX_ROWS rows. call `flush_writes` before
+reading back queued rows; `aclose` flushes anything still pending.
 """
 
+import asyncio
+import contextvars
+import os
 import sqlite3
-from typing import Any, List, Optional, Tuple, Union
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple, Union
 import logging
 from pathlib import Path
 
 # set up logging
 logger = logging.getLogger(__name__)
 
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+# connection tuning, overridable from config.py
+DB_JOURNAL_MODE = getattr(_config, 'DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = getattr(_config, 'DB_SYNCHRONOUS', 'NORMAL')
+DB_BUSY_TIMEOUT_MS = getattr(_config, 'DB_BUSY_TIMEOUT_MS', 5000)
+DB_CACHE_SIZE_KIB = getattr(_config, 'DB_CACHE_SIZE_KIB', 16384)
+DB_MMAP_SIZE = getattr(_config, 'DB_MMAP_SIZE', 64 * 1024 * 1024)
+DB_TEMP_STORE = getattr(_config, 'DB_TEMP_STORE', 'MEMORY')
+DB_READ_POOL_SIZE = getattr(_config, 'DB_READ_POOL_SIZE', 4)
+DB_WRITE_BATCH_INTERVAL_MS = getattr(_config, 'DB_WRITE_BATCH_INTERVAL_MS', 250)
+DB_WRITE_BATCH_MAX_ROWS = getattr(_config, 'DB_WRITE_BATCH_MAX_ROWS', 500)
+
+_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+_SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+_TEMP_STORES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+class _CallQueue:
+    """hands database calls to executor threads and their results back to the loop in batches.
+
+    run_in_executor costs a pair of futures, a work item and a wakeup of the loop per
+    call, which is more than a point query takes. here calls wait in one queue that up
+    to `workers` threads drain, and each thread returns everything it ran with a single
+    call_soon_threadsafe, so a burst of calls shares the handoffs.
+    """
+
+    def __init__(self, get_executor: Callable[[], ThreadPoolExecutor], workers: int, chunk: Optional[int] = None):
+        self._get_executor = get_executor
+        self.workers = workers
+        # most calls one thread takes at a time, None for all (the writer keeps them in order)
+        self.chunk = chunk
+        self._pending: deque = deque()
+        self._lock = threading.Lock()
+        self._draining = 0
+
+    def submit(self, func: Callable, args: tuple) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._pending.append((future, contextvars.copy_context(), func, args))
+            start = self._draining < self.workers
+            if start:
+                self._draining += 1
+        if start:
+            try:
+                self._get_executor().submit(self._drain)
+            except BaseException:
+                with self._lock:
+                    self._draining -= 1
+                raise
+        return future
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._draining -= 1
+                    return
+                count = len(self._pending) if self.chunk is None else min(self.chunk, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(count)]
+            results = []
+            for future, context, func, args in batch:
+                try:
+                    results.append((future, context.run(func, *args), None))
+                except BaseException as e:
+                    results.append((future, None, e))
+            loops = {}
+            for result in results:
+                loops.setdefault(result[0].get_loop(), []).append(result)
+            for loop, delivered in loops.items():
+                try:
+                    loop.call_soon_threadsafe(_set_results, delivered)
+                except RuntimeError:
+                    # the loop closed while the calls ran, nobody is waiting for them
+                    pass
+
+
+def _set_results(results: List[Tuple[asyncio.Future, Any, Optional[BaseException]]]) -> None:
+    for future, result, error in results:
+        if future.cancelled():
+            continue
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+
+class Transaction:
+    """collects write statements and commits them atomically on the worker thread.
+
+    statements are queued with `execute`/`executemany` and only sent to the database
+    when the `async with` block exits without an exception.
+    """
+
+    def __init__(self, manager: 'DatabaseManager'):
+        self._manager = manager
+        self._statements: List[Tuple[str, Any, bool]] = []
+
+    def execute(self, query: str, params: Union[tuple, dict] = ()) -> None:
+        """queue a single statement."""
+        self._statements.append((query, params, False))
+
+    def executemany(self, query: str, seq_of_params: Iterable[Union[tuple, dict]]) -> None:
+        """queue a statement for each parameter set."""
+        self._statements.append((query, list(seq_of_params), True))
+
+    async def __aenter__(self) -> 'Transaction':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> bool:
+        if exc_type is None and self._statements:
+            await self._manager.run_in_transaction(self._apply)
+        return False
+
+    def _apply(self, connection: sqlite3.Connection) -> None:
+        for query, params, many in self._statements:
+            if many:
+                connection.executemany(query, params)
+            else:
+                connection.execute(query, params)
+
 class DatabaseManager:
     """manages database connections and operations."""
 
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, read_pool_size: Optional[int] = None):
         """initialize the database manager."""
         if db_path is None:
             # default to data/bot_database.db in the project root
-            import os
             script_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             self.db_path = os.path.join(script_dir, 'data', 'bot_database.db')
         else:
             self.db_path = db_path
             
         self.connection: Optional[sqlite3.Connection] = None
+        # the connection is shared between the event loop thread (execute_query)
+        # and the worker thread (async api), so every use goes through this lock
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # read-only connections, one per reader thread
+        self.read_pool_size = DB_READ_POOL_SIZE if read_pool_size is None else read_pool_size
+        self._reader_executor: Optional[ThreadPoolExecutor] = None
+        self._reader_local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        # async calls run in the caller's context, so contextvars the caller set are visible
+        self._calls = _CallQueue(self._get_executor, workers=1)
+        self._read_calls = _CallQueue(self._get_reader_executor, workers=self.read_pool_size, chunk=16)
+        # write-behind buffer for queue_write
+        self._write_buffer: List[Tuple[str, Any]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        # the newest batch handed to the writer thread; batches commit in order
+        self._last_flush: Optional[asyncio.Future] = None
+        # sqlite trace callback set on every connection, see set_trace_callback
+        self._trace: Optional[Callable[[str], None]] = None
         self._ensure_db_directory()
         
         # ensure the database directory exists
@@ -39,20 +201,329 @@ class DatabaseManager:
 
     def connect(self) -> None:
         """establish a connection to the database."""
-        if self.connection is None:
-            self.connection = sqlite3.connect(
-                self.db_path,
-                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+        with self._lock:
+            if self.connection is None:
+                self.connection = self._open_connection()
+                self._apply_pragmas(self.connection, writer=True)
+                logger.info('database connection established')
+
+    def _open_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """open a new sqlite connection to the database file."""
+        if read_only:
+            target = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        else:
+            target = self.db_path
+        connection = sqlite3.connect(
+            target,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False,
+            uri=read_only
+        )
+        connection.row_factory = sqlite3.Row
+        connection.set_trace_callback(self._trace)
+        return connection
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        """call callback(statement) for every statement run on any connection, None to stop.
+
+        async work runs in the caller's context, so the callback can read the caller's
+        contextvars to tell which code a statement came from.
+        """
+        with self._lock:
+            self._trace = callback
+            for connection in [self.connection, *self._readers]:
+                if connection is not None:
+                    connection.set_trace_callback(callback)
+
+    def _apply_pragmas(self, connection: sqlite3.Connection, writer: bool) -> None:
+        """apply the configured startup pragmas to a connection."""
+        if writer:
+            journal_mode = str(DB_JOURNAL_MODE).upper()
+            if journal_mode in _JOURNAL_MODES:
+                mode = connection.execute(f'PRAGMA journal_mode={journal_mode}').fetchone()[0]
+                if mode.upper() != journal_mode:
+                    logger.warning(f'requested journal_mode {journal_mode}, database is using {mode}')
+            else:
+                logger.warning(f'ignoring invalid DB_JOURNAL_MODE: {DB_JOURNAL_MODE}')
+        else:
+            connection.execute('PRAGMA query_only=1')
+
+        synchronous = str(DB_SYNCHRONOUS).upper()
+        if synchronous in _SYNCHRONOUS_MODES:
+            connection.execute(f'PRAGMA synchronous={synchronous}')
+        else:
+            logger.warning(f'ignoring invalid DB_SYNCHRONOUS: {DB_SYNCHRONOUS}')
+
+        temp_store = str(DB_TEMP_STORE).upper()
+        if temp_store in _TEMP_STORES:
+            connection.execute(f'PRAGMA temp_store={temp_store}')
+        else:
+            logger.warning(f'ignoring invalid DB_TEMP_STORE: {DB_TEMP_STORE}')
+
+        connection.execute(f'PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}')
+        # a negative cache_size is in KiB rather than pages
+        connection.execute(f'PRAGMA cache_size={-int(DB_CACHE_SIZE_KIB)}')
+        connection.execute(f'PRAGMA mmap_size={int(DB_MMAP_SIZE)}')
+
+    def _uses_read_pool(self) -> bool:
+        """whether async reads go to the read-only pool instead of the writer."""
+        # an in-memory database only exists on the writer connection
+        return self.read_pool_size > 0 and self.db_path != ':memory:' \
+            and not str(self.db_path).startswith('file:')
+
+    def _get_reader_executor(self) -> ThreadPoolExecutor:
+        """get the executor whose threads each own a read-only connection."""
+        if self._reader_executor is None:
+            # read-only connections can't create the file or switch journal mode,
+            # so make sure the writer has done that first
+            self.connect()
+            self._reader_executor = ThreadPoolExecutor(
+                max_workers=self.read_pool_size,
+                thread_name_prefix='db-reader'
             )
-            self.connection.row_factory = sqlite3.Row
-            logger.info('database connection established')
+        return self._reader_executor
+
+    def _reader_connection(self) -> sqlite3.Connection:
+        """get the read-only connection belonging to the current reader thread."""
+        connection = getattr(self._reader_local, 'connection', None)
+        if connection is None:
+            connection = self._open_connection(read_only=True)
+            self._apply_pragmas(connection, writer=False)
+            self._reader_local.connection = connection
+            with self._lock:
+                self._readers.append(connection)
+        return connection
 
     def close(self) -> None:
         """close the database connection if it's open."""
-        if self.connection is not None:
-            self.connection.close()
-            self.connection = None
-            logger.info('database connection closed')
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._write_buffer:
+            rows, self._write_buffer = self._write_buffer, []
+            self._flush_sync(rows)
+        if self._reader_executor is not None:
+            self._reader_executor.shutdown(wait=True)
+            self._reader_executor = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+            self._reader_local = threading.local()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+                logger.info('database connection closed')
+
+    async def aclose(self) -> None:
+        """flush queued writes and close the database without blocking the event loop."""
+        await self.flush_writes()
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """get the single-threaded executor that owns all async database work."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-worker')
+        return self._executor
+
+    async def _run(self, func: Callable, *args) -> Any:
+        """run a blocking database function on the worker thread."""
+        return await self._calls.submit(func, args)
+
+    async def _run_read(self, func: Callable, *args) -> Any:
+        """run a blocking read on one of the read-only connection threads."""
+        return await self._read_calls.submit(func, args)
+
+    def _fetch_sync(self, query: str, params: Union[tuple, dict]) -> List[sqlite3.Row]:
+        with self._lock:
+            self.connect()
+            return self.connection.execute(query, params).fetchall()
+
+    def _fetchone_sync(self, query: str, params: Union[tuple, dict]) -> Optional[sqlite3.Row]:
+        with self._lock:
+            self.connect()
+            return self.connection.execute(query, params).fetchone()
+
+    def _read_fetch_sync(self, query: str, params: Union[tuple, dict]) -> List[sqlite3.Row]:
+        return self._reader_connection().execute(query, params).fetchall()
+
+    def _read_fetchone_sync(self, query: str, params: Union[tuple, dict]) -> Optional[sqlite3.Row]:
+        return self._reader_connection().execute(query, params).fetchone()
+
+    def _write_sync(self, query: str, params: Any, many: bool) -> int:
+        with self._lock:
+            self.connect()
+            try:
+                if many:
+                    cursor = self.connection.executemany(query, params)
+                    result = cursor.rowcount
+                else:
+                    cursor = self.connection.execute(query, params)
+                    result = cursor.lastrowid
+                self.connection.commit()
+                return result
+            except sqlite3.Error as e:
+                logger.error(f'database error: {e}')
+                self.connection.rollback()
+                raise
+
+    def _transaction_sync(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            self.connect()
+            try:
+                result = func(self.connection)
+                self.connection.commit()
+                return result
+            except Exception:
+                self.connection.rollback()
+                raise
+
+    async def fetch(self, query: str, params: Union[tuple, dict] = ()) -> List[sqlite3.Row]:
+        """run a select on a reader connection and return all rows."""
+        if not self._uses_read_pool():
+            return await self._run(self._fetch_sync, query, params)
+        return await self._run_read(self._read_fetch_sync, query, params)
+
+    async def fetchone(self, query: str, params: Union[tuple, dict] = ()) -> Optional[sqlite3.Row]:
+        """run a select on a reader connection and return the first row, if any."""
+        if not self._uses_read_pool():
+            return await self._run(self._fetchone_sync, query, params)
+        return await self._run_read(self._read_fetchone_sync, query, params)
+
+    async def execute(self, query: str, params: Union[tuple, dict] = ()) -> int:
+        """run a write statement and commit it. returns the last inserted row id."""
+        return await self._run(self._write_sync, query, params, False)
+
+    async def executemany(self, query: str, seq_of_params: Iterable[Union[tuple, dict]]) -> int:
+        """run a write statement once per parameter set in a single commit.
+
+        returns the number of affected rows.
+        """
+        return await self._run(self._write_sync, query, list(seq_of_params), True)
+
+    async def run_in_transaction(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """call func(connection) on the worker thread inside a single transaction.
+
+        use this for read-modify-write logic that has to be atomic. func must not
+        touch the event loop; it is rolled back if it raises.
+        """
+        return await self._run(self._transaction_sync, func)
+
+    def _flush_sync(self, rows: List[Tuple[str, Any]]) -> List[Tuple[int, sqlite3.Error]]:
+        """commit a batch of queued writes, grouping runs of the same statement.
+
+        returns (index, error) for every row that couldn't be written.
+        """
+        def apply(connection: sqlite3.Connection) -> None:
+            start = 0
+            while start < len(rows):
+                query = rows[start][0]
+                end = start
+                while end < len(rows) and rows[end][0] == query:
+                    end += 1
+                connection.executemany(query, [params for _, params in rows[start:end]])
+                start = end
+
+        try:
+            self._transaction_sync(apply)
+            return []
+        except sqlite3.Error as e:
+            # don't let one bad row throw away the whole batch
+            logger.error(f'batched write of {len(rows)} rows failed, retrying one by one: {e}')
+            failed = []
+            for index, (query, params) in enumerate(rows):
+                try:
+                    self._write_sync(query, params, False)
+                except sqlite3.Error as row_error:
+                    logger.error(f"dropped queued write {' '.join(query.split())[:120]!r} {params!r}: {row_error}")
+                    failed.append((index, row_error))
+            return failed
+
+    async def queue_write(self, query: str, params: Union[tuple, dict] = (), durable: bool = False) -> None:
+        """queue a write to be committed with the next batch.
+
+        non-durable rows return immediately and are committed within
+        DB_WRITE_BATCH_INTERVAL_MS. durable rows flush the queue (including
+        themselves) and only return once the commit has happened, raising the
+        sqlite error if their row couldn't be written.
+        """
+        row = (query, params)
+        self._write_buffer.append(row)
+        if durable:
+            # the row is in this batch: nothing awaits between appending it and the flush taking the buffer
+            rows, failed = await self._flush()
+            for index, error in failed:
+                if rows[index] is row:
+                    raise error
+        elif len(self._write_buffer) >= DB_WRITE_BATCH_MAX_ROWS:
+            await self.flush_writes()
+        else:
+            self._schedule_flush(asyncio.get_running_loop())
+
+    def enqueue_write(self, query: str, params: Union[tuple, dict] = ()) -> None:
+        """queue a non-durable write from synchronous code.
+
+        the row is committed with the next batch. without a running event loop the
+        write happens immediately instead.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_sync(query, params, False)
+            return
+        self._write_buffer.append((query, params))
+        if len(self._write_buffer) >= DB_WRITE_BATCH_MAX_ROWS:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush_handle = loop.call_soon(self._start_flush, loop)
+        else:
+            self._schedule_flush(loop)
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """make sure a batch flush is pending."""
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(DB_WRITE_BATCH_INTERVAL_MS / 1000, self._start_flush, loop)
+
+    def _start_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        # the loop only keeps a weak reference to tasks, so hold on to it until it's done
+        task = loop.create_task(self.flush_writes())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush_writes(self) -> int:
+        """commit everything in the write queue now, including batches already in flight. returns the number of rows this call wrote."""
+        rows, failed = await self._flush()
+        return len(rows) - len(failed)
+
+    async def _flush(self) -> Tuple[List[Tuple[str, Any]], List[Tuple[int, sqlite3.Error]]]:
+        """commit the write queue, returning the rows taken and (index, error) for those that failed."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._write_buffer:
+            # a timer flush may still be committing rows queued before this call
+            if self._last_flush is not None and not self._last_flush.done():
+                await asyncio.wait([self._last_flush])
+            return [], []
+        # swap the buffer before awaiting so new rows start the next batch; batches
+        # still commit in order because they share the single writer thread, so
+        # waiting for this one also waits for any batch already in flight
+        rows, self._write_buffer = self._write_buffer, []
+        batch = self._last_flush = self._calls.submit(self._flush_sync, (rows,))
+        return rows, await batch
+
+    def transaction(self) -> Transaction:
+        """start a batch of writes that is committed atomically.
+
+        usage:
+            async with db.transaction() as tx:
+                tx.execute("INSERT ...", (...))
+                tx.executemany("INSERT ...", rows)
+        """
+        return Transaction(self)
 
     def execute_query(
         self,
@@ -61,27 +532,32 @@ class DatabaseManager:
         fetch: bool = False,
         commit: bool = False
     ) -> Union[sqlite3.Cursor, List[sqlite3.Row], int]:
-        """execute a sql query."""
-        self.connect()
-        cursor = self.connection.cursor()
-        
-        try:
-            cursor.execute(query, params)
+        """execute a sql query.
+
+        this blocks the calling thread. it is kept as a compatibility shim for code
+        that has not moved to the async api yet.
+        """
+        with self._lock:
+            self.connect()
+            cursor = self.connection.cursor()
             
-            if commit:
-                self.connection.commit()
-                return cursor.lastrowid
+            try:
+                cursor.execute(query, params)
                 
-            if fetch:
-                return cursor.fetchall()
+                if commit:
+                    self.connection.commit()
+                    return cursor.lastrowid
+                    
+                if fetch:
+                    return cursor.fetchall()
+                    
+                return cursor
                 
-            return cursor
-            
-        except sqlite3.Error as e:
-            logger.error(f'database error: {e}')
-            if self.connection:
-                self.connection.rollback()
-            raise
+            except sqlite3.Error as e:
+                logger.error(f'database error: {e}')
+                if self.connection:
+                    self.connection.rollback()
+                raise
 
     def _add_column_if_not_exists(self, table: str, column: str, column_def: str):
         """add a column to a table if it doesn't already exist."""
@@ -0,0 +1,200 @@
+"""
+concurrent dm fan-out for event reminders.
+
+recipients are pushed through a fixed pool of workers that share a token bucket,
+so the bot sends as fast as discord allows without tripping the global rate limit.
+progress and throughput are printed while the run is in progress.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+import discord
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+# how many dms are in flight at once
+EVENT_DM_CONCURRENCY = getattr(_config, 'EVENT_DM_CONCURRENCY', 8)
+# api requests per second across all workers (opening a dm channel counts as one)
+EVENT_DM_RATE_PER_SEC = getattr(_config, 'EVENT_DM_RATE_PER_SEC', 20)
+
+
+class RateLimiter:
+    """token bucket shared by all fan-out workers."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """wait until the requested number of tokens is available."""
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """stop handing out tokens for a while, e.g. after a 429."""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+        self.tokens = 0
+
+
+@dataclass
+class FanoutStats:
+    """counters for a single fan-out run."""
+    total: int = 0
+    sent: int = 0
+    forbidden: int = 0
+    failed: int = 0
+    rate_limited: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.forbidden + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """dms handled per second so far."""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.done}/{self.total} processed, {self.sent} sent, {self.forbidden} closed dms, "
+            f"{self.failed} failed, {self.rate_limited} rate limited in {self.elapsed:.1f}s "
+            f"({self.throughput:.1f}/s)"
+        )
+
+
+class DMFanout:
+    """sends one message per recipient through a bounded, rate limited worker pool."""
+
+    def __init__(
+        self,
+        concurrency: int = EVENT_DM_CONCURRENCY,
+        rate_per_sec: float = EVENT_DM_RATE_PER_SEC,
+        progress_interval: float = 10.0,
+        max_retries: int = 2
+    ):
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rate_per_sec)
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+
+    async def run(
+        self,
+        recipients: Iterable[Tuple[Any, Any]],
+        build_message: Callable[[Any, Any], dict],
+        on_sent: Optional[Callable[[Any], Awaitable[None]]] = None,
+        label: str = 'dm fan-out'
+    ) -> FanoutStats:
+        """send to every (user, context) pair.
+
+        build_message(user, context) returns the kwargs for `user.send`. on_sent is
+        awaited after each successful send, which is where results get recorded.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for recipient in recipients:
+            queue.put_nowait(recipient)
+
+        stats = FanoutStats(total=queue.qsize())
+        print(f"[DMFanout] {label}: sending to {stats.total} users with "
+              f"{self.concurrency} workers at {self.limiter.rate:g} req/s")
+
+        workers = [
+            asyncio.create_task(self._worker(queue, build_message, on_sent, stats))
+            for _ in range(min(self.concurrency, stats.total) or 1)
+        ]
+        reporter = asyncio.create_task(self._report(stats, label))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            reporter.cancel()
+            stats.finished = time.monotonic()
+
+        print(f"[DMFanout] {label} complete: {stats.summary()}")
+        return stats
+
+    async def _worker(self, queue: asyncio.Queue, build_message, on_sent, stats: FanoutStats) -> None:
+        while True:
+            try:
+                user, context = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            try:
+                kwargs = build_message(user, context)
+            except Exception as e:
+                print(f"[DMFanout] Error building message for {user}: {e}")
+                stats.failed += 1
+                continue
+
+            if await self._send(user, kwargs, stats):
+                stats.sent += 1
+                if on_sent is not None:
+                    try:
+                        await on_sent(user)
+                    except Exception as e:
+                        print(f"[DMFanout] Error recording dm to {user}: {e}")
+
+    async def _send(self, user, kwargs: dict, stats: FanoutStats) -> bool:
+        for attempt in range(self.max_retries + 1):
+            # opening the dm channel is a request of its own
+            needs_channel = getattr(user, 'dm_channel', None) is None
+            await self.limiter.acquire(2 if needs_channel else 1)
+            try:
+                await user.send(**kwargs)
+                return True
+            except discord.Forbidden:
+                stats.forbidden += 1
+                return False
+            except discord.HTTPException as e:
+                if e.status == 429 and attempt < self.max_retries:
+                    # discord.py already retried; back everyone off before trying again
+                    stats.rate_limited += 1
+                    retry_after = getattr(e, 'retry_after', None) or 5.0
+                    self.limiter.pause(retry_after)
+                    continue
+                print(f"[DMFanout] Error sending dm to {user}: {e}")
+                stats.failed += 1
+                return False
+            except Exception as e:
+                print(f"[DMFanout] Error sending dm to {user}: {type(e).__name__}: {e}")
+                stats.failed += 1
+                return False
+        stats.failed += 1
+        return False
+
+    async def _report(self, stats: FanoutStats, label: str) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            remaining = stats.total - stats.done
+            eta = remaining / stats.throughput if stats.throughput else float('inf')
+            print(f"[DMFanout] {label}: {stats.summary()}, eta {eta:.0f}s")
@@ -327,7 +327,7 @@ async def setup(bot):
                 # add to active events
                 if event_id:
                     event_data['event_id'] = event_id
-                    event_manager.active_events[event_id] = event_data
+                    event_manager.add_event(event_data)
                 
                 if not event_id:
                     await interaction.followup.send(
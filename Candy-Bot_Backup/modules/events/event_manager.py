@@ -3,22 +3,32 @@ event manager for handling event scheduling and notifications.
 """
 import asyncio
 import datetime
+import sqlite3
 import pytz
 from typing import Dict, List, Optional, Tuple
 import discord
 from discord.ext import tasks
 from modules.database.database import db
+from utils.scheduler import TimerQueue
+from .dm_fanout import DMFanout
 
 __all__ = ['EventManager']
 
 class EventManager:
     """manages event scheduling and notifications."""
     
+    # when the dm reminder goes out, relative to the event start
+    REMINDER_LEAD = datetime.timedelta(hours=1)
+    # how overdue a notification may be and still be sent
+    NOTIFICATION_GRACE = datetime.timedelta(minutes=5)
+    
     def __init__(self):
         """initialize the event manager."""
         self.bot = None
         self.active_events = {}
         self.notification_task = None
+        # pending notifications keyed by (event_id, reminder_type)
+        self.timers = TimerQueue()
         
     async def initialize(self, bot):
         """initialize the event manager with the bot instance."""
@@ -30,7 +40,8 @@ class EventManager:
         """load all upcoming events from the database."""
         try:
             # clear existing events
-            self.active_events = {}
+            for event_id in list(self.active_events):
+                self.remove_event(event_id)
             
             # try to get the events with the new schema first
             try:
@@ -122,7 +133,7 @@ class EventManager:
                             'event_channel_id': getattr(event, 'event_channel_id', None)
                         }
                     
-                    self.active_events[event_dict['event_id']] = event_dict
+                    self.add_event(event_dict)
                     print(f"Loaded event: {event_dict['name']} (ID: {event_dict['event_id']})")
                     loaded_count += 1
                     
@@ -145,104 +156,101 @@ class EventManager:
         self.notification_task = self.bot.loop.create_task(self._check_event_notifications())
     
     async def _check_event_notifications(self):
-        """background task to check for upcoming events and send notifications."""
-        while True:
-            try:
-                now = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc)
-                
-                # check each active event
-                for event_id, event in list(self.active_events.items()):
+        """background task that fires reminders and start notifications as they come due."""
+        await self.timers.run(self._fire_notification)
+    
+    @staticmethod
+    def _parse_event_time(value) -> datetime.datetime:
+        """parse a stored event time into an aware utc datetime."""
+        event_time = value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(value)
+        if event_time.tzinfo is None:
+            event_time = event_time.replace(tzinfo=datetime.timezone.utc)
+        return event_time
+    
+    def add_event(self, event: dict) -> None:
+        """track an upcoming event and schedule its notifications."""
+        event['starts_at'] = self._parse_event_time(event['time'])
+        self.active_events[event['event_id']] = event
+        
+        now = datetime.datetime.now(datetime.timezone.utc)
+        starts_at = event['starts_at']
+        reminder_at = starts_at - self.REMINDER_LEAD
+        
+        # notifications that are only a little overdue (e.g. after a restart) still go out
+        if starts_at > now and now - reminder_at <= self.NOTIFICATION_GRACE:
+            self.timers.schedule((event['event_id'], 'dm_1h'), reminder_at.timestamp(), event['event_id'])
+        if now - starts_at <= self.NOTIFICATION_GRACE:
+            self.timers.schedule((event['event_id'], 'start_notification'), starts_at.timestamp(), event['event_id'])
+    
+    def remove_event(self, event_id: int) -> None:
+        """stop tracking an event and cancel its pending notifications."""
+        self.active_events.pop(event_id, None)
+        self.timers.cancel((event_id, 'dm_1h'))
+        self.timers.cancel((event_id, 'start_notification'))
+    
+    async def _fire_notification(self, key: Tuple[int, str], event_id: int):
+        """handle a due reminder or start notification."""
+        reminder_type = key[1]
+        event = self.active_events.get(event_id)
+        if event is None:
+            return
+        
+        try:
+            # check if we've already sent this notification
+            query = """
+            SELECT 1 FROM event_reminders 
+            WHERE event_id = ? AND reminder_type = ?
+            """
+            result = await db.fetch(query, (event_id, reminder_type))
+            
+            if reminder_type == 'dm_1h':
+                if not result:
+                    print(f"Sending 1h reminder for event {event_id}: {event['name']}")
+                    # send dm reminders
+                    await self._send_dm_reminders(event)
+                    
+                    # record that we've sent the reminder
+                    # use insert or ignore to handle race conditions
+                    query = """
+                    INSERT OR IGNORE INTO event_reminders (event_id, reminder_type, sent_at)
+                    VALUES (?, ?, ?)
+                    """
                     try:
-                        # parse the event time and ensure it's timezone-aware
-                        event_time = datetime.datetime.fromisoformat(event['time'])
-                        if event_time.tzinfo is None:
-                            event_time = event_time.replace(tzinfo=datetime.timezone.utc)
-                        time_until = event_time - now
-                        
-                        # check if it's time to send a reminder (1 hour before)
-                        if datetime.timedelta(hours=0, minutes=59) < time_until <= datetime.timedelta(hours=1):
-                            # check if we've already sent a reminder for this event
-                            query = """
-                            SELECT 1 FROM event_reminders 
-                            WHERE event_id = ? AND reminder_type = 'dm_1h'
-                            """
-                            result = db.execute_query(query, (event_id,), fetch=True)
-                            
-                            if not result:
-                                print(f"Sending 1h reminder for event {event_id}: {event['name']}")
-                                # send dm reminders
-                                await self._send_dm_reminders(event)
-                                
-                                # record that we've sent the reminder
-                                # use insert or ignore to handle race conditions
-                                query = """
-                                INSERT OR IGNORE INTO event_reminders (event_id, reminder_type, sent_at)
-                                VALUES (?, ?, ?)
-                                """
-                                try:
-                                    db.execute_query(
-                                        query,
-                                        (event_id, 'dm_1h', datetime.datetime.utcnow().isoformat()),
-                                        commit=True
-                                    )
-                                    print(f"Recorded 1h reminder for event {event_id}")
-                                except sqlite3.IntegrityError:
-                                    # Another instance might have inserted the record
-                                    print(f"Reminder already recorded for event {event_id}")
-                                    pass
-                                print(f"Sent 1h reminder for event {event_id}: {event['name']}")
-                        
-                        # check if the event has started (within last 5 minutes to handle restarts)
-                        elif datetime.timedelta(minutes=-5) <= time_until <= datetime.timedelta(seconds=0):
-                            print(f"Event {event_id} has started or is about to start: {event['name']}")
-                            # check if we've already sent the start notification
-                            query = """
-                            SELECT 1 FROM event_reminders 
-                            WHERE event_id = ? AND reminder_type = 'start_notification'
-                            """
-                            result = db.execute_query(query, (event_id,), fetch=True)
-                            
-                            if not result:
-                                # send event start notification
-                                await self._send_event_start_notification(event)
-                                
-                                # record that we've sent the notification
-                                query = """
-                                INSERT INTO event_reminders (event_id, reminder_type, sent_at)
-                                VALUES (?, ?, ?)
-                                """
-                                db.execute_query(
-                                    query,
-                                    (event_id, 'start_notification', datetime.datetime.utcnow().isoformat()),
-                                    commit=True
-                                )
-                                print(f"Sent start notification for event {event_id}: {event['name']}")
-                            
-                            # remove the event from active events if it's in the past
-                            if time_until < datetime.timedelta(minutes=-5):
-                                self.active_events.pop(event_id, None)
-                                print(f"Removed past event {event_id} from active events")
-                        
-                        # clean up old events (more than 1 day old)
-                        elif time_until < datetime.timedelta(days=-1):
-                            self.active_events.pop(event_id, None)
-                            print(f"Cleaned up old event {event_id}: {event['name']}")
-                            
-                    except Exception as e:
-                        print(f"Error processing event {event_id}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        # remove the problematic event to prevent repeated errors
-                        self.active_events.pop(event_id, None)
-                
-                # wait for 30 seconds before checking again
-                await asyncio.sleep(30)
+                        await db.execute(
+                            query,
+                            (event_id, 'dm_1h', datetime.datetime.utcnow().isoformat())
+                        )
+                        print(f"Recorded 1h reminder for event {event_id}")
+                    except sqlite3.IntegrityError:
+                        # Another instance might have inserted the record
+                        print(f"Reminder already recorded for event {event_id}")
+                    print(f"Sent 1h reminder for event {event_id}: {event['name']}")
+                return
+            
+            print(f"Event {event_id} has started or is about to start: {event['name']}")
+            if not result:
+                # send event start notification
+                await self._send_event_start_notification(event)
                 
-            except Exception as e:
-                print(f"Error in notification loop: {e}")
-                import traceback
-                traceback.print_exc()
-                await asyncio.sleep(60)  # wait longer on error
+                # record that we've sent the notification
+                query = """
+                INSERT OR IGNORE INTO event_reminders (event_id, reminder_type, sent_at)
+                VALUES (?, ?, ?)
+                """
+                await db.execute(
+                    query,
+                    (event_id, 'start_notification', datetime.datetime.utcnow().isoformat())
+                )
+                print(f"Sent start notification for event {event_id}: {event['name']}")
+            
+            # nothing else is scheduled for a started event
+            self.remove_event(event_id)
+            print(f"Removed past event {event_id} from active events")
+            
+        except Exception as e:
+            print(f"Error processing event {event_id}: {e}")
+            import traceback
+            traceback.print_exc()
     
     async def _send_dm_reminders(self, event: dict):
         """send dm reminders to all non-bot members in all servers."""
@@ -254,7 +262,7 @@ class EventManager:
             # get event details
             event_id = event.get('event_id')
             event_name = event.get('name', 'Unnamed Event')
-            event_time = datetime.datetime.fromisoformat(event['time']).replace(tzinfo=datetime.timezone.utc)
+            event_time = event.get('starts_at') or self._parse_event_time(event['time'])
             
             print(f"\n🔔 Processing event: {event_name} (ID: {event_id})")
             print(f"📅 Event time: {event_time.isoformat()}")
@@ -264,210 +272,75 @@ class EventManager:
             SELECT 1 FROM event_reminders 
             WHERE event_id = ? AND reminder_type = 'dm_1h'
             """
-            already_processed = db.execute_query(query, (event_id,), fetch=True)
+            already_processed = await db.fetch(query, (event_id,))
             
-            # create a set to track users who have already received a dm for this event
-            sent_to_users = set()
-            
-            # if we've already processed this event, load the sent users
+            # skip events whose reminders have already gone out
             if already_processed:
                 print("ℹ️  dm reminders already processed for this event")
                 return
-                
+            
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS event_dm_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                sent_at TEXT NOT NULL,
+                UNIQUE(event_id, user_id)
+            )
+            """)
+            
+            # load everything the fan-out needs up front instead of querying per member
+            sent_to_users = {
+                row['user_id'] for row in await db.fetch(
+                    "SELECT user_id FROM event_dm_log WHERE event_id = ?", (event_id,)
+                )
+            }
+            timezones = await self.get_all_user_timezones()
+            print(f"ℹ️  {len(sent_to_users)} users already reminded, {len(timezones)} timezones loaded")
+            
             # get all guilds
             guilds = list(self.bot.guilds)
             print(f"\n🌐 Found {len(guilds)} guilds")
             
+            # collect each non-bot member once, paired with the first guild we saw them in
+            recipients = []
+            seen = set(sent_to_users)
             total_members = 0
-            total_sent = 0
-            
-            # process each guild
             for guild in guilds:
                 try:
-                    print(f"\n🏰 Processing guild: {guild.name} (ID: {guild.id})")
-                    
-                    # fetch all members with detailed debugging
-                    print(f"🔄 Fetching members for {guild.name}...")
-                    try:
-                        # debug guild member count
-                        print(f"   Guild member count: {guild.member_count}")
-                        print(f"   Bot has members intent: {self.bot.intents.members}")
-                        
-                        # ensure we have the latest member data
-                        print("   Chunking guild members...")
-                        try:
-                            await guild.chunk(cache=True)
-                            print("   Guild chunking completed")
-                        except Exception as chunk_error:
-                            print(f"   Error during chunking: {type(chunk_error).__name__}: {chunk_error}")
-                        
-                        # get all non-bot members
-                        members = [m for m in guild.members if not m.bot]
-                        print(f"👥 Found {len(members)} non-bot members (out of {len(guild.members)} total members)")
-                        
-                        # debug: print member count by status
-                        status_count = {}
-                        for m in guild.members:
-                            status = str(m.status)
-                            status_count[status] = status_count.get(status, 0) + 1
-                        print(f"   Member statuses: {status_count}")
-                        
-                        # debug: print the first few member names if any
-                        if members:
-                            member_info = []
-                            for m in members[:5]:
-                                perms = m.guild_permissions
-                                can_dm = '✅' if perms.read_messages else '❌'
-                                member_info.append(f"{m} (DM: {can_dm})")
-                            print(f"   Sample members: {', '.join(member_info)}" + ('...' if len(members) > 5 else ''))
-                        else:
-                            print("   No non-bot members found in the guild")
-                    except Exception as e:
-                        print(f"❌ Error fetching members: {e}")
+                    if not guild.chunked:
+                        await guild.chunk(cache=True)
+                except Exception as chunk_error:
+                    print(f"❌ Error chunking {guild.name}: {type(chunk_error).__name__}: {chunk_error}")
+                
+                for member in guild.members:
+                    if member.bot:
                         continue
-                    
-                    # process each member
-                    for member in members:
-                        try:
-                            total_members += 1
-                            
-                            # skip if bot or already processed
-                            if member.bot:
-                                continue
-                            
-                            print(f"\n👤 Processing member: {member} (ID: {member.id})")
-                            
-                            # get user's timezone
-                            user_timezone = None
-                            try:
-                                user_timezone = await self.get_user_timezone(member.id)
-                                print(f"  ℹ️  Timezone for {member}: {user_timezone}")
-                            except Exception as e:
-                                print(f"  ❌ Error getting timezone for {member}: {e}")
-                                # continue anyway, we'll use utc as fallback
-                                
-                            try:
-                                # format time based on user's timezone
-                                time_display = ""
-                                if user_timezone:
-                                    try:
-                                        user_tz = pytz.timezone(user_timezone)
-                                        user_time = event_time.astimezone(user_tz)
-                                        time_display = user_time.strftime('%Y-%m-%d %H:%M %Z')
-                                    except Exception as tz_error:
-                                        print(f"  ❌ Error processing timezone {user_timezone} for {member}: {tz_error}")
-                                        # fall back to utc if timezone is invalid
-                                        time_display = event_time.strftime('%Y-%m-%d %H:%M %Z (UTC)')
-                                else:
-                                    # use utc if no timezone set
-                                    time_display = event_time.strftime('%Y-%m-%d %H:%M %Z (UTC)')
-                                
-                                # create embed for dm with the requested design
-                                embed = discord.Embed(
-                                    title=f"Upcoming Event: {event_name} - ***in one hour***",
-                                    description=f"**Discord server:** {guild.name}",
-                                    color=3092790  # using the specified blue color
-                                )
-                                
-                                # add fields
-                                embed.add_field(
-                                    name="Event Time",
-                                    value=time_display,
-                                    inline=True
-                                )
-                                
-                                embed.add_field(
-                                    name="Event Description",
-                                    value=event.get('description', 'No description provided.'),
-                                    inline=True
-                                )
-                                
-                                # add bot's avatar as author
-                                bot_user = self.bot.user
-                                embed.set_author(
-                                    name=bot_user.display_name,
-                                    icon_url=bot_user.display_avatar.url
-                                )
-                                
-                                # add footer
-                                embed.set_footer(
-                                    text="This is an automated reminder for an upcoming event, you can disable reminders by blocking this bot."
-                                )
-                                
-                            except Exception as tz_error:
-                                print(f"  ❌ Error creating embed for {member}: {tz_error}")
-                                continue
-                            
-                            # skip if we've already sent to this user
-                            if member.id in sent_to_users:
-                                print(f"  ℹ️  Already sent DM to {member} (ID: {member.id}) for this event")
-                                continue
-                                
-                            # try to send DM
-                            try:
-                                # create DM channel if needed
-                                if member.dm_channel is None:
-                                    print("  Creating DM channel...")
-                                    try:
-                                        await member.create_dm()
-                                        print("  ✅ DM channel created")
-                                    except Exception as e:
-                                        print(f"  ❌ Failed to create DM channel: {e}")
-                                        continue
-                                
-                                # check if we've already sent to this user for this event
-                                query = """
-                                SELECT 1 FROM event_dm_log 
-                                WHERE event_id = ? AND user_id = ?
-                                """
-                                already_sent = db.execute_query(query, (event_id, member.id), fetch=True)
-                                
-                                if already_sent:
-                                    print(f"  ℹ️  Already sent DM to {member} (ID: {member.id}) for this event (from database)")
-                                    sent_to_users.add(member.id)
-                                    continue
-                                
-                                # send the embed
-                                print("  Sending DM...")
-                                try:
-                                    await member.dm_channel.send(embed=embed)
-                                    total_sent += 1
-                                    print(f"  ✅ DM sent to {member} (ID: {member.id})")
-                                    
-                                    # log the successful DM
-                                    try:
-                                        query = """
-                                        INSERT INTO event_dm_log (event_id, user_id, sent_at)
-                                        VALUES (?, ?, ?)
-                                        """
-                                        db.execute_query(
-                                            query,
-                                            (event_id, member.id, datetime.datetime.utcnow().isoformat()),
-                                            commit=True
-                                        )
-                                        sent_to_users.add(member.id)
-                                    except Exception as e:
-                                        print(f"  ❌ Error logging DM to database: {e}")
-                                        
-                                except discord.Forbidden:
-                                    print(f"  ❌ Cannot send DM (user has DMs disabled)")
-                                except Exception as e:
-                                    print(f"  ❌ Error sending DM: {type(e).__name__}: {e}")
-                                
-                                # small delay to avoid rate limits
-                                await asyncio.sleep(0.5)
-                                
-                            except Exception as e:
-                                print(f"  ❌ Unexpected error in DM process: {type(e).__name__}: {e}")
-                                continue
-                                
-                        except Exception as e:
-                            print(f"  ❌ Error processing member {member}: {type(e).__name__}: {e}")
-                            continue
-                            
-                except Exception as e:
-                    print(f"\n❌ Error in guild {guild.name}: {type(e).__name__}: {e}")
-                    continue
+                    total_members += 1
+                    if member.id in seen:
+                        continue
+                    seen.add(member.id)
+                    recipients.append((member, guild))
+            
+            def build_message(member, guild):
+                return {'embed': self._build_reminder_embed(event, event_time, guild, timezones.get(member.id))}
+            
+            async def record_sent(member):
+                await db.queue_write(
+                    """
+                    INSERT OR IGNORE INTO event_dm_log (event_id, user_id, sent_at)
+                    VALUES (?, ?, ?)
+                    """,
+                    (event_id, member.id, datetime.datetime.utcnow().isoformat())
+                )
+            
+            stats = await DMFanout().run(
+                recipients, build_message, record_sent, label=f"event {event_id} reminders"
+            )
+            total_sent = stats.sent
+            
+            # make sure every dm we sent is recorded before the event is marked processed
+            await db.flush_writes()
             
             # log completion
             print("\n" + "="*50)
@@ -483,24 +356,11 @@ class EventManager:
                 INSERT OR IGNORE INTO event_reminders (event_id, reminder_type, sent_at)
                 VALUES (?, 'dm_1h', ?)
                 """
-                db.execute_query(
+                await db.execute(
                     query, 
-                    (event_id, datetime.datetime.utcnow().isoformat()),
-                    commit=True
+                    (event_id, datetime.datetime.utcnow().isoformat())
                 )
                 
-                # create the event_dm_log table if it doesn't exist
-                create_table_query = """
-                CREATE TABLE IF NOT EXISTS event_dm_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    event_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    sent_at TEXT NOT NULL,
-                    UNIQUE(event_id, user_id)
-                )
-                """
-                db.execute_query(create_table_query, commit=True)
-                
                 print("\n✅ DM reminders recorded in database")
             except Exception as e:
                 print(f"\n❌ Error recording DM reminders: {type(e).__name__}: {e}")
@@ -517,6 +377,51 @@ class EventManager:
             traceback.print_exc()
             print("!"*50 + "\n")
     
+    def _build_reminder_embed(self, event: dict, event_time: datetime.datetime, guild: discord.Guild, user_timezone: Optional[str]) -> discord.Embed:
+        """build the one-hour reminder embed for a single member."""
+        # format time based on user's timezone
+        time_display = event_time.strftime('%Y-%m-%d %H:%M %Z (UTC)')
+        if user_timezone:
+            try:
+                user_time = event_time.astimezone(pytz.timezone(user_timezone))
+                time_display = user_time.strftime('%Y-%m-%d %H:%M %Z')
+            except Exception:
+                # fall back to utc if timezone is invalid
+                pass
+        
+        # create embed for dm with the requested design
+        embed = discord.Embed(
+            title=f"Upcoming Event: {event.get('name', 'Unnamed Event')} - ***in one hour***",
+            description=f"**Discord server:** {guild.name}",
+            color=3092790  # using the specified blue color
+        )
+        
+        # add fields
+        embed.add_field(
+            name="Event Time",
+            value=time_display,
+            inline=True
+        )
+        
+        embed.add_field(
+            name="Event Description",
+            value=event.get('description', 'No description provided.'),
+            inline=True
+        )
+        
+        # add bot's avatar as author
+        bot_user = self.bot.user
+        embed.set_author(
+            name=bot_user.display_name,
+            icon_url=bot_user.display_avatar.url
+        )
+        
+        # add footer
+        embed.set_footer(
+            text="This is an automated reminder for an upcoming event, you can disable reminders by blocking this bot."
+        )
+        return embed
+    
     async def _send_event_start_notification(self, event: dict):
         """send a notification to the event channel when the event starts."""
         try:
@@ -537,7 +442,7 @@ class EventManager:
                 FROM guilds 
                 WHERE guild_id = ?
                 """
-                result = db.execute_query(query, (guild.id,), fetch=True)
+                result = await db.fetch(query, (guild.id,))
                 if result and result[0]['event_channel_id']:
                     channel_id = result[0]['event_channel_id']
                 else:
@@ -552,7 +457,7 @@ class EventManager:
             print(f"📢 Found event channel: #{channel.name} ({channel.id}) in {guild.name}")
             
             # get the event time in UTC
-            event_time = datetime.datetime.fromisoformat(event['time']).replace(tzinfo=datetime.timezone.utc)
+            event_time = event.get('starts_at') or self._parse_event_time(event['time'])
             
             # create embed with the specified design
             embed = discord.Embed(
@@ -598,10 +503,9 @@ class EventManager:
                     INSERT OR IGNORE INTO event_reminders (event_id, reminder_type, sent_at)
                     VALUES (?, 'event_started', ?)
                     """
-                    db.execute_query(
+                    await db.execute(
                         query,
-                        (event['event_id'], datetime.datetime.utcnow().isoformat()),
-                        commit=True
+                        (event['event_id'], datetime.datetime.utcnow().isoformat())
                     )
                     print("✅ Recorded event start notification in database")
                 except Exception as db_error:
@@ -626,7 +530,7 @@ class EventManager:
             FROM guilds 
             WHERE guild_id = ?
             """
-            result = db.execute_query(query, (guild_id,), fetch=True)
+            result = await db.fetch(query, (guild_id,))
             event_channel_id = result[0]['event_channel_id'] if result and result[0] and 'event_channel_id' in result[0] and result[0]['event_channel_id'] else None
             
             # insert the event into the database
@@ -634,15 +538,14 @@ class EventManager:
             INSERT INTO events (guild_id, name, time, timezone, description, event_channel_id)
             VALUES (?, ?, ?, ?, ?, ?)
             """
-            event_id = db.execute_query(
+            event_id = await db.execute(
                 query,
-                (guild_id, name, event_time.isoformat(), timezone, description, event_channel_id),
-                commit=True
+                (guild_id, name, event_time.isoformat(), timezone, description, event_channel_id)
             )
             
             if event_id:
                 # add to active events
-                self.active_events[event_id] = {
+                self.add_event({
                     'event_id': event_id,
                     'guild_id': guild_id,
                     'name': name,
@@ -650,7 +553,7 @@ class EventManager:
                     'timezone': timezone,
                     'description': description or '',
                     'event_channel_id': event_channel_id
-                }
+                })
                 
                 print(f"Created new event: {name} (ID: {event_id}) in guild {guild_id}")
                 
@@ -666,7 +569,7 @@ class EventManager:
         """get a user's timezone."""
         try:
             query = "SELECT timezone FROM user_timezones WHERE user_id = ?"
-            result = db.execute_query(query, (user_id,), fetch=True)
+            result = await db.fetch(query, (user_id,))
             
             if not result or not result[0]:
                 print(f"No timezone found for user {user_id}")
@@ -688,15 +591,24 @@ class EventManager:
             traceback.print_exc()
             return None
 
+    async def get_all_user_timezones(self) -> Dict[int, str]:
+        """get every stored user timezone in one query."""
+        try:
+            rows = await db.fetch("SELECT user_id, timezone FROM user_timezones")
+            return {row['user_id']: row['timezone'] for row in rows if row['timezone']}
+        except Exception as e:
+            print(f"Error loading user timezones: {e}")
+            return {}
+
     async def delete_event(self, event_id: int) -> bool:
         """delete an event."""
         try:
             # delete from database
             query = "DELETE FROM events WHERE event_id = ?"
-            db.execute_query(query, (event_id,), commit=True)
+            await db.execute(query, (event_id,))
             
             # remove from active events
-            self.active_events.pop(event_id, None)
+            self.remove_event(event_id)
             
             return True
             
@@ -710,22 +622,21 @@ class EventManager:
             print(f"\n🔍 Fetching events for guild {guild_id}")
             
             # first, check if guild exists in guilds table
-            guild_check = db.execute_query("SELECT 1 FROM guilds WHERE guild_id = ?", (guild_id,), fetch=True)
+            guild_check = await db.fetch("SELECT 1 FROM guilds WHERE guild_id = ?", (guild_id,))
             if not guild_check:
                 print(f"⚠️ Guild {guild_id} not found in guilds table")
                 # add guild to guilds table if not exists
                 try:
-                    db.execute_query(
+                    await db.execute(
                         "INSERT OR IGNORE INTO guilds (guild_id, owner_id) VALUES (?, ?)",
-                        (guild_id, 0),  # using 0 as default owner_id since we don't have it
-                        commit=True
+                        (guild_id, 0)  # using 0 as default owner_id since we don't have it
                     )
                     print(f"✅ Added guild {guild_id} to guilds table")
                 except Exception as e:
                     print(f"❌ Error adding guild to guilds table: {e}")
             
             # check if events table exists
-            table_check = db.execute_query(
+            table_check = await db.fetch(
                 "SELECT name FROM sqlite_master WHERE type='table' AND name='events'"
             )
             if not table_check:
@@ -738,7 +649,7 @@ class EventManager:
             WHERE guild_id = ? 
             ORDER BY datetime(time) ASC
             """
-            events = db.execute_query(query, (guild_id,), fetch=True)
+            events = await db.fetch(query, (guild_id,))
             
             if not events:
                 print(f"ℹ️ No events found for guild {guild_id} in the database")
@@ -822,7 +733,7 @@ class EventManager:
             VALUES (?, ?)
             ON CONFLICT(user_id) DO UPDATE SET timezone = excluded.timezone
             """
-            db.execute_query(query, (user_id, timezone), commit=True)
+            await db.execute(query, (user_id, timezone))
             print(f"Set timezone for user {user_id} to {timezone}")
             return True
             
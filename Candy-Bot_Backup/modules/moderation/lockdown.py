@@ -20,7 +20,7 @@ logger.addHandler(ch)
 logger.propagate = False  # Prevent duplicate logs in Jupyter notebooks
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from typing import Optional, Dict, List, Tuple, Union, Any
 import logging
@@ -28,6 +28,10 @@ from datetime import datetime, timedelta
 import re
 import asyncio
 from modules.database.database import db
+from utils.expiry_service import expiry_service, to_timestamp
+from utils.permission_bulk import (
+    PermissionPlan, delete_snapshot, has_snapshot, load_rollback, permission_engine, save_snapshot
+)
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +46,21 @@ TIME_UNITS = {
     'y': 365 * 24 * 60 * 60,  # Approximate year
 }
 
+# permissions taken from @everyone during a lockdown
+LOCKDOWN_TEXT_DENY = {
+    'send_messages': False,
+    'add_reactions': False,
+    'create_public_threads': False,
+    'create_private_threads': False,
+    'send_messages_in_threads': False,
+    'send_tts_messages': False,
+    'use_application_commands': False,
+}
+LOCKDOWN_VOICE_DENY = {
+    'connect': False,
+    'speak': False,
+}
+
 class Lockdown(commands.Cog):
     """handles channel and server lockdowns"""
     
@@ -49,11 +68,14 @@ class Lockdown(commands.Cog):
         self.bot = bot
         self._create_tables()
         self.active_lockdowns: Dict[int, asyncio.Task] = {}
-        self.check_lockdowns.start()
+    
+    async def cog_load(self) -> None:
+        """schedule every pending lockdown expiry"""
+        await expiry_service.register('lockdown', self._expire_lockdown, self._load_lockdown_expiries)
     
     def cog_unload(self) -> None:
-        """cancel the background task when the cog is unloaded"""
-        self.check_lockdowns.cancel()
+        """cancel the background tasks when the cog is unloaded"""
+        expiry_service.unregister('lockdown')
         for task in self.active_lockdowns.values():
             task.cancel()
     
@@ -94,44 +116,50 @@ class Lockdown(commands.Cog):
             logger.error(f"failed to create lockdown tables: {e}")
             raise
 
-    @tasks.loop(minutes=1)
-    async def check_lockdowns(self) -> None:
-        """check for expired lockdowns and remove them"""
-        try:
-            now = datetime.utcnow()
-            expired = db.execute_query(
-                "SELECT id, guild_id, target_id, target_type FROM lockdowns WHERE expires_at <= ? AND active = 1",
-                (now,),
-                fetch=True
-            )
-            
-            for row in expired:
-                lockdown_id = row['id']
-                guild = self.bot.get_guild(row['guild_id'])
-                if not guild:
-                    continue
-                    
-                if row['target_type'] == 'channel':
-                    target = guild.get_channel(row['target_id'])
-                else:
-                    target = guild
-                    
-                if target:
-                    try:
-                        await self.remove_lockdown(guild, target, "Lockdown expired")
-                        logger.info(f"removed expired lockdown for {target} in {guild}")
-                    except Exception as e:
-                        logger.error(f"failed to remove expired lockdown: {e}")
-                
-                # Mark as inactive
-                db.execute_query(
-                    "UPDATE lockdowns SET active = 0 WHERE id = ?",
-                    (lockdown_id,),
-                    commit=True
-                )
-                
-        except Exception as e:
-            logger.error(f"error checking lockdowns: {e}")
+    async def _load_lockdown_expiries(self) -> List[Tuple[int, int, str]]:
+        """get every active lockdown that has an expiry"""
+        rows = await db.fetch(
+            "SELECT guild_id, target_id, expires_at FROM lockdowns WHERE expires_at IS NOT NULL AND active = 1"
+        )
+        return [(row['guild_id'], row['target_id'], row['expires_at']) for row in rows]
+
+    async def _expire_lockdown(self, guild_id: int, target_id: int) -> None:
+        """remove a lockdown that has expired"""
+        rows = await db.fetch(
+            "SELECT id, target_type, expires_at FROM lockdowns WHERE guild_id = ? AND target_id = ? AND active = 1",
+            (guild_id, target_id)
+        )
+        if not rows:
+            # already lifted
+            return
+        row = rows[0]
+        due = to_timestamp(row['expires_at'])
+        if due is None:
+            # replaced by an indefinite lockdown
+            return
+        if due > expiry_service.timers.clock():
+            expiry_service.schedule('lockdown', guild_id, target_id, due)
+            return
+
+        guild = self.bot.get_guild(guild_id)
+        if guild:
+            if row['target_type'] == 'channel':
+                target = guild.get_channel(target_id)
+            else:
+                target = guild
+
+            if target:
+                try:
+                    await self.remove_lockdown(guild, target, "Lockdown expired")
+                    logger.info(f"removed expired lockdown for {target} in {guild}")
+                except Exception as e:
+                    logger.error(f"failed to remove expired lockdown: {e}")
+
+        # Mark as inactive
+        await db.execute(
+            "UPDATE lockdowns SET active = 0 WHERE id = ?",
+            (row['id'],)
+        )
 
     async def _save_lockdown_to_db(self, guild_id: int, target_id: int, moderator_id: int, 
                                  reason: str, expires_at: Optional[datetime], target_type: str) -> int:
@@ -156,6 +184,10 @@ class Lockdown(commands.Cog):
             )
             
             lockdown_id = cursor.fetchone()['id']
+            if expires_at:
+                expiry_service.schedule('lockdown', guild_id, target_id, expires_at)
+            else:
+                expiry_service.cancel('lockdown', guild_id, target_id)
             logger.info(f"saved lockdown to database with id {lockdown_id}")
             return lockdown_id
             
@@ -163,95 +195,61 @@ class Lockdown(commands.Cog):
             logger.error(f"failed to save lockdown to database: {e}")
             raise
 
+    def _plan_lockdown(self, target: Union[discord.TextChannel, discord.Guild]) -> PermissionPlan:
+        """work out every overwrite a lockdown needs, skipping ones already in place"""
+        guild = target.guild if isinstance(target, discord.TextChannel) else target
+        text_channels = [target] if isinstance(target, discord.TextChannel) else guild.text_channels
+        voice_channels = [] if isinstance(target, discord.TextChannel) else guild.voice_channels
+        
+        plan = PermissionPlan()
+        for channel in text_channels:
+            plan.update(channel, guild.default_role, **LOCKDOWN_TEXT_DENY)
+            plan.update(channel, guild.me, send_messages=True, manage_messages=True, manage_channels=True)
+        for channel in voice_channels:
+            plan.update(channel, guild.default_role, **LOCKDOWN_VOICE_DENY)
+            plan.update(channel, guild.me, connect=True, speak=True, move_members=True)
+        return plan
+
     async def _apply_lockdown_permissions(self, target: Union[discord.TextChannel, discord.Guild]) -> None:
         """apply lockdown permissions to a channel or server"""
-        try:
-            # Default permissions for lockdown
-            overwrites = {
-                'send_messages': False,
-                'add_reactions': False,
-                'create_public_threads': False,
-                'create_private_threads': False,
-                'send_messages_in_threads': False,
-                'send_tts_messages': False,
-                'use_application_commands': False,
-                'connect': False,  # For voice channels
-                'speak': False    # For voice channels
-            }
-            
-            if isinstance(target, discord.TextChannel):
-                # For text channels, apply to @everyone
-                await target.edit(overwrites={
-                    target.guild.default_role: discord.PermissionOverwrite(**overwrites),
-                    target.guild.me: discord.PermissionOverwrite(
-                        send_messages=True,
-                        manage_messages=True,
-                        manage_channels=True
-                    )
-                })
-                logger.info(f"applied lockdown to channel {target.name} ({target.id})")
-                
-            elif isinstance(target, discord.Guild):
-                # For server-wide lockdown, apply to all text channels
-                for channel in target.text_channels:
-                    try:
-                        await channel.edit(overwrites={
-                            target.default_role: discord.PermissionOverwrite(**overwrites),
-                            target.me: discord.PermissionOverwrite(
-                                send_messages=True,
-                                manage_messages=True,
-                                manage_channels=True
-                            )
-                        })
-                        logger.info(f"applied lockdown to channel {channel.name} ({channel.id}) in {target.name}")
-                    except Exception as e:
-                        logger.error(f"failed to lockdown channel {channel.name} ({channel.id}): {e}")
-                        continue
-                
-                # Also lock voice channels
-                for channel in target.voice_channels:
-                    try:
-                        await channel.edit(overwrites={
-                            target.default_role: discord.PermissionOverwrite(
-                                connect=False,
-                                speak=False
-                            ),
-                            target.me: discord.PermissionOverwrite(
-                                connect=True,
-                                speak=True,
-                                move_members=True
-                            )
-                        })
-                        logger.info(f"applied voice lockdown to channel {channel.name} ({channel.id}) in {target.name}")
-                    except Exception as e:
-                        logger.error(f"failed to lockdown voice channel {channel.name} ({channel.id}): {e}")
-                        continue
+        guild = target.guild if isinstance(target, discord.TextChannel) else target
+        plan = self._plan_lockdown(target)
         
-        except Exception as e:
-            logger.error(f"failed to apply lockdown permissions: {e}")
-            raise
+        # save what we're about to change first so the lockdown can be undone exactly. an existing
+        # snapshot already holds the originals, and a plan over locked channels has none to save
+        key = self._snapshot_key(guild.id, target.id)
+        if plan and not await has_snapshot(key):
+            await save_snapshot(key, guild.id, plan)
+        
+        result = await permission_engine.apply(plan, reason="Lockdown")
+        logger.info(f"applied lockdown to {target} ({target.id}): {result.summary()}")
+        for edit, error in result.failed:
+            logger.error(f"failed to lockdown channel {edit.channel.name} ({edit.channel.id}): {error}")
 
     async def _remove_lockdown_permissions(self, target: Union[discord.TextChannel, discord.Guild]) -> None:
-        """remove lockdown permissions from a channel or server"""
-        try:
-            if isinstance(target, discord.TextChannel):
-                # Reset channel to inherit permissions
-                await target.edit(overwrites={})
-                logger.info(f"removed lockdown from channel {target.name} ({target.id})")
-                
-            elif isinstance(target, discord.Guild):
-                # Reset all text channels
-                for channel in target.text_channels + target.voice_channels:
-                    try:
-                        await channel.edit(overwrites={})
-                        logger.info(f"removed lockdown from channel {channel.name} ({channel.id}) in {target.name}")
-                    except Exception as e:
-                        logger.error(f"failed to remove lockdown from channel {channel.name} ({channel.id}): {e}")
-                        continue
-                        
-        except Exception as e:
-            logger.error(f"failed to remove lockdown permissions: {e}")
-            raise
+        """restore the overwrites a lockdown replaced"""
+        guild = target.guild if isinstance(target, discord.TextChannel) else target
+        key = self._snapshot_key(guild.id, target.id)
+        plan = await load_rollback(key, guild)
+        
+        if plan is None:
+            # no snapshot (lockdown predates them), just lift the lockdown denies
+            plan = PermissionPlan()
+            channels = [target] if isinstance(target, discord.TextChannel) else guild.text_channels + guild.voice_channels
+            for channel in channels:
+                denied = LOCKDOWN_VOICE_DENY if isinstance(channel, discord.VoiceChannel) else LOCKDOWN_TEXT_DENY
+                plan.update(channel, guild.default_role, **{perm: None for perm in denied})
+        
+        result = await permission_engine.apply(plan, reason="Lockdown lifted")
+        logger.info(f"removed lockdown from {target} ({target.id}): {result.summary()}")
+        for edit, error in result.failed:
+            logger.error(f"failed to remove lockdown from channel {edit.channel.name} ({edit.channel.id}): {error}")
+        if result.ok:
+            await delete_snapshot(key)
+
+    @staticmethod
+    def _snapshot_key(guild_id: int, target_id: int) -> str:
+        return f"lockdown:{guild_id}:{target_id}"
 
     async def remove_lockdown(self, guild: discord.Guild, target: Union[discord.TextChannel, discord.Guild], reason: str) -> None:
         """remove a lockdown from a channel or server"""
@@ -259,6 +257,8 @@ class Lockdown(commands.Cog):
             target_id = target.id if isinstance(target, discord.TextChannel) else guild.id
             target_type = 'channel' if isinstance(target, discord.TextChannel) else 'server'
             
+            expiry_service.cancel('lockdown', guild.id, target_id)
+            
             # Remove the lockdown permissions
             await self._remove_lockdown_permissions(target)
             
@@ -396,6 +396,22 @@ class Lockdown(commands.Cog):
             f"reason: {reason or 'No reason provided'}, duration: {duration or 'indefinite'}"
         )
         
+        # locking again would snapshot the locked state over the original overwrites
+        active = await db.fetchone(
+            "SELECT 1 FROM lockdowns WHERE guild_id = ? AND target_id = ? AND active = 1",
+            (guild.id, target.id if target else guild.id)
+        )
+        if active:
+            logger.info(f"[LOCKDOWN] {target_name} in {guild.name} is already locked down")
+            try:
+                await interaction.followup.send(
+                    f"❌ this {'channel' if is_channel_lockdown else 'server'} is already locked down.",
+                    ephemeral=True
+                )
+            except Exception as e:
+                logger.error(f"[LOCKDOWN] Failed to send error message: {e}")
+            return
+        
         try:
             # Send a response to the user
             response_msg = f"🔒 {'Channel' if is_channel_lockdown else 'Server'} lockdown initiated"
@@ -1,6 +1,6 @@
 """mute functionality for moderation"""
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from typing import Optional, Dict, List, Tuple
 import logging
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import re
 import asyncio
 from modules.database.database import db
+from utils.expiry_service import expiry_service, to_timestamp
+from utils.permission_bulk import PermissionPlan, permission_engine
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +30,14 @@ class Mute(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
         self._create_tables()
-        self.check_mutes.start()
+    
+    async def cog_load(self) -> None:
+        """schedule every pending mute expiry"""
+        await expiry_service.register('mute', self._expire_mute, self._load_mute_expiries)
     
     def cog_unload(self) -> None:
-        """cancel the background task when the cog is unloaded"""
-        self.check_mutes.cancel()
+        """stop handling mute expiries when the cog is unloaded"""
+        expiry_service.unregister('mute')
     
     def _create_tables(self) -> None:
         """create necessary database tables if they don't exist"""
@@ -111,28 +116,27 @@ class Mute(commands.Cog):
                 color=discord.Color.dark_grey()
             )
             
-            # Set up channel overrides
+            # Set up channel overrides, many channels at a time
+            plan = PermissionPlan()
             for channel in guild.channels:
-                try:
-                    # Deny send messages and add reactions in text channels
-                    if isinstance(channel, discord.TextChannel):
-                        await channel.set_permissions(
-                            mute_role,
-                            send_messages=False,
-                            add_reactions=False,
-                            create_public_threads=False,
-                            create_private_threads=False,
-                            send_messages_in_threads=False
-                        )
-                    # Deny speaking in voice channels
-                    elif isinstance(channel, discord.VoiceChannel):
-                        await channel.set_permissions(
-                            mute_role,
-                            speak=False
-                        )
-                except (discord.Forbidden, discord.HTTPException) as e:
-                    logger.warning(f"failed to set permissions for {channel.name}: {e}")
-                    continue
+                # Deny send messages and add reactions in text channels
+                if isinstance(channel, discord.TextChannel):
+                    plan.update(
+                        channel,
+                        mute_role,
+                        send_messages=False,
+                        add_reactions=False,
+                        create_public_threads=False,
+                        create_private_threads=False,
+                        send_messages_in_threads=False
+                    )
+                # Deny speaking in voice channels
+                elif isinstance(channel, discord.VoiceChannel):
+                    plan.update(channel, mute_role, speak=False)
+            
+            result = await permission_engine.apply(plan, reason='Automatic mute role setup')
+            for edit, error in result.failed:
+                logger.warning(f"failed to set permissions for {edit.channel.name}: {error}")
             
             return mute_role
             
@@ -165,6 +169,9 @@ class Mute(commands.Cog):
                 fetch=False
             )
             
+            if expires_at:
+                expiry_service.schedule('mute', guild_id, user_id, expires_at)
+            
             # Get the ID of the inserted/updated row
             result = db.execute_query(
                 """
@@ -182,6 +189,7 @@ class Mute(commands.Cog):
     
     def remove_mute(self, guild_id: int, user_id: int) -> bool:
         """remove a mute from the database"""
+        expiry_service.cancel('mute', guild_id, user_id)
         try:
             result = db.execute_query(
                 """
@@ -196,80 +204,75 @@ class Mute(commands.Cog):
             logger.error(f"error in remove_mute: {e}", exc_info=True)
             return False
     
-    @tasks.loop(seconds=30.0)
-    async def check_mutes(self) -> None:
-        """check for expired mutes and unmute users"""
-        try:
-            # Get all expired mutes
-            expired_mutes = db.execute_query(
-                """
-                SELECT id, guild_id, user_id 
-                FROM mutes 
-                WHERE active = 1 
-                AND expires_at IS NOT NULL 
-                AND expires_at <= datetime('now')
-                """,
-                fetch=True
+    async def _load_mute_expiries(self) -> List[Tuple[int, int, str]]:
+        """get every active mute that has an expiry"""
+        rows = await db.fetch(
+            """
+            SELECT guild_id, user_id, expires_at 
+            FROM mutes 
+            WHERE active = 1 
+            AND expires_at IS NOT NULL
+            """
+        )
+        return [(row['guild_id'], row['user_id'], row['expires_at']) for row in rows]
+    
+    async def _expire_mute(self, guild_id: int, user_id: int) -> None:
+        """unmute a user whose mute has expired"""
+        rows = await db.fetch(
+            "SELECT id, expires_at FROM mutes WHERE guild_id = ? AND user_id = ? AND active = 1",
+            (guild_id, user_id)
+        )
+        if not rows:
+            # already unmuted
+            return
+        mute = rows[0]
+        due = to_timestamp(mute['expires_at'])
+        if due is None:
+            # replaced by a permanent mute
+            return
+        if due > expiry_service.timers.clock():
+            # the mute was extended after this timer was set
+            expiry_service.schedule('mute', guild_id, user_id, due)
+            return
+        
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(user_id) if guild else None
+        if not member:
+            # Guild or member not found, remove the mute record
+            await db.execute(
+                "DELETE FROM mutes WHERE id = ?",
+                (mute['id'],)
             )
+            return
+        
+        try:
+            # Remove the mute role
+            mute_role = await self.get_mute_role(guild)
+            if mute_role and mute_role in member.roles:
+                await member.remove_roles(mute_role, reason="Mute expired")
             
-            for mute in expired_mutes:
-                guild = self.bot.get_guild(mute['guild_id'])
-                if not guild:
-                    # Guild not found, remove the mute record
-                    db.execute_query(
-                        "DELETE FROM mutes WHERE id = ?",
-                        (mute['id'],),
-                        commit=True
-                    )
-                    continue
-                    
-                member = guild.get_member(mute['user_id'])
-                if not member:
-                    # Member not found, remove the mute record
-                    db.execute_query(
-                        "DELETE FROM mutes WHERE id = ?",
-                        (mute['id'],),
-                        commit=True
-                    )
-                    continue
-                
+            # Log the unmute
+            mod_actions = self.bot.get_cog("ModActions")
+            if mod_actions:
                 try:
-                    # Remove the mute role
-                    mute_role = await self.get_mute_role(guild)
-                    if mute_role and mute_role in member.roles:
-                        await member.remove_roles(mute_role, reason="Mute expired")
-                    
-                    # Log the unmute
-                    mod_actions = self.bot.get_cog("ModActions")
-                    if mod_actions:
-                        try:
-                            await mod_actions.log_action_embed(
-                                action="unmute",
-                                guild=guild,
-                                user=member,
-                                moderator=self.bot.user,
-                                reason="Mute expired"
-                            )
-                        except Exception as e:
-                            logger.error(f"failed to log unmute: {e}")
-                    
-                    # Remove the mute record after processing
-                    db.execute_query(
-                        "DELETE FROM mutes WHERE id = ?",
-                        (mute['id'],),
-                        commit=True
+                    await mod_actions.log_action_embed(
+                        action="unmute",
+                        guild=guild,
+                        user=member,
+                        moderator=self.bot.user,
+                        reason="Mute expired"
                     )
-                    
                 except Exception as e:
-                    logger.error(f"error processing expired mute {mute['id']}: {e}", exc_info=True)
-                    
+                    logger.error(f"failed to log unmute: {e}")
+            
+            # Remove the mute record after processing
+            await db.execute(
+                "DELETE FROM mutes WHERE id = ?",
+                (mute['id'],)
+            )
+            
         except Exception as e:
-            logger.error(f"error in check_mutes: {e}", exc_info=True)
-    
-    @check_mutes.before_loop
-    async def before_check_mutes(self) -> None:
-        """wait for the bot to be ready before starting the task"""
-        await self.bot.wait_until_ready()
+            logger.error(f"error processing expired mute {mute['id']}: {e}", exc_info=True)
     
     @app_commands.command(name="mute", description="mute a member")
     @app_commands.describe(
@@ -1,6 +1,6 @@
 """temporary ban functionality"""
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from typing import Optional, Dict, List, Tuple
 import logging
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 import re
 import asyncio
 from modules.database.database import db
+from utils.expiry_service import expiry_service, to_timestamp
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +29,14 @@ class TempBan(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
         self._create_tables()
-        self.check_temp_bans.start()
+    
+    async def cog_load(self) -> None:
+        """schedule every pending temp ban expiry"""
+        await expiry_service.register('tempban', self._expire_temp_ban, self._load_temp_ban_expiries)
     
     def cog_unload(self) -> None:
-        """cancel the background task when the cog is unloaded"""
-        self.check_temp_bans.cancel()
+        """stop handling temp ban expiries when the cog is unloaded"""
+        expiry_service.unregister('tempban')
     
     def _create_tables(self) -> None:
         """create necessary database tables if they don't exist"""
@@ -130,6 +134,7 @@ class TempBan(commands.Cog):
                 commit=True,
                 fetch=False
             )
+            expiry_service.schedule('tempban', guild_id, user_id, expires_at)
             
             # Get the ID of the inserted/updated row
             result = db.execute_query(
@@ -148,6 +153,7 @@ class TempBan(commands.Cog):
     
     def remove_temp_ban(self, guild_id: int, user_id: int) -> bool:
         """remove a temporary ban from the database"""
+        expiry_service.cancel('tempban', guild_id, user_id)
         try:
             result = db.execute_query(
                 """
@@ -162,72 +168,68 @@ class TempBan(commands.Cog):
             logger.error(f"error in remove_temp_ban: {e}", exc_info=True)
             return False
     
-    @tasks.loop(seconds=30.0)
-    async def check_temp_bans(self) -> None:
-        """check for expired temp bans and unban users"""
-        try:
-            # Get all expired temp bans
-            expired_bans = db.execute_query(
-                """
-                SELECT id, guild_id, user_id 
-                FROM temp_bans 
-                WHERE expires_at <= datetime('now')
-                """,
-                fetch=True
+    async def _load_temp_ban_expiries(self) -> List[Tuple[int, int, str]]:
+        """get every pending temp ban"""
+        rows = await db.fetch("SELECT guild_id, user_id, expires_at FROM temp_bans")
+        return [(row['guild_id'], row['user_id'], row['expires_at']) for row in rows]
+    
+    async def _expire_temp_ban(self, guild_id: int, user_id: int) -> None:
+        """unban a user whose temporary ban has expired"""
+        rows = await db.fetch(
+            "SELECT id, expires_at FROM temp_bans WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id)
+        )
+        if not rows:
+            # already unbanned
+            return
+        ban = rows[0]
+        due = to_timestamp(ban['expires_at'])
+        if due is not None and due > expiry_service.timers.clock():
+            # the ban was extended after this timer was set
+            expiry_service.schedule('tempban', guild_id, user_id, due)
+            return
+        
+        guild = self.bot.get_guild(guild_id)
+        if not guild:
+            # Guild not found, remove the ban record
+            await db.execute(
+                "DELETE FROM temp_bans WHERE id = ?",
+                (ban['id'],)
             )
+            return
+        
+        try:
+            # Try to unban the user
+            user = await self.bot.fetch_user(user_id)
+            try:
+                await guild.unban(user, reason="Temporary ban expired")
+                logger.info(f"unbanned user {user_id} (ban expired)")
+            except discord.NotFound:
+                # User is already unbanned, just log it
+                logger.info(f"user {user_id} was already unbanned")
             
-            for ban in expired_bans:
-                guild = self.bot.get_guild(ban['guild_id'])
-                if not guild:
-                    # Guild not found, remove the ban record
-                    db.execute_query(
-                        "DELETE FROM temp_bans WHERE id = ?",
-                        (ban['id'],),
-                        commit=True
-                    )
-                    continue
-                
+            # Log the unban
+            mod_actions = self.bot.get_cog("ModActions")
+            if mod_actions:
                 try:
-                    # Try to unban the user
-                    user = await self.bot.fetch_user(ban['user_id'])
-                    try:
-                        await guild.unban(user, reason="Temporary ban expired")
-                        logger.info(f"unbanned user {ban['user_id']} (ban expired)")
-                    except discord.NotFound:
-                        # User is already unbanned, just log it
-                        logger.info(f"user {ban['user_id']} was already unbanned")
-                    
-                    # Log the unban
-                    mod_actions = self.bot.get_cog("ModActions")
-                    if mod_actions:
-                        try:
-                            await mod_actions.log_action_embed(
-                                action="unban",
-                                guild=guild,
-                                user=user,
-                                moderator=self.bot.user,
-                                reason="Temporary ban expired"
-                            )
-                        except Exception as e:
-                            logger.error(f"failed to log unban: {e}")
-                    
-                    # Remove the ban record after processing
-                    db.execute_query(
-                        "DELETE FROM temp_bans WHERE id = ?",
-                        (ban['id'],),
-                        commit=True
+                    await mod_actions.log_action_embed(
+                        action="unban",
+                        guild=guild,
+                        user=user,
+                        moderator=self.bot.user,
+                        reason="Temporary ban expired"
                     )
-                    
                 except Exception as e:
-                    logger.error(f"error processing expired ban {ban['id']}: {e}", exc_info=True)
-                    
+                    logger.error(f"failed to log unban: {e}")
+            
+            # Remove the ban record after processing
+            await db.execute(
+                "DELETE FROM temp_bans WHERE id = ?",
+                (ban['id'],)
+            )
+            
         except Exception as e:
-            logger.error(f"error in check_temp_bans: {e}", exc_info=True)
-    
-    @check_temp_bans.before_loop
-    async def before_check_temp_bans(self) -> None:
-        """wait for the bot to be ready before starting the task"""
-        await self.bot.wait_until_ready()
+            logger.error(f"error processing expired ban {ban['id']}: {e}", exc_info=True)
     
     @app_commands.command(name="temp-ban", description="temporarily ban a user from the server")
     @app_commands.describe(
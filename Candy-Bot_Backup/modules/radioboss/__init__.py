@@ -4,10 +4,12 @@ radioboss module for handling radioboss api interactions.
 
 from .radioboss_cog import RadioBossCog
 from .radioboss_api import RadioBossAPIClient
+from .now_playing_cog import NowPlayingCog
 
-__all__ = ['RadioBossCog', 'RadioBossAPIClient']
+__all__ = ['RadioBossCog', 'RadioBossAPIClient', 'NowPlayingCog']
 
 async def setup(bot):
-    """setup function for loading the radioboss cog."""
+    """setup function for loading the radioboss cogs."""
     await bot.add_cog(RadioBossCog(bot))
+    await bot.add_cog(NowPlayingCog(bot))
     return True
@@ -0,0 +1,369 @@
+"""
+local song library index for /request.
+
+radioboss only offers a search endpoint for the request library, so the index is
+built by crawling it (`LIBRARY_SYNC_QUERIES`) on a timer and by keeping every track
+a remote search returns. tracks are stored in sqlite so the index survives restarts,
+and searched in memory through a trigram index: every title is broken into
+overlapping three letter chunks, so a query still finds a title when a few letters
+are wrong or missing.
+
+searches are answered locally while the last sync is recent. when the index is stale
+(or has never been synced) callers get None back and use the remote search instead.
+the crawl only searches single characters, so a fresh index can still miss tracks:
+`find` also asks radioboss when the local search finds nothing or only weak matches.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+from modules.database.database import db
+from modules.radioboss.now_playing import station_endpoint
+from utils.circuit_breaker import CircuitOpenError, breakers
+from utils.http_client import http_client
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_SYNC_INTERVAL_MINUTES = getattr(_config, 'LIBRARY_SYNC_INTERVAL_MINUTES', 60)
+LIBRARY_STALE_AFTER_MINUTES = getattr(_config, 'LIBRARY_STALE_AFTER_MINUTES', 180)
+LIBRARY_PRUNE_AFTER_DAYS = getattr(_config, 'LIBRARY_PRUNE_AFTER_DAYS', 7)
+LIBRARY_SYNC_QUERIES = getattr(_config, 'LIBRARY_SYNC_QUERIES', list('abcdefghijklmnopqrstuvwxyz0123456789'))
+LIBRARY_SYNC_CONCURRENCY = 4
+# a local result scoring below this is checked against radioboss, the crawl can miss tracks
+LIBRARY_MIN_LOCAL_SCORE = getattr(_config, 'LIBRARY_MIN_LOCAL_SCORE', 0.5)
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalise(text: str) -> str:
+    """lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def trigrams(normalised: str) -> Set[str]:
+    """the three letter chunks of a normalised string, padded so word starts count."""
+    padded = f"  {normalised} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def parse_search_response(response_text: str) -> Optional[List[Dict[str, Any]]]:
+    """tracks from a songrequestsearch response, or None if it isn't the expected json."""
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict):
+        data = data.get('tracks')
+    if not isinstance(data, list):
+        return None
+    return [
+        {'id': str(track['id']), 'title': str(track.get('title', ''))}
+        for track in data
+        if isinstance(track, dict) and track.get('id') is not None
+    ]
+
+
+class StationLibrary:
+    """the in-memory trigram index for one station's library."""
+
+    def __init__(self, station_key: str):
+        self.station_key = station_key
+        self.titles: Dict[str, str] = {}
+        self.synced_at: Optional[float] = None
+        self._normalised: Dict[str, str] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @property
+    def is_stale(self) -> bool:
+        if not self.titles or self.synced_at is None:
+            return True
+        return time.time() - self.synced_at > LIBRARY_STALE_AFTER_MINUTES * 60
+
+    def add(self, track_id: str, title: str) -> bool:
+        """index a track. returns False if it was already indexed with the same title."""
+        if self.titles.get(track_id) == title:
+            return False
+        self.remove(track_id)
+        normalised = normalise(title)
+        grams = trigrams(normalised)
+        self.titles[track_id] = title
+        self._normalised[track_id] = normalised
+        self._grams[track_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(track_id)
+        return True
+
+    def remove(self, track_id: str) -> None:
+        if track_id not in self.titles:
+            return
+        for gram in self._grams.pop(track_id):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(track_id)
+                if not ids:
+                    del self._postings[gram]
+        del self.titles[track_id]
+        del self._normalised[track_id]
+
+    def get(self, track_id: str) -> Optional[Dict[str, Any]]:
+        title = self.titles.get(track_id)
+        return {'id': track_id, 'title': title} if title is not None else None
+
+    def search(self, query: str, limit: int = 25) -> List[Dict[str, Any]]:
+        """best matching tracks for query, best first."""
+        normalised = normalise(query)
+        if not normalised:
+            return []
+        grams = trigrams(normalised)
+
+        shared = Counter()
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if ids:
+                shared.update(ids)
+
+        # a title must share a reasonable part of the query to count as a match
+        needed = max(1, int(len(grams) * 0.4))
+        scored = []
+        for track_id, count in shared.items():
+            if count < needed:
+                continue
+            coverage = count / len(grams)
+            dice = 2 * count / (len(grams) + len(self._grams[track_id]))
+            scored.append((0.7 * coverage + 0.3 * dice, track_id))
+
+        # whole-phrase and word-prefix matches rank higher; only worth checking near the top
+        words = normalised.split()
+        ranked = []
+        for score, track_id in heapq.nlargest(limit * 8, scored):
+            title = self._normalised[track_id]
+            if normalised in title:
+                score += 0.5
+            elif all(any(t.startswith(w) for t in title.split()) for w in words):
+                score += 0.3
+            ranked.append((score, track_id))
+
+        ranked.sort(key=lambda item: (-item[0], self.titles[item[1]]))
+        return [
+            {'id': track_id, 'title': self.titles[track_id], 'score': round(score, 3)}
+            for score, track_id in ranked[:limit]
+        ]
+
+
+class LibraryIndex:
+    """song library indexes for every station, persisted in the bot database."""
+
+    def __init__(self):
+        self.libraries: Dict[str, StationLibrary] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._table_ready = False
+
+    def _ensure_tables(self) -> None:
+        if self._table_ready:
+            return
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS library_tracks (
+                station TEXT NOT NULL,
+                track_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                last_seen REAL NOT NULL, -- unix time the track was last returned by radioboss
+                PRIMARY KEY (station, track_id)
+            )
+        """, commit=True)
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS library_sync (
+                station TEXT PRIMARY KEY,
+                synced_at REAL NOT NULL
+            )
+        """, commit=True)
+        self._table_ready = True
+
+    def library(self, station_key: Optional[str] = None) -> StationLibrary:
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        library = self.libraries.get(station_key)
+        if library is None:
+            library = self.libraries[station_key] = StationLibrary(station_key)
+        return library
+
+    async def load(self) -> None:
+        """rebuild the in-memory indexes from the database."""
+        self._ensure_tables()
+        rows = await db.fetch("SELECT station, track_id, title FROM library_tracks")
+        for row in rows:
+            self.library(row['station']).add(row['track_id'], row['title'])
+        for row in await db.fetch("SELECT station, synced_at FROM library_sync"):
+            self.library(row['station']).synced_at = row['synced_at']
+        logger.info(f"loaded {len(rows)} library tracks for {len(self.libraries)} stations")
+
+    def search(self, query: str, station_key: Optional[str] = None, limit: int = 25,
+               allow_stale: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """search the local index. None means it's stale and the remote search should be used."""
+        library = self.library(station_key)
+        if library.is_stale and not allow_stale:
+            return None
+        return library.search(query, limit)
+
+    def get(self, track_id: str, station_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.library(station_key).get(track_id)
+
+    @staticmethod
+    def confident(tracks: Optional[List[Dict[str, Any]]]) -> bool:
+        """whether local results are good enough to answer without asking radioboss."""
+        return bool(tracks) and tracks[0].get('score', 0) >= LIBRARY_MIN_LOCAL_SCORE
+
+    async def find(self, query: str, station_key: Optional[str] = None,
+                   limit: int = 25) -> Optional[List[Dict[str, Any]]]:
+        """search locally, and radioboss too when the index is stale or has no good match.
+
+        None means radioboss failed and the index had nothing to offer either.
+        """
+        tracks = self.search(query, station_key, limit)
+        if self.confident(tracks):
+            return tracks
+        logger.info(f"no confident local match for {query!r}, searching radioboss")
+        remote = await self.search_remote(query, station_key)
+        if remote:
+            return remote[:limit]
+        # radioboss is failing or found nothing, an out of date or weak local answer beats none
+        tracks = self.search(query, station_key, limit, allow_stale=True)
+        if tracks:
+            return tracks
+        return [] if remote is not None else None
+
+    async def record(self, tracks: Iterable[Dict[str, Any]], station_key: Optional[str] = None) -> int:
+        """index tracks returned by radioboss. returns how many were new or renamed."""
+        self._ensure_tables()
+        library = self.library(station_key)
+        now = time.time()
+        rows = [(library.station_key, track['id'], track['title'], now) for track in tracks]
+        changed = sum(library.add(track_id, title) for _, track_id, title, _ in rows)
+        if rows:
+            await db.executemany(
+                """
+                INSERT INTO library_tracks (station, track_id, title, last_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(station, track_id) DO UPDATE SET
+                    title = excluded.title, last_seen = excluded.last_seen
+                """,
+                rows
+            )
+        return changed
+
+    async def _fetch_remote(self, query: str, library: StationLibrary) -> Optional[List[Dict[str, Any]]]:
+        station = getattr(_config, 'STATIONS', {}).get(library.station_key)
+        if station is None:
+            logger.error(f"no station configured for {library.station_key!r}")
+            return None
+        host, station_id = station_endpoint(station)
+        url = f"https://{host}/w/songrequestsearch"
+        headers = {'Referer': f'https://{host}/', 'Origin': f'https://{host}'}
+        params = {'u': station_id, 'q': query, '_': ''}
+
+        async def fetch(timeout: float) -> tuple:
+            async with http_client.get(
+                url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                # 5xx and 429 count against the breaker
+                if response.status >= 500 or response.status == 429:
+                    response.raise_for_status()
+                return response.status, await response.text(encoding='utf-8')
+
+        try:
+            status, response_text = await breakers.call(host, 'songrequestsearch', fetch)
+        except CircuitOpenError as e:
+            logger.debug(f"library search for {query!r} skipped: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"error searching radioboss library for {query!r}: {e}")
+            return None
+
+        tracks = parse_search_response(response_text) if status == 200 else None
+        if tracks is None:
+            logger.warning(f"unexpected library search response ({status}): {response_text[:200]}")
+        return tracks
+
+    async def search_remote(self, query: str, station_key: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """search radioboss directly, keeping the results in the index. None if the search failed."""
+        library = self.library(station_key)
+        tracks = await self._fetch_remote(query, library)
+        if tracks is not None:
+            await self.record(tracks, library.station_key)
+        return tracks
+
+    async def sync(self, station_key: Optional[str] = None, force: bool = False) -> Optional[int]:
+        """crawl the station's library and update the index.
+
+        only new or renamed tracks are re-indexed, and tracks that no sync has seen for
+        LIBRARY_PRUNE_AFTER_DAYS are dropped. returns the number of tracks added, renamed
+        or pruned, or None if the sync was skipped or failed.
+        """
+        library = self.library(station_key)
+        lock = self._locks.setdefault(library.station_key, asyncio.Lock())
+        if lock.locked():
+            return None
+        async with lock:
+            # a restart shouldn't re-crawl a library that was synced moments ago
+            if not force and library.synced_at is not None \
+                    and time.time() - library.synced_at < LIBRARY_SYNC_INTERVAL_MINUTES * 60 / 2:
+                return None
+
+            started = time.time()
+            semaphore = asyncio.Semaphore(LIBRARY_SYNC_CONCURRENCY)
+
+            async def crawl(query: str) -> Optional[List[Dict[str, Any]]]:
+                async with semaphore:
+                    return await self._fetch_remote(query, library)
+
+            results = await asyncio.gather(*(crawl(q) for q in LIBRARY_SYNC_QUERIES))
+            if all(result is None for result in results):
+                logger.error(f"library sync for {library.station_key} failed, keeping the old index")
+                return None
+            seen = {track['id']: track for result in results if result for track in result}
+            changed = await self.record(seen.values(), library.station_key)
+
+            cutoff = started - LIBRARY_PRUNE_AFTER_DAYS * 86400
+            expired = await db.fetch(
+                "SELECT track_id FROM library_tracks WHERE station = ? AND last_seen < ?",
+                (library.station_key, cutoff)
+            )
+            for row in expired:
+                library.remove(row['track_id'])
+            if expired:
+                await db.execute(
+                    "DELETE FROM library_tracks WHERE station = ? AND last_seen < ?",
+                    (library.station_key, cutoff)
+                )
+
+            library.synced_at = started
+            await db.execute(
+                "INSERT OR REPLACE INTO library_sync (station, synced_at) VALUES (?, ?)",
+                (library.station_key, started)
+            )
+            logger.info(
+                f"library sync for {library.station_key}: {len(library)} tracks, {changed} new or renamed, "
+                f"{len(expired)} pruned in {time.time() - started:.1f}s"
+            )
+            return changed + len(expired)
+
+
+# create a global instance for easy import
+library_index = LibraryIndex()
@@ -0,0 +1,281 @@
+"""
+listener counts per station over time.
+
+a sampler reads the listener count from each station's radioboss info every
+`LISTENER_SAMPLE_SECONDS`, through the now playing service, so a sample taken while
+the track poller's info is fresh costs no request. samples go into a fixed-size
+array-backed ring buffer per station, so memory stays the same however long the bot
+runs. every `LISTENER_FLUSH_SECONDS` the samples not yet written are folded into
+hourly and daily rollups on disk (samples, total, peak and low per hour and per day),
+and the rollups are all that `/stats` reads: 24 rows for a day, 7 for a week, plus
+whatever is still in the buffer.
+"""
+import array
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from modules.database.database import db
+from modules.radioboss.now_playing import now_playing
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+LISTENER_SAMPLE_SECONDS = getattr(_config, 'LISTENER_SAMPLE_SECONDS', 60)
+LISTENER_BUFFER_SAMPLES = getattr(_config, 'LISTENER_BUFFER_SAMPLES', 1440)
+LISTENER_FLUSH_SECONDS = getattr(_config, 'LISTENER_FLUSH_SECONDS', 300)
+
+HOUR = 3600
+DAY = 86400
+
+SPARK_BLOCKS = '▁▂▃▄▅▆▇█'
+
+
+def listener_count(data: Optional[Dict[str, Any]]) -> Optional[int]:
+    """the listener count in a radioboss info payload, None if it has none."""
+    if not data:
+        return None
+    try:
+        return max(0, int(data.get('listeners')))
+    except (TypeError, ValueError):
+        return None
+
+
+def sparkline(values: List[Optional[float]]) -> str:
+    """one block character per value, scaled between the lowest and highest. gaps are blank."""
+    known = [v for v in values if v is not None]
+    if not known:
+        return ' ' * len(values)
+    low, high = min(known), max(known)
+    top = len(SPARK_BLOCKS) - 1
+    return ''.join(
+        ' ' if v is None else SPARK_BLOCKS[round((v - low) / (high - low) * top) if high > low else top // 2]
+        for v in values
+    )
+
+
+class RingBuffer:
+    """the last `capacity` (time, count) samples, in two preallocated arrays."""
+
+    def __init__(self, capacity: int = LISTENER_BUFFER_SAMPLES):
+        self.capacity = capacity
+        self.times = array.array('q', [0]) * capacity
+        self.counts = array.array('i', [0]) * capacity
+        self.size = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.itemsize * len(self.times) + self.counts.itemsize * len(self.counts)
+
+    def append(self, at: int, count: int) -> None:
+        self.times[self._next] = at
+        self.counts[self._next] = count
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def since(self, at: int) -> Iterator[Tuple[int, int]]:
+        """(time, count) for the samples taken at or after at, oldest first."""
+        # samples are appended in time order, so walk back from the newest to find the first
+        newer = 0
+        while newer < self.size and self.times[(self._next - newer - 1) % self.capacity] >= at:
+            newer += 1
+        for i in range(self._next - newer, self._next):
+            slot = i % self.capacity
+            yield self.times[slot], self.counts[slot]
+
+    def latest(self) -> Optional[Tuple[int, int]]:
+        if not self.size:
+            return None
+        slot = (self._next - 1) % self.capacity
+        return self.times[slot], self.counts[slot]
+
+
+@dataclass
+class Rollup:
+    """listener counts over one hour or day."""
+    samples: int = 0
+    total: int = 0
+    peak: int = 0
+    low: Optional[int] = None
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.total / self.samples if self.samples else None
+
+    def add(self, count: int) -> None:
+        self.samples += 1
+        self.total += count
+        self.peak = max(self.peak, count)
+        self.low = count if self.low is None else min(self.low, count)
+
+
+def rollup(samples: Iterator[Tuple[int, int]], period: int) -> Dict[int, Rollup]:
+    """the samples summed up per period (hours or days since the epoch)."""
+    rollups: Dict[int, Rollup] = {}
+    for at, count in samples:
+        rollups.setdefault(at // period, Rollup()).add(count)
+    return rollups
+
+
+class ListenerStats:
+    """a sampler per station, the rollup tables and the queries /stats uses."""
+
+    def __init__(
+        self,
+        sample_every: float = LISTENER_SAMPLE_SECONDS,
+        capacity: int = LISTENER_BUFFER_SAMPLES,
+        flush_every: float = LISTENER_FLUSH_SECONDS,
+        clock: Callable[[], float] = time.time
+    ):
+        self.sample_every = sample_every
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self.clock = clock
+        self.buffers: Dict[str, RingBuffer] = {}
+        # samples taken before this time are in the rollups already
+        self._flushed_until: Dict[str, int] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._table_ready = False
+
+    def _ensure_tables(self) -> None:
+        if self._table_ready:
+            return
+        for table, period in (('listener_stats_hourly', 'hour'), ('listener_stats_daily', 'day')):
+            db.execute_query(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    station TEXT NOT NULL,
+                    {period} INTEGER NOT NULL, -- {period}s since the unix epoch (utc)
+                    samples INTEGER NOT NULL,
+                    total INTEGER NOT NULL,
+                    peak INTEGER NOT NULL,
+                    low INTEGER NOT NULL,
+                    PRIMARY KEY (station, {period})
+                ) WITHOUT ROWID
+            """, commit=True)
+        self._table_ready = True
+
+    def buffer(self, station_key: str) -> RingBuffer:
+        buffer = self.buffers.get(station_key)
+        if buffer is None:
+            buffer = self.buffers[station_key] = RingBuffer(self.capacity)
+            self._flushed_until.setdefault(station_key, 0)
+        return buffer
+
+    def record(self, station_key: str, count: int, at: Optional[int] = None) -> None:
+        self.buffer(station_key).append(int(self.clock()) if at is None else at, count)
+
+    def start(self) -> None:
+        """start sampling every station in config.STATIONS. safe to call again on reconnect."""
+        self._ensure_tables()
+        for station_key in getattr(_config, 'STATIONS', {}):
+            task = self._tasks.get(station_key)
+            if task is None or task.done():
+                self._tasks[station_key] = asyncio.create_task(self._sample(station_key))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """stop sampling and write what's still buffered."""
+        tasks = list(self._tasks.values()) + ([self._flusher] if self._flusher else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._flusher = None
+        await self.flush()
+
+    async def _sample(self, station_key: str) -> None:
+        service = now_playing.service(station_key)
+        if service is None:
+            return
+        while True:
+            try:
+                # info the track poller fetched within the interval counts as a sample
+                count = listener_count(await service.fresh(self.sample_every))
+                if count is not None:
+                    self.record(station_key, count)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"error sampling listeners for {station_key}: {e}")
+            await asyncio.sleep(self.sample_every)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_every)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"error writing listener rollups: {e}")
+
+    async def flush(self) -> int:
+        """fold the samples not yet written into the hourly and daily rollups. returns how many."""
+        self._ensure_tables()
+        pending = []
+        for station_key, buffer in self.buffers.items():
+            samples = list(buffer.since(self._flushed_until[station_key]))
+            if samples:
+                pending.append((station_key, samples))
+        if not pending:
+            return 0
+
+        def write(connection) -> None:
+            for station_key, samples in pending:
+                for table, period, size in (('listener_stats_hourly', 'hour', HOUR), ('listener_stats_daily', 'day', DAY)):
+                    connection.executemany(
+                        f"INSERT INTO {table} (station, {period}, samples, total, peak, low) VALUES (?, ?, ?, ?, ?, ?) "
+                        f"ON CONFLICT (station, {period}) DO UPDATE SET samples = samples + excluded.samples, "
+                        "total = total + excluded.total, peak = MAX(peak, excluded.peak), low = MIN(low, excluded.low)",
+                        [
+                            (station_key, slot, r.samples, r.total, r.peak, r.low)
+                            for slot, r in rollup(iter(samples), size).items()
+                        ]
+                    )
+
+        await db.run_in_transaction(write)
+        for station_key, samples in pending:
+            self._flushed_until[station_key] = samples[-1][0] + 1
+        return sum(len(samples) for _, samples in pending)
+
+    async def series(self, station_key: str, period: int, count: int) -> List[Rollup]:
+        """rollups for the last count hours or days (period HOUR or DAY), oldest first, the current one last."""
+        self._ensure_tables()
+        table, column = ('listener_stats_hourly', 'hour') if period == HOUR else ('listener_stats_daily', 'day')
+        current = int(self.clock()) // period
+        first = current - count + 1
+        rows = await db.fetch(
+            f"SELECT {column}, samples, total, peak, low FROM {table} WHERE station = ? AND {column} >= ?",
+            (station_key, first)
+        )
+        slots = {row[0]: Rollup(row[1], row[2], row[3], row[4]) for row in rows}
+        # samples still in the buffer aren't in the tables yet
+        buffer = self.buffers.get(station_key)
+        if buffer is not None:
+            unflushed = buffer.since(max(self._flushed_until[station_key], first * period))
+            for slot, r in rollup(unflushed, period).items():
+                merged = slots.setdefault(slot, Rollup())
+                merged.samples += r.samples
+                merged.total += r.total
+                merged.peak = max(merged.peak, r.peak)
+                merged.low = r.low if merged.low is None else min(merged.low, r.low)
+        return [slots.get(slot, Rollup()) for slot in range(first, current + 1)]
+
+    def current(self, station_key: str) -> Optional[Tuple[int, int]]:
+        """(time, count) of the station's latest sample."""
+        buffer = self.buffers.get(station_key)
+        return buffer.latest() if buffer is not None else None
+
+
+# create a global instance for easy import
+listener_stats = ListenerStats()
@@ -0,0 +1,264 @@
+"""
+cached now playing info per station.
+
+every station in `config.STATIONS` gets one `NowPlayingService`. track info fetched
+from radioboss is served from memory for a short ttl, concurrent callers share a
+single in-flight request, and once the ttl has passed the last known info is still
+returned if radioboss is slow to answer the refresh, fails it, or is behind an open
+circuit breaker, until it is `NOW_PLAYING_STALE_SECONDS` past the ttl. after that
+callers get None. hit, miss and upstream latency counters are kept per station.
+"""
+import asyncio
+import json
+import logging
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from utils.circuit_breaker import CircuitOpenError, breakers
+from utils.http_client import http_client
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+NOW_PLAYING_TTL_SECONDS = getattr(_config, 'NOW_PLAYING_TTL_SECONDS', 10)
+NOW_PLAYING_STALE_SECONDS = getattr(_config, 'NOW_PLAYING_STALE_SECONDS', 120)
+NOW_PLAYING_REFRESH_WAIT_SECONDS = getattr(_config, 'NOW_PLAYING_REFRESH_WAIT_SECONDS', 1.5)
+
+Fetcher = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class NowPlayingStats:
+    """cache and upstream counters for one station."""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    stale: int = 0
+    fetches: int = 0
+    errors: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=200))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses + self.coalesced + self.stale
+        return (self.hits + self.coalesced + self.stale) / total if total else 0.0
+
+    def latency_ms(self, quantile: float) -> Optional[float]:
+        """upstream latency at the given quantile over the recent fetches."""
+        if not self.latencies:
+            return None
+        if len(self.latencies) == 1:
+            return self.latencies[0] * 1000
+        return statistics.quantiles(self.latencies, n=100, method='inclusive')[int(quantile * 100) - 1] * 1000
+
+    def summary(self) -> str:
+        p50, p95 = self.latency_ms(0.5), self.latency_ms(0.95)
+        latency = f"p50 {p50:.0f}ms p95 {p95:.0f}ms" if p50 is not None else "no fetches"
+        return (
+            f"{self.hits} hits, {self.coalesced} coalesced, {self.stale} stale, {self.misses} misses "
+            f"({self.hit_rate:.0%} served without waiting on its own fetch), "
+            f"{self.fetches} fetches, {self.errors} errors, upstream {latency}"
+        )
+
+
+def station_endpoint(station: Dict[str, Any]) -> tuple:
+    """get (api host, station id) for a station.
+
+    radioboss streams on port 8000 + station id, so the id comes from the stream
+    url unless the station config sets 'station_id' explicitly.
+    """
+    parsed = urlparse(station['url'])
+    station_id = station.get('station_id')
+    if station_id is None and parsed.port:
+        station_id = parsed.port - 8000
+    return parsed.hostname, str(station_id)
+
+
+class NowPlayingService:
+    """ttl-cached, single-flight now playing lookups for one station."""
+
+    def __init__(
+        self,
+        name: str,
+        fetcher: Fetcher,
+        ttl: float = NOW_PLAYING_TTL_SECONDS,
+        stale_for: float = NOW_PLAYING_STALE_SECONDS,
+        refresh_wait: float = NOW_PLAYING_REFRESH_WAIT_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_for = stale_for
+        self.refresh_wait = refresh_wait
+        self.clock = clock
+        self.stats = NowPlayingStats()
+        self._data: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        """seconds since the cached info was fetched."""
+        return None if self._data is None else self.clock() - self._fetched_at
+
+    def invalidate(self) -> None:
+        """make the next call fetch, e.g. when the track is known to have changed."""
+        self._fetched_at = self.clock() - self.ttl
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """get now playing info, or None if radioboss can't be reached and nothing recent is cached."""
+        age = self.age
+        if age is not None and age < self.ttl:
+            self.stats.hits += 1
+            return self._data
+
+        joining = self._inflight is not None
+        task = self._refresh()
+
+        if age is not None and age < self.ttl + self.stale_for:
+            # have something recent enough to fall back on, don't wait long for the refresh
+            try:
+                data = await asyncio.wait_for(asyncio.shield(task), self.refresh_wait)
+            except asyncio.TimeoutError:
+                self.stats.stale += 1
+                return self._data
+        else:
+            data = await asyncio.shield(task)
+
+        if joining:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+        if data is not None:
+            return data
+        # the refresh failed: cached info is still served, but only while it's recent enough
+        age = self.age
+        return self._data if age is not None and age < self.ttl + self.stale_for else None
+
+    async def fresh(self, max_age: float) -> Optional[Dict[str, Any]]:
+        """get info no older than max_age, joining a running fetch rather than starting another."""
+        age = self.age
+        if age is not None and age < max_age:
+            self.stats.hits += 1
+            return self._data
+        joining = self._inflight is not None
+        data = await asyncio.shield(self._refresh())
+        if joining:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+        return data
+
+    def _refresh(self) -> asyncio.Task:
+        """start a fetch unless one is already running, and return it."""
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._clear_inflight)
+        return self._inflight
+
+    def _clear_inflight(self, task: asyncio.Task) -> None:
+        if self._inflight is task:
+            self._inflight = None
+
+    async def _fetch(self) -> Optional[Dict[str, Any]]:
+        self.stats.fetches += 1
+        started = time.perf_counter()
+        try:
+            data = await self.fetcher()
+        except CircuitOpenError as e:
+            # radioboss is known to be down, the cached info is served instead
+            logger.debug(f"now playing for {self.name} not fetched: {e}")
+            self.stats.errors += 1
+            return None
+        except Exception as e:
+            logger.error(f"error fetching now playing for {self.name}: {e}")
+            data = None
+        self.stats.latencies.append(time.perf_counter() - started)
+
+        if data is None:
+            self.stats.errors += 1
+            return None
+        self._data = data
+        self._fetched_at = self.clock()
+        return data
+
+
+def radioboss_info_fetcher(host: str, station_id: str, api_key: str) -> Fetcher:
+    """a fetcher for the radioboss /api/info/{station_id} endpoint."""
+    url = f"https://{host}/api/info/{station_id}"
+    headers = {'Accept': 'application/json', 'X-API-Key': api_key}
+    params = {'key': api_key}
+
+    async def request(timeout: float) -> str:
+        # skip certificate verification in case of SSL certificate issues
+        async with http_client.get(
+            url, params=params, headers=headers, ssl=False, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            # 5xx and 429 count against the breaker
+            if response.status >= 500 or response.status == 429:
+                response.raise_for_status()
+            return await response.text()
+
+    async def fetch() -> Optional[Dict[str, Any]]:
+        response_text = await breakers.call(host, 'info', request)
+
+        # try to parse as JSON regardless of content-type
+        try:
+            data = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse JSON response from {url}: {e}")
+            logger.error(f"Response text: {response_text[:1000]}...")
+            return None
+
+        # check if the response has the expected structure
+        if isinstance(data, dict) and ('currenttrack_info' in data or 'nowplaying' in data):
+            return data
+        logger.error(f"Unexpected API response format from {url}: {data}")
+        return None
+
+    return fetch
+
+
+class NowPlayingRegistry:
+    """one now playing service per configured station, created on first use."""
+
+    def __init__(self):
+        self.services: Dict[str, NowPlayingService] = {}
+
+    def service(self, station_key: Optional[str] = None) -> Optional[NowPlayingService]:
+        """get the service for a station key from config.STATIONS (default station if omitted)."""
+        stations = getattr(_config, 'STATIONS', {})
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        service = self.services.get(station_key)
+        if service is None:
+            station = stations.get(station_key)
+            api_key = getattr(_config, 'RADIOBOSS_API_KEY', None)
+            if station is None or not api_key:
+                logger.error(f"no radioboss station or api key configured for {station_key!r}")
+                return None
+            host, station_id = station_endpoint(station)
+            service = NowPlayingService(station_key, radioboss_info_fetcher(host, station_id, api_key))
+            self.services[station_key] = service
+        return service
+
+    async def get(self, station_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        service = self.service(station_key)
+        return await service.get() if service else None
+
+    def stats(self) -> Dict[str, NowPlayingStats]:
+        return {key: service.stats for key, service in self.services.items()}
+
+
+# create a global instance for easy import
+now_playing = NowPlayingRegistry()
@@ -0,0 +1,323 @@
+"""
+pinned now playing embeds, play history and listener stats commands.
+
+`/now-playing-pin` posts an embed for a station in a channel and pins it. the embed
+is edited from the station's track change events, so it only changes when the track
+does and never asks radioboss itself. the same events are recorded in the local play
+history, which `/recent`, `/top-tracks` and `/dj-plays` read. `/stats` charts listener
+counts from the hourly and daily rollups.
+"""
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+
+import discord
+from discord import app_commands, ui
+from discord.ext import commands
+
+import config
+from modules.database.database import db
+from modules.radioboss.listener_stats import DAY, HOUR, Rollup, listener_stats, sparkline
+from modules.radioboss.play_history import PLAY_HISTORY_PAGE_SIZE, Play, play_history
+from modules.radioboss.track_events import TRACK_CHANGED, TrackChange, track_events
+from utils.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+# pinned embeds edited at once when a track changes
+PIN_EDIT_CONCURRENCY = 8
+
+STATION_CHOICES = [app_commands.Choice(name=info['name'], value=key) for key, info in config.STATIONS.items()]
+
+
+def history_embed(plays: List[Play], station_key: str, page: int) -> discord.Embed:
+    """a page of /recent."""
+    station = config.STATIONS.get(station_key, {})
+    embed = discord.Embed(title="🎵 Recently Played", color=0x2f3136)
+    embed.description = '\n'.join(
+        f"<t:{play.played_at}:t> **{play.display}**" + (f" · {play.dj}" if play.dj else '')
+        for play in plays
+    ) or "Nothing recorded yet."
+    embed.set_footer(text=f"{station.get('name', station_key)} · page {page + 1}")
+    return embed
+
+
+class HistoryPager(ui.View):
+    """older/newer buttons for /recent, paging on played_at so every page is an index range read."""
+
+    def __init__(self, station_key: str, plays: List[Play], user_id: int):
+        super().__init__(timeout=300)
+        self.station_key = station_key
+        self.user_id = user_id
+        # every page shown so far, the last one is on screen; newer pops back to the one before
+        self.pages: List[List[Play]] = [plays]
+        self._update_buttons()
+
+    def _update_buttons(self) -> None:
+        self.newer.disabled = len(self.pages) == 1
+        self.older.disabled = len(self.pages[-1]) < PLAY_HISTORY_PAGE_SIZE
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id
+
+    @ui.button(label="Newer", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction: discord.Interaction, button: ui.Button) -> None:
+        self.pages.pop()
+        self._update_buttons()
+        await interaction.response.edit_message(
+            embed=history_embed(self.pages[-1], self.station_key, len(self.pages) - 1), view=self
+        )
+
+    @ui.button(label="Older", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: ui.Button) -> None:
+        plays = await play_history.recent(self.station_key, before=self.pages[-1][-1].played_at)
+        if plays:
+            self.pages.append(plays)
+        self._update_buttons()
+        await interaction.response.edit_message(
+            embed=history_embed(self.pages[-1], self.station_key, len(self.pages) - 1), view=self
+        )
+
+
+def listener_chart(rollups: List[Rollup]) -> str:
+    """a sparkline of average listeners, with the average, peak and low over the whole range."""
+    sampled = [r for r in rollups if r.samples]
+    if not sampled:
+        return "No samples yet."
+    average = sum(r.total for r in sampled) / sum(r.samples for r in sampled)
+    return (
+        f"`{sparkline([r.average for r in rollups])}`\n"
+        f"avg {average:.1f} · peak {max(r.peak for r in sampled)} · low {min(r.low for r in sampled)}"
+    )
+
+
+def track_embed(track: Optional[TrackChange], station_key: str) -> discord.Embed:
+    """the pinned now playing embed for a station."""
+    station = config.STATIONS.get(station_key, {})
+    embed = discord.Embed(title="🎵 Now Playing", color=0x2f3136)
+    if track is None:
+        embed.description = "Waiting for the next track..."
+    else:
+        embed.description = f"**{track.display}**"
+        if track.duration:
+            minutes, seconds = divmod(int(track.duration), 60)
+            embed.add_field(name="Length", value=f"{minutes}:{seconds:02d}", inline=True)
+        if track.previous:
+            embed.add_field(name="Previously", value=track.previous.display, inline=True)
+        embed.timestamp = discord.utils.utcnow()
+    thumbnail = (track.artwork if track else None) or station.get('thumbnail')
+    if thumbnail:
+        embed.set_thumbnail(url=thumbnail)
+    embed.set_footer(text=station.get('name', station_key))
+    return embed
+
+
+class NowPlayingCog(commands.Cog):
+    """keeps pinned now playing embeds up to date."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        # station -> pins showing it
+        self.pins: Dict[str, List[dict]] = {}
+        self._unsubscribe: List[Callable[[], None]] = []
+
+    async def cog_load(self) -> None:
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS now_playing_pins (
+                guild_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                station TEXT NOT NULL,
+                track_key TEXT, -- the track the embed shows, so unchanged tracks aren't re-edited
+                PRIMARY KEY (guild_id, channel_id, station)
+            )
+        """, commit=True)
+        for row in await db.fetch("SELECT * FROM now_playing_pins"):
+            self.pins.setdefault(row['station'], []).append(dict(row))
+        await play_history.load()
+        self._unsubscribe = [
+            event_bus.subscribe(TRACK_CHANGED, self.on_track_changed),
+            event_bus.subscribe(TRACK_CHANGED, play_history.record),
+        ]
+
+    async def cog_unload(self) -> None:
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+
+    async def on_track_changed(self, track: TrackChange) -> None:
+        """edit every pinned embed for the station that doesn't already show this track."""
+        track_key = json.dumps(list(track.key))
+        pins = [pin for pin in self.pins.get(track.station_key, []) if pin['track_key'] != track_key]
+        if not pins:
+            return
+        embed = track_embed(track, track.station_key)
+        semaphore = asyncio.Semaphore(PIN_EDIT_CONCURRENCY)
+
+        async def edit(pin: dict) -> None:
+            async with semaphore:
+                await self._edit_pin(pin, embed, track_key)
+
+        await asyncio.gather(*(edit(pin) for pin in pins))
+        await db.executemany(
+            "UPDATE now_playing_pins SET track_key = ? WHERE guild_id = ? AND channel_id = ? AND station = ?",
+            [(pin['track_key'], pin['guild_id'], pin['channel_id'], pin['station']) for pin in pins]
+        )
+
+    async def _edit_pin(self, pin: dict, embed: discord.Embed, track_key: str) -> None:
+        channel = self.bot.get_channel(pin['channel_id'])
+        if channel is None:
+            # not cached right now (guild outage, cache still filling): try again on the next track.
+            # deleted channels are forgotten by on_guild_channel_delete
+            logger.debug(f"skipping now playing pin in channel {pin['channel_id']}, channel isn't available")
+            return
+        try:
+            await channel.get_partial_message(pin['message_id']).edit(embed=embed)
+            pin['track_key'] = track_key
+        except discord.NotFound:
+            logger.info(f"removing now playing pin in channel {pin['channel_id']}, message is gone")
+            await self._remove_pin(pin['guild_id'], pin['channel_id'], pin['station'])
+        except discord.HTTPException as e:
+            logger.warning(f"failed to update now playing pin in channel {pin['channel_id']}: {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        for station, pins in list(self.pins.items()):
+            if any(p['channel_id'] == channel.id for p in pins):
+                await self._remove_pin(channel.guild.id, channel.id, station)
+
+    async def _remove_pin(self, guild_id: int, channel_id: int, station: str) -> Optional[dict]:
+        pins = self.pins.get(station, [])
+        removed = next((p for p in pins if p['guild_id'] == guild_id and p['channel_id'] == channel_id), None)
+        if removed:
+            pins.remove(removed)
+        await db.execute(
+            "DELETE FROM now_playing_pins WHERE guild_id = ? AND channel_id = ? AND station = ?",
+            (guild_id, channel_id, station)
+        )
+        return removed
+
+    @app_commands.command(name="now-playing-pin", description="pin a now playing embed that follows the radio")
+    @app_commands.describe(channel="the channel to post the embed in", station="the station to follow")
+    @app_commands.choices(station=[
+        app_commands.Choice(name=info['name'], value=key) for key, info in config.STATIONS.items()
+    ])
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def now_playing_pin(self, interaction: discord.Interaction, channel: discord.TextChannel,
+                              station: Optional[str] = None) -> None:
+        """handle the /now-playing-pin slash command."""
+        station = station or config.DEFAULT_STATION
+        await interaction.response.defer(ephemeral=True)
+        track = track_events.current(station)
+        try:
+            message = await channel.send(embed=track_embed(track, station))
+        except discord.Forbidden:
+            await interaction.followup.send(f"❌ I can't send messages in {channel.mention}.", ephemeral=True)
+            return
+        try:
+            await message.pin(reason=f"now playing embed set up by {interaction.user}")
+        except discord.HTTPException:
+            pass  # still kept up to date, just not pinned
+
+        old = await self._remove_pin(interaction.guild_id, channel.id, station)
+        if old:
+            try:
+                await channel.get_partial_message(old['message_id']).delete()
+            except discord.HTTPException:
+                pass
+        pin = {
+            'guild_id': interaction.guild_id,
+            'channel_id': channel.id,
+            'message_id': message.id,
+            'station': station,
+            'track_key': json.dumps(list(track.key)) if track else None
+        }
+        await db.execute(
+            "INSERT INTO now_playing_pins (guild_id, channel_id, message_id, station, track_key) VALUES (?, ?, ?, ?, ?)",
+            (pin['guild_id'], pin['channel_id'], pin['message_id'], pin['station'], pin['track_key'])
+        )
+        self.pins.setdefault(station, []).append(pin)
+        await interaction.followup.send(f"✅ Now playing embed posted in {channel.mention}.", ephemeral=True)
+
+    @app_commands.command(name="now-playing-unpin", description="stop updating the now playing embed in a channel")
+    @app_commands.describe(channel="the channel with the embed")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def now_playing_unpin(self, interaction: discord.Interaction, channel: discord.TextChannel) -> None:
+        """handle the /now-playing-unpin slash command."""
+        removed = []
+        for station in list(self.pins):
+            pin = await self._remove_pin(interaction.guild_id, channel.id, station)
+            if pin:
+                removed.append(pin)
+        for pin in removed:
+            try:
+                await channel.get_partial_message(pin['message_id']).unpin()
+            except discord.HTTPException:
+                pass
+        if removed:
+            await interaction.response.send_message(f"✅ Stopped updating the now playing embed in {channel.mention}.", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"❌ There's no now playing embed in {channel.mention}.", ephemeral=True)
+
+    @app_commands.command(name="recent", description="show the tracks the radio played recently")
+    @app_commands.describe(station="the station to show")
+    @app_commands.choices(station=STATION_CHOICES)
+    async def recent(self, interaction: discord.Interaction, station: Optional[str] = None) -> None:
+        """handle the /recent slash command."""
+        station = station or config.DEFAULT_STATION
+        plays = await play_history.recent(station)
+        view = HistoryPager(station, plays, interaction.user.id)
+        await interaction.response.send_message(embed=history_embed(plays, station, 0), view=view)
+
+    @app_commands.command(name="top-tracks", description="show the most played tracks")
+    @app_commands.describe(station="the station to show", days="how many days back to count (default 7)")
+    @app_commands.choices(station=STATION_CHOICES)
+    async def top_tracks(self, interaction: discord.Interaction, station: Optional[str] = None,
+                         days: app_commands.Range[int, 1, 365] = 7) -> None:
+        """handle the /top-tracks slash command."""
+        station = station or config.DEFAULT_STATION
+        top = await play_history.top_tracks(station, days)
+        embed = discord.Embed(title=f"🏆 Top Tracks, last {days} days", color=0x2f3136)
+        embed.description = '\n'.join(
+            f"**{i}.** {f'{artist} - {title}' if artist else title} ({plays} plays)"
+            for i, (artist, title, plays) in enumerate(top, 1)
+        ) or "Nothing recorded yet."
+        embed.set_footer(text=config.STATIONS.get(station, {}).get('name', station))
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name="dj-plays", description="show how many tracks each dj played")
+    @app_commands.describe(station="the station to show", days="how many days back to count (default 7)")
+    @app_commands.choices(station=STATION_CHOICES)
+    async def dj_plays(self, interaction: discord.Interaction, station: Optional[str] = None,
+                       days: app_commands.Range[int, 1, 365] = 7) -> None:
+        """handle the /dj-plays slash command."""
+        station = station or config.DEFAULT_STATION
+        counts = await play_history.dj_plays(station, days)
+        embed = discord.Embed(title=f"🎧 DJ Plays, last {days} days", color=0x2f3136)
+        embed.description = '\n'.join(
+            f"**{i}.** {dj} ({plays} tracks)" for i, (dj, plays) in enumerate(counts, 1)
+        ) or "No DJ plays recorded yet."
+        embed.set_footer(text=config.STATIONS.get(station, {}).get('name', station))
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name="stats", description="show listener counts over the last day and week")
+    @app_commands.describe(station="the station to show")
+    @app_commands.choices(station=STATION_CHOICES)
+    async def stats(self, interaction: discord.Interaction, station: Optional[str] = None) -> None:
+        """handle the /stats slash command."""
+        station = station or config.DEFAULT_STATION
+        hours = await listener_stats.series(station, HOUR, 24)
+        days = await listener_stats.series(station, DAY, 7)
+        embed = discord.Embed(title="📈 Listeners", color=0x2f3136)
+        latest = listener_stats.current(station)
+        if latest is not None:
+            embed.description = f"**{latest[1]}** listening now (<t:{latest[0]}:R>)"
+        embed.add_field(name="Last 24 hours", value=listener_chart(hours), inline=False)
+        embed.add_field(name="Last 7 days", value=listener_chart(days), inline=False)
+        embed.set_footer(text=config.STATIONS.get(station, {}).get('name', station))
+        await interaction.response.send_message(embed=embed)
+
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(NowPlayingCog(bot))
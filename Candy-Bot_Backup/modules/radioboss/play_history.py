@@ -0,0 +1,231 @@
+"""
+local play history per station.
+
+every track change published on the event bus is written to the bot database, so
+history commands are answered locally and nothing is lost when radioboss's own
+history window rolls over. storage is compact: artist and title are stored once in
+`play_tracks`, and each play is a (station, time, track id, dj) row in
+`play_history`, clustered on (station, played_at) so time ranges and pages are
+index range reads.
+
+aggregates are kept up to date as plays are recorded rather than computed from the
+history: `play_counts_daily` holds plays per station, day and track, and
+`dj_plays_daily` plays per station, day and dj. "top tracks this week" reads seven
+days of counters, however long the history gets.
+
+the dj comes from the currenttrack_info attribute named by `PLAY_HISTORY_DJ_FIELD`
+(radioboss has no standard dj field; stations usually put it in a custom field).
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from modules.database.database import db
+from modules.radioboss.track_events import TrackChange
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+PLAY_HISTORY_DJ_FIELD = getattr(_config, 'PLAY_HISTORY_DJ_FIELD', '')
+PLAY_HISTORY_PAGE_SIZE = getattr(_config, 'PLAY_HISTORY_PAGE_SIZE', 10)
+# the same track seen again this soon after it started (a restart) isn't a new play
+PLAY_HISTORY_REPEAT_SECONDS = getattr(_config, 'PLAY_HISTORY_REPEAT_SECONDS', 600)
+
+DAY = 86400
+
+
+@dataclass
+class Play:
+    """one row of a station's history."""
+    station: str
+    played_at: int
+    artist: str
+    title: str
+    duration: Optional[float]
+    dj: str
+
+    @property
+    def display(self) -> str:
+        return f"{self.artist} - {self.title}" if self.artist else self.title
+
+
+def dj_from(track: TrackChange, field: str = PLAY_HISTORY_DJ_FIELD) -> str:
+    """the dj named in the track's radioboss attributes, '' if there isn't one."""
+    if not field:
+        return ''
+    attributes = (track.data.get('currenttrack_info') or {}).get('@attributes') or {}
+    return str(attributes.get(field) or '').strip()
+
+
+class PlayHistory:
+    """the play history tables and the queries the history commands use."""
+
+    def __init__(self):
+        # station -> (track id, played_at) of its last recorded play
+        self._last: Dict[str, Tuple[int, int]] = {}
+        self._table_ready = False
+
+    def _ensure_tables(self) -> None:
+        if self._table_ready:
+            return
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS play_tracks (
+                id INTEGER PRIMARY KEY,
+                artist TEXT NOT NULL,
+                title TEXT NOT NULL,
+                duration REAL,
+                UNIQUE (artist, title)
+            )
+        """, commit=True)
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS play_history (
+                station TEXT NOT NULL,
+                played_at INTEGER NOT NULL, -- unix time the track change was seen
+                track INTEGER NOT NULL REFERENCES play_tracks (id),
+                dj TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (station, played_at)
+            ) WITHOUT ROWID
+        """, commit=True)
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS play_counts_daily (
+                station TEXT NOT NULL,
+                day INTEGER NOT NULL, -- days since the unix epoch (utc)
+                track INTEGER NOT NULL,
+                plays INTEGER NOT NULL,
+                PRIMARY KEY (station, day, track)
+            ) WITHOUT ROWID
+        """, commit=True)
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS dj_plays_daily (
+                station TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                dj TEXT NOT NULL,
+                plays INTEGER NOT NULL,
+                PRIMARY KEY (station, day, dj)
+            ) WITHOUT ROWID
+        """, commit=True)
+        self._table_ready = True
+
+    async def load(self) -> None:
+        """create the tables and remember each station's last play, so a restart doesn't record it twice."""
+        self._ensure_tables()
+        for station_key in getattr(_config, 'STATIONS', {}):
+            row = await db.fetchone(
+                "SELECT track, played_at FROM play_history WHERE station = ? ORDER BY played_at DESC LIMIT 1",
+                (station_key,)
+            )
+            if row is not None:
+                self._last[station_key] = (row['track'], row['played_at'])
+
+    async def record(self, track: TrackChange) -> bool:
+        """store a track change and bump its counters. False if it was a repeat of the last play."""
+        self._ensure_tables()
+        played_at = int(track.detected_at)
+        dj = dj_from(track)
+
+        def write(connection: sqlite3.Connection) -> Optional[int]:
+            connection.execute(
+                "INSERT INTO play_tracks (artist, title, duration) VALUES (?, ?, ?) "
+                "ON CONFLICT (artist, title) DO UPDATE SET duration = COALESCE(excluded.duration, duration)",
+                (track.artist, track.title, track.duration)
+            )
+            track_id = connection.execute(
+                "SELECT id FROM play_tracks WHERE artist = ? AND title = ?", (track.artist, track.title)
+            ).fetchone()[0]
+            last = self._last.get(track.station_key)
+            if last is not None and last[0] == track_id and played_at - last[1] < PLAY_HISTORY_REPEAT_SECONDS:
+                return None
+            # a second change within the same second is dropped
+            if not connection.execute(
+                "INSERT OR IGNORE INTO play_history (station, played_at, track, dj) VALUES (?, ?, ?, ?)",
+                (track.station_key, played_at, track_id, dj)
+            ).rowcount:
+                return None
+            day = played_at // DAY
+            connection.execute(
+                "INSERT INTO play_counts_daily (station, day, track, plays) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (station, day, track) DO UPDATE SET plays = plays + 1",
+                (track.station_key, day, track_id)
+            )
+            if dj:
+                connection.execute(
+                    "INSERT INTO dj_plays_daily (station, day, dj, plays) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT (station, day, dj) DO UPDATE SET plays = plays + 1",
+                    (track.station_key, day, dj)
+                )
+            return track_id
+
+        track_id = await db.run_in_transaction(write)
+        if track_id is None:
+            return False
+        self._last[track.station_key] = (track_id, played_at)
+        return True
+
+    async def recent(
+        self,
+        station_key: Optional[str] = None,
+        before: Optional[int] = None,
+        limit: int = PLAY_HISTORY_PAGE_SIZE
+    ) -> List[Play]:
+        """a page of plays, newest first. pass the last play's played_at as before for the next page."""
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        self._ensure_tables()
+        rows = await db.fetch(
+            """
+            SELECT h.station, h.played_at, t.artist, t.title, t.duration, h.dj
+            FROM play_history AS h JOIN play_tracks AS t ON t.id = h.track
+            WHERE h.station = ? AND h.played_at < ?
+            ORDER BY h.played_at DESC LIMIT ?
+            """,
+            (station_key, before if before is not None else 2 ** 62, limit)
+        )
+        return [Play(*row) for row in rows]
+
+    async def top_tracks(
+        self,
+        station_key: Optional[str] = None,
+        days: int = 7,
+        limit: int = 10
+    ) -> List[Tuple[str, str, int]]:
+        """(artist, title, plays) for the most played tracks over the last days, from the daily counters."""
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        self._ensure_tables()
+        rows = await db.fetch(
+            """
+            SELECT t.artist, t.title, c.plays FROM (
+                SELECT track, SUM(plays) AS plays FROM play_counts_daily
+                WHERE station = ? AND day > ? GROUP BY track ORDER BY plays DESC LIMIT ?
+            ) AS c JOIN play_tracks AS t ON t.id = c.track
+            ORDER BY c.plays DESC, t.artist, t.title
+            """,
+            (station_key, int(time.time()) // DAY - days, limit)
+        )
+        return [tuple(row) for row in rows]
+
+    async def dj_plays(
+        self,
+        station_key: Optional[str] = None,
+        days: int = 7,
+        limit: int = 10
+    ) -> List[Tuple[str, int]]:
+        """(dj, plays) over the last days, from the daily counters."""
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        self._ensure_tables()
+        rows = await db.fetch(
+            """
+            SELECT dj, SUM(plays) AS plays FROM dj_plays_daily
+            WHERE station = ? AND day > ? GROUP BY dj ORDER BY plays DESC, dj LIMIT ?
+            """,
+            (station_key, int(time.time()) // DAY - days, limit)
+        )
+        return [tuple(row) for row in rows]
+
+
+# create a global instance for easy import
+play_history = PlayHistory()
@@ -5,8 +5,20 @@ Radioboss API client for interacting with the Radioboss remote control API.
 import asyncio
 import logging
 import aiohttp
-import async_timeout
 from typing import Optional, Dict, Any, List
+from urllib.parse import urlparse
+
+from modules.radioboss.library_index import library_index
+from modules.radioboss.now_playing import now_playing as now_playing_service, station_endpoint
+from modules.radioboss.play_history import play_history
+from modules.radioboss.stream_urls import stream_urls
+from utils.circuit_breaker import CircuitOpenError, breakers
+from utils.http_client import http_client
+
+try:
+    import config as _config
+except Exception:
+    _config = None
 
 logger = logging.getLogger(__name__)
 
@@ -23,18 +35,11 @@ class RadioBossAPIClient:
         self.api_key = api_key
         self.station_id = station_id
         self.owner_id = owner_id
-        self.session: Optional[aiohttp.ClientSession] = None
-        self.timeout = 10  # seconds
-
-    async def _ensure_session(self) -> None:
-        """ensure an aiohttp client session exists."""
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+        # last good response per request, served while the api's breaker is open
+        self._cached: Dict[tuple, Any] = {}
 
     async def _make_request(self, endpoint: str, params: Optional[dict] = None) -> dict:
         """make a request to the Radioboss API."""
-        await self._ensure_session()
-        
         url = f"{self.base_url}/api/{endpoint.lstrip('/')}"
         headers = {
             'X-API-Key': self.api_key,
@@ -46,149 +51,62 @@ class RadioBossAPIClient:
             
         params['station'] = self.station_id
         
+        async def fetch(timeout: float) -> Any:
+            async with http_client.get(
+                url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                # 5xx and 429 count against the breaker
+                if response.status >= 500 or response.status == 429:
+                    response.raise_for_status()
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise RadioBossAPIError(
+                        f"API request failed with status {response.status}: {error_text}"
+                    )
+                
+                try:
+                    return await response.json()
+                except Exception as e:
+                    text = await response.text()
+                    raise RadioBossAPIError(
+                        f"Failed to parse JSON response: {e}, response: {text[:200]}"
+                    ) from e
+
+        cache_key = (endpoint, tuple(sorted(params.items())))
         try:
-            async with async_timeout.timeout(self.timeout):
-                async with self.session.get(url, params=params, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise RadioBossAPIError(
-                            f"API request failed with status {response.status}: {error_text}"
-                        )
-                    
-                    try:
-                        return await response.json()
-                    except Exception as e:
-                        text = await response.text()
-                        raise RadioBossAPIError(
-                            f"Failed to parse JSON response: {e}, response: {text[:200]}"
-                        ) from e
-                    
+            data = await breakers.call(urlparse(url).hostname, endpoint.strip('/'), fetch)
+        except CircuitOpenError as e:
+            if cache_key in self._cached:
+                logger.info(f"serving cached {endpoint}: {e}")
+                return self._cached[cache_key]
+            raise RadioBossAPIError(str(e)) from e
         except asyncio.TimeoutError as e:
             raise RadioBossAPIError("Request to RadioBoss API timed out") from e
         except aiohttp.ClientError as e:
             raise RadioBossAPIError(f"Error making request to RadioBoss API: {e}") from e
+        self._cached[cache_key] = data
+        return data
 
     async def get_stream_info(self) -> Dict[str, Any]:
         """get stream information including stream URLs."""
         return await self._make_request('stream/info')
 
+    def _station_key(self) -> Optional[str]:
+        """the configured station this client's station id belongs to, None for the default."""
+        for key, station in getattr(_config, 'STATIONS', {}).items():
+            if station_endpoint(station)[1] == str(self.station_id):
+                return key
+        return None
+
     async def search_song_in_library(self, query: str) -> tuple[bool, str]:
         """search for a song in the library."""
-        try:
-            # use the songrequestsearch endpoint
-            url = "https://c4.radioboss.fm/w/songrequestsearch"
-            params = {
-                "u": self.station_id,  # use the instance station_id
-                "q": query,
-                "_": ""  # cache buster
-            }
-            
-            logger.info(f"Searching for song: {url}?u={params['u']}&q={query}")
-            
-            # set a reasonable timeout
-            timeout = aiohttp.ClientTimeout(total=10)
-            
-            # create a session with headers that mimic a browser
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'application/json, text/plain, */*',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Referer': 'https://c4.radioboss.fm/',
-                'Origin': 'https://c4.radioboss.fm',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Sec-Fetch-Dest': 'empty',
-                'Sec-Fetch-Mode': 'cors',
-                'Sec-Fetch-Site': 'same-origin',
-                'Pragma': 'no-cache',
-                'Cache-Control': 'no-cache'
-            }
-            
-            # use a new session for this request
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.get(url, params=params, timeout=timeout) as response:
-                    # log response status and headers for debugging
-                    logger.info(f"Search response status: {response.status}")
-                    
-                    # get the content type
-                    content_type = response.headers.get('Content-Type', '').lower()
-                    
-                    # get the response text first
-                    response_text = await response.text(encoding='utf-8')
-                    
-                    # log the response for debugging
-                    logger.debug(f"Response content type: {content_type}")
-                    logger.debug(f"Response text: {response_text[:500]}...")
-                    
-                    # check if we got HTML instead of JSON
-                    if 'text/html' in content_type or response_text.strip().startswith('<'):
-                        logger.warning("Received HTML response instead of JSON. The API might be down or rate limiting.")
-                        # Try to extract JSON from HTML if it's embedded in the page
-                        import re
-                        json_match = re.search(r'<script[^>]*>\s*var\s+data\s*=\s*(\[.*?\]|\{.*?\})\s*;', 
-                                            response_text, re.DOTALL)
-                        if json_match:
-                            try:
-                                import json
-                                json_str = json_match.group(1)
-                                data = json.loads(json_str)
-                                if isinstance(data, list) and len(data) > 0:
-                                    track_id = str(data[0].get('id', ''))
-                                    if track_id:
-                                        logger.info(f"Found track ID in HTML response: {track_id}")
-                                        return True, track_id
-                            except Exception as e:
-                                logger.warning(f"Failed to parse JSON from HTML: {e}")
-                        
-                        # If we got here, we couldn't extract valid data from HTML
-                        return False, "The radio server returned an unexpected response. Please try again later."
-                    
-                    # try to parse as JSON
-                    try:
-                        import json
-                        data = await response.json()
-                        if isinstance(data, list) and len(data) > 0:
-                            track_id = str(data[0].get('id', ''))
-                            if track_id:
-                                logger.info(f"Found track ID in JSON response: {track_id}")
-                                return True, track_id
-                    except Exception as e:
-                        logger.warning(f"Failed to parse JSON response: {e}")
-                    
-                    # try to find track ID using simple string search as fallback
-                    if '"id":' in response_text and '"title":' in response_text:
-                        try:
-                            import re
-                            match = re.search(r'"id"\s*:\s*"?(\d+)', response_text)
-                            if match:
-                                track_id = match.group(1)
-                                logger.info(f"Found track ID using regex search: {track_id}")
-                                return True, track_id
-                        except Exception as e:
-                            logger.error(f"Error in regex track ID search: {e}")
-                    
-                    # last resort: look for any numbers that might be track IDs
-                    try:
-                        import re
-                        matches = re.findall(r'\b\d{4,}\b', response_text)
-                        if matches:
-                            track_id = matches[0]
-                            logger.info(f"Found potential track ID in raw text: {track_id}")
-                            return True, track_id
-                    except Exception as e:
-                        logger.error(f"Error in numeric ID search: {e}")
-                    
-                    # if we still don't have a track ID, log the response
-                    logger.error(f"Could not find track ID in response. Response starts with: {response_text[:200]}...")
-                    return False, "Could not find any matching songs. Please try a different search term."
-                        
-        except asyncio.TimeoutError:
-            logger.error("Search request timed out")
-            return False, "The search request timed out. Please try again later."
-            
-        except Exception as e:
-            logger.error(f"Error searching for song: {str(e)}", exc_info=True)
-            return False, f"An error occurred while searching for songs: {str(e)}"
+        tracks = await library_index.find(query, self._station_key())
+        if tracks is None:
+            return False, "The radio server couldn't be reached. Please try again later."
+        if not tracks:
+            return False, "Could not find any matching songs. Please try a different search term."
+        logger.info(f"Found track ID: {tracks[0]['id']}")
+        return True, tracks[0]['id']
             
     async def request_song(self, song_id: str) -> bool:
         """request a song to be played on the radio."""
@@ -203,10 +121,7 @@ class RadioBossAPIClient:
             
             logger.info(f"Making song request: {url}?u={params['u']}&id={params['id']}")
             
-            # set a reasonable timeout
-            timeout = aiohttp.ClientTimeout(total=10)
-            
-            # create a session with headers that might help with the response
+            # headers that might help with the response
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
                 'Accept': '*/*',
@@ -214,33 +129,46 @@ class RadioBossAPIClient:
                 'Connection': 'keep-alive'
             }
             
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.get(url, params=params, timeout=timeout) as response:
+            async def make_request(timeout: float) -> bool:
+                async with http_client.get(
+                    url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
                     # log the response status and headers for debugging
                     logger.info(f"Response status: {response.status}")
                     logger.info(f"Response headers: {dict(response.headers)}")
-                    
+                
                     # get the response text first
                     response_text = await response.text(encoding='utf-8')
-                    
+                
                     # print the raw response to console
                     print("\n" + "="*80)
                     print("RAW RESPONSE FROM SONG REQUEST:")
                     print(response_text)
                     print("="*80 + "\n")
-                    
+                
                     # log the full response
                     logger.info(f"Full response: {response_text}")
+                
+                    # 5xx and 429 count against the breaker
+                    if response.status >= 500 or response.status == 429:
+                        response.raise_for_status()
                     
                     # if status is 200, assume success
                     if response.status == 200:
                         logger.info("Request successful (status 200)")
                         return True
-                        
+                    
                     # if we get here, the request likely failed
                     logger.error(f"Request failed with status {response.status}")
                     return False
-                        
+
+            # asking twice could queue the song twice, so no retries
+            return await breakers.call(urlparse(url).hostname, 'songrequestmake', make_request, retry=False)
+                    
+        except CircuitOpenError as e:
+            logger.warning(f"song request not sent: {e}")
+            return False
+            
         except asyncio.TimeoutError:
             logger.error("Request timed out")
             return False
@@ -263,9 +191,7 @@ class RadioBossAPIClient:
         return await self._make_request(f'track/history?limit={limit}')
 
     async def close(self) -> None:
-        """close the HTTP session."""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        """nothing to release; connections belong to the shared http client, which is closed on shutdown."""
 
 # configuration moved to config.py
 
@@ -326,18 +252,22 @@ class RadioBossCommands(commands.Cog):
     async def now_playing(self, ctx):
         """get currently playing track."""
         try:
-            track_info = await self.radioboss_client.get_current_track()
+            # shared, cached lookup so bursts of !np across guilds hit radioboss once
+            data = await now_playing_service.get()
+            if not data:
+                await ctx.send("Could not fetch the current track, the radio might be offline.")
+                return
+            track_info = data.get('currenttrack_info', {}).get('@attributes', {})
             
             embed = discord.Embed(
                 title="🎵 Now Playing",
                 color=discord.Color.blue()
             )
-            embed.add_field(name="Title", value=track_info['title'], inline=False)
-            embed.add_field(name="Artist", value=track_info['artist'], inline=True)
-            embed.add_field(name="Album", value=track_info['album'], inline=True)
-            embed.add_field(name="Duration", value=track_info['duration'], inline=True)
-            embed.add_field(name="Listeners", value=track_info['listeners'], inline=True)
-            embed.add_field(name="Live", value="Yes" if track_info['live'] else "No", inline=True)
+            embed.add_field(name="Title", value=track_info.get('TITLE', 'Unknown Track'), inline=False)
+            embed.add_field(name="Artist", value=track_info.get('ARTIST', 'Unknown Artist'), inline=True)
+            embed.add_field(name="Album", value=track_info.get('ALBUM') or 'N/A', inline=True)
+            embed.add_field(name="Duration", value=track_info.get('DURATION', '0:00'), inline=True)
+            embed.add_field(name="Listeners", value=str(data.get('listeners', 'N/A')), inline=True)
             
             await ctx.send(embed=embed)
             
@@ -348,7 +278,10 @@ class RadioBossCommands(commands.Cog):
     async def radio_info(self, ctx):
         """get radio station information."""
         try:
-            stream_info = await self.radioboss_client.get_stream_info()
+            stream_info = await now_playing_service.get()
+            if not stream_info:
+                await ctx.send("Could not fetch radio info, the radio might be offline.")
+                return
             
             embed = discord.Embed(
                 title=f"📻 {stream_info.get('station_name', 'Radio Station')}",
@@ -359,7 +292,7 @@ class RadioBossCommands(commands.Cog):
             # add stream URL
             embed.add_field(
                 name="Stream URL",
-                value=f"[Listen Here]({RADIOBOSS_STREAM_URL})",
+                value=f"[Listen Here]({await stream_urls.resolve()})",
                 inline=False
             )
             
@@ -394,7 +327,8 @@ class RadioBossCommands(commands.Cog):
     async def recent_tracks(self, ctx, limit: int = 5):
         """get recently played tracks."""
         try:
-            recent = await self.radioboss_client.get_recent_tracks()
+            # answered from the local play history, radioboss isn't asked
+            recent = await play_history.recent(limit=min(limit, 25))
             
             if not recent:
                 await ctx.send("No recent tracks found.")
@@ -405,10 +339,10 @@ class RadioBossCommands(commands.Cog):
                 color=discord.Color.purple()
             )
             
-            for i, track in enumerate(recent[:limit]):
+            for i, play in enumerate(recent):
                 embed.add_field(
-                    name=f"{i+1}. {track['title']}",
-                    value=f"Started: {track['started']}",
+                    name=f"{i+1}. {play.display}",
+                    value=f"Started: <t:{play.played_at}:t>",
                     inline=False
                 )
             
@@ -426,27 +360,9 @@ async def setup(bot):
     await bot.add_cog(RadioBossCommands(bot))
 
 # alternative: simple function to get stream URL
-async def get_working_stream_url():
-    """get a working stream URL from the API."""
-    client = RadioBossAPIClient(
-        base_url=RADIOBOSS_API_URL,
-        api_key=RADIOBOSS_API_KEY,
-        station_id=RADIOBOSS_STATION_ID
-    )
-    
-    try:
-        urls = await client.get_stream_urls()
-        # try different URL types in order of preference
-        for url_type in ['ssl', 'http', 'port443', 'port80']:
-            if url_type in urls and urls[url_type]:
-                return urls[url_type]
-        # fallback to configured stream URL
-        return RADIOBOSS_STREAM_URL
-    except Exception as e:
-        print(f"Error getting stream URL from API: {e}")
-        return RADIOBOSS_STREAM_URL
-    finally:
-        await client.close()
+async def get_working_stream_url(station_key: Optional[str] = None) -> Optional[str]:
+    """get a working stream URL for a station (the default station if omitted)."""
+    return await stream_urls.resolve(station_key)
 
 if __name__ == "__main__":
     # test the API
@@ -3,11 +3,10 @@ radioboss cog for interacting with the radioboss api.
 """
 
 import logging
-from typing import Optional, List, Dict, Any, Union
-import aiohttp
+from typing import Optional, List, Dict, Any, Tuple, Union
 import discord
 from discord import app_commands, ui
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
 
 # import config
@@ -19,9 +18,16 @@ from config import (
 
 # import the RadioBoss API client
 from .radioboss_api import RadioBossAPIClient, RadioBossAPIError
+from .library_index import LIBRARY_SYNC_INTERVAL_MINUTES, library_index
+from .request_broker import ALREADY_SENT, DUPLICATE, FULL, QUEUED, RequestResult, request_broker
+from utils.bot_admin import is_bot_admin
+from utils.circuit_breaker import breakers
 
 logger = logging.getLogger(__name__)
 
+# autocomplete choices carry the track id so the pick can skip the dropdown
+AUTOCOMPLETE_PREFIX = 'id:'
+
 class RadioBossCog(commands.Cog):
     """cog for handling radioboss related commands."""
 
@@ -40,8 +46,16 @@ class RadioBossCog(commands.Cog):
         self.selected_track = None
         logger.info("radioboss cog initialized")
 
+    async def cog_load(self) -> None:
+        """load the song library index and start keeping it in sync."""
+        await library_index.load()
+        await request_broker.load()
+        self.sync_library.start()
+
     async def cog_unload(self) -> None:
         """clean up resources when the cog is unloaded."""
+        self.sync_library.cancel()
+        request_broker.stop()
         if hasattr(self, 'radioboss'):
             await self.radioboss.close()
         logger.info("radioboss cog unloaded")
@@ -213,142 +227,98 @@ class RadioBossCog(commands.Cog):
         self.confirmed = False
         self.cancelled = False
         
-        # define headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': '*/*',
-            'Accept-Encoding': 'gzip, deflate, br'
-        }
-        
-        # define URL and parameters for the request
-        url = "https://c4.radioboss.fm/w/songrequestsearch"
-        params = {
-            "u": 560,  # station ID
-            "q": song_name,
-            "_": ""  # cache buster
-        }
-        
         try:
-            # search for the song in the library
-            async with aiohttp.ClientSession(headers=headers) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        await interaction.followup.send(
-                            "❌ Failed to search for songs. Please try again later.",
-                            ephemeral=True
-                        )
+            tracks, picked = await self._find_tracks(song_name)
+            if tracks is None:
+                await interaction.followup.send(
+                    "❌ Failed to search for songs. Please try again later.",
+                    ephemeral=True
+                )
+                return
+            
+            if not tracks:
+                # no songs found, show the request button
+                if not self.owner_id:
+                    await interaction.followup.send("No songs found. The admin has been notified.", ephemeral=True)
+                    return
+                
+                # create a view with the request button
+                view = discord.ui.View(timeout=300)  # 5 minute timeout
+                request_btn = self.RequestSongButton(
+                    owner_id=self.owner_id,
+                    original_query=song_name
+                )
+                view.add_item(request_btn)
+                
+                await interaction.followup.send(
+                    "We couldn't find that song in our library. Would you like to request it?",
+                    view=view,
+                    ephemeral=True
+                )
+                return
+                
+            try:
+                if picked:
+                    # chosen from the autocomplete list, no need to pick again
+                    selected_track = tracks[0]
+                else:
+                    # create a view with the dropdown
+                    select_view = discord.ui.View(timeout=60)
+                    dropdown = self.SongSelectDropdown(tracks)
+                    select_view.add_item(dropdown)
+                    
+                    # send the dropdown as ephemeral
+                    await interaction.followup.send(
+                        "Select a song:",
+                        view=select_view,
+                        ephemeral=True
+                    )
+                    
+                    # wait for the user to select a song
+                    await select_view.wait()
+                    
+                    if not hasattr(select_view, 'selected_song_id'):
+                        await interaction.followup.send("No song selected. Please try again.", ephemeral=True)
                         return
                         
-                    # get and parse the JSON response
-                    response_text = await response.text(encoding='utf-8')
-                    print("\n" + "="*80)
-                    print("SEARCH RESPONSE:")
-                    print(response_text)
-                    print("="*80 + "\n")
+                    # get the selected track
+                    selected_track = next((t for t in tracks if str(t['id']) == select_view.selected_song_id), None)
                     
-                    try:
-                        import json
-                        data = json.loads(response_text)
-                        
-                        if not data.get('tracks'):
-                            # no songs found, show the request button
-                            if not self.owner_id:
-                                await interaction.followup.send("No songs found. The admin has been notified.", ephemeral=True)
-                                return
-                            
-                            # create a view with the request button
-                            view = discord.ui.View(timeout=300)  # 5 minute timeout
-                            request_btn = self.RequestSongButton(
-                                owner_id=self.owner_id,
-                                original_query=song_name
-                            )
-                            view.add_item(request_btn)
-                            
-                            await interaction.followup.send(
-                                "We couldn't find that song in our library. Would you like to request it?",
-                                view=view,
-                                ephemeral=True
-                            )
-                            return
-                        
-                        # process the tracks
-                        tracks = data.get('tracks', [])
-                        if not tracks:
-                            await interaction.followup.send("No songs found. Please try a different search term.", ephemeral=True)
-                            return
-                            
-                        # create a view with the dropdown
-                        select_view = discord.ui.View(timeout=60)
-                        dropdown = self.SongSelectDropdown(tracks)
-                        select_view.add_item(dropdown)
-                        
-                        # send the dropdown as ephemeral
-                        await interaction.followup.send(
-                            "Select a song:",
-                            view=select_view,
-                            ephemeral=True
-                        )
-                        
-                        try:
-                            # wait for the user to select a song
-                            await select_view.wait()
-                            
-                            if not hasattr(select_view, 'selected_song_id'):
-                                await interaction.followup.send("No song selected. Please try again.", ephemeral=True)
-                                return
-                                
-                            # get the selected track
-                            selected_track = next((t for t in tracks if str(t['id']) == select_view.selected_song_id), None)
-                            
-                            if not selected_track:
-                                await interaction.followup.send("❌ Invalid selection. Please try again.", ephemeral=True)
-                                return
-                            
-                            # create confirmation view
-                            confirm_view = self.ConfirmRequestView(
-                                track_title=selected_track['title'],
-                                track_id=selected_track['id']
-                            )
-                            
-                            # send confirmation message
-                            await interaction.followup.send(
-                                f"Confirm request for: **{selected_track['title']}**",
-                                view=confirm_view,
-                                ephemeral=True
-                            )
-                            
-                            # wait for confirmation
-                            await confirm_view.wait()
-                            
-                            if confirm_view.confirmed:
-                                # request the song
-                                success = await self.radioboss.request_song(selected_track['id'])
-                                
-                                if success:
-                                    await interaction.followup.send(
-                                        f"Your song '{selected_track['title']}' has been requested! "
-                                        "It should play in about 5 minutes. Use `/join` to listen in a voice channel!",
-                                        ephemeral=True
-                                    )
-                                else:
-                                    await interaction.followup.send(
-                                        "❌ Failed to request the song. Please try again later.",
-                                        ephemeral=True
-                                    )
-                            
-                        except asyncio.TimeoutError:
-                            await interaction.followup.send("⏱️ Timed out. Please try your request again.", ephemeral=True)
-                        except Exception as e:
-                            logger.error(f"Error in song request: {e}", exc_info=True)
-                            await interaction.followup.send("❌ An error occurred while processing your request. Please try again.", ephemeral=True)
-                            
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to parse JSON response: {e}")
-                        await interaction.followup.send("❌ Failed to process the song list. Please try again later.", ephemeral=True)
-                        
-        except aiohttp.ClientError as e:
-            logger.error(f"HTTP error during song search: {e}")
-            await interaction.followup.send("❌ Failed to connect to the music library. Please try again later.", ephemeral=True)
+                    if not selected_track:
+                        await interaction.followup.send("❌ Invalid selection. Please try again.", ephemeral=True)
+                        return
+                
+                # create confirmation view
+                confirm_view = self.ConfirmRequestView(
+                    track_title=selected_track['title'],
+                    track_id=selected_track['id']
+                )
+                
+                # send confirmation message
+                await interaction.followup.send(
+                    f"Confirm request for: **{selected_track['title']}**",
+                    view=confirm_view,
+                    ephemeral=True
+                )
+                
+                # wait for confirmation
+                await confirm_view.wait()
+                
+                if confirm_view.confirmed:
+                    # queue the request; the broker sends it to radioboss in its turn
+                    result = await request_broker.submit(
+                        selected_track['id'], selected_track['title'], interaction.user.id, interaction.guild_id
+                    )
+                    await interaction.followup.send(
+                        self._request_message(selected_track['title'], result),
+                        ephemeral=True
+                    )
+                
+            except asyncio.TimeoutError:
+                await interaction.followup.send("⏱️ Timed out. Please try your request again.", ephemeral=True)
+            except Exception as e:
+                logger.error(f"Error in song request: {e}", exc_info=True)
+                await interaction.followup.send("❌ An error occurred while processing your request. Please try again.", ephemeral=True)
             
         except Exception as e:
             logger.error(f"Unexpected error in request_song: {e}", exc_info=True)
@@ -362,6 +332,78 @@ class RadioBossCog(commands.Cog):
             )
             await interaction.followup.send(embed=error_embed, ephemeral=True)
 
+    @staticmethod
+    def _request_message(title: str, result: RequestResult) -> str:
+        """the reply to a confirmed request."""
+        minutes = max(1, round(result.wait / 60))
+        if result.status == QUEUED:
+            when = "now" if result.wait < 1 else f"in about {minutes} min"
+            return (
+                f"Your song '{title}' is #{result.position} in the request queue and goes to the station {when}. "
+                "Use `/join` to listen in a voice channel!"
+            )
+        if result.status == DUPLICATE:
+            return f"'{title}' is already in the request queue at #{result.position}, your request has been added to it."
+        if result.status == ALREADY_SENT:
+            return f"'{title}' was requested a moment ago and should play soon."
+        if result.status == FULL:
+            return "❌ The request queue is full right now. Please try again in a few minutes."
+        return f"⏱️ You're requesting songs faster than the station can play them. Try again in {minutes} min."
+
+    async def _find_tracks(self, song_name: str) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """find tracks for /request, returning (tracks or None on error, picked from autocomplete)."""
+        if song_name.startswith(AUTOCOMPLETE_PREFIX):
+            track = library_index.get(song_name[len(AUTOCOMPLETE_PREFIX):])
+            if track:
+                return [track], True
+        
+        # the local index answers in milliseconds; radioboss is asked when it's stale or unsure
+        tracks = await library_index.find(song_name)
+        return (tracks[:25] if tracks is not None else None), False
+
+    @request_song.autocomplete('song_name')
+    async def song_name_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        """suggest library tracks while the user types."""
+        if len(current.strip()) < 2:
+            return []
+        tracks = library_index.search(current, limit=25, allow_stale=True)
+        return [
+            app_commands.Choice(name=track['title'][:100] or track['id'], value=f"{AUTOCOMPLETE_PREFIX}{track['id']}")
+            for track in tracks
+        ]
+
+    @app_commands.command(
+        name="radioboss-stats",
+        description="show radioboss circuit breaker state and upstream latency"
+    )
+    @is_bot_admin()
+    async def radioboss_stats(self, interaction: discord.Interaction) -> None:
+        """handle the /radioboss-stats slash command."""
+        embed = discord.Embed(title="📊 RadioBoss Upstreams", color=0x2f3136)
+        for name, breaker in sorted(breakers.stats().items())[:24]:
+            embed.add_field(name=name, value=breaker.summary(), inline=False)
+        if not embed.fields:
+            embed.description = "No radioboss requests yet."
+        queued = ', '.join(f"{key} {len(queue)}" for key, queue in request_broker.queues.items()) or 'empty'
+        embed.add_field(
+            name="Song request queue",
+            value=f"{queued}; {request_broker.stats.summary()}",
+            inline=False
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @tasks.loop(minutes=LIBRARY_SYNC_INTERVAL_MINUTES)
+    async def sync_library(self) -> None:
+        """keep the local library index up to date."""
+        try:
+            await library_index.sync()
+        except Exception as e:
+            logger.error(f"error syncing song library: {e}", exc_info=True)
+
+    @sync_library.before_loop
+    async def before_sync_library(self) -> None:
+        await self.bot.wait_until_ready()
+
 async def setup(bot: commands.Bot) -> None:
     """add the radioboss cog to the bot."""
     await bot.add_cog(RadioBossCog(bot))
@@ -0,0 +1,403 @@
+"""
+song request queue per station.
+
+/request used to call radioboss's songrequestmake straight away for every confirmed
+request, so ten listeners asking for the same track sent it ten times, and one user
+could send as many as they liked. `RequestBroker` sits in between:
+
+- confirmed requests go into a queue per station, persisted in the bot database so
+  a restart doesn't lose them, and the user gets their place in the queue at once;
+- a track that's already queued, or was sent in the last `REQUEST_DEDUP_MINUTES`, is
+  folded into the earlier request instead of being queued again;
+- users and guilds each have a token bucket (`REQUEST_USER_*`, `REQUEST_GUILD_*`);
+- one worker per station sends the head of the queue to radioboss every
+  `REQUEST_SUBMIT_INTERVAL_SECONDS`. a send that fails stays at the head and is
+  tried again on the next slot, up to `REQUEST_MAX_ATTEMPTS`. a send held back by an
+  open circuit breaker waits for the breaker and doesn't count as an attempt.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import aiohttp
+
+from modules.database.database import db
+from modules.radioboss.now_playing import station_endpoint
+from utils.circuit_breaker import CircuitOpenError, breakers
+from utils.http_client import http_client
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SUBMIT_INTERVAL_SECONDS = getattr(_config, 'REQUEST_SUBMIT_INTERVAL_SECONDS', 30)
+REQUEST_DEDUP_MINUTES = getattr(_config, 'REQUEST_DEDUP_MINUTES', 30)
+REQUEST_USER_BURST = getattr(_config, 'REQUEST_USER_BURST', 3)
+REQUEST_USER_PER_HOUR = getattr(_config, 'REQUEST_USER_PER_HOUR', 6)
+REQUEST_GUILD_BURST = getattr(_config, 'REQUEST_GUILD_BURST', 10)
+REQUEST_GUILD_PER_HOUR = getattr(_config, 'REQUEST_GUILD_PER_HOUR', 40)
+REQUEST_MAX_ATTEMPTS = getattr(_config, 'REQUEST_MAX_ATTEMPTS', 5)
+REQUEST_QUEUE_MAX = getattr(_config, 'REQUEST_QUEUE_MAX', 50)
+
+QUEUED, DUPLICATE, ALREADY_SENT, RATE_LIMITED, FULL = 'queued', 'duplicate', 'already_sent', 'rate_limited', 'full'
+
+Sender = Callable[[str, str], Awaitable[bool]]
+
+
+@dataclass
+class SongRequest:
+    """one queued (or recently sent) request, with everyone who asked for the track."""
+    id: int
+    station: str
+    track_id: str
+    title: str
+    user_id: int
+    guild_id: Optional[int]
+    requested_at: float
+    requesters: int = 1
+    attempts: int = 0
+    sent_at: Optional[float] = None
+
+
+@dataclass
+class RequestResult:
+    """what happened to a submitted request, for the reply to the user."""
+    status: str
+    request: Optional[SongRequest] = None
+    position: int = 0
+    # seconds until the request is sent to radioboss (queued) or until the user may ask again (rate limited)
+    wait: float = 0.0
+
+    @property
+    def accepted(self) -> bool:
+        return self.status in (QUEUED, DUPLICATE, ALREADY_SENT)
+
+
+@dataclass
+class BrokerStats:
+    """counters across all stations."""
+    queued: int = 0
+    coalesced: int = 0
+    rate_limited: int = 0
+    rejected_full: int = 0
+    sent: int = 0
+    send_errors: int = 0
+    failed: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.queued} queued, {self.coalesced} folded into earlier requests, "
+            f"{self.rate_limited} rate limited, {self.rejected_full} queue full, "
+            f"{self.sent} sent, {self.send_errors} send errors, {self.failed} given up"
+        )
+
+
+class TokenBucket:
+    """non-blocking token bucket: `capacity` requests at once, refilled at `per_hour`."""
+
+    def __init__(self, capacity: float, per_hour: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.rate = per_hour / 3600
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def wait(self) -> float:
+        """seconds until a token is available, 0 if one is now."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+async def submit_to_radioboss(station_key: str, track_id: str) -> bool:
+    """send one request to the station's songrequestmake endpoint."""
+    station = getattr(_config, 'STATIONS', {}).get(station_key)
+    if station is None:
+        logger.error(f"no station configured for {station_key!r}")
+        return False
+    host, station_id = station_endpoint(station)
+    url = f"https://{host}/w/songrequestmake"
+    headers = {'Accept': '*/*', 'Referer': f'https://{host}/', 'Origin': f'https://{host}'}
+    params = {'u': station_id, 'id': track_id, '_': ''}
+
+    async def send(timeout: float) -> bool:
+        async with http_client.get(
+            url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            # 5xx and 429 count against the breaker
+            if response.status >= 500 or response.status == 429:
+                response.raise_for_status()
+            if response.status != 200:
+                logger.error(f"song request for {track_id} on {station_key} failed ({response.status}): "
+                             f"{(await response.text())[:200]}")
+            return response.status == 200
+
+    # asking twice could queue the song twice, so no retries
+    return await breakers.call(host, 'songrequestmake', send, retry=False)
+
+
+class RequestBroker:
+    """queues, dedups and rate limits song requests, and paces them out to radioboss."""
+
+    def __init__(
+        self,
+        sender: Sender = submit_to_radioboss,
+        interval: float = REQUEST_SUBMIT_INTERVAL_SECONDS,
+        dedup_for: float = REQUEST_DEDUP_MINUTES * 60
+    ):
+        self.sender = sender
+        self.interval = interval
+        self.dedup_for = dedup_for
+        self.stats = BrokerStats()
+        self.queues: Dict[str, Deque[SongRequest]] = {}
+        # (station, track id) -> the request that was sent, while it still counts as recent
+        self._recent: Dict[Tuple[str, str], SongRequest] = {}
+        self._user_buckets: Dict[int, TokenBucket] = {}
+        self._guild_buckets: Dict[int, TokenBucket] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._next_send: Dict[str, float] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._table_ready = False
+
+    def _ensure_tables(self) -> None:
+        if self._table_ready:
+            return
+        db.execute_query("""
+            CREATE TABLE IF NOT EXISTS song_requests (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                station TEXT NOT NULL,
+                track_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                guild_id INTEGER,
+                requested_at REAL NOT NULL, -- unix time
+                requesters INTEGER NOT NULL DEFAULT 1, -- users whose requests were folded into this one
+                attempts INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'queued', -- queued, sent or failed
+                sent_at REAL
+            )
+        """, commit=True)
+        db.execute_query(
+            "CREATE INDEX IF NOT EXISTS idx_song_requests_status ON song_requests(status, station)",
+            commit=True
+        )
+        self._table_ready = True
+
+    def queue(self, station_key: str) -> Deque[SongRequest]:
+        queue = self.queues.get(station_key)
+        if queue is None:
+            queue = self.queues[station_key] = deque()
+        return queue
+
+    async def load(self) -> None:
+        """restore queued and recently sent requests from the database and start sending."""
+        self._ensure_tables()
+        rows = await db.fetch(
+            "SELECT * FROM song_requests WHERE status = 'queued' OR (status = 'sent' AND sent_at >= ?) ORDER BY id",
+            (time.time() - self.dedup_for,)
+        )
+        for row in rows:
+            request = SongRequest(
+                row['id'], row['station'], row['track_id'], row['title'], row['user_id'], row['guild_id'],
+                row['requested_at'], row['requesters'], row['attempts'], row['sent_at']
+            )
+            if row['status'] == 'queued':
+                self.queue(request.station).append(request)
+            else:
+                self._recent[(request.station, request.track_id)] = request
+        for station_key, queue in self.queues.items():
+            if queue:
+                self._wake(station_key)
+        logger.info(f"loaded {sum(len(q) for q in self.queues.values())} queued song requests")
+
+    def stop(self) -> None:
+        for task in self._workers.values():
+            task.cancel()
+        self._workers.clear()
+
+    def position(self, station_key: str, index: int) -> Tuple[int, float]:
+        """(1-based place, seconds until sent) for the request at index in the station's queue."""
+        now = time.monotonic()
+        next_send = max(now, self._next_send.get(station_key, now))
+        return index + 1, next_send - now + index * self.interval
+
+    async def submit(
+        self,
+        track_id: str,
+        title: str,
+        user_id: int,
+        guild_id: Optional[int] = None,
+        station_key: Optional[str] = None
+    ) -> RequestResult:
+        """queue a request, returning its place in the queue without waiting on radioboss."""
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        track_id = str(track_id)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._ensure_tables()
+            queue = self.queue(station_key)
+
+            # someone already asked for it: fold this request into theirs, it costs nothing upstream
+            for index, queued in enumerate(queue):
+                if queued.track_id == track_id:
+                    return await self._coalesce(queued, DUPLICATE, *self.position(station_key, index))
+            sent = self._recent.get((station_key, track_id))
+            if sent is not None:
+                if time.time() - sent.sent_at < self.dedup_for:
+                    return await self._coalesce(sent, ALREADY_SENT, 0, 0.0)
+                del self._recent[(station_key, track_id)]
+
+            wait = self._rate_limit(user_id, guild_id)
+            if wait:
+                self.stats.rate_limited += 1
+                return RequestResult(RATE_LIMITED, wait=wait)
+            if len(queue) >= REQUEST_QUEUE_MAX:
+                self.stats.rejected_full += 1
+                return RequestResult(FULL)
+
+            requested_at = time.time()
+            request_id = await db.execute(
+                """
+                INSERT INTO song_requests (station, track_id, title, user_id, guild_id, requested_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (station_key, track_id, title, user_id, guild_id, requested_at)
+            )
+            request = SongRequest(request_id, station_key, track_id, title, user_id, guild_id, requested_at)
+            queue.append(request)
+            self.stats.queued += 1
+            self._wake(station_key)
+            return RequestResult(QUEUED, request, *self.position(station_key, len(queue) - 1))
+
+    async def _coalesce(self, request: SongRequest, status: str, position: int, wait: float) -> RequestResult:
+        request.requesters += 1
+        self.stats.coalesced += 1
+        await db.queue_write(
+            "UPDATE song_requests SET requesters = ? WHERE id = ?", (request.requesters, request.id)
+        )
+        return RequestResult(status, request, position, wait)
+
+    def _prune_recent(self, now: float) -> None:
+        """forget sent requests that no longer count as recent."""
+        for key in [key for key, sent in self._recent.items() if now - sent.sent_at >= self.dedup_for]:
+            del self._recent[key]
+
+    def _rate_limit(self, user_id: int, guild_id: Optional[int]) -> float:
+        """take a token from the user's and the guild's buckets, or return how long to wait."""
+        buckets = [self._bucket(self._user_buckets, user_id, REQUEST_USER_BURST, REQUEST_USER_PER_HOUR)]
+        if guild_id is not None:
+            buckets.append(self._bucket(self._guild_buckets, guild_id, REQUEST_GUILD_BURST, REQUEST_GUILD_PER_HOUR))
+        wait = max(bucket.wait() for bucket in buckets)
+        if not wait:
+            for bucket in buckets:
+                bucket.take()
+        return wait
+
+    @staticmethod
+    def _bucket(buckets: Dict[int, TokenBucket], key: int, capacity: float, per_hour: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) > 1024:
+                # a full bucket is the same as a new one, so there's no need to keep it
+                for stale in [k for k, b in buckets.items() if b.full]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(capacity, per_hour)
+        return bucket
+
+    def _wake(self, station_key: str) -> None:
+        event = self._wakeups.get(station_key)
+        if event is None:
+            event = self._wakeups[station_key] = asyncio.Event()
+        event.set()
+        worker = self._workers.get(station_key)
+        if worker is None or worker.done():
+            self._workers[station_key] = asyncio.create_task(self._run(station_key))
+
+    async def _run(self, station_key: str) -> None:
+        """send the station's queue to radioboss, one request per interval."""
+        queue = self.queue(station_key)
+        wakeup = self._wakeups[station_key]
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            delay = self._next_send.get(station_key, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                await self._send_next(station_key, queue)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a database error here must not end the worker, or the queue would never drain
+                logger.error(f"error in song request worker for {station_key}: {e}", exc_info=True)
+                self._next_send[station_key] = time.monotonic() + self.interval
+
+    async def _send_next(self, station_key: str, queue: Deque[SongRequest]) -> None:
+        """send the request at the front of the queue and record the outcome."""
+        request = queue[0]
+        try:
+            ok = await self.sender(station_key, request.track_id)
+        except CircuitOpenError as e:
+            # radioboss wasn't asked, so this isn't a failed attempt: wait for the breaker and try again
+            logger.info(f"song request {request.id} held back: {e}")
+            self._next_send[station_key] = time.monotonic() + max(e.retry_in, 1.0)
+            return
+        except Exception as e:
+            logger.error(f"error sending song request {request.id}: {e}")
+            ok = False
+        self._next_send[station_key] = time.monotonic() + self.interval
+
+        if ok:
+            queue.popleft()
+            request.sent_at = time.time()
+            self._prune_recent(request.sent_at)
+            self._recent[(station_key, request.track_id)] = request
+            self.stats.sent += 1
+            await db.execute(
+                "UPDATE song_requests SET status = 'sent', sent_at = ?, attempts = ? WHERE id = ?",
+                (request.sent_at, request.attempts + 1, request.id)
+            )
+            logger.info(f"sent song request {request.id} ({request.title}) for {request.requesters} listeners")
+            return
+
+        self.stats.send_errors += 1
+        request.attempts += 1
+        if request.attempts >= REQUEST_MAX_ATTEMPTS:
+            queue.popleft()
+            self.stats.failed += 1
+            status = 'failed'
+            logger.error(f"gave up on song request {request.id} after {request.attempts} attempts")
+        else:
+            status = 'queued'
+        await db.execute(
+            "UPDATE song_requests SET status = ?, attempts = ? WHERE id = ?",
+            (status, request.attempts, request.id)
+        )
+
+
+# create a global instance for easy import
+request_broker = RequestBroker()
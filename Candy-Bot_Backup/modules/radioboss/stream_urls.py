@@ -0,0 +1,182 @@
+"""
+working stream url for each station.
+
+a station can be reached on several urls: the one in config.STATIONS, any listed
+under the station's 'fallback_urls', and, for radioboss cloud mounts, the same
+four url types the radioboss stream info lists (ssl, port443, http, port80).
+instead of trying them one after another with a timeout each, `StreamURLProber`
+races them happy-eyeballs style: candidates start `STREAM_URL_STAGGER_MS` apart
+(sooner when one fails) and the first to answer with an audio stream wins. the
+rest are cancelled.
+
+the winner is cached per station for `STREAM_URL_CACHE_SECONDS`. a url that fails
+is backed off (doubling up to `STREAM_URL_BACKOFF_MAX_SECONDS`) and left out of
+later races until its back-off runs out. used by /join and by info commands that
+show a listen link.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from modules.radioboss.now_playing import station_endpoint
+from utils.http_client import HTTPClient, http_client
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+STREAM_URL_CACHE_SECONDS = getattr(_config, 'STREAM_URL_CACHE_SECONDS', 600)
+STREAM_URL_TIMEOUT_SECONDS = getattr(_config, 'STREAM_URL_TIMEOUT_SECONDS', 4)
+STREAM_URL_STAGGER_MS = getattr(_config, 'STREAM_URL_STAGGER_MS', 250)
+STREAM_URL_BACKOFF_MAX_SECONDS = getattr(_config, 'STREAM_URL_BACKOFF_MAX_SECONDS', 600)
+
+AUDIO_CONTENT_TYPES = ('audio/', 'application/ogg', 'application/octet-stream')
+
+
+def candidate_urls(station: Dict) -> List[str]:
+    """every url a station might be reachable on, in order of preference."""
+    urls = [station['url'], *station.get('fallback_urls', [])]
+    parsed = urlparse(station['url'])
+    if parsed.hostname and parsed.hostname.endswith('radioboss.fm') and parsed.port:
+        host, station_id = station_endpoint(station)
+        urls += [
+            f"https://{host}/stream/{station_id}",
+            f"http://{host}:{parsed.port}{parsed.path}",
+            f"http://{host}/stream/{station_id}",
+        ]
+    # keep the order, drop repeats
+    return list(dict.fromkeys(urls))
+
+
+def is_audio_response(response: aiohttp.ClientResponse) -> bool:
+    """true for a 200 that looks like an audio stream (content type or icecast/shoutcast headers)."""
+    if response.status != 200:
+        return False
+    content_type = response.headers.get('Content-Type', '').lower()
+    if content_type.startswith(AUDIO_CONTENT_TYPES):
+        return True
+    return any(name.lower().startswith('icy-') for name in response.headers)
+
+
+class StreamURLProber:
+    """races a station's candidate urls and caches the first working one."""
+
+    def __init__(
+        self,
+        client: HTTPClient = http_client,
+        timeout: float = STREAM_URL_TIMEOUT_SECONDS,
+        stagger: float = STREAM_URL_STAGGER_MS / 1000,
+        ttl: float = STREAM_URL_CACHE_SECONDS,
+        backoff_max: float = STREAM_URL_BACKOFF_MAX_SECONDS,
+        stations: Optional[Dict[str, Dict]] = None
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.stagger = stagger
+        self.ttl = ttl
+        self.backoff_max = backoff_max
+        self.stations = stations if stations is not None else getattr(_config, 'STATIONS', {})
+        # station key -> (url, when it won)
+        self._winners: Dict[str, Tuple[str, float]] = {}
+        # url -> (failures in a row, retry after)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def cached(self, station_key: str) -> Optional[str]:
+        winner = self._winners.get(station_key)
+        if winner is not None and time.monotonic() - winner[1] < self.ttl:
+            return winner[0]
+        return None
+
+    async def resolve(self, station_key: Optional[str] = None) -> Optional[str]:
+        """a working stream url for the station (default station if omitted).
+
+        falls back to the configured url when nothing answers, so callers always
+        have something to try. None only for an unknown station.
+        """
+        station_key = station_key or getattr(_config, 'DEFAULT_STATION', None)
+        station = self.stations.get(station_key)
+        if station is None:
+            return None
+        url = self.cached(station_key)
+        if url is not None:
+            return url
+        task = self._inflight.get(station_key)
+        if task is None:
+            task = self._inflight[station_key] = asyncio.create_task(self._race(station_key, station))
+            task.add_done_callback(lambda _: self._inflight.pop(station_key, None))
+        return await asyncio.shield(task) or station['url']
+
+    def mark_failed(self, station_key: str, url: str) -> None:
+        """report a url that didn't play, so the next resolve races the others."""
+        winner = self._winners.get(station_key)
+        if winner is not None and winner[0] == url:
+            del self._winners[station_key]
+        self._failed(url)
+
+    def _failed(self, url: str) -> None:
+        failures = self._failures.get(url, (0, 0.0))[0] + 1
+        backoff = min(self.backoff_max, self.timeout * 2 ** failures)
+        self._failures[url] = (failures, time.monotonic() + backoff)
+
+    def _candidates(self, station: Dict) -> List[str]:
+        urls = candidate_urls(station)
+        now = time.monotonic()
+        ready = [url for url in urls if self._failures.get(url, (0, 0.0))[1] <= now]
+        # when everything is backed off, try everything rather than nothing
+        return ready or urls
+
+    async def _check(self, url: str) -> bool:
+        try:
+            async with self.client.get(
+                url,
+                headers={'Accept': '*/*', 'Icy-MetaData': '0'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                ok = is_audio_response(response) and bool(await response.content.readany())
+                # a live stream never ends, so don't leave the connection for the pool
+                response.close()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"stream url {url} failed: {e}")
+            ok = False
+        if ok:
+            self._failures.pop(url, None)
+        else:
+            self._failed(url)
+        return ok
+
+    async def _race(self, station_key: str, station: Dict) -> Optional[str]:
+        started = time.monotonic()
+        remaining = self._candidates(station)
+        pending = {}
+        try:
+            while remaining or pending:
+                if remaining:
+                    url = remaining.pop(0)
+                    pending[asyncio.create_task(self._check(url))] = url
+                # the next candidate starts after the stagger, or as soon as one fails
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.stagger if remaining else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    url = pending.pop(task)
+                    if task.result():
+                        self._winners[station_key] = (url, time.monotonic())
+                        logger.info(f"{station_key} streams from {url} ({(time.monotonic() - started) * 1000:.0f}ms)")
+                        return url
+        finally:
+            for task in pending:
+                task.cancel()
+        logger.warning(f"no stream url answered for {station_key}")
+        return None
+
+
+# create a global instance for easy import
+stream_urls = StreamURLProber()
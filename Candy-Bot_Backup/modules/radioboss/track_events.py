@@ -0,0 +1,207 @@
+"""
+track change events for every configured station.
+
+one `TrackPoller` per station watches radioboss through the station's now playing
+service and publishes a `TrackChange` on the bot's event bus (`TRACK_CHANGED`) only
+when the playing track actually changes. subscribers (bot presence, voice control
+panels, pinned now playing embeds) react to the event instead of asking radioboss
+themselves, so one upstream request serves every guild.
+
+the poll interval adapts to the track: while a track has plenty of time left the
+poller sleeps until shortly before it should end, then polls quickly until the
+change shows up.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from modules.radioboss.now_playing import NowPlayingService, now_playing
+from utils.event_bus import EventBus, event_bus
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+TRACK_CHANGED = 'track_changed'
+
+TRACK_POLL_MIN_SECONDS = getattr(_config, 'TRACK_POLL_MIN_SECONDS', 5)
+TRACK_POLL_MAX_SECONDS = getattr(_config, 'TRACK_POLL_MAX_SECONDS', 60)
+TRACK_POLL_DEFAULT_SECONDS = getattr(_config, 'TRACK_POLL_DEFAULT_SECONDS', 20)
+TRACK_POLL_END_LEAD_SECONDS = getattr(_config, 'TRACK_POLL_END_LEAD_SECONDS', 10)
+
+
+def parse_duration(duration: Any) -> Optional[float]:
+    """seconds from a radioboss 'MM:SS' or 'H:MM:SS' duration, or None."""
+    try:
+        seconds = 0.0
+        for part in str(duration).split(':'):
+            seconds = seconds * 60 + float(part)
+    except (TypeError, ValueError):
+        return None
+    return seconds if seconds > 0 else None
+
+
+@dataclass
+class TrackChange:
+    """a track that started playing on a station."""
+    station_key: str
+    artist: str
+    title: str
+    duration: Optional[float] = None
+    artwork: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict, repr=False)
+    detected_at: float = field(default_factory=time.time)
+    previous: Optional['TrackChange'] = field(default=None, repr=False)
+
+    @property
+    def key(self) -> tuple:
+        """what makes two polls the same track."""
+        return self.artist, self.title, self.duration
+
+    @property
+    def display(self) -> str:
+        return f"{self.artist} - {self.title}" if self.artist else self.title
+
+    @classmethod
+    def from_data(cls, station_key: str, data: Optional[Dict[str, Any]]) -> Optional['TrackChange']:
+        if not data:
+            return None
+        attributes = (data.get('currenttrack_info') or {}).get('@attributes') or {}
+        artist = attributes.get('ARTIST', '').strip()
+        title = attributes.get('TITLE', '').strip()
+        if not title:
+            # older responses only carry a 'nowplaying' string
+            title = str(data.get('nowplaying') or '').strip()
+        if not title and not artist:
+            return None
+        return cls(
+            station_key=station_key,
+            artist=artist,
+            title=title or 'Unknown Track',
+            duration=parse_duration(attributes.get('DURATION')),
+            artwork=(data.get('links') or {}).get('artwork'),
+            data=data
+        )
+
+
+class TrackPoller:
+    """polls one station and publishes a TRACK_CHANGED event when the track changes."""
+
+    def __init__(
+        self,
+        station_key: str,
+        service: NowPlayingService,
+        bus: EventBus = event_bus,
+        min_interval: float = TRACK_POLL_MIN_SECONDS,
+        max_interval: float = TRACK_POLL_MAX_SECONDS,
+        default_interval: float = TRACK_POLL_DEFAULT_SECONDS,
+        end_lead: float = TRACK_POLL_END_LEAD_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep
+    ):
+        self.station_key = station_key
+        self.service = service
+        self.bus = bus
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.end_lead = end_lead
+        self.clock = clock
+        self.sleep = sleep
+        self.current: Optional[TrackChange] = None
+        self.polls = 0
+        self.changes = 0
+        # when the current track was first seen, and whether that was close to its real start
+        self._seen_at = 0.0
+        self._start_known = False
+
+    async def poll_once(self) -> float:
+        """check the station once. returns how long to wait before the next check."""
+        # a lookup made by a command moments ago is as good as a new request
+        data = await self.service.fresh(self.min_interval)
+        self.polls += 1
+        now = self.clock()
+        track = TrackChange.from_data(self.station_key, data)
+        if track is None:
+            return self.default_interval
+
+        if self.current is None or track.key != self.current.key:
+            if self.current is not None:
+                track.previous = self.current
+                self.current.previous = None
+            # the first track seen after startup was already partway through
+            self._start_known = self.current is not None
+            self.current = track
+            self._seen_at = now
+            self.changes += 1
+            logger.info(f"{self.station_key} now playing: {track.display}")
+            self.bus.publish(TRACK_CHANGED, track)
+        return self.next_delay(now)
+
+    def next_delay(self, now: float) -> float:
+        track = self.current
+        if track is None or track.duration is None or not self._start_known:
+            return self.default_interval
+        remaining = self._seen_at + track.duration - now
+        if remaining > self.end_lead:
+            return max(self.min_interval, min(self.max_interval, remaining - self.end_lead))
+        if -remaining > track.duration:
+            # long past its length (a live set, or a wrong duration), stop polling hard
+            return self.default_interval
+        return self.min_interval
+
+    async def run(self) -> None:
+        while True:
+            try:
+                delay = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"error polling now playing for {self.station_key}: {e}", exc_info=True)
+                delay = self.default_interval
+            await self.sleep(delay)
+
+
+class TrackEvents:
+    """a track poller for every configured station."""
+
+    def __init__(self, bus: EventBus = event_bus):
+        self.bus = bus
+        self.pollers: Dict[str, TrackPoller] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self) -> None:
+        """start polling every station in config.STATIONS. safe to call again on reconnect."""
+        for station_key in getattr(_config, 'STATIONS', {}):
+            task = self._tasks.get(station_key)
+            if task is not None and not task.done():
+                continue
+            poller = self.pollers.get(station_key)
+            if poller is None:
+                service = now_playing.service(station_key)
+                if service is None:
+                    continue
+                poller = self.pollers[station_key] = TrackPoller(station_key, service, self.bus)
+            self._tasks[station_key] = asyncio.create_task(poller.run())
+        logger.info(f"watching track changes on {len(self._tasks)} stations")
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def current(self, station_key: Optional[str] = None) -> Optional[TrackChange]:
+        """the last track seen on a station (default station if omitted)."""
+        poller = self.pollers.get(station_key or getattr(_config, 'DEFAULT_STATION', None))
+        return poller.current if poller else None
+
+
+# create a global instance for easy import
+track_events = TrackEvents()
@@ -5,12 +5,13 @@ cog for handling song requests.
 import asyncio
 import logging
 from typing import Dict, List, Optional
-import aiohttp
 import discord
 from discord import app_commands, ui
 from discord.ext import commands
 
 import config as config_module
+from modules.radioboss.library_index import library_index
+from modules.radioboss.request_broker import request_broker
 
 logger = logging.getLogger(__name__)
 
@@ -80,89 +81,18 @@ class RequestCog(commands.Cog):
     
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
         logger.info("Request cog initialized")
     
     async def search_songs(self, query: str) -> List[Dict]:
-        """search for songs using the RadioBoss API."""
-        url = "https://c4.radioboss.fm/w/songrequestsearch"
-        params = {
-            "u": 560,  # station ID
-            "q": query,
-            "_": ""  # cache buster
-        }
-        
-        # set headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Referer': 'https://c4.radioboss.fm/',
-            'Origin': 'https://c4.radioboss.fm',
-            'DNT': '1',
-            'Connection': 'keep-alive'
-        }
-        
-        try:
-            async with self.session.get(url, params=params, headers=headers) as response:
-                # get the response text first
-                response_text = await response.text()
-                
-                # log the response for debugging
-                logger.debug(f"Search response status: {response.status}")
-                logger.debug(f"Response content type: {response.headers.get('Content-Type')}")
-                logger.debug(f"Response text: {response_text[:500]}...")
-                
-                # try to parse as JSON
-                try:
-                    import json
-                    data = json.loads(response_text)
-                    
-                    # handle different response formats
-                    if isinstance(data, list):
-                        return data  # already a list of tracks
-                    elif isinstance(data, dict):
-                        if 'tracks' in data and isinstance(data['tracks'], list):
-                            return data['tracks']
-                        elif 'error' in data and data['error'] is False:
-                            return data.get('tracks', [])
-                    
-                    # if we get here, the format is unexpected
-                    logger.warning(f"Unexpected JSON format in response: {data}")
-                    return []
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON response: {e}")
-                    logger.debug(f"Response text that failed to parse: {response_text[:500]}...")
-                    return []
-                    
-        except aiohttp.ClientError as e:
-            logger.error(f"Error making request to RadioBoss API: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Error searching for songs: {e}")
-            return []
+        """search for songs in the default station's library, asking RadioBoss when the local index can't answer."""
+        return await library_index.find(query) or []
     
-    async def request_song(self, track_id: int) -> bool:
-        """request a song using the RadioBoss API."""
-        url = "https://c4.radioboss.fm/w/songrequestmake"
-        params = {
-            "u": 560,  # station ID
-            "id": track_id,
-            "_": ""  # cache buster
-        }
-        
-        try:
-            async with self.session.get(url, params=params) as response:
-                data = await response.json()
-                return data.get('success', False)
-        except Exception as e:
-            logger.error(f"Error requesting song: {e}")
-            return False
-    
-    def cog_unload(self):
-        """clean up when the cog is unloaded."""
-        asyncio.create_task(self.session.close())
+    async def request_song(self, track_id: int, user_id: int = 0, guild_id: Optional[int] = None) -> bool:
+        """queue a song request, it's sent to RadioBoss by the request broker."""
+        track = library_index.get(str(track_id))
+        title = track['title'] if track else str(track_id)
+        result = await request_broker.submit(track_id, title, user_id, guild_id)
+        return result.accepted
 
 async def setup(bot: commands.Bot):
     """set up the request cog."""
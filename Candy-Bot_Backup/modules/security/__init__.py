@@ -11,6 +11,7 @@ from .anti_raid_cog import setup as setup_anti_raid
 from .raid_commands import setup as setup_raid_commands
 from .bot_security import setup as setup_bot_security
 from .admin_action_tracker import AdminActionCog
+from .settings import settings_cache
 
 class Security(commands.Cog):
     """main security cog that loads all security components."""
@@ -21,6 +22,9 @@ class Security(commands.Cog):
 
     async def setup_hook(self):
         """set up all security components when the cog is loaded."""
+        # load per-guild security settings before any events are handled
+        await settings_cache.warm()
+        
         # set up all security components
         await setup_security_events(self.bot)
         await setup_admin_security(self.bot)
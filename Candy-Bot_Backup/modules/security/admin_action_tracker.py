@@ -13,6 +13,7 @@ import asyncio
 
 from modules.database import db
 from modules.security.settings import AdminSecuritySettings
+from utils.expiry_service import expiry_service, to_timestamp
 
 logger = logging.getLogger('discord.security.admin_tracker')
 
@@ -29,9 +30,8 @@ class AdminActionTracker:
         self.quarantined_users: Set[Tuple[int, int]] = set()  # (guild_id, user_id)
         # track temporary admin assignments: (guild_id, user_id) -> expiry_time
         self.temporary_admins: Dict[Tuple[int, int], datetime] = {}
-        # start background tasks
-        self.bot.loop.create_task(self._check_temporary_admins())
-        self.bot.loop.create_task(self._check_expired_quarantines())
+        # hand quarantine and temporary admin expiries to the shared scheduler
+        self.bot.loop.create_task(self._register_expiries())
         
     async def _ensure_guild_exists(self, guild_id: int):
         """ensure the guild exists in the guilds table."""
@@ -43,20 +43,18 @@ class AdminActionTracker:
                 return False
                 
             # check if guild exists in database
-            existing_guild = db.execute_query(
+            existing_guild = await db.fetch(
                 "SELECT 1 FROM guilds WHERE guild_id = ?",
-                (guild_id,),
-                fetch=True
+                (guild_id,)
             )
             
             if not existing_guild:
                 # insert guild if it doesn't exist
-                db.execute_query(
+                await db.execute(
                     """INSERT OR IGNORE INTO guilds 
                        (guild_id, owner_id, admin_role_id, event_channel_id)
                        VALUES (?, ?, NULL, NULL)""",
-                    (guild_id, guild.owner_id),
-                    commit=True
+                    (guild_id, guild.owner_id)
                 )
                 self.logger.info(f"Added guild {guild_id} to database")
                 
@@ -70,20 +68,18 @@ class AdminActionTracker:
         """ensure the user exists in the users table."""
         try:
             # check if user exists
-            existing_user = db.execute_query(
+            existing_user = await db.fetch(
                 "SELECT 1 FROM users WHERE user_id = ?",
-                (user_id,),
-                fetch=True
+                (user_id,)
             )
             
             if not existing_user:
                 # insert user if they don't exist
-                db.execute_query(
+                await db.execute(
                     """INSERT OR IGNORE INTO users 
                        (user_id, timezone)
                        VALUES (?, 'UTC')""",
-                    (user_id,),
-                    commit=True
+                    (user_id,)
                 )
                 self.logger.info(f"Added user {user_id} to database")
                 
@@ -115,16 +111,15 @@ class AdminActionTracker:
                 self.logger.error(f"Failed to ensure user {user_id} exists in database")
                 return
             
-            # log to database with error handling for foreign key constraints
-            db.execute_query(
+            # queued so a burst of actions is committed as one batch
+            await db.queue_write(
                 """
                 INSERT INTO admin_action_logs 
                 (guild_id, user_id, action, target_id, timestamp, details)
                 VALUES (?, ?, ?, ?, datetime('now'), ?)
                 """,
                 (guild_id, user_id, action_type, target_id, 
-                 json.dumps(kwargs.get('details', {})) if kwargs.get('details') else None),
-                commit=True
+                 json.dumps(kwargs.get('details', {})) if kwargs.get('details') else None)
             )
         except Exception as e:
             self.logger.error(f"Error logging admin action: {str(e)}", exc_info=True)
@@ -214,93 +209,94 @@ class AdminActionTracker:
         except Exception as e:
             self.logger.error(f"Error in _notify_owner: {str(e)}", exc_info=True)
         
-    async def _check_expired_quarantines(self):
-        """background task to check for and automatically unquarantine users when their quarantine expires."""
-        while not self.bot.is_closed():
-            try:
-                now = datetime.utcnow()
-                
-                # find users with expired quarantines
-                expired_quarantines = db.execute_query(
-                    """
-                    SELECT guild_id, user_id 
-                    FROM admin_quarantine 
-                    WHERE is_active = 1 
-                    AND quarantined_until < ?
-                    """,
-                    (now.isoformat(),),
-                    fetch=True
-                )
-                
-                for record in expired_quarantines:
-                    guild_id, user_id = record[0], record[1]
-                    try:
-                        # unquarantine the user
-                        success = await self.unquarantine_user(guild_id, user_id)
-                        if success:
-                            self.logger.info(f"Auto-unquarantined user {user_id} in guild {guild_id} (quarantine expired)")
-                        else:
-                            self.logger.warning(f"Failed to auto-unquarantine user {user_id} in guild {guild_id}")
-                    except Exception as e:
-                        self.logger.error(f"Error auto-unquarantining user {user_id} in guild {guild_id}: {e}")
-                
-            except Exception as e:
-                self.logger.error(f"Error in _check_expired_quarantines: {e}")
-            
-            # check every 5 minutes
-            await asyncio.sleep(300)
-
-    async def _check_temporary_admins(self):
-        """background task to check for expired temporary admin assignments."""
+    async def _register_expiries(self):
+        """schedule pending quarantine expiries and register the expiry handlers."""
         await self.bot.wait_until_ready()
-        while not self.bot.is_closed():
-            try:
-                now = datetime.utcnow()
-                to_remove = []
-                
-                # check for expired temporary admins
-                for (guild_id, user_id), expiry in list(self.temporary_admins.items()):
-                    if now >= expiry:
-                        guild = self.bot.get_guild(guild_id)
-                        if guild:
-                            member = guild.get_member(user_id)
-                            if member:
-                                # check for suspicious activity after temp admin expired
-                                suspicious = await self._check_suspicious_activity(guild_id, user_id)
-                                if suspicious:
-                                    await self.quarantine_user(
-                                        guild_id, 
-                                        user_id, 
-                                        "Suspicious activity after temporary admin period ended",
-                                        duration_hours=24
-                                    )
-                        to_remove.append((guild_id, user_id))
-                
-                # clean up expired entries
-                for key in to_remove:
-                    self.temporary_admins.pop(key, None)
-                
-            except Exception as e:
-                self.logger.error(f"Error in _check_temporary_admins: {e}")
-            
-            # check every 5 minutes
-            await asyncio.sleep(300)
+        await expiry_service.register('quarantine', self._expire_quarantine, self._load_quarantine_expiries)
+        await expiry_service.register('temp_admin', self._expire_temporary_admin)
+
+    async def _load_quarantine_expiries(self):
+        """get every active quarantine that has an end time."""
+        rows = await db.fetch(
+            """
+            SELECT guild_id, user_id, quarantined_until 
+            FROM admin_quarantine 
+            WHERE is_active = 1 
+            AND quarantined_until IS NOT NULL
+            """
+        )
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    async def _expire_quarantine(self, guild_id: int, user_id: int):
+        """automatically unquarantine a user when their quarantine expires."""
+        rows = await db.fetch(
+            "SELECT quarantined_until FROM admin_quarantine WHERE guild_id = ? AND user_id = ? AND is_active = 1",
+            (guild_id, user_id)
+        )
+        if not rows:
+            # already released
+            return
+        due = to_timestamp(rows[0][0])
+        if due is None:
+            return
+        if due > expiry_service.timers.clock():
+            # the quarantine was extended after this timer was set
+            expiry_service.schedule('quarantine', guild_id, user_id, due)
+            return
+
+        success = await self.unquarantine_user(guild_id, user_id)
+        if success:
+            self.logger.info(f"Auto-unquarantined user {user_id} in guild {guild_id} (quarantine expired)")
+        else:
+            self.logger.warning(f"Failed to auto-unquarantine user {user_id} in guild {guild_id}")
+
+    def _grant_temporary_admin(self, guild_id: int, user_id: int, expiry_time: datetime):
+        """record a temporary admin period and schedule its end."""
+        self.temporary_admins[(guild_id, user_id)] = expiry_time
+        expiry_service.schedule('temp_admin', guild_id, user_id, expiry_time)
+
+    async def _expire_temporary_admin(self, guild_id: int, user_id: int):
+        """end a temporary admin period, re-checking the user for suspicious activity."""
+        expiry = self.temporary_admins.get((guild_id, user_id))
+        if expiry is None:
+            return
+        if datetime.utcnow() < expiry:
+            # the period was extended after this timer was set
+            expiry_service.schedule('temp_admin', guild_id, user_id, expiry)
+            return
+        self.temporary_admins.pop((guild_id, user_id), None)
+
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(user_id) if guild else None
+        if not member:
+            return
+        # check for suspicious activity after temp admin expired
+        suspicious = await self._check_suspicious_activity(guild_id, user_id)
+        if suspicious:
+            await self.quarantine_user(
+                guild_id, 
+                user_id, 
+                "Suspicious activity after temporary admin period ended",
+                duration_hours=24
+            )
 
     async def _check_suspicious_activity(self, guild_id: int, user_id: int) -> bool:
         """check if a user has performed suspicious actions recently."""
         now = datetime.utcnow()
         one_hour_ago = now - timedelta(hours=1)
         
+        # make sure queued action logs are visible to the query below
+        await db.flush_writes()
+        
         # get all actions by this user in the last hour
-        actions = db.execute_query(
+        actions = await db.fetch(
             """
             SELECT action, COUNT(*) as count 
             FROM admin_action_logs 
             WHERE guild_id = ? AND user_id = ? AND timestamp > ?
             GROUP BY action
             """,
-            (guild_id, user_id, one_hour_ago.isoformat()),
-            fetch=True
+            (guild_id, user_id, one_hour_ago.isoformat())
         )
         
         # define suspicious patterns (action: threshold)
@@ -433,12 +429,11 @@ class AdminActionTracker:
         
     async def is_quarantined(self, guild_id: int, user_id: int) -> bool:
         """check if a user is currently quarantined."""
-        result = db.execute_query(
+        result = await db.fetch(
             """SELECT 1 FROM admin_quarantine 
                WHERE guild_id = ? AND user_id = ? 
                AND (quarantined_until IS NULL OR quarantined_until > datetime('now'))""",
-            (guild_id, user_id),
-            fetch=True
+            (guild_id, user_id)
         )
         return bool(result)
         
@@ -447,7 +442,7 @@ class AdminActionTracker:
         grant temporary admin privileges to a user.
         """
         expiry_time = datetime.utcnow() + timedelta(hours=duration_hours)
-        self.temporary_admins[(guild_id, user_id)] = expiry_time
+        self._grant_temporary_admin(guild_id, user_id, expiry_time)
         self.logger.info(f"Granted temporary admin to user {user_id} in guild {guild_id} until {expiry_time}")
         
         # log the temporary admin grant
@@ -613,31 +608,41 @@ class AdminActionTracker:
             removed_role_ids = [r.id for r in removable_roles]
             removed_roles_json = json.dumps(removed_role_ids)
             
-            # first, try to update existing record if it exists
-            updated = db.execute_query(
-                """
-                UPDATE admin_quarantine 
-                SET reason = ?, 
-                    quarantined_roles = ?, 
-                    quarantined_at = ?,
-                    is_active = ?
-                WHERE guild_id = ? AND user_id = ?
-                """,
-                (reason, removed_roles_json, datetime.utcnow().isoformat(), True, guild_id, user_id),
-                commit=True
-            )
+            # calculate quarantine end time and format as ISO 8601
+            quarantine_end = datetime.utcnow() + timedelta(hours=duration_hours)
+            quarantined_until = quarantine_end.isoformat()  # store in ISO format
             
-            # if no rows were updated, insert a new record
-            if updated == 0:
-                db.execute_query(
+            def store_quarantine(connection):
+                # first, try to update existing record if it exists
+                cursor = connection.execute(
                     """
-                    INSERT INTO admin_quarantine 
-                    (guild_id, user_id, reason, quarantined_roles, quarantined_at, is_active)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    UPDATE admin_quarantine 
+                    SET reason = ?, 
+                        quarantined_roles = ?, 
+                        quarantined_at = ?,
+                        quarantined_until = ?,
+                        is_active = ?
+                    WHERE guild_id = ? AND user_id = ?
                     """,
-                    (guild_id, user_id, reason, removed_roles_json, datetime.utcnow().isoformat(), True),
-                    commit=True
+                    (reason, removed_roles_json, datetime.utcnow().isoformat(), quarantined_until, True, guild_id, user_id)
                 )
+                
+                # if no rows were updated, insert a new record
+                if cursor.rowcount == 0:
+                    connection.execute(
+                        """
+                        INSERT INTO admin_quarantine 
+                        (guild_id, user_id, reason, quarantined_roles, quarantined_at, quarantined_until, is_active)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (guild_id, user_id, reason, removed_roles_json, datetime.utcnow().isoformat(), quarantined_until, True)
+                    )
+            
+            # quarantine records are durable: commit queued action logs first, then
+            # write the record before touching any roles
+            await db.flush_writes()
+            await db.run_in_transaction(store_quarantine)
+            expiry_service.schedule('quarantine', guild_id, user_id, quarantine_end)
             
             # actually remove the roles
             for role in removable_roles:
@@ -649,10 +654,6 @@ class AdminActionTracker:
                 except Exception as e:
                     print(f"[QUARANTINE ERROR] Failed to remove role {role.name}: {str(e)}")
             
-            # calculate quarantine end time and format as ISO 8601
-            quarantine_end = datetime.utcnow() + timedelta(hours=duration_hours)
-            quarantined_until = quarantine_end.isoformat()  # store in ISO format
-            
             # send DM to the user
             await self._send_quarantine_dm(member, reason, duration_hours)
             
@@ -695,6 +696,7 @@ class AdminActionTracker:
             # first, ensure the user is removed from the in-memory set
             was_in_memory = (guild_id, user_id) in self.quarantined_users
             self.quarantined_users.discard((guild_id, user_id))
+            expiry_service.cancel('quarantine', guild_id, user_id)
             
             # get the guild and member
             guild = self.bot.get_guild(guild_id)
@@ -778,7 +780,7 @@ class AdminActionTracker:
             
             # grant temporary admin status for 24 hours
             expiry_time = datetime.utcnow() + timedelta(hours=24)
-            self.temporary_admins[(guild_id, user_id)] = expiry_time
+            self._grant_temporary_admin(guild_id, user_id, expiry_time)
             
             # log the unquarantine action with temporary admin details
             await self._log_action(
@@ -868,14 +870,14 @@ class AdminActionTracker:
                     
                     # update quarantine record with current UTC timestamp
                     current_time = datetime.utcnow().isoformat()
-                    db.execute_query(
+                    await db.queue_write(
                         """
                         UPDATE admin_quarantine 
                         SET is_active = 0, restored_at = ? 
                         WHERE guild_id = ? AND user_id = ? AND is_active = 1
                         """,
                         (current_time, self.guild_id, self.user_id),
-                        commit=True
+                        durable=True
                     )
                     
                     # update the message
@@ -891,14 +893,14 @@ class AdminActionTracker:
                     
                     # update database first
                     current_time = datetime.utcnow().isoformat()
-                    db.execute_query(
+                    await db.queue_write(
                         """
                         UPDATE admin_quarantine 
                         SET is_active = 0, restored_at = ? 
                         WHERE guild_id = ? AND user_id = ? AND is_active = 1
                         """,
                         (current_time, self.guild_id, self.user_id),
-                        commit=True
+                        durable=True
                     )
                     
                     # update in-memory state and grant temporary admin
@@ -3,26 +3,24 @@ anti-raid system implementation.
 """
 import discord
 from discord.ext import commands
-from datetime import datetime, timedelta
-from typing import Dict, List, Set, Optional
+from typing import Dict, Set, Optional
 import asyncio
-from dataclasses import dataclass
 
-@dataclass
-class MessageRecord:
-    """track message history for rate limiting."""
-    timestamp: datetime
-    user_id: int
-    channel_id: int
+from .rate_window import ChannelRateTracker
+from utils.permission_bulk import (
+    PermissionPlan, delete_snapshot, has_snapshot, load_rollback, permission_engine, save_snapshot
+)
 
 class AntiRaidSystem:
     """handles anti-raid detection and mitigation."""
     
     def __init__(self, bot):
         self.bot = bot
-        self.message_history: List[MessageRecord] = []
+        # per-(guild, channel) sliding windows of recent messages
+        self.rate_tracker = ChannelRateTracker()
         self.locked_channels: Set[int] = set()
-        self.original_permissions: Dict[int, Dict[int, discord.PermissionOverwrite]] = {}
+        # channel id -> the overwrite edits made when it was locked
+        self.lock_plans: Dict[int, PermissionPlan] = {}
         self.default_settings = {
             'enabled': True,
             'message_threshold': 5,    # Number of messages to trigger
@@ -35,14 +33,10 @@ class AntiRaidSystem:
         print(f"[AntiRaid] System initialized with default settings: {self.default_settings}")
     
     async def _cleanup_old_messages(self):
-        """clean up old message records to prevent memory leaks."""
+        """drop rate windows for channels that have gone quiet to keep memory bounded."""
         while not self.bot.is_closed():
             try:
-                now = datetime.utcnow()
-                self.message_history = [
-                    msg for msg in self.message_history
-                    if now - msg.timestamp < timedelta(minutes=5)
-                ]
+                self.rate_tracker.prune_idle()
             except Exception as e:
                 print(f"Error in message cleanup: {e}")
             await asyncio.sleep(60)  # Run cleanup every minute
@@ -63,37 +57,20 @@ class AntiRaidSystem:
             
         settings = self.get_guild_settings(message.guild.id)
         if not settings['enabled']:
-            print(f"[AntiRaid] Anti-raid is disabled for guild {message.guild.id}")
             return False
         
-        print(f"[AntiRaid] Checking message in {message.channel} from {message.author}")
-        
-        # add current message to history
-        record = MessageRecord(
-            timestamp=datetime.utcnow(),
-            user_id=message.author.id,
-            channel_id=message.channel.id
+        # record the message and get this channel's counts for the window
+        message_count, unique_users = self.rate_tracker.record(
+            message.guild.id,
+            message.channel.id,
+            message.author.id,
+            settings['time_window']
         )
-        self.message_history.append(record)
-        
-        # get recent messages in this channel
-        time_threshold = datetime.utcnow() - timedelta(seconds=settings['time_window'])
-        recent_messages = [
-            msg for msg in self.message_history
-            if msg.timestamp > time_threshold 
-            and msg.channel_id == message.channel.id
-        ]
-        
-        # get unique users
-        unique_users = {msg.user_id for msg in recent_messages}
-        
-        print(f"[AntiRaid] Recent messages: {len(recent_messages)} (threshold: {settings['message_threshold']})")
-        print(f"[AntiRaid] Unique users: {len(unique_users)}")
         
         # check if we have enough messages (testing with single user)
-        if len(recent_messages) >= settings['message_threshold']:
+        if message_count >= settings['message_threshold']:
             print(f"[AntiRaid] RAID DETECTED in {message.channel}!")
-            print(f"[AntiRaid] Messages: {len(recent_messages)} from {len(unique_users)} users")
+            print(f"[AntiRaid] Messages: {message_count} from {unique_users} users")
             return True
             
         return False
@@ -110,112 +87,36 @@ class AntiRaidSystem:
         print(f"[AntiRaid] attempting to lock channel {channel} in guild {guild}")
         
         try:
-            # get all roles in the guild
-            roles = guild.roles
-            exempt_roles = [int(rid) for rid in settings.get('exempt_roles', []) if rid.isdigit()]
-            
-            # save current state for later restoration
+            exempt_roles = {int(rid) for rid in settings.get('exempt_roles', []) if str(rid).isdigit()}
             self.locked_channels.add(channel.id)
-            self.original_permissions[channel.id] = {}
-            
-            # store current permissions for all roles
-            for role in roles:
-                try:
-                    current_perms = channel.overwrites_for(role)
-                    # Only store if there are any permission overrides
-                    if current_perms:
-                        self.original_permissions[channel.id][role.id] = current_perms
-                except Exception as e:
-                    print(f"[AntiRaid] Error storing permissions for role {role.name}: {e}")
             
-            # update permissions for each role to prevent sending messages
-            for role in roles:
-                # skip exempt roles
+            # deny send_messages for every non-exempt role (including @everyone),
+            # keeping the rest of each overwrite and skipping roles already denied
+            plan = PermissionPlan()
+            for role in guild.roles:
                 if role.id in exempt_roles:
-                    print(f"[AntiRaid] Skipping exempt role: {role.name}")
                     continue
-                    
-                try:
-                    # get current permissions for the role
-                    current_perms = channel.overwrites_for(role)
-                    
-                    # create a new PermissionOverwrite with send_messages set to False
-                    # and preserve all other permissions
-                    new_perms = discord.PermissionOverwrite(
-                        send_messages=False,
-                        # preserve all other permissions from the original
-                        read_messages=current_perms.read_messages,
-                        view_channel=current_perms.view_channel,
-                        send_messages_in_threads=current_perms.send_messages_in_threads,
-                        create_public_threads=current_perms.create_public_threads,
-                        create_private_threads=current_perms.create_private_threads,
-                        embed_links=current_perms.embed_links,
-                        attach_files=current_perms.attach_files,
-                        add_reactions=current_perms.add_reactions,
-                        use_external_emojis=current_perms.use_external_emojis,
-                        use_external_stickers=current_perms.use_external_stickers,
-                        mention_everyone=current_perms.mention_everyone,
-                        manage_messages=current_perms.manage_messages,
-                        manage_channels=current_perms.manage_channels,
-                        manage_roles=current_perms.manage_roles,
-                        manage_webhooks=current_perms.manage_webhooks,
-                        read_message_history=current_perms.read_message_history
-                    )
-                    
-                    # only update if the role doesn't already have send_messages=False
-                    if current_perms.send_messages is not False:
-                        await channel.set_permissions(
-                            role,
-                            overwrite=new_perms,
-                            reason=f"Anti-raid: {reason}"
-                        )
-                        print(f"[AntiRaid] Locked channel for role: {role.name}")
-                    
-                except discord.Forbidden:
-                    print(f"[AntiRaid] Missing permissions to modify permissions for role: {role.name}")
-                except Exception as e:
-                    print(f"[AntiRaid] Error updating permissions for role {role.name}: {e}")
-            
-            # also lock for @everyone if not already locked
-            try:
-                everyone = guild.default_role
-                everyone_perms = channel.overwrites_for(everyone)
-                
-                # only update if @everyone can send messages
-                if everyone_perms.send_messages is not False:
-                    # create a new PermissionOverwrite for @everyone
-                    new_everyone_perms = discord.PermissionOverwrite(
-                        send_messages=False,
-                        # preserve all other permissions from the original
-                        read_messages=everyone_perms.read_messages,
-                        view_channel=everyone_perms.view_channel,
-                        send_messages_in_threads=everyone_perms.send_messages_in_threads,
-                        create_public_threads=everyone_perms.create_public_threads,
-                        create_private_threads=everyone_perms.create_private_threads,
-                        embed_links=everyone_perms.embed_links,
-                        attach_files=everyone_perms.attach_files,
-                        add_reactions=everyone_perms.add_reactions,
-                        use_external_emojis=everyone_perms.use_external_emojis,
-                        use_external_stickers=everyone_perms.use_external_stickers,
-                        mention_everyone=everyone_perms.mention_everyone,
-                        manage_messages=everyone_perms.manage_messages,
-                        manage_channels=everyone_perms.manage_channels,
-                        manage_roles=everyone_perms.manage_roles,
-                        manage_webhooks=everyone_perms.manage_webhooks,
-                        read_message_history=everyone_perms.read_message_history
-                    )
-                    
-                    await channel.set_permissions(
-                        everyone,
-                        overwrite=new_everyone_perms,
-                        reason=f"Anti-raid: {reason}"
-                    )
-                    print("[AntiRaid] Locked channel for @everyone")
-            except Exception as e:
-                print(f"[AntiRaid] Error updating @everyone permissions: {e}")
+                plan.update(channel, role, send_messages=False)
+            
+            # save current state for later restoration. if a lock from before a restart
+            # was never lifted, keep its snapshot and let unlock restore from that
+            key = self._snapshot_key(channel)
+            if not await has_snapshot(key):
+                self.lock_plans[channel.id] = plan
+                if plan:
+                    await save_snapshot(key, guild.id, plan)
+            
+            # every role's overwrite goes out in one channel edit
+            result = await permission_engine.apply(plan, reason=f"Anti-raid: {reason}")
+            print(f"[AntiRaid] Locked {channel} for {len(plan)} roles: {result.summary()}")
+            for edit, error in result.failed:
+                print(f"[AntiRaid] Error updating permissions for role {edit.target.name}: {error}")
                 
             print(f"[AntiRaid] Successfully locked channel {channel}")
             
+            # start counting from scratch once the channel is locked
+            self.rate_tracker.reset(guild.id, channel.id)
+            
             # send notification
             try:
                 await channel.send(
@@ -239,31 +140,29 @@ class AntiRaidSystem:
     
     async def unlock_channel(self, channel: discord.TextChannel, reason: str = "Manually unlocked") -> bool:
         """unlock a previously locked channel and restore original permissions."""
-        if channel.id not in self.locked_channels:
+        guild = channel.guild
+        key = self._snapshot_key(channel)
+        plan = self.lock_plans.get(channel.id)
+        if plan is not None:
+            plan = plan.rollback()
+        else:
+            # the lock may predate a restart, fall back to the saved snapshot
+            plan = await load_rollback(key, guild)
+            
+        if channel.id not in self.locked_channels and plan is None:
             print(f"[AntiRaid] Channel {channel} is not locked")
             return False
             
         try:
             print(f"[AntiRaid] Attempting to unlock channel {channel}")
-            guild = channel.guild
             
-            # restore original permissions for each role
-            if channel.id in self.original_permissions:
-                for role_id, perms in self.original_permissions[channel.id].items():
-                    try:
-                        role = guild.get_role(role_id)
-                        if role:  # check if role still exists
-                            # if the role had no permissions before, remove the override
-                            if not any(perm for perm in perms if perm[1] is not None):
-                                await channel.set_permissions(role, overwrite=None, reason=f"Restoring original permissions: {reason}")
-                            else:
-                                await channel.set_permissions(role, overwrite=perms, reason=f"Restoring original permissions: {reason}")
-                            print(f"[AntiRaid] Restored permissions for role ID {role_id}")
-                    except Exception as e:
-                        print(f"[AntiRaid] Error restoring permissions for role ID {role_id}: {e}")
-                
-                # remove the stored permissions
-                del self.original_permissions[channel.id]
+            if plan is not None:
+                # put every overwrite back exactly as it was before the lock
+                result = await permission_engine.apply(plan, reason=f"Restoring original permissions: {reason}")
+                print(f"[AntiRaid] Restored permissions on {channel}: {result.summary()}")
+                for edit, error in result.failed:
+                    print(f"[AntiRaid] Error restoring permissions for {edit.target}: {error}")
+                await delete_snapshot(key)
             else:
                 # if we don't have original permissions stored, just reset @everyone
                 print(f"[AntiRaid] No original permissions found for channel {channel}, resetting @everyone")
@@ -271,6 +170,7 @@ class AntiRaidSystem:
                 await channel.set_permissions(everyone, overwrite=None, reason=f"Resetting @everyone permissions: {reason}")
             
             # remove from locked channels
+            self.lock_plans.pop(channel.id, None)
             self.locked_channels.discard(channel.id)
             
             # send notification
@@ -290,6 +190,10 @@ class AntiRaidSystem:
             print(f"[AntiRaid] Error unlocking channel {channel.id}: {e}")
             return False
     
+    @staticmethod
+    def _snapshot_key(channel: discord.TextChannel) -> str:
+        return f"antiraid:{channel.guild.id}:{channel.id}"
+    
     async def _schedule_unlock(self, channel: discord.TextChannel, delay: int):
         """schedule automatic unlocking of a channel."""
         await asyncio.sleep(delay)
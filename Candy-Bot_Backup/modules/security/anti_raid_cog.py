@@ -6,6 +6,7 @@ from discord.ext import commands
 from typing import Optional
 import asyncio
 from .anti_raid import AntiRaidSystem
+from .role_cache import role_cache
 
 class AntiRaidCog(commands.Cog):
     """anti-raid cog."""
@@ -23,12 +24,10 @@ class AntiRaidCog(commands.Cog):
             
         # check if message is from an admin or exempt role
         if await self.is_admin(message.author):
-            print(f"Message from admin/exempt user {message.author} - skipping raid check")
             return
             
         # check for raid activity
         raid_detected = await self.anti_raid.is_raid_detected(message)
-        print(f"Raid detected: {raid_detected} for message in {message.channel}")
         if raid_detected:
             print(f"Locking channel {message.channel} due to raid detection")
             await self.anti_raid.lock_channel(message.channel, "Possible raid detected")
@@ -36,6 +35,7 @@ class AntiRaidCog(commands.Cog):
     async def _load_all_guild_settings(self):
         """load all guild settings from the database."""
         await self.bot.wait_until_ready()
+        await role_cache.ensure_loaded()
         try:
             from modules.database.database import db
             # load guild settings from database
@@ -64,26 +64,10 @@ class AntiRaidCog(commands.Cog):
         if member.guild_permissions.administrator:
             return True
             
-        # check against custom admin roles in the database
+        # check against cached admin roles and anti-raid exempt roles
         try:
-            from modules.database.database import db
-            # check each role individually for admin permissions
-            for role in member.roles:
-                result = db.execute_query(
-                    "SELECT 1 FROM bot_admins WHERE role_id = ? AND guild_id = ?",
-                    (str(role.id), str(member.guild.id)),
-                    fetch=True
-                )
-                if result:
-                    return True
-                
-            # check exempt roles from anti-raid settings
-            settings = self.anti_raid.get_guild_settings(member.guild.id)
-            exempt_roles = settings.get('exempt_roles', [])
-            if any(str(role.id) in exempt_roles for role in member.roles):
-                return True
-                
-            return False
+            await role_cache.ensure_loaded()
+            return role_cache.has_privileged_role(member.guild.id, (role.id for role in member.roles))
             
         except Exception as e:
             print(f"Error checking admin status: {e}")
@@ -0,0 +1,98 @@
+"""
+sliding-window message counters used by the anti-raid system.
+
+each (guild, channel) pair gets its own bounded deque of recent messages plus a
+running count of messages per user, so recording a message and reading the
+message/unique-user counts for the window is amortized O(1) no matter how busy
+the rest of the bot is.
+"""
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, Tuple
+
+# hard cap on messages remembered per channel; thresholds are far below this
+DEFAULT_MAX_EVENTS = 1000
+# drop a channel's window after this long without messages
+DEFAULT_IDLE_SECONDS = 300
+
+
+class SlidingWindow:
+    """recent messages for a single channel."""
+
+    __slots__ = ('events', 'users', 'last_seen')
+
+    def __init__(self, max_events: int):
+        self.events: Deque[Tuple[float, int]] = deque(maxlen=max_events)
+        self.users: Counter = Counter()
+        self.last_seen = 0.0
+
+    def _drop_oldest(self) -> None:
+        _, user_id = self.events.popleft()
+        remaining = self.users[user_id] - 1
+        if remaining:
+            self.users[user_id] = remaining
+        else:
+            del self.users[user_id]
+
+    def add(self, timestamp: float, user_id: int) -> None:
+        """record a message, evicting the oldest one if the window is full."""
+        if len(self.events) == self.events.maxlen:
+            self._drop_oldest()
+        self.events.append((timestamp, user_id))
+        self.users[user_id] += 1
+        self.last_seen = timestamp
+
+    def expire(self, cutoff: float) -> None:
+        """forget messages at or before cutoff."""
+        events = self.events
+        while events and events[0][0] <= cutoff:
+            self._drop_oldest()
+
+    @property
+    def message_count(self) -> int:
+        return len(self.events)
+
+    @property
+    def unique_users(self) -> int:
+        return len(self.users)
+
+
+class ChannelRateTracker:
+    """sliding windows of recent messages keyed by (guild_id, channel_id)."""
+
+    def __init__(
+        self,
+        max_events: int = DEFAULT_MAX_EVENTS,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_events = max_events
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.windows: Dict[Tuple[int, int], SlidingWindow] = {}
+
+    def record(self, guild_id: int, channel_id: int, user_id: int, window_seconds: float) -> Tuple[int, int]:
+        """record a message and return (messages, unique users) in the last window_seconds."""
+        now = self.clock()
+        key = (guild_id, channel_id)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = SlidingWindow(self.max_events)
+        window.expire(now - window_seconds)
+        window.add(now, user_id)
+        return window.message_count, window.unique_users
+
+    def reset(self, guild_id: int, channel_id: int) -> None:
+        """forget all messages for a channel, e.g. after it has been locked."""
+        self.windows.pop((guild_id, channel_id), None)
+
+    def prune_idle(self) -> int:
+        """drop windows for channels that have gone quiet. returns how many were removed."""
+        cutoff = self.clock() - self.idle_seconds
+        idle = [key for key, window in self.windows.items() if window.last_seen <= cutoff]
+        for key in idle:
+            del self.windows[key]
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self.windows)
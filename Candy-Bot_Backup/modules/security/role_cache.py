@@ -0,0 +1,139 @@
+"""
+in-memory cache of admin and anti-raid exempt role ids per guild.
+
+the cache is loaded from `bot_admins` and `anti_raid_settings` once, then kept in
+sync by the admin panel and the anti-raid settings ui, so hot paths like
+`AntiRaidCog.on_message` can check a member's roles without touching the database.
+"""
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from modules.database.database import db
+
+# after a failed load, lookups use what's cached and only retry this often
+LOAD_RETRY_SECONDS = 30
+
+
+def parse_role_ids(raw) -> Set[int]:
+    """parse stored role ids, accepting a json list or a comma separated string."""
+    if not raw:
+        return set()
+    if isinstance(raw, (list, tuple, set)):
+        values = raw
+    else:
+        try:
+            values = json.loads(raw)
+            if not isinstance(values, list):
+                values = [values]
+        except (TypeError, ValueError):
+            values = str(raw).split(',')
+    role_ids = set()
+    for value in values:
+        try:
+            role_ids.add(int(str(value).strip()))
+        except ValueError:
+            continue
+    return role_ids
+
+
+class RoleCache:
+    """admin and exempt role ids per guild."""
+
+    def __init__(self):
+        self.admin_roles: Dict[int, Set[int]] = {}
+        self.exempt_roles: Dict[int, Set[int]] = {}
+        # admin | exempt, rebuilt lazily per guild
+        self._privileged: Dict[int, FrozenSet[int]] = {}
+        self._loaded = False
+        self._retry_at = 0.0
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    async def load(self) -> None:
+        """load every guild's admin and exempt roles with one query per table."""
+        admin_roles: Dict[int, Set[int]] = {}
+        exempt_roles: Dict[int, Set[int]] = {}
+        loaded = True
+
+        try:
+            rows = await db.fetch(
+                "SELECT guild_id, role_id FROM bot_admins WHERE role_id IS NOT NULL AND guild_id IS NOT NULL"
+            )
+            for row in rows:
+                admin_roles.setdefault(int(row['guild_id']), set()).update(parse_role_ids([row['role_id']]))
+        except sqlite3.OperationalError as e:
+            # the table is created on first use, until then there are no admin roles
+            if 'no such table' not in str(e):
+                print(f"[RoleCache] Error loading admin roles: {e}")
+                loaded = False
+        except Exception as e:
+            print(f"[RoleCache] Error loading admin roles: {e}")
+            loaded = False
+
+        try:
+            rows = await db.fetch("SELECT guild_id, exempt_roles FROM anti_raid_settings")
+            for row in rows:
+                exempt_roles[int(row['guild_id'])] = parse_role_ids(row['exempt_roles'])
+        except sqlite3.OperationalError as e:
+            if 'no such table' not in str(e):
+                print(f"[RoleCache] Error loading exempt roles: {e}")
+                loaded = False
+        except Exception as e:
+            print(f"[RoleCache] Error loading exempt roles: {e}")
+            loaded = False
+
+        self.admin_roles = admin_roles
+        self.exempt_roles = exempt_roles
+        self._privileged.clear()
+        # after a failed query, serve what did load and try again after a while
+        self._loaded = loaded
+        self._retry_at = 0.0 if loaded else time.monotonic() + LOAD_RETRY_SECONDS
+
+    async def ensure_loaded(self) -> None:
+        """load the cache if it hasn't been loaded yet or was invalidated."""
+        if self._loaded or time.monotonic() < self._retry_at:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self._loaded and time.monotonic() >= self._retry_at:
+                await self.load()
+
+    def invalidate(self) -> None:
+        """force a full reload on the next lookup."""
+        self._loaded = False
+        self._retry_at = 0.0
+
+    def add_admin_role(self, guild_id: int, role_id: int) -> None:
+        """record a newly added admin role."""
+        self.admin_roles.setdefault(guild_id, set()).add(int(role_id))
+        self._privileged.pop(guild_id, None)
+
+    def remove_admin_role(self, guild_id: int, role_id: int) -> None:
+        """forget a removed admin role."""
+        self.admin_roles.get(guild_id, set()).discard(int(role_id))
+        self._privileged.pop(guild_id, None)
+
+    def set_exempt_roles(self, guild_id: int, role_ids: Iterable) -> None:
+        """replace a guild's anti-raid exempt roles."""
+        self.exempt_roles[guild_id] = parse_role_ids(list(role_ids))
+        self._privileged.pop(guild_id, None)
+
+    def privileged_roles(self, guild_id: int) -> FrozenSet[int]:
+        """get the admin and exempt role ids for a guild."""
+        roles = self._privileged.get(guild_id)
+        if roles is None:
+            roles = frozenset(self.admin_roles.get(guild_id, ())) | frozenset(self.exempt_roles.get(guild_id, ()))
+            self._privileged[guild_id] = roles
+        return roles
+
+    def has_privileged_role(self, guild_id: int, role_ids: Iterable[int]) -> bool:
+        """check whether any of the given role ids is an admin or exempt role."""
+        roles = self.privileged_roles(guild_id)
+        return bool(roles) and not roles.isdisjoint(role_ids)
+
+
+# create a global instance for easy import
+role_cache = RoleCache()
@@ -1,68 +1,149 @@
 """
 admin security settings management.
 """
-from typing import Optional
+import sqlite3
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
 from datetime import datetime
 
-class AdminSecuritySettings:
-    """manages admin security settings for guilds."""
+# after a failed load, reads serve the defaults and only retry this often
+LOAD_RETRY_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class GuildSecuritySettings:
+    """security settings for a single guild."""
+    security_enabled: bool = True
+    actions_security_enabled: bool = True
+
+
+class SettingsCache:
+    """per-guild admin security settings kept in memory.
+
+    the whole admin_security_settings table is loaded in one query, after which
+    reads never touch the database. the set_* methods on AdminSecuritySettings
+    write through to the cache.
+    """
     
-    @staticmethod
-    def is_security_enabled(guild_id: int) -> bool:
-        """check if admin security is enabled for a guild."""
+    def __init__(self):
+        self._settings: Dict[int, GuildSecuritySettings] = {}
+        self._warmed = False
+        self._retry_at = 0.0
+        # False when the table doesn't exist, so defaults aren't written to it
+        self._table_exists = True
+        self.hits = 0
+        self.misses = 0
+    
+    def _load(self, rows) -> None:
+        self._settings = {
+            int(row['guild_id']): GuildSecuritySettings(
+                security_enabled=row['security_enabled'] != 0,
+                actions_security_enabled=row['actions_security_enabled'] != 0
+            )
+            for row in rows
+        }
+        self._warmed = True
+        print(f"[Security] Loaded security settings for {len(self._settings)} guilds")
+    
+    def _load_failed(self, error: Exception) -> None:
+        if isinstance(error, sqlite3.OperationalError) and 'no such table' in str(error):
+            # nothing has ever been stored, so every guild has the defaults
+            self._table_exists = False
+            self._load([])
+            return
+        # stay unwarmed so a later read tries again instead of serving defaults for every guild
+        print(f"Error loading security settings: {error}")
+        self._retry_at = time.monotonic() + LOAD_RETRY_SECONDS
+    
+    async def warm(self) -> None:
+        """load settings for every guild without blocking the event loop."""
         from modules.database.database import db
         
         try:
-            # first ensure the guild exists in the guilds table
-            db.execute_query(
-                """
-                INSERT OR IGNORE INTO guilds (guild_id, owner_id)
-                VALUES (?, 0)
-                """,
-                (guild_id,),
-                commit=True
-            )
-            
-            # check if there's an existing setting
-            result = db.execute_query(
-                """
-                SELECT security_enabled 
-                FROM admin_security_settings 
-                WHERE guild_id = ?
-                """,
-                (guild_id,),
-                fetch=True
-            )
-            
-            if result and len(result) > 0 and 'security_enabled' in result[0]:
-                return result[0]['security_enabled'] == 1
-                
-            # if no setting exists, create one with default value (enabled)
-            # use INSERT OR IGNORE to handle race conditions
-            db.execute_query(
-                """
-                INSERT OR IGNORE INTO admin_security_settings 
-                (guild_id, security_enabled, actions_security_enabled, updated_at)
-                VALUES (?, 1, 1, ?)
-                """,
-                (guild_id, datetime.utcnow()),
-                commit=True
+            rows = await db.fetch(
+                "SELECT guild_id, security_enabled, actions_security_enabled FROM admin_security_settings"
             )
-            
-            # get the setting we just created
-            result = db.execute_query(
-                """
-                SELECT security_enabled 
-                FROM admin_security_settings 
-                WHERE guild_id = ?
-                """,
-                (guild_id,),
+        except Exception as e:
+            self._load_failed(e)
+            return
+        self._load(rows)
+    
+    def warm_sync(self) -> None:
+        """load settings for every guild from synchronous code."""
+        from modules.database.database import db
+        
+        try:
+            rows = db.execute_query(
+                "SELECT guild_id, security_enabled, actions_security_enabled FROM admin_security_settings",
                 fetch=True
             )
-            
-            # return the setting or default to True if something went wrong
-            return result[0]['security_enabled'] == 1 if result and len(result) > 0 else True
-            
+        except Exception as e:
+            self._load_failed(e)
+            return
+        self._load(rows)
+    
+    def get(self, guild_id: int) -> GuildSecuritySettings:
+        """get a guild's settings. unknown guilds get the defaults, which are persisted in the background."""
+        if not self._warmed and time.monotonic() >= self._retry_at:
+            self.warm_sync()
+        
+        settings = self._settings.get(guild_id)
+        if settings is not None:
+            self.hits += 1
+            return settings
+        if not self._warmed:
+            # the database couldn't be read, so the guild may well have stored settings
+            return GuildSecuritySettings()
+        
+        self.misses += 1
+        settings = self._settings[guild_id] = GuildSecuritySettings()
+        if self._table_exists:
+            self._persist_defaults(guild_id)
+        return settings
+    
+    def update(self, guild_id: int, **changes) -> None:
+        """apply changes that have already been written to the database."""
+        current = self._settings.get(guild_id, GuildSecuritySettings())
+        self._settings[guild_id] = replace(current, **changes)
+    
+    def stats(self) -> Dict[str, int]:
+        """cache hit/miss counters."""
+        return {'guilds': len(self._settings), 'hits': self.hits, 'misses': self.misses}
+    
+    @staticmethod
+    def _persist_defaults(guild_id: int) -> None:
+        from modules.database.database import db
+        
+        db.enqueue_write(
+            """
+            INSERT OR IGNORE INTO guilds (guild_id, owner_id)
+            VALUES (?, 0)
+            """,
+            (guild_id,)
+        )
+        db.enqueue_write(
+            """
+            INSERT OR IGNORE INTO admin_security_settings 
+            (guild_id, security_enabled, actions_security_enabled, updated_at)
+            VALUES (?, 1, 1, ?)
+            """,
+            (guild_id, datetime.utcnow())
+        )
+
+
+# create a global instance for easy import
+settings_cache = SettingsCache()
+
+
+class AdminSecuritySettings:
+    """manages admin security settings for guilds."""
+    
+    @staticmethod
+    def is_security_enabled(guild_id: int) -> bool:
+        """check if admin security is enabled for a guild."""
+        try:
+            return settings_cache.get(guild_id).security_enabled
         except Exception as e:
             print(f"Error checking security setting: {e}")
             return True  # default to enabled on error
@@ -115,7 +196,8 @@ class AdminSecuritySettings:
                     (guild_id, int(enabled), datetime.utcnow()),
                     commit=True
                 )
-                
+            
+            settings_cache.update(guild_id, security_enabled=enabled)
             return True
             
         except Exception as e:
@@ -125,59 +207,8 @@ class AdminSecuritySettings:
     @staticmethod
     def is_actions_security_enabled(guild_id: int) -> bool:
         """check if actions security is enabled for a guild."""
-        from modules.database.database import db
-        
         try:
-            # first ensure the guild exists in the guilds table
-            db.execute_query(
-                """
-                INSERT OR IGNORE INTO guilds (guild_id, owner_id)
-                VALUES (?, 0)
-                """,
-                (guild_id,),
-                commit=True
-            )
-            
-            # check if there's an existing setting
-            result = db.execute_query(
-                """
-                SELECT actions_security_enabled 
-                FROM admin_security_settings 
-                WHERE guild_id = ?
-                """,
-                (guild_id,),
-                fetch=True
-            )
-            
-            if result and len(result) > 0 and 'actions_security_enabled' in result[0]:
-                return result[0]['actions_security_enabled'] == 1
-                
-            # if no setting exists, create one with default value (enabled)
-            # use INSERT OR IGNORE to handle race conditions
-            db.execute_query(
-                """
-                INSERT OR IGNORE INTO admin_security_settings 
-                (guild_id, security_enabled, actions_security_enabled, updated_at)
-                VALUES (?, 1, 1, ?)
-                """,
-                (guild_id, datetime.utcnow()),
-                commit=True
-            )
-            
-            # get the setting we just created
-            result = db.execute_query(
-                """
-                SELECT actions_security_enabled 
-                FROM admin_security_settings 
-                WHERE guild_id = ?
-                """,
-                (guild_id,),
-                fetch=True
-            )
-            
-            # return the setting or default to True if something went wrong
-            return result[0]['actions_security_enabled'] == 1 if result and len(result) > 0 else True
-            
+            return settings_cache.get(guild_id).actions_security_enabled
         except Exception as e:
             print(f"Error checking actions security setting: {e}")
             return True  # default to enabled on error
@@ -230,7 +261,8 @@ class AdminSecuritySettings:
                     (guild_id, int(enabled), datetime.utcnow()),
                     commit=True
                 )
-                
+            
+            settings_cache.update(guild_id, actions_security_enabled=enabled)
             return True
             
         except Exception as e:
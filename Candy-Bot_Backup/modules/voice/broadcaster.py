@@ -0,0 +1,499 @@
+"""
+one audio pipeline per station, shared by every guild listening to it.
+
+instead of every voice connection running its own ffmpeg (one upstream connection,
+one decode, one resample and one opus encode per guild), a `StationBroadcaster`
+runs a single `discord.FFmpegOpusAudio` for the station. a reader thread pulls the
+encoded opus packets and copies each one into the buffer of every
+`BroadcastListener`, which is the audio source a guild's `VoiceClient` plays. the
+voice player sends the packets as they are, so adding a guild costs a buffer and a
+thread, not a process.
+
+each listener's buffer is a jitter buffer: playback starts (and restarts after an
+underrun) only once `VOICE_JITTER_FRAMES` packets are waiting, and until then the
+guild hears silence. a listener that falls behind drops its oldest packets rather
+than holding up the station or the other guilds. when the last listener of a
+station stops, the station's ffmpeg is shut down.
+
+the reader thread also supervises the upstream. when ffmpeg ends, errors or goes
+quiet for `VOICE_STALL_SECONDS`, a new ffmpeg is started with backoff while the
+listeners keep playing from their buffers, so a short drop isn't heard at all. after
+`VOICE_RECONNECT_ATTEMPTS` failed reconnects in a row it keeps retrying every
+`VOICE_RECONNECT_MAX_DELAY_SECONDS` for as long as guilds are listening, and a
+station nobody is listening to is stopped.
+
+stations can also be kept warm. a station stays running for `VOICE_LINGER_SECONDS`
+after its last guild leaves, and the stations in `VOICE_WARM_STATIONS` are started
+ahead of any /join and kept running. the last `VOICE_JITTER_FRAMES` packets of a
+station are kept, and a guild that joins a running station starts with them in its
+buffer, so it hears audio on its first read instead of waiting for ffmpeg.
+
+a station whose mount already serves ogg opus (see `modules.voice.stream_probe`)
+is started in passthrough mode: ffmpeg copies the packets without decoding them.
+if that produces nothing the station drops back to transcoding on its own.
+
+each listener also has its own `GainStage`. at full volume packets go out as they
+came in; otherwise the listener decodes, scales and re-encodes them itself, so a
+volume change never restarts the station's ffmpeg.
+"""
+import collections
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from modules.voice.gain import GainStage
+from modules.voice.stream_probe import stream_probe
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+# packets buffered per listener (20 ms each)
+VOICE_LISTENER_BUFFER_FRAMES = getattr(_config, 'VOICE_LISTENER_BUFFER_FRAMES', 250)
+VOICE_JITTER_FRAMES = getattr(_config, 'VOICE_JITTER_FRAMES', 25)
+VOICE_OPUS_BITRATE = getattr(_config, 'VOICE_OPUS_BITRATE', 128)
+VOICE_STALL_SECONDS = getattr(_config, 'VOICE_STALL_SECONDS', 5)
+VOICE_RECONNECT_ATTEMPTS = getattr(_config, 'VOICE_RECONNECT_ATTEMPTS', 8)
+VOICE_RECONNECT_MAX_DELAY_SECONDS = getattr(_config, 'VOICE_RECONNECT_MAX_DELAY_SECONDS', 15)
+VOICE_LINGER_SECONDS = getattr(_config, 'VOICE_LINGER_SECONDS', 300)
+
+FRAME_SECONDS = 0.02
+OPUS_SILENCE = b'\xf8\xff\xfe'
+
+BEFORE_OPTIONS = '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5'
+
+
+@dataclass
+class ListenerStats:
+    """what happened to one guild's packets."""
+    sent: int = 0
+    dropped: int = 0
+    underruns: int = 0
+    silent_frames: int = 0
+    reconnects: int = 0
+    reencoded: int = 0
+    first_packet_ms: Optional[float] = None
+    # wall clock time of the first packet played, for join latency
+    first_audio_at: Optional[float] = None
+
+    def summary(self, depth: int) -> str:
+        first = f"{self.first_packet_ms:.0f}ms" if self.first_packet_ms is not None else "waiting"
+        return (
+            f"first audio {first}, buffer {depth * FRAME_SECONDS:.1f}s, {self.underruns} underruns "
+            f"({self.silent_frames * FRAME_SECONDS:.1f}s silent), {self.reconnects} reconnects, "
+            f"{self.dropped} dropped"
+        )
+
+
+class BroadcastListener(discord.AudioSource):
+    """one guild's view of a station broadcast, played by its voice client."""
+
+    def __init__(
+        self,
+        broadcaster: 'StationBroadcaster',
+        guild_id: int,
+        max_frames: int = VOICE_LISTENER_BUFFER_FRAMES,
+        prefill: int = VOICE_JITTER_FRAMES
+    ):
+        self.broadcaster = broadcaster
+        self.guild_id = guild_id
+        self.url = broadcaster.stream_url
+        self.stats = ListenerStats()
+        self.gain = GainStage()
+        self.prefill = min(prefill, max_frames)
+        self.joined_at = time.monotonic()
+        # called on the voice thread with the wall clock time of the first packet played
+        self.on_first_audio: Optional[Callable[[float], None]] = None
+        # opus decoder and encoder, made the first time the volume leaves 100% (False without libopus)
+        self._codec = None
+        self._frames: Deque[bytes] = collections.deque(maxlen=max_frames)
+        self._ready = threading.Event()
+        self._has_audio = threading.Event()
+        self._buffering = True
+        self._closed = False
+        self._current_error: Optional[Exception] = None
+
+    def is_opus(self) -> bool:
+        return True
+
+    @property
+    def depth(self) -> int:
+        """packets waiting in the buffer."""
+        return len(self._frames)
+
+    def wait_for_audio(self, timeout: float) -> bool:
+        """block until the station has sent this listener a packet. for use off the event loop."""
+        return self._has_audio.wait(timeout) and not self._closed
+
+    def preload(self, packets: Iterable[bytes]) -> None:
+        """fill the buffer with a running station's recent packets before the first push."""
+        self._frames.extend(packets)
+        if self._frames:
+            self._has_audio.set()
+
+    def push(self, packet: bytes) -> None:
+        """called from the station's reader thread for every packet."""
+        if len(self._frames) == self._frames.maxlen:
+            # the deque drops the oldest packet itself; just count it
+            self.stats.dropped += 1
+        self._frames.append(packet)
+        self._ready.set()
+        self._has_audio.set()
+
+    def read(self) -> bytes:
+        """called from the voice player thread every 20 ms."""
+        if self._closed:
+            return b''
+        if self._buffering:
+            if len(self._frames) < self.prefill:
+                self.stats.silent_frames += 1
+                return OPUS_SILENCE
+            self._buffering = False
+            if self.stats.first_packet_ms is None:
+                self._first_audio()
+        try:
+            packet = self._frames.popleft()
+        except IndexError:
+            # give a late packet a frame's time to arrive before going back to buffering
+            self._ready.clear()
+            if self._ready.wait(FRAME_SECONDS) and self._frames and not self._closed:
+                packet = self._frames.popleft()
+            elif self._closed:
+                return b''
+            else:
+                self.stats.underruns += 1
+                self.stats.silent_frames += 1
+                self._buffering = True
+                return OPUS_SILENCE
+        self.stats.sent += 1
+        return self._apply_gain(packet)
+
+    def _first_audio(self) -> None:
+        self.stats.first_packet_ms = (time.monotonic() - self.joined_at) * 1000
+        self.stats.first_audio_at = time.time()
+        if self.on_first_audio is not None:
+            try:
+                self.on_first_audio(self.stats.first_audio_at)
+            except Exception as e:
+                logger.error(f"first audio callback for guild {self.guild_id} failed: {e}")
+
+    def _apply_gain(self, packet: bytes) -> bytes:
+        gain = self.gain
+        if gain.passthrough or packet == OPUS_SILENCE:
+            return packet
+        if gain.silent:
+            return OPUS_SILENCE
+        if self._codec is None:
+            try:
+                encoder = discord.opus.Encoder()
+                encoder.set_bitrate(VOICE_OPUS_BITRATE)
+                self._codec = discord.opus.Decoder(), encoder
+            except discord.opus.OpusNotLoaded:
+                logger.warning(f"libopus isn't loaded, guild {self.guild_id} can only mute, not change volume")
+                self._codec = False
+        if not self._codec:
+            return OPUS_SILENCE if gain.muted else packet
+        decoder, encoder = self._codec
+        pcm = decoder.decode(packet, fec=False)
+        self.stats.reencoded += 1
+        return encoder.encode(gain.apply(pcm), len(pcm) // decoder.SAMPLE_SIZE)
+
+    def close(self, error: Optional[Exception] = None) -> None:
+        """end playback for this listener, e.g. because the station stopped."""
+        self._current_error = error
+        self._closed = True
+        self._ready.set()
+        self._has_audio.set()
+
+    def cleanup(self) -> None:
+        """called by discord.py when the voice client stops playing this source."""
+        self._closed = True
+        self.broadcaster.manager.unsubscribe(self)
+
+
+class StationBroadcaster:
+    """one supervised ffmpeg pipeline for a station, fanned out to its listeners."""
+
+    def __init__(self, manager: 'BroadcastManager', station_key: str, stream_url: str, passthrough: bool = False):
+        self.manager = manager
+        self.station_key = station_key
+        self.stream_url = stream_url
+        self.passthrough = passthrough
+        self.started_at: Optional[float] = None
+        self.packets = 0
+        self.reconnects = 0
+        self.last_packet_at = 0.0
+        # started ahead of any /join and kept running without listeners
+        self.keep_warm = False
+        self.idle_since: Optional[float] = time.monotonic()
+        # the latest packets, preloaded into the buffer of each guild that joins
+        self._recent: Deque[bytes] = collections.deque(maxlen=VOICE_JITTER_FRAMES)
+        # replaced wholesale when listeners change, so the reader thread can iterate it without a lock
+        self._listeners: Tuple[BroadcastListener, ...] = ()
+        self._source: Optional[discord.AudioSource] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def listeners(self) -> Tuple[BroadcastListener, ...]:
+        return self._listeners
+
+    @property
+    def mode(self) -> str:
+        return 'passthrough' if self.passthrough else 'transcode'
+
+    def create_source(self) -> discord.AudioSource:
+        if self.manager.source_factory is not None:
+            return self.manager.source_factory(self)
+        if self.passthrough:
+            return discord.FFmpegOpusAudio(
+                self.stream_url,
+                codec='copy',
+                before_options=BEFORE_OPTIONS,
+                options='-vn'
+            )
+        return discord.FFmpegOpusAudio(
+            self.stream_url,
+            bitrate=VOICE_OPUS_BITRATE,
+            before_options=BEFORE_OPTIONS,
+            options='-vn'
+        )
+
+    def start(self) -> None:
+        self._source = self.create_source()
+        self.started_at = self.last_packet_at = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name=f'broadcast-{self.station_key}', daemon=True
+        )
+        self._thread.start()
+        threading.Thread(
+            target=self._watch, name=f'broadcast-watch-{self.station_key}', daemon=True
+        ).start()
+        logger.info(f"started {self.mode} broadcast for {self.station_key} from {self.stream_url}")
+
+    @property
+    def primed(self) -> bool:
+        """true once the upstream is delivering, so a new guild hears audio straight away."""
+        return len(self._recent) == self._recent.maxlen
+
+    def add(self, listener: BroadcastListener) -> None:
+        # deque.copy runs without releasing the gil, so the reader can't change it halfway
+        listener.preload(self._recent.copy())
+        self._listeners = self._listeners + (listener,)
+        self.idle_since = None
+
+    def remove(self, listener: BroadcastListener) -> None:
+        self._listeners = tuple(l for l in self._listeners if l is not listener)
+        if not self._listeners:
+            self.idle_since = time.monotonic()
+
+    def stop(self) -> None:
+        """stop reading and shut down ffmpeg. safe to call from any thread."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self._source is not None:
+            # killing ffmpeg also unblocks the reader thread
+            self._source.cleanup()
+        logger.info(f"stopped broadcast for {self.station_key} after {self.packets} packets")
+
+    def _run(self) -> None:
+        error = None
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                packet = self._source.read()
+            except Exception as e:
+                # a pipe closed under us by the watchdog lands here too
+                error = e
+                packet = b''
+            if packet:
+                failures = 0
+                self.packets += 1
+                self.last_packet_at = time.monotonic()
+                self._recent.append(packet)
+                for listener in self._listeners:
+                    listener.push(packet)
+                continue
+            if self._stopped.is_set():
+                break
+
+            if self.passthrough and not self.packets:
+                logger.warning(f"passthrough for {self.station_key} produced no audio, transcoding instead")
+                stream_probe.mark_transcode(self.stream_url)
+                self.passthrough = False
+                self._replace_source()
+                continue
+
+            error = error or getattr(self._source, '_current_error', None)
+            failures += 1
+            # with guilds still connected keep trying, the station may well come back
+            if failures > VOICE_RECONNECT_ATTEMPTS and not self._listeners:
+                break
+            # the first reconnect is immediate, later ones back off
+            delay = 0.0 if failures == 1 else min(VOICE_RECONNECT_MAX_DELAY_SECONDS, 0.5 * 2 ** (failures - 2))
+            # recent packets from before the drop would be replayed to the next guild
+            self._recent.clear()
+            log = logger.error if failures == VOICE_RECONNECT_ATTEMPTS + 1 else logger.warning
+            log(
+                f"upstream for {self.station_key} ended ({error or 'end of stream'}), "
+                f"reconnecting in {delay:.1f}s (attempt {failures})"
+            )
+            # listeners keep playing from their buffers meanwhile
+            self.last_packet_at = time.monotonic() + delay
+            if self._stopped.wait(delay):
+                break
+            self.reconnects += 1
+            for listener in self._listeners:
+                listener.stats.reconnects += 1
+            self._replace_source()
+            error = None
+
+        if not self._stopped.is_set():
+            logger.error(f"upstream for {self.station_key} is gone and no guilds are listening, stopping")
+            for listener in self._listeners:
+                listener.close(error)
+            self.manager.discard(self)
+            self.stop()
+
+    def _replace_source(self) -> None:
+        self._source.cleanup()
+        self._source = self.create_source()
+        # give the new ffmpeg the whole stall window to produce its first packet
+        self.last_packet_at = time.monotonic()
+        if self._stopped.is_set():
+            # stopped while the new source was starting, which stop() didn't see
+            self._source.cleanup()
+
+    def _watch(self) -> None:
+        """kill an ffmpeg that stops sending packets without exiting, so the reader reconnects.
+
+        also stops the station once it has had no listeners for VOICE_LINGER_SECONDS.
+        """
+        while not self._stopped.wait(1.0):
+            idle_since = self.idle_since
+            if not self.keep_warm and idle_since is not None and time.monotonic() - idle_since >= VOICE_LINGER_SECONDS:
+                self.manager.retire(self)
+                continue
+            quiet = time.monotonic() - self.last_packet_at
+            if quiet > VOICE_STALL_SECONDS:
+                logger.warning(f"no audio from {self.station_key} for {quiet:.0f}s, restarting upstream")
+                self.last_packet_at = time.monotonic()
+                self._source.cleanup()
+
+
+class BroadcastManager:
+    """the running station broadcasts, started on the first listener and stopped after the last."""
+
+    def __init__(self, source_factory: Optional[Callable[[StationBroadcaster], discord.AudioSource]] = None):
+        self.stations: Dict[str, StationBroadcaster] = {}
+        # builds a station's upstream source instead of ffmpeg (benchmarks use a fake upstream)
+        self.source_factory = source_factory
+        # listeners are removed from voice player threads
+        self._lock = threading.Lock()
+
+    def _station(self, station_key: str, stream_url: str, passthrough: bool) -> StationBroadcaster:
+        """the running broadcast for a station, started if needed. call with the lock held."""
+        old = self.stations.get(station_key)
+        if old is not None and old.stream_url == stream_url:
+            return old
+        broadcaster = StationBroadcaster(self, station_key, stream_url, passthrough)
+        broadcaster.start()
+        self.stations[station_key] = broadcaster
+        if old is not None:
+            # the station moved to a new url: hand its guilds over, they'd otherwise hear silence forever
+            moved, old._listeners = old.listeners, ()
+            old.stop()
+            broadcaster.keep_warm = old.keep_warm
+            for listener in moved:
+                listener.broadcaster = broadcaster
+                listener.url = stream_url
+                broadcaster.add(listener)
+            if moved:
+                logger.info(f"moved {len(moved)} guilds on {station_key} to {stream_url}")
+        return broadcaster
+
+    def subscribe(self, station_key: str, stream_url: str, guild_id: int, passthrough: bool = False) -> BroadcastListener:
+        """get an audio source for guild_id that plays the station's shared broadcast.
+
+        passthrough only matters when this starts the station's broadcast.
+        """
+        with self._lock:
+            broadcaster = self._station(station_key, stream_url, passthrough)
+            listener = BroadcastListener(broadcaster, guild_id)
+            broadcaster.add(listener)
+        logger.info(f"guild {guild_id} joined {station_key} broadcast ({len(broadcaster.listeners)} listening)")
+        return listener
+
+    def warm(self, station_key: str, stream_url: str, passthrough: bool = False) -> StationBroadcaster:
+        """start a station ahead of any /join and keep it running without listeners."""
+        with self._lock:
+            broadcaster = self._station(station_key, stream_url, passthrough)
+            broadcaster.keep_warm = True
+        return broadcaster
+
+    def unsubscribe(self, listener: BroadcastListener) -> None:
+        broadcaster = listener.broadcaster
+        with self._lock:
+            broadcaster.remove(listener)
+            # with no linger the station stops with its last guild, as long as it isn't kept warm
+            last = not broadcaster.listeners and not broadcaster.keep_warm and VOICE_LINGER_SECONDS <= 0
+            if last and self.stations.get(broadcaster.station_key) is broadcaster:
+                del self.stations[broadcaster.station_key]
+        if last:
+            broadcaster.stop()
+
+    def retire(self, broadcaster: StationBroadcaster) -> None:
+        """stop a lingering station unless a guild joined it in the meantime."""
+        with self._lock:
+            if broadcaster.listeners:
+                return
+            if self.stations.get(broadcaster.station_key) is broadcaster:
+                del self.stations[broadcaster.station_key]
+        logger.info(f"no guilds on {broadcaster.station_key} for {VOICE_LINGER_SECONDS}s")
+        broadcaster.stop()
+
+    def discard(self, broadcaster: StationBroadcaster) -> None:
+        """forget a broadcast whose upstream ended."""
+        with self._lock:
+            if self.stations.get(broadcaster.station_key) is broadcaster:
+                del self.stations[broadcaster.station_key]
+
+    def stop_all(self) -> None:
+        with self._lock:
+            stations = list(self.stations.values())
+            self.stations.clear()
+        for broadcaster in stations:
+            for listener in broadcaster.listeners:
+                listener.close()
+            broadcaster.stop()
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            key: {
+                'mode': b.mode,
+                'warm': b.keep_warm,
+                'listeners': len(b.listeners),
+                'packets': b.packets,
+                'reconnects': b.reconnects,
+                'dropped': sum(l.stats.dropped for l in b.listeners),
+                'underruns': sum(l.stats.underruns for l in b.listeners),
+                'reencoding': sum(1 for l in b.listeners if not l.gain.passthrough),
+            }
+            for key, b in list(self.stations.items())
+        }
+
+    def listeners(self) -> List[Tuple[str, BroadcastListener]]:
+        """every listening guild's source with the station it plays."""
+        return [(key, listener) for key, b in list(self.stations.items()) for listener in b.listeners]
+
+
+# create a global instance for easy import
+broadcaster = BroadcastManager()
@@ -0,0 +1,105 @@
+"""
+in-process volume for voice playback.
+
+a `GainStage` scales 16-bit stereo pcm frame by frame. changing the volume only moves
+its target, so a change is heard on the next 20 ms frame without touching ffmpeg.
+the move to a new target is spread over `VOICE_GAIN_RAMP_MS` in small steps so it
+doesn't click, and a new target set halfway through a ramp carries on from wherever
+the ramp had got to, so a burst of button presses turns into one smooth change.
+muting is a ramp to silence.
+
+`GainTransformer` puts a gain stage on a pcm source (like discord.py's
+`PCMVolumeTransformer`). shared station broadcasts apply theirs per listener in
+`modules.voice.broadcaster`.
+"""
+import audioop
+from typing import Optional
+
+import discord
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+VOICE_GAIN_RAMP_MS = getattr(_config, 'VOICE_GAIN_RAMP_MS', 20)
+
+FRAME_MS = 20
+SAMPLE_WIDTH = 2
+# a ramp changes the gain in this many steps per frame (20 samples each)
+RAMP_STEPS = 48
+
+
+class GainStage:
+    """a volume with a smooth ramp between settings. set from the bot, applied on the voice thread."""
+
+    def __init__(self, gain: float = 1.0, ramp_ms: int = VOICE_GAIN_RAMP_MS):
+        self.target = gain
+        self.current = gain
+        self.muted = False
+        self.ramp_frames = max(1, round(ramp_ms / FRAME_MS))
+        self._frames_left = 0
+
+    @property
+    def ramp_seconds(self) -> float:
+        return self.ramp_frames * FRAME_MS / 1000
+
+    @property
+    def passthrough(self) -> bool:
+        """true when frames come out unchanged."""
+        return not self.muted and self.current == self.target == 1.0
+
+    @property
+    def silent(self) -> bool:
+        """true once a mute has faded all the way out."""
+        return self.muted and self.current == 0.0
+
+    def set(self, gain: float) -> None:
+        self.target = max(0.0, min(2.0, gain))
+        self._frames_left = self.ramp_frames
+
+    def mute(self, muted: bool = True) -> None:
+        self.muted = muted
+        self._frames_left = self.ramp_frames
+
+    def apply(self, pcm: bytes) -> bytes:
+        """scale one frame of pcm, moving one step along any ramp in progress."""
+        target = 0.0 if self.muted else self.target
+        start = self.current
+        if start == target or self._frames_left <= 0:
+            self.current = target
+            return pcm if target == 1.0 else audioop.mul(pcm, SAMPLE_WIDTH, target)
+
+        end = start + (target - start) / self._frames_left
+        self._frames_left -= 1
+        self.current = target if self._frames_left == 0 else end
+
+        # step the gain across the frame in blocks of whole stereo samples
+        block = max(4, len(pcm) // RAMP_STEPS // 4 * 4)
+        steps = -(-len(pcm) // block)
+        out = []
+        for i in range(steps):
+            gain = start + (end - start) * (i + 1) / steps
+            out.append(audioop.mul(pcm[i * block:(i + 1) * block], SAMPLE_WIDTH, gain))
+        return b''.join(out)
+
+
+class GainTransformer(discord.AudioSource):
+    """applies a gain stage to a pcm audio source."""
+
+    def __init__(self, original: discord.AudioSource, gain: Optional[GainStage] = None):
+        if original.is_opus():
+            raise discord.ClientException('GainTransformer needs a pcm source')
+        self.original = original
+        self.gain = gain or GainStage()
+
+    def read(self) -> bytes:
+        data = self.original.read()
+        if not data or self.gain.passthrough:
+            return data
+        if self.gain.silent:
+            return bytes(len(data))
+        return self.gain.apply(data)
+
+    def cleanup(self) -> None:
+        self.original.cleanup()
@@ -0,0 +1,195 @@
+"""
+stream format probe for station broadcasts.
+
+before a station's broadcast starts, the first few kilobytes of its stream are read
+through the shared http client and sniffed. a mount that already serves ogg opus in
+the shape discord wants (48 kHz stereo, 20 ms packets) can be played with ffmpeg
+copying the packets as they are (`codec='copy'`), with no decode or encode at all.
+anything else (mp3, aac, vorbis, odd opus framing, or a probe that failed) is
+transcoded as before.
+
+results are cached per stream url. a broadcast whose copy mode turns out not to
+work falls back to transcoding and tells the probe, so the next start doesn't try
+copying again until the cache expires.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+import aiohttp
+
+from utils.http_client import HTTPClient, http_client
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+VOICE_PASSTHROUGH = getattr(_config, 'VOICE_PASSTHROUGH', True)
+VOICE_PROBE_TIMEOUT_SECONDS = getattr(_config, 'VOICE_PROBE_TIMEOUT_SECONDS', 3)
+VOICE_PROBE_TTL_MINUTES = getattr(_config, 'VOICE_PROBE_TTL_MINUTES', 60)
+
+PROBE_BYTES = 16 * 1024
+
+# frame length in ms for each opus toc config (rfc 6716 section 3.1)
+_SILK_MS = (10, 20, 40, 60)
+_HYBRID_MS = (10, 20)
+_CELT_MS = (2.5, 5, 10, 20)
+
+
+@dataclass
+class StreamFormat:
+    """what a station's stream carries."""
+    codec: Optional[str] = None
+    content_type: str = ''
+    channels: Optional[int] = None
+    frame_ms: Optional[float] = None
+    copy_failed: bool = False
+
+    @property
+    def passthrough(self) -> bool:
+        """true when the packets can go to discord without a transcode."""
+        return self.codec == 'opus' and self.channels == 2 and self.frame_ms == 20 and not self.copy_failed
+
+
+def ogg_packets(data: bytes) -> Iterator[bytes]:
+    """the complete packets in a run of ogg pages, stopping at a truncated page."""
+    pos = data.find(b'OggS')
+    packet = b''
+    while 0 <= pos and pos + 27 <= len(data) and data[pos:pos + 4] == b'OggS':
+        segments = data[pos + 26]
+        table = data[pos + 27:pos + 27 + segments]
+        body = pos + 27 + segments
+        if len(table) < segments or body + sum(table) > len(data):
+            return
+        for lacing in table:
+            packet += data[body:body + lacing]
+            body += lacing
+            if lacing < 255:
+                yield packet
+                packet = b''
+        pos = body
+
+
+def opus_packet_ms(packet: bytes) -> Optional[float]:
+    """duration of the audio in one opus packet, from its toc byte."""
+    if not packet:
+        return None
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame_ms = _SILK_MS[config % 4]
+    elif config < 16:
+        frame_ms = _HYBRID_MS[config % 2]
+    else:
+        frame_ms = _CELT_MS[config % 4]
+    code = toc & 3
+    if code == 0:
+        frames = 1
+    elif code < 3:
+        frames = 2
+    elif len(packet) > 1:
+        frames = packet[1] & 0x3f
+    else:
+        return None
+    return frame_ms * frames
+
+
+def sniff(content_type: str, head: bytes) -> StreamFormat:
+    """work out the stream format from its content type and first bytes."""
+    content_type = content_type.split(';')[0].strip().lower()
+    fmt = StreamFormat(content_type=content_type)
+    if b'OggS' in head[:4096]:
+        packets = ogg_packets(head)
+        first = next(packets, b'')
+        if first.startswith(b'OpusHead') and len(first) >= 10:
+            fmt.codec = 'opus'
+            fmt.channels = first[9]
+            # the second packet is OpusTags, then audio
+            next(packets, None)
+            fmt.frame_ms = opus_packet_ms(next(packets, b''))
+        elif first.startswith(b'\x01vorbis'):
+            fmt.codec = 'vorbis'
+        elif first.startswith(b'\x7fFLAC'):
+            fmt.codec = 'flac'
+        else:
+            fmt.codec = 'ogg'
+    elif head.startswith(b'ID3') or content_type in ('audio/mpeg', 'audio/mp3') or head[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xfa'):
+        fmt.codec = 'mp3'
+    elif content_type in ('audio/aac', 'audio/aacp') or head[:2] in (b'\xff\xf1', b'\xff\xf9'):
+        fmt.codec = 'aac'
+    return fmt
+
+
+class StreamProbe:
+    """cached stream formats, one probe per url at a time."""
+
+    def __init__(
+        self,
+        client: HTTPClient = http_client,
+        timeout: float = VOICE_PROBE_TIMEOUT_SECONDS,
+        ttl: float = VOICE_PROBE_TTL_MINUTES * 60,
+        enabled: bool = VOICE_PASSTHROUGH
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.ttl = ttl
+        self.enabled = enabled
+        self._formats: Dict[str, Tuple[float, StreamFormat]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get(self, url: str) -> StreamFormat:
+        """the stream's format, probing it if the cached result is missing or old."""
+        if not self.enabled:
+            return StreamFormat()
+        cached = self._formats.get(url)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        task = self._inflight.get(url)
+        if task is None:
+            task = self._inflight[url] = asyncio.create_task(self._probe(url))
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    def mark_transcode(self, url: str) -> None:
+        """remember that copying this stream didn't work. safe to call from any thread."""
+        cached = self._formats.get(url)
+        fmt = cached[1] if cached else StreamFormat()
+        fmt.copy_failed = True
+        self._formats[url] = (time.monotonic(), fmt)
+
+    async def _probe(self, url: str) -> StreamFormat:
+        try:
+            async with self.client.get(
+                url,
+                headers={'Accept': '*/*', 'Icy-MetaData': '0'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                response.raise_for_status()
+                head = b''
+                while len(head) < PROBE_BYTES:
+                    chunk = await response.content.read(PROBE_BYTES - len(head))
+                    if not chunk:
+                        break
+                    head += chunk
+                content_type = response.headers.get('Content-Type', '')
+                # a live stream never ends, so don't leave the connection for the pool
+                response.close()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # not cached, so the next start probes again
+            logger.warning(f"couldn't probe {url}, transcoding: {e}")
+            return StreamFormat()
+
+        fmt = sniff(content_type, head)
+        self._formats[url] = (time.monotonic(), fmt)
+        mode = 'passthrough' if fmt.passthrough else 'transcode'
+        logger.info(f"{url} serves {fmt.codec or 'unknown'} ({fmt.content_type or 'no content type'}), using {mode}")
+        return fmt
+
+
+# create a global instance for easy import
+stream_probe = StreamProbe()
@@ -5,23 +5,29 @@ voice cog for handling voice channel connections and audio streaming.
 import asyncio
 import logging
 from typing import Dict, Optional, Any
-import aiohttp
 import json
 from datetime import datetime
 
 import discord
 from discord import app_commands, ui
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 import config
+from modules.radioboss.now_playing import now_playing
+from modules.radioboss.stream_urls import stream_urls
+from modules.voice.broadcaster import broadcaster
+from modules.voice.gain import GainStage, GainTransformer
+from modules.voice.stream_probe import stream_probe
+from modules.radioboss.track_events import TRACK_CHANGED, TrackChange, track_events
+from utils.event_bus import event_bus
+from utils.bot_admin import is_bot_admin
+from utils.histogram import Histogram
 
 logger = logging.getLogger(__name__)
 
-# FFmpeg options for stable audio streaming
-FFMPEG_OPTIONS = {
-    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-    'options': '-vn -loglevel warning -af volume=1.0',
-}
+VOICE_FIRST_PACKET_TIMEOUT_SECONDS = getattr(config, 'VOICE_FIRST_PACKET_TIMEOUT_SECONDS', 10)
+VOICE_WARM_STATIONS = getattr(config, 'VOICE_WARM_STATIONS', [])
+EMBED_MAX_FIELDS = 25  # discord's limit per embed
 
 class VoiceControls(ui.View):
     """view for voice control buttons."""
@@ -32,8 +38,8 @@ class VoiceControls(ui.View):
         self.voice_client = voice_client
         self.bot = bot
         self._message = None
+        self.track_key = None  # the track the panel currently shows
         self.volume = 0.5  # default volume (50% of original)
-        self._current_source = None
         
     async def on_timeout(self) -> None:
         """handle view timeout."""
@@ -75,28 +81,24 @@ class VoiceControls(ui.View):
                 await interaction.response.send_message("not connected to a voice channel!", ephemeral=True)
                 return
 
-            # get the bot's member object in the guild
-            bot_member = interaction.guild.me
-            
-            if bot_member.voice and bot_member.voice.mute:
-                # unmute the bot
-                await bot_member.edit(mute=False)
+            gain = self._gain()
+            if gain is None:
+                await interaction.response.send_message("nothing is playing right now!", ephemeral=True)
+                return
+
+            # fade the stream in or out on our side rather than server muting the bot
+            current_embed = interaction.message.embeds[0]
+            current_embed.color = 0x2f3136  # dark gray theme
+            if gain.muted:
+                gain.mute(False)
                 button.label = "Pause"
-                # get the current embed to preserve all fields
-                current_embed = interaction.message.embeds[0]
                 current_embed.title = "Now Playing"
-                current_embed.color = 0x2f3136  # Dark gray/black theme
-                await interaction.response.edit_message(embed=current_embed, view=self)
             else:
-                # Mute the bot
-                await bot_member.edit(mute=True)
+                gain.mute()
                 button.label = "Play"
-                # get the current embed to preserve all fields
-                current_embed = interaction.message.embeds[0]
                 current_embed.title = "Paused"
-                current_embed.color = 0x2f3136  # dark gray theme
-                await interaction.response.edit_message(embed=current_embed, view=self)
-                
+            await interaction.response.edit_message(embed=current_embed, view=self)
+
             if not interaction.response.is_done():
                 await interaction.response.defer()
                 
@@ -105,50 +107,21 @@ class VoiceControls(ui.View):
             if not interaction.response.is_done():
                 await interaction.response.send_message("an error occurred while toggling playback", ephemeral=True)
 
-    def _create_audio_source(self, stream_url: str, volume: float = 0.5):
-        """create a new audio source with the specified volume."""
-        # create a copy of FFMPEG_OPTIONS to avoid modifying the original
-        ffmpeg_options = FFMPEG_OPTIONS.copy()
-        
-        # update the volume in the options
-        ffmpeg_options['options'] = f"-vn -loglevel warning -af volume={volume:.2f}"
-        
-        return discord.FFmpegPCMAudio(
-            stream_url,
-            **ffmpeg_options
-        )
+    def _gain(self) -> Optional[GainStage]:
+        """the gain stage of the source the voice client is playing."""
+        if not self.voice_client or not self.voice_client.is_connected():
+            return None
+        return getattr(self.voice_client.source, 'gain', None)
 
     async def _update_volume(self, interaction: discord.Interaction, new_volume: float) -> None:
-        """update the volume and restart playback with new volume."""
-        if not self.voice_client or not self.voice_client.is_connected():
+        """ramp playback to the new volume (takes effect on the next 20 ms frame)."""
+        gain = self._gain()
+        if gain is None:
             return
 
         try:
-            was_playing = not self.voice_client.is_paused()
-            
-            # create new source with updated volume
-            stream_url = getattr(self.voice_client.source, 'url', config.RADIOBOSS_STREAM_URL)
-            new_source = self._create_audio_source(stream_url, new_volume)
-            
-            # store the source for volume adjustments
-            self._current_source = new_source
-            
-            # stop current playback and start new one
-            self.voice_client.stop()
-            
-            # get the after callback if it exists
-            after_callback = getattr(self.voice_client, '_player', None) and self.voice_client._player.after
-            
-            # start new playback
-            self.voice_client.play(new_source, after=after_callback)
-            
-            # restore play/pause state if needed
-            if not was_playing:
-                self.voice_client.pause()
-                
-            # Update the volume display
+            gain.set(new_volume)
             await self._update_volume_display(interaction)
-            
         except Exception as e:
             logger.error(f"error updating volume: {e}")
             if not interaction.response.is_done():
@@ -243,6 +216,12 @@ class VoiceControls(ui.View):
             if not interaction.response.is_done():
                 await interaction.response.defer()
             
+            # fade out before disconnecting
+            gain = self._gain()
+            if gain is not None:
+                gain.mute()
+                await asyncio.sleep(gain.ramp_seconds + 0.02)
+
             # get the voice cog and clean up
             cog = self.bot.get_cog("VoiceCog")
             if cog:
@@ -273,13 +252,90 @@ class VoiceCog(commands.Cog):
         """initialize the voice cog."""
         self.bot = bot
         self.voice_clients: Dict[int, discord.VoiceClient] = {}
+        # guild id -> the control panel posted by /join, kept in step with the playing track
+        self.panels: Dict[int, VoiceControls] = {}
+        # /join interaction to first audio played, in ms, split by whether the station was already running
+        self.join_latency = {'warm': Histogram(), 'cold': Histogram()}
+        self._unsubscribe = None
         logger.info("voice cog initialized")
 
+    async def cog_load(self) -> None:
+        """follow track changes so control panels show what's playing."""
+        self._unsubscribe = event_bus.subscribe(TRACK_CHANGED, self.on_track_changed)
+        if VOICE_WARM_STATIONS:
+            self.keep_warm.start()
+
+    async def cog_unload(self) -> None:
+        if self._unsubscribe:
+            self._unsubscribe()
+        self.keep_warm.cancel()
+        broadcaster.stop_all()
+
+    @tasks.loop(minutes=1)
+    async def keep_warm(self) -> None:
+        """keep the stations in VOICE_WARM_STATIONS running so /join attaches to them instantly."""
+        for station_key in VOICE_WARM_STATIONS:
+            station = config.STATIONS.get(station_key)
+            if station is None or station_key in broadcaster.stations:
+                continue
+            try:
+                stream_url = await stream_urls.resolve(station_key)
+                stream_format = await stream_probe.get(stream_url)
+                broadcaster.warm(station_key, stream_url, passthrough=stream_format.passthrough)
+            except Exception as e:
+                logger.error(f"error warming {station_key}: {e}")
+
+    @keep_warm.before_loop
+    async def before_keep_warm(self) -> None:
+        await self.bot.wait_until_ready()
+
+    @staticmethod
+    def _set_field(embed: discord.Embed, name: str, value: str, index: int = 0) -> None:
+        """replace the named field, or insert it at index if the embed doesn't have one."""
+        for i, embed_field in enumerate(embed.fields):
+            if embed_field.name == name:
+                embed.set_field_at(i, name=name, value=value, inline=False)
+                return
+        embed.insert_field_at(index, name=name, value=value, inline=False)
+
+    @staticmethod
+    def _add_track_field(embed: discord.Embed, view: 'VoiceControls') -> None:
+        track = track_events.current()
+        if track:
+            embed.insert_field_at(0, name="Track", value=track.display, inline=False)
+            view.track_key = track.key
+
+    async def on_track_changed(self, track: TrackChange) -> None:
+        """show the new track on every control panel streaming this station."""
+        if track.station_key != config.DEFAULT_STATION:
+            return
+        panels = [(guild_id, view) for guild_id, view in self.panels.items() if view.track_key != track.key]
+        await asyncio.gather(*(self._update_panel(guild_id, view, track) for guild_id, view in panels))
+
+    async def _update_panel(self, guild_id: int, view: 'VoiceControls', track: TrackChange) -> None:
+        message = view._message
+        if message is None or not message.embeds:
+            return
+        embed = message.embeds[0]
+        self._set_field(embed, "Track", track.display)
+        if any(embed_field.name == "Volume" for embed_field in embed.fields):
+            # the stored message predates any volume button presses
+            self._set_field(embed, "Volume", f"`{self._get_volume_bar(view.volume)}` {self._get_volume_percent(view.volume)}%")
+        try:
+            view._message = await message.edit(embed=embed, view=view)
+            view.track_key = track.key
+        except discord.HTTPException as e:
+            # the panel was deleted or its interaction token has expired; stop updating it
+            logger.debug(f"dropping voice panel for guild {guild_id}: {e}")
+            if self.panels.get(guild_id) is view:
+                del self.panels[guild_id]
+
     async def cleanup_voice_client(self, guild_id: int) -> None:
         """clean up voice client for a guild."""
         if guild_id not in self.voice_clients:
             return
             
+        self.panels.pop(guild_id, None)
         vc = self.voice_clients[guild_id]
         try:
             # stop any ongoing playback
@@ -346,8 +402,9 @@ class VoiceCog(commands.Cog):
                 
             self.voice_clients[guild_id] = voice_client
 
-            # test if we can access the stream URL
-            stream_url = config.RADIOBOSS_STREAM_URL
+            # a running broadcast keeps its url, otherwise race the station's urls for one that answers
+            station = broadcaster.stations.get(config.DEFAULT_STATION)
+            stream_url = station.stream_url if station is not None else await stream_urls.resolve(config.DEFAULT_STATION)
             logger.info(f"attempting to stream from: {stream_url}")
             
             # create audio source with error handling
@@ -363,19 +420,22 @@ class VoiceCog(commands.Cog):
                     logger.info("playback ended normally")
 
             try:
-                # try to create the audio source
-                audio_source = discord.FFmpegPCMAudio(
-                    stream_url,
-                    **FFMPEG_OPTIONS
+                # listen to the station's shared broadcast (one ffmpeg per station, not per guild),
+                # copying the packets as they are when the mount already serves opus
+                stream_format = await stream_probe.get(stream_url)
+                latency = self.join_latency['warm' if station is not None and station.primed else 'cold']
+                requested_at = interaction.created_at.timestamp()
+                audio_source = broadcaster.subscribe(
+                    config.DEFAULT_STATION, stream_url, guild_id, passthrough=stream_format.passthrough
                 )
+                audio_source.on_first_audio = lambda at: latency.record((at - requested_at) * 1000)
                 
-                # store the source and start playing
-                view = VoiceControls(voice_client, self.bot)
-                view._current_source = audio_source
+                # start playing
                 voice_client.play(audio_source, after=after_playing)
                 
-                # check if playback actually started
-                await asyncio.sleep(1)  # give it a moment to start
+                # wait for the station to deliver audio (immediate if it's already running)
+                if not await asyncio.to_thread(audio_source.wait_for_audio, VOICE_FIRST_PACKET_TIMEOUT_SECONDS):
+                    raise Exception("no audio arrived from the stream")
                 
                 if not voice_client.is_playing():
                     raise Exception("audio source created but playback did not start")
@@ -411,21 +471,28 @@ class VoiceCog(commands.Cog):
                 
                 # create and send controls
                 view = VoiceControls(voice_client, self.bot)
+                self._add_track_field(embed, view)
                 message = await interaction.followup.send(embed=embed, view=view)
                 view._message = message
+                self.panels[guild_id] = view
                 
             except Exception as audio_error:
                 logger.error(f"audio creation/playback error: {audio_error}")
+                # don't hand the same url to the fallback, or to the next /join
+                stream_urls.mark_failed(config.DEFAULT_STATION, stream_url)
+                stream_url = await stream_urls.resolve(config.DEFAULT_STATION)
                 
                 # try alternative FFmpeg options
                 try:
                     logger.info("trying alternative FFmpeg options...")
-                    audio_source = discord.FFmpegPCMAudio(
+                    audio_source = GainTransformer(discord.FFmpegPCMAudio(
                         stream_url,
                         before_options='-reconnect 1 -reconnect_streamed 1',
                         options='-vn'
-                    )
+                    ))
                     
+                    if voice_client.is_playing():
+                        voice_client.stop()
                     voice_client.play(audio_source, after=after_playing)
                     
                     # check if playback started
@@ -455,8 +522,10 @@ class VoiceCog(commands.Cog):
                     
                     # create and send controls
                     view = VoiceControls(voice_client, self.bot)
+                    self._add_track_field(embed, view)
                     message = await interaction.followup.send(embed=embed, view=view)
                     view._message = message
+                    self.panels[guild_id] = view
                     
                 except Exception as final_error:
                     logger.error(f"all playback attempts failed: {final_error}")
@@ -533,74 +602,9 @@ class VoiceCog(commands.Cog):
             logger.info(f"auto-disconnecting from {before.channel.name} - no listeners")
             await self.cleanup_voice_client(guild_id)
             
-    async def _fetch_radioboss_data(self) -> Optional[Dict[str, Any]]:
-        """fetch current track information from RadioBOSS API."""
-        if not hasattr(config, 'RADIOBOSS_API_KEY') or not config.RADIOBOSS_API_KEY:
-            logger.error("RADIOBOSS_API_KEY is not configured")
-            return None
-            
-        # use the domain from RADIOBOSS_STREAM_URL or default to c4.radioboss.fm
-        api_domain = "c4.radioboss.fm"  # default API domain
-        station_id = "560"  # default station ID
-        
-        if hasattr(config, 'RADIOBOSS_STREAM_URL'):
-            # extract domain from stream URL (e.g., c4.radioboss.fm from https://c4.radioboss.fm:8560/stream)
-            import re
-            match = re.search(r'//([^/:]+)', config.RADIOBOSS_STREAM_URL)
-            if match:
-                api_domain = match.group(1)
-        
-        # construct the API URL with the correct format
-        url = f"https://{api_domain}/api/info/{station_id}"
-        
-        # prepare headers and params
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json',
-            'X-API-Key': config.RADIOBOSS_API_KEY
-        }
-        params = {"key": config.RADIOBOSS_API_KEY}
-        
-        try:
-            # try with verify_ssl=False in case of SSL certificate issues
-            connector = aiohttp.TCPConnector(ssl=False)
-            timeout = aiohttp.ClientTimeout(total=10)  # 10 seconds timeout
-            
-            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
-                # first try with headers and params
-                async with session.get(url, params=params) as response:
-                    response_text = await response.text()
-                    
-                    # try to parse as JSON regardless of content-type
-                    try:
-                        # first try to parse the response text as JSON
-                        import json
-                        data = json.loads(response_text)
-                        
-                        # if we got this far, the response is valid JSON
-                        logger.debug(f"Successfully parsed JSON response from {url}")
-                        
-                        # check if the response has the expected structure
-                        if isinstance(data, dict) and ('currenttrack_info' in data or 'nowplaying' in data):
-                            return data
-                        else:
-                            logger.error(f"Unexpected API response format: {data}")
-                            return None
-                            
-                    except json.JSONDecodeError as json_err:
-                        # if we can't parse as JSON, log the error and response
-                        logger.error(f"Failed to parse JSON response: {json_err}")
-                        logger.error(f"Response content type: {response.content_type}")
-                        logger.error(f"Response headers: {dict(response.headers)}")
-                        logger.error(f"Response text: {response_text[:1000]}...")
-                        return None
-                        
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout while connecting to RadioBOSS API at {url}")
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching RadioBOSS data from {url}: {str(e)}")
-            return None
+    async def _fetch_radioboss_data(self, station: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """get current track information for a station (default station if omitted)."""
+        return await now_playing.get(station)
             
     def _format_duration(self, duration_str: str) -> str:
         """format duration string from MM:SS to a more readable format."""
@@ -626,7 +630,11 @@ class VoiceCog(commands.Cog):
         name="currently-playing",
         description="show information about the currently playing track"
     )
-    async def currently_playing(self, interaction: discord.Interaction) -> None:
+    @app_commands.describe(station="the station to check (defaults to the main station)")
+    @app_commands.choices(station=[
+        app_commands.Choice(name=info['name'], value=key) for key, info in config.STATIONS.items()
+    ])
+    async def currently_playing(self, interaction: discord.Interaction, station: Optional[str] = None) -> None:
         """handle the /currently-playing slash command."""
         await interaction.response.defer(ephemeral=True)
         
@@ -640,7 +648,7 @@ class VoiceCog(commands.Cog):
         await interaction.followup.send(embed=embed, ephemeral=True)
         
         # fetch data from RadioBOSS API
-        data = await self._fetch_radioboss_data()
+        data = await self._fetch_radioboss_data(station)
         
         if not data:
             error_embed = discord.Embed(
@@ -708,6 +716,61 @@ class VoiceCog(commands.Cog):
         # update the message with the final embed and remove any existing view
         await interaction.edit_original_response(embed=embed, view=None)
 
+    @app_commands.command(
+        name="now-playing-stats",
+        description="show now playing cache and radioboss latency stats"
+    )
+    @is_bot_admin()
+    async def now_playing_stats(self, interaction: discord.Interaction) -> None:
+        """handle the /now-playing-stats slash command."""
+        stats = now_playing.stats()
+        embed = discord.Embed(title="📊 Now Playing Cache", color=0x2f3136)
+        for key, station_stats in stats.items():
+            embed.add_field(name=config.STATIONS.get(key, {}).get('name', key), value=station_stats.summary(), inline=False)
+        if not stats:
+            embed.description = "No now playing lookups yet."
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="voice-stats",
+        description="show station broadcast and per-guild voice stream health"
+    )
+    @is_bot_admin()
+    async def voice_stats(self, interaction: discord.Interaction) -> None:
+        """handle the /voice-stats slash command."""
+        embed = discord.Embed(title="📊 Voice Streams", color=0x2f3136)
+        for key, station in broadcaster.stats().items():
+            embed.add_field(
+                name=config.STATIONS.get(key, {}).get('name', key),
+                value=f"{station['mode']}, {station['listeners']} guilds, {station['packets']} packets, "
+                      f"{station['reconnects']} reconnects",
+                inline=False
+            )
+        histograms = [(kind, histogram) for kind, histogram in self.join_latency.items() if histogram.total]
+        # discord rejects an embed with more than EMBED_MAX_FIELDS fields, so listeners get what's left
+        listeners = broadcaster.listeners()
+        room = max(0, EMBED_MAX_FIELDS - len(embed.fields) - len(histograms))
+        shown = listeners if len(listeners) <= room else listeners[:max(0, room - 1)]
+        for key, listener in shown:
+            guild = self.bot.get_guild(listener.guild_id)
+            embed.add_field(
+                name=f"{guild.name if guild else listener.guild_id} ({key})",
+                value=listener.stats.summary(listener.depth),
+                inline=False
+            )
+        if len(shown) < len(listeners) and room:
+            embed.add_field(name="…", value=f"+{len(listeners) - len(shown)} more guilds", inline=False)
+        for kind, histogram in histograms:
+            embed.add_field(
+                name=f"/join to first audio ({kind} station)",
+                value=f"p50 {histogram.quantile(0.5):.0f}ms, p95 {histogram.quantile(0.95):.0f}ms, "
+                      f"{histogram.total} joins\n```{histogram.render()}```",
+                inline=False
+            )
+        if not embed.fields:
+            embed.description = "No guilds are listening right now."
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 async def setup(bot: commands.Bot) -> None:
     """set up the voice cog."""
     await bot.add_cog(VoiceCog(bot))
@@ -0,0 +1,284 @@
+"""
+circuit breakers and adaptive timeouts for upstream http calls.
+
+`BreakerRegistry.call(host, endpoint, fn)` runs `fn(timeout)` behind two breakers: one
+for the host and one for the endpoint. a breaker opens when its last
+`BREAKER_MIN_CALLS` calls all failed, or at least `BREAKER_FAILURE_RATIO` of its
+recent calls did (timeouts, connection errors, 5xx and 429). while it's open, calls
+are rejected at once with `CircuitOpenError` rather than waiting on an upstream that
+isn't answering, so callers can serve what they have cached. after `BREAKER_OPEN_SECONDS` one call is let through (half-open), and it
+decides whether the breaker closes or opens again.
+
+the timeout handed to fn follows the endpoint's latency: `BREAKER_TIMEOUT_MULTIPLIER`
+times the p99 of its recent successful calls, kept between the min and max timeouts.
+each failed half-open probe doubles the next probe's timeout, so an upstream that
+comes back slower than before can still close the breaker. idempotent calls are
+retried with jittered backoff, but only while the host's retry budget allows it.
+each request adds `BREAKER_RETRY_RATIO` of a retry to the budget, so retries can't
+multiply the load on an upstream that's already struggling.
+"""
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import aiohttp
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+BREAKER_WINDOW = getattr(_config, 'BREAKER_WINDOW', 20)
+BREAKER_MIN_CALLS = getattr(_config, 'BREAKER_MIN_CALLS', 5)
+BREAKER_FAILURE_RATIO = getattr(_config, 'BREAKER_FAILURE_RATIO', 0.5)
+BREAKER_OPEN_SECONDS = getattr(_config, 'BREAKER_OPEN_SECONDS', 30)
+BREAKER_MIN_TIMEOUT_SECONDS = getattr(_config, 'BREAKER_MIN_TIMEOUT_SECONDS', 1)
+BREAKER_MAX_TIMEOUT_SECONDS = getattr(_config, 'BREAKER_MAX_TIMEOUT_SECONDS', 10)
+BREAKER_TIMEOUT_MULTIPLIER = getattr(_config, 'BREAKER_TIMEOUT_MULTIPLIER', 3)
+BREAKER_RETRIES = getattr(_config, 'BREAKER_RETRIES', 2)
+BREAKER_RETRY_RATIO = getattr(_config, 'BREAKER_RETRY_RATIO', 0.2)
+BREAKER_RETRY_BACKOFF_SECONDS = getattr(_config, 'BREAKER_RETRY_BACKOFF_SECONDS', 0.2)
+
+# latencies needed before the timeout adapts, until then it's the max
+ADAPT_AFTER = 20
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable, trying again in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def is_failure(error: BaseException) -> bool:
+    """true for errors that say the upstream is unhealthy, not that the request was bad."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """closed/open/half-open state, recent outcomes and latencies for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_ratio: float = BREAKER_FAILURE_RATIO,
+        open_for: float = BREAKER_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_for = open_for
+        self.clock = clock
+        self.state = CLOSED
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.retries = 0
+        self.opened = 0
+        # half-open probes that failed since the breaker was last closed
+        self.failed_probes = 0
+        self.latencies: Deque[float] = deque(maxlen=200)
+        # True for each recent call that failed
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def retry_in(self) -> float:
+        """seconds until an open breaker lets a call through."""
+        return max(0.0, self._opened_at + self.open_for - self.clock()) if self.state == OPEN else 0.0
+
+    def allow(self) -> bool:
+        """whether a call may go ahead. a True in half-open must be followed by record or release."""
+        if self.state == OPEN:
+            if self.retry_in > 0:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+        return True
+
+    def release(self) -> None:
+        """give back a half-open probe that was allowed but never made."""
+        self._probing = False
+
+    def record(self, ok: bool, latency: Optional[float] = None) -> None:
+        self.calls += 1
+        # a timeout says nothing about how long an answer takes, only successes count
+        if ok and latency is not None:
+            self.latencies.append(latency)
+        if not ok:
+            self.failures += 1
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok:
+                self.state = CLOSED
+                self.failed_probes = 0
+                self._outcomes.clear()
+                logger.info(f"{self.name} is answering again, breaker closed")
+            else:
+                self.failed_probes += 1
+                self._trip()
+            return
+        self._outcomes.append(not ok)
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls and (
+            all(self._outcomes[i] for i in range(-self.min_calls, 0))
+            or sum(self._outcomes) / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = self.clock()
+        logger.warning(f"{self.name} is failing, breaker open for {self.open_for:.0f}s")
+
+    def latency_ms(self, quantile: float) -> Optional[float]:
+        """latency at the given quantile over the recent calls."""
+        if not self.latencies:
+            return None
+        if len(self.latencies) == 1:
+            return self.latencies[0] * 1000
+        return statistics.quantiles(self.latencies, n=100, method='inclusive')[int(quantile * 100) - 1] * 1000
+
+    def timeout(
+        self,
+        failed_probes: int = 0,
+        multiplier: float = BREAKER_TIMEOUT_MULTIPLIER,
+        minimum: float = BREAKER_MIN_TIMEOUT_SECONDS,
+        maximum: float = BREAKER_MAX_TIMEOUT_SECONDS
+    ) -> float:
+        """seconds to wait for this upstream, a multiple of its recent p99, doubled per failed probe."""
+        if len(self.latencies) < ADAPT_AFTER:
+            return maximum
+        return min(maximum, max(minimum, self.latency_ms(0.99) / 1000 * multiplier) * 2 ** failed_probes)
+
+    def summary(self) -> str:
+        p50, p95 = self.latency_ms(0.5), self.latency_ms(0.95)
+        latency = f"p50 {p50:.0f}ms p95 {p95:.0f}ms" if p50 is not None else "no calls"
+        state = f"{self.state} ({self.retry_in:.0f}s left)" if self.state == OPEN else self.state
+        return (
+            f"{state}, {self.calls} calls, {self.failures} failed, {self.rejected} rejected, "
+            f"{self.retries} retries, opened {self.opened}x, {latency}, timeout {self.timeout():.1f}s"
+        )
+
+
+class RetryBudget:
+    """retries allowed as a fraction of requests: each request earns `ratio` of a retry, up to `cap`."""
+
+    def __init__(self, ratio: float = BREAKER_RETRY_RATIO, cap: float = 10):
+        self.ratio = ratio
+        self.cap = cap
+        self.tokens = cap
+        self.denied = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        return True
+
+
+class BreakerRegistry:
+    """breakers per host and per endpoint, and a retry budget per host."""
+
+    def __init__(
+        self,
+        retries: int = BREAKER_RETRIES,
+        backoff: float = BREAKER_RETRY_BACKOFF_SECONDS,
+        **breaker_options
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.budgets: Dict[str, RetryBudget] = {}
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name, **self.breaker_options)
+        return breaker
+
+    def budget(self, host: str) -> RetryBudget:
+        budget = self.budgets.get(host)
+        if budget is None:
+            budget = self.budgets[host] = RetryBudget()
+        return budget
+
+    async def call(self, host: str, endpoint: str, fn: Callable[[float], Awaitable[T]], retry: bool = True) -> T:
+        """await fn(timeout seconds) behind the host's and the endpoint's breakers.
+
+        raises CircuitOpenError without calling fn when either breaker is open, and
+        otherwise whatever fn raised on its last attempt. only pass retry=True for
+        requests that are safe to repeat.
+        """
+        host_breaker, breaker = self.breaker(host), self.breaker(f"{host} {endpoint}")
+        budget = self.budget(host)
+        attempt = 0
+        while True:
+            if not host_breaker.allow():
+                raise CircuitOpenError(host, host_breaker.retry_in)
+            if not breaker.allow():
+                host_breaker.release()
+                raise CircuitOpenError(breaker.name, breaker.retry_in)
+            if attempt == 0:
+                budget.deposit()
+
+            started = time.perf_counter()
+            try:
+                result = await fn(breaker.timeout(max(host_breaker.failed_probes, breaker.failed_probes)))
+            except asyncio.CancelledError:
+                host_breaker.release()
+                breaker.release()
+                raise
+            except Exception as e:
+                latency = time.perf_counter() - started
+                failed = is_failure(e)
+                host_breaker.record(not failed, latency)
+                breaker.record(not failed, latency)
+                attempt += 1
+                if not failed or not retry or attempt > self.retries or not budget.withdraw():
+                    raise
+                breaker.retries += 1
+                # full jitter, so callers that failed together don't retry together
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+                continue
+
+            latency = time.perf_counter() - started
+            host_breaker.record(True, latency)
+            breaker.record(True, latency)
+            return result
+
+    def stats(self) -> Dict[str, CircuitBreaker]:
+        return dict(self.breakers)
+
+
+# create a global instance for easy import
+breakers = BreakerRegistry()
@@ -0,0 +1,58 @@
+"""
+in-process publish/subscribe bus.
+
+components publish named events (e.g. 'track_changed') without knowing who is
+listening, and cogs subscribe async callbacks to the events they care about. every
+subscriber runs in its own task, so a slow or failing subscriber can't hold up the
+publisher or the other subscribers.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[..., Awaitable[None]]
+
+
+class EventBus:
+    """named events fanned out to async subscriber callbacks."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, event: str, callback: Subscriber) -> Callable[[], None]:
+        """call callback(*args) every time event is published. returns an unsubscribe function."""
+        self._subscribers.setdefault(event, []).append(callback)
+        return lambda: self.unsubscribe(event, callback)
+
+    def unsubscribe(self, event: str, callback: Subscriber) -> None:
+        callbacks = self._subscribers.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def subscribers(self, event: str) -> int:
+        return len(self._subscribers.get(event, ()))
+
+    def publish(self, event: str, *args: Any) -> List[asyncio.Task]:
+        """start every subscriber of event. returns their tasks for callers that want to wait."""
+        tasks = []
+        for callback in list(self._subscribers.get(event, ())):
+            task = asyncio.create_task(self._deliver(event, callback, args))
+            # keep a reference so the task isn't garbage collected mid-run
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            tasks.append(task)
+        return tasks
+
+    @staticmethod
+    async def _deliver(event: str, callback: Subscriber, args: tuple) -> None:
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.error(f"error in {event} subscriber {getattr(callback, '__qualname__', callback)}: {e}", exc_info=True)
+
+
+# create a global instance for easy import
+event_bus = EventBus()
@@ -0,0 +1,151 @@
+"""
+shared expiry scheduler for timed moderation actions.
+
+mutes, temp bans, lockdowns, quarantines and temporary admin grants all end at a
+known time. instead of each feature polling its table on its own interval, every
+pending expiry lives in one heap keyed by (kind, guild_id, target_id) and ordered
+by expires_at. the heap is rebuilt from the database when a kind is registered and
+each expiry is handed to that kind's handler as soon as it is due.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from utils.scheduler import TimerQueue
+
+logger = logging.getLogger(__name__)
+
+ExpiryHandler = Callable[[int, int], Awaitable[None]]
+# returns (guild_id, target_id, expires_at) for every pending expiry of a kind
+ExpiryLoader = Callable[[], Awaitable[Iterable[Tuple[int, int, object]]]]
+
+
+def to_timestamp(expires_at: Union[datetime, str, int, float, None]) -> Optional[float]:
+    """convert a stored expiry to a unix timestamp. naive datetimes are treated as utc."""
+    if expires_at is None or expires_at == '':
+        return None
+    if isinstance(expires_at, (int, float)):
+        return float(expires_at)
+    if isinstance(expires_at, str):
+        try:
+            expires_at = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+        except ValueError:
+            logger.warning(f"unparseable expiry timestamp: {expires_at!r}")
+            return None
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
+
+
+class ExpiryService:
+    """one timer heap for every kind of timed moderation action."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.timers = TimerQueue(clock=clock)
+        self.handlers: Dict[str, ExpiryHandler] = {}
+        self.loaders: Dict[str, ExpiryLoader] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    async def register(
+        self,
+        kind: str,
+        handler: ExpiryHandler,
+        loader: Optional[ExpiryLoader] = None,
+        autostart: bool = True
+    ) -> int:
+        """register the handler for a kind, load its pending expiries and start the runner.
+
+        returns how many expiries were loaded.
+        """
+        self.handlers[kind] = handler
+        loaded = 0
+        if loader is not None:
+            self.loaders[kind] = loader
+            loaded = await self.load(kind)
+        if autostart:
+            self.start()
+        return loaded
+
+    def unregister(self, kind: str) -> None:
+        """drop a kind's handler, e.g. when its cog is unloaded. pending timers stay in the db."""
+        self.handlers.pop(kind, None)
+        self.loaders.pop(kind, None)
+        for key in self.timers.keys():
+            if key[0] == kind:
+                self.timers.cancel(key)
+
+    async def load(self, kind: str) -> int:
+        """(re)load every pending expiry of a kind from its loader."""
+        loader = self.loaders.get(kind)
+        if loader is None:
+            return 0
+        try:
+            rows = await loader()
+        except Exception as e:
+            logger.error(f"failed to load {kind} expiries: {e}", exc_info=True)
+            return 0
+        loaded = 0
+        for guild_id, target_id, expires_at in rows:
+            if self.schedule(kind, guild_id, target_id, expires_at):
+                loaded += 1
+        logger.info(f"loaded {loaded} pending {kind} expiries")
+        return loaded
+
+    async def rebuild(self) -> int:
+        """throw away the heap and reload it from every registered loader."""
+        self.timers.clear()
+        total = 0
+        for kind in list(self.loaders):
+            total += await self.load(kind)
+        return total
+
+    def schedule(self, kind: str, guild_id: int, target_id: int, expires_at) -> bool:
+        """schedule (or move) an expiry. returns False if expires_at is empty or invalid."""
+        due = to_timestamp(expires_at)
+        if due is None:
+            return False
+        self.timers.schedule((kind, int(guild_id), int(target_id)), due)
+        return True
+
+    def cancel(self, kind: str, guild_id: int, target_id: int) -> bool:
+        """cancel a pending expiry, e.g. after a manual unmute or unban."""
+        return self.timers.cancel((kind, int(guild_id), int(target_id)))
+
+    def expires_at(self, kind: str, guild_id: int, target_id: int) -> Optional[float]:
+        return self.timers.due_time((kind, int(guild_id), int(target_id)))
+
+    def start(self) -> None:
+        """start firing expiries in the background if not already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.timers.run(self._dispatch))
+
+    async def stop(self) -> None:
+        """stop the background runner. pending expiries are kept."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_due(self, now: Optional[float] = None) -> int:
+        """fire everything due at now in the current task. used by tests and benchmarks."""
+        return await self.timers.run_due(self._dispatch, now)
+
+    async def _dispatch(self, key: Tuple[str, int, int], payload=None) -> None:
+        kind, guild_id, target_id = key
+        handler = self.handlers.get(kind)
+        if handler is None:
+            logger.warning(f"no handler registered for {kind} expiry {guild_id}/{target_id}")
+            return
+        await handler(guild_id, target_id)
+
+
+# create a global instance for easy import
+expiry_service = ExpiryService()
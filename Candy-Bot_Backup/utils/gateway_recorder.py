@@ -0,0 +1,185 @@
+"""
+anonymised recordings of gateway dispatches, for replaying offline.
+
+`GatewayRecorder.install(bot)` wraps discord.py's parsers for the events in
+`GATEWAY_RECORD_EVENTS`, so every matching dispatch is written to `GATEWAY_RECORD_PATH`
+before discord.py turns it into objects. the file is gzipped json lines, one per
+dispatch: `{"t": seconds since recording started, "e": event name, "d": payload}`.
+a file holds a single recording: a new recorder replaces whatever was at the path,
+since ids hashed with an earlier recording's key wouldn't match this one's.
+
+payloads are anonymised as they are recorded:
+
+    - snowflakes are replaced by keyed hashes (the key is random per recording and
+      never written), so the same id maps to the same fake id throughout a file and
+      members still point at their roles and channels. the creation day of the id
+      is kept, so account and server ages still mean something.
+    - text (names, nicknames, message content, topics, urls) is masked with 'x',
+      keeping its length and whitespace.
+    - avatar, icon and banner hashes are dropped.
+    - timestamps, permissions, flags and other numbers are kept as they are.
+
+READY keeps only the bot's own user. guild and member chunk payloads are recorded
+so a replay can rebuild the cache the other events refer to.
+
+`read_recording(path)` yields (t, event, payload) from a file, and is what
+benchmarks/bench_gateway_replay.py feeds to the cogs.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_RECORD_PATH = getattr(_config, 'GATEWAY_RECORD_PATH', '')
+GATEWAY_RECORD_EVENTS = getattr(_config, 'GATEWAY_RECORD_EVENTS', [
+    'READY', 'GUILD_CREATE', 'GUILD_MEMBERS_CHUNK', 'MESSAGE_CREATE', 'GUILD_MEMBER_ADD',
+    'GUILD_MEMBER_UPDATE', 'GUILD_MEMBER_REMOVE', 'GUILD_BAN_ADD', 'GUILD_ROLE_CREATE',
+    'GUILD_ROLE_UPDATE', 'GUILD_ROLE_DELETE', 'CHANNEL_CREATE', 'CHANNEL_DELETE',
+])
+
+# payloads that build the cache rather than being events in their own right
+STATE_EVENTS = ('READY', 'GUILD_CREATE', 'GUILD_MEMBERS_CHUNK')
+
+SNOWFLAKE = re.compile(r'\d{15,21}')
+DAY_MS = 86400000
+
+# strings kept as they are: iso timestamps, permission bitfields, enum-like values
+KEEP_KEYS = frozenset({
+    'timestamp', 'edited_timestamp', 'joined_at', 'premium_since', 'communication_disabled_until',
+    'permissions', 'allow', 'deny', 'discriminator', 'status', 'locale', 'preferred_locale',
+    'features', 'type', 'format_type',
+})
+# image hashes, dropped
+DROP_KEYS = frozenset({
+    'avatar', 'banner', 'icon', 'splash', 'discovery_splash', 'avatar_decoration_data',
+    'asset', 'email', 'phone',
+})
+
+
+class Anonymiser:
+    """consistent fake ids and masked text for gateway payloads."""
+
+    def __init__(self, key: Optional[bytes] = None):
+        self.key = key or os.urandom(32)
+        self._ids: Dict[str, str] = {}
+
+    def snowflake(self, value: str) -> str:
+        fake = self._ids.get(value)
+        if fake is None:
+            digest = int.from_bytes(hmac.new(self.key, value.encode(), hashlib.sha256).digest()[:8], 'big')
+            # keep the day the id was made, replace the rest
+            day = ((int(value) >> 22) // DAY_MS) * DAY_MS
+            fake = self._ids[value] = str(((day + digest % DAY_MS) << 22) | (digest >> 42))
+        return fake
+
+    def __call__(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, dict):
+            return {k: None if k in DROP_KEYS else self(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self(v, key) for v in value]
+        if isinstance(value, str):
+            if SNOWFLAKE.fullmatch(value) and key not in ('permissions', 'allow', 'deny'):
+                return self.snowflake(value)
+            if key in KEEP_KEYS:
+                return value
+            return re.sub(r'\S', 'x', value)
+        return value
+
+
+class GatewayRecorder:
+    """writes the dispatches discord.py parses to an anonymised recording."""
+
+    def __init__(
+        self,
+        path: str = GATEWAY_RECORD_PATH,
+        events: Iterable[str] = GATEWAY_RECORD_EVENTS,
+        anonymiser: Optional[Anonymiser] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.path = path
+        self.events = set(events)
+        self.anonymise = anonymiser or Anonymiser()
+        self.clock = clock
+        self.recorded = 0
+        self._started = clock()
+        self._file = None
+        self._opened = False
+        self._originals: Dict[str, Callable[[Any], None]] = {}
+
+    def open(self) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # reopening after close() carries on with the same recording
+            self._file = gzip.open(self.path, 'at' if self._opened else 'wt', encoding='utf-8')
+            if not self._opened:
+                self._started = self.clock()
+                self._opened = True
+
+    def record(self, event: str, data: Any, at: Optional[float] = None) -> None:
+        """write one dispatch. at is seconds since the recording started, now if omitted."""
+        self.open()
+        if event == 'READY':
+            data = {'user': data.get('user')}
+        line = {
+            't': round((self.clock() - self._started) if at is None else at, 4),
+            'e': event,
+            'd': self.anonymise(data),
+        }
+        self._file.write(json.dumps(line, separators=(',', ':')) + '\n')
+        self.recorded += 1
+
+    def install(self, bot) -> None:
+        """record the bot's dispatches from now on, before or after it connects."""
+        # the websocket looks parsers up in this same dict, so replacing entries is enough
+        parsers = bot._connection.parsers
+        for event in self.events:
+            parse = parsers.get(event)
+            if parse is None or event in self._originals:
+                continue
+            self._originals[event] = parse
+            parsers[event] = self._wrap(event, parse)
+        self.open()
+        logger.info(f"recording {len(self._originals)} gateway events to {self.path}")
+
+    def _wrap(self, event: str, parse: Callable[[Any], None]) -> Callable[[Any], None]:
+        def recording_parse(data: Any) -> None:
+            try:
+                self.record(event, data)
+            except Exception as e:
+                logger.error(f"error recording {event}: {e}")
+            parse(data)
+        return recording_parse
+
+    def uninstall(self, bot) -> None:
+        bot._connection.parsers.update(self._originals)
+        self._originals.clear()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"recorded {self.recorded} gateway events to {self.path}")
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, str, Dict[str, Any]]]:
+    """(seconds since start, event name, payload) for every dispatch in a recording."""
+    with open(path, 'rb') as file:
+        gzipped = file.read(2) == b'\x1f\x8b'
+    opener = gzip.open if gzipped else open
+    with opener(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry['t'], entry['e'], entry['d']
@@ -0,0 +1,63 @@
+"""
+fixed-bucket latency histogram.
+
+`Histogram` counts observations into buckets with fixed upper bounds, so recording
+is a lock and an increment and the memory used never grows. quantiles are read off
+the buckets (the upper bound of the bucket the quantile falls in), which is plenty
+for tracking how long something usually takes. safe to record from any thread.
+"""
+import bisect
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+# milliseconds
+DEFAULT_BOUNDS_MS = (50, 100, 250, 500, 1000, 2000, 3000, 5000, 10000)
+
+
+class Histogram:
+    """counts of observations per bucket."""
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_BOUNDS_MS):
+        self.bounds = tuple(sorted(bounds))
+        # one extra bucket for anything above the last bound
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.total += 1
+            self.sum += value
+            self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.total if self.total else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """upper bound of the bucket holding the q-th observation (the max for the last bucket)."""
+        if not self.total:
+            return None
+        rank = max(1, round(q * self.total))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def buckets(self) -> List[Tuple[str, int]]:
+        labels = [f"≤{bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return list(zip(labels, self.counts))
+
+    def render(self, unit: str = 'ms', width: int = 12) -> str:
+        """the non-empty buckets as text bars, for an embed code block."""
+        peak = max(self.counts) or 1
+        rows = [
+            f"{label + unit:>9} {'█' * max(1, round(count / peak * width)):<{width}} {count}"
+            for label, count in self.buckets() if count
+        ]
+        return '\n'.join(rows) or 'no data'
@@ -0,0 +1,116 @@
+"""
+bot-wide http client.
+
+every outbound request (radioboss search, song requests, now playing lookups) goes
+through one `aiohttp.ClientSession` with a keep-alive connection pool, so repeated
+calls to the same host reuse an open tcp/tls connection instead of handshaking
+again. the pool is capped overall and per host, and timeouts and default headers
+are shared. `close` is called once when the bot shuts down.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import aiohttp
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_LIMIT = getattr(_config, 'HTTP_POOL_LIMIT', 64)
+HTTP_POOL_LIMIT_PER_HOST = getattr(_config, 'HTTP_POOL_LIMIT_PER_HOST', 8)
+HTTP_KEEPALIVE_SECONDS = getattr(_config, 'HTTP_KEEPALIVE_SECONDS', 60)
+HTTP_TIMEOUT_SECONDS = getattr(_config, 'HTTP_TIMEOUT_SECONDS', 10)
+HTTP_CONNECT_TIMEOUT_SECONDS = getattr(_config, 'HTTP_CONNECT_TIMEOUT_SECONDS', 5)
+
+# the radioboss web endpoints answer browsers, so look like one
+BROWSER_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+DEFAULT_HEADERS = {
+    'User-Agent': BROWSER_USER_AGENT,
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+class HTTPClient:
+    """a lazily created, shared aiohttp session with a bounded keep-alive pool."""
+
+    def __init__(
+        self,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive: float = HTTP_KEEPALIVE_SECONDS,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive = keepalive
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.headers = dict(DEFAULT_HEADERS if headers is None else headers)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    async def session(self) -> aiohttp.ClientSession:
+        """get the shared session, creating it on first use."""
+        if not self.closed:
+            return self._session
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive,
+                    ttl_dns_cache=300
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=self.timeout,
+                    headers=self.headers
+                )
+                logger.info(f"opened shared http session ({self.limit_per_host} connections per host)")
+        return self._session
+
+    @asynccontextmanager
+    async def get(self, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """`async with http_client.get(url) as response:` on the shared session.
+
+        accepts the same keyword arguments as `aiohttp.ClientSession.get`, e.g.
+        params, headers (merged over the defaults), timeout and ssl.
+        """
+        session = await self.session()
+        async with session.get(url, **kwargs) as response:
+            yield response
+
+    def pool_stats(self) -> Dict[str, int]:
+        """connections currently open and idle in the pool."""
+        if self.closed:
+            return {'acquired': 0, 'idle': 0}
+        connector = self._session.connector
+        idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        return {'acquired': len(getattr(connector, '_acquired', ())), 'idle': idle}
+
+    async def close(self) -> None:
+        """close the session and every pooled connection."""
+        if not self.closed:
+            await self._session.close()
+            logger.info("closed shared http session")
+        self._session = None
+
+
+# create a global instance for easy import
+http_client = HTTPClient()
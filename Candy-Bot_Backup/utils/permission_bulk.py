@@ -0,0 +1,286 @@
+"""
+bulk permission overwrite edits.
+
+lockdowns, raid locks and mute role setup all touch one overwrite per channel (or
+per role per channel). instead of awaiting each edit in turn, callers build a
+`PermissionPlan` up front: every edit records the overwrite before and after, and
+edits that wouldn't change anything are dropped. `PermissionBulkEngine` then runs
+the plan with bounded concurrency. overwrite edits are rate limited per channel, so
+different channels run in parallel while a channel with several edits gets them all
+in a single overwrites PATCH instead of one request per target.
+
+a plan's before-state can be saved to the database, which makes rollback exact
+(including removing overwrites that didn't exist before) even after a restart.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import discord
+
+from modules.database.database import db
+
+try:
+    import config as _config
+except Exception:
+    _config = None
+
+logger = logging.getLogger(__name__)
+
+# channels edited at once
+PERMISSION_BULK_CONCURRENCY = getattr(_config, 'PERMISSION_BULK_CONCURRENCY', 8)
+
+Target = Union[discord.Role, discord.Member]
+
+
+def _normalise(overwrite: Optional[discord.PermissionOverwrite]) -> Optional[discord.PermissionOverwrite]:
+    """treat an empty overwrite the same as no overwrite."""
+    if overwrite is None or overwrite.is_empty():
+        return None
+    return overwrite
+
+
+@dataclass
+class OverwriteEdit:
+    """a single channel overwrite change."""
+    channel: discord.abc.GuildChannel
+    target: Target
+    before: Optional[discord.PermissionOverwrite]
+    after: Optional[discord.PermissionOverwrite]
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.channel.id, self.target.id
+
+
+class PermissionPlan:
+    """the overwrite edits to make, computed against the channels' current state."""
+
+    def __init__(self):
+        self.edits: Dict[Tuple[int, int], OverwriteEdit] = {}
+        self.skipped = 0
+        # channel id -> {target id: overwrite}, read once per channel
+        self._current: Dict[int, Dict[int, discord.PermissionOverwrite]] = {}
+
+    def __len__(self) -> int:
+        return len(self.edits)
+
+    def _current_overwrite(self, channel, target) -> Optional[discord.PermissionOverwrite]:
+        current = self._current.get(channel.id)
+        if current is None:
+            current = self._current[channel.id] = {t.id: ow for t, ow in channel.overwrites.items()}
+        return current.get(target.id)
+
+    def replace(self, channel, target: Target, overwrite: Optional[discord.PermissionOverwrite]) -> bool:
+        """set target's overwrite on channel to exactly overwrite (None removes it).
+
+        returns False if the edit is a no-op and was skipped.
+        """
+        key = (channel.id, target.id)
+        existing = self.edits.get(key)
+        before = existing.before if existing else _normalise(self._current_overwrite(channel, target))
+        after = _normalise(overwrite)
+        if before == after:
+            self.edits.pop(key, None)
+            self.skipped += 1
+            return False
+        self.edits[key] = OverwriteEdit(channel, target, before, after)
+        return True
+
+    def update(self, channel, target: Target, **permissions) -> bool:
+        """change some of target's permissions on channel, keeping the rest."""
+        key = (channel.id, target.id)
+        existing = self.edits.get(key)
+        if existing:
+            base = existing.after
+        else:
+            base = _normalise(self._current_overwrite(channel, target))
+        overwrite = discord.PermissionOverwrite.from_pair(*base.pair()) if base else discord.PermissionOverwrite()
+        overwrite.update(**permissions)
+        return self.replace(channel, target, overwrite)
+
+    def rollback(self) -> 'PermissionPlan':
+        """a plan that puts every edited overwrite back the way it was."""
+        plan = PermissionPlan()
+        for edit in self.edits.values():
+            plan.edits[edit.key] = OverwriteEdit(edit.channel, edit.target, edit.after, edit.before)
+        return plan
+
+    def channels(self) -> Dict[int, List[OverwriteEdit]]:
+        """edits grouped by channel, which is also how discord buckets them."""
+        grouped: Dict[int, List[OverwriteEdit]] = {}
+        for edit in self.edits.values():
+            grouped.setdefault(edit.channel.id, []).append(edit)
+        return grouped
+
+
+@dataclass
+class BulkResult:
+    """what happened when a plan was applied."""
+    applied: int = 0
+    skipped: int = 0
+    missing: int = 0
+    failed: List[Tuple[OverwriteEdit, Exception]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def summary(self) -> str:
+        return (
+            f"{self.applied} applied, {self.skipped} unchanged, {self.missing} missing, "
+            f"{len(self.failed)} failed in {self.elapsed:.2f}s"
+        )
+
+
+class PermissionBulkEngine:
+    """applies permission plans with bounded, per-channel ordered concurrency."""
+
+    def __init__(self, concurrency: int = PERMISSION_BULK_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+
+    async def apply(self, plan: PermissionPlan, reason: Optional[str] = None) -> BulkResult:
+        """make every edit in the plan. failures are collected rather than raised."""
+        result = BulkResult(skipped=plan.skipped)
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_channel(edits: List[OverwriteEdit]) -> None:
+            async with semaphore:
+                if len(edits) == 1:
+                    await self._apply_edit(edits[0], reason, result)
+                else:
+                    await self._apply_channel(edits, reason, result)
+
+        await asyncio.gather(*(run_channel(edits) for edits in plan.channels().values()))
+        result.elapsed = time.monotonic() - started
+        return result
+
+    @staticmethod
+    async def _apply_edit(edit: OverwriteEdit, reason: Optional[str], result: BulkResult) -> None:
+        try:
+            await edit.channel.set_permissions(edit.target, overwrite=edit.after, reason=reason)
+            result.applied += 1
+        except discord.NotFound:
+            # the channel, role or member is gone, so there is nothing left to change
+            result.missing += 1
+        except (discord.Forbidden, discord.HTTPException) as e:
+            logger.warning(f"failed to edit overwrite for {edit.target} in {edit.channel}: {e}")
+            result.failed.append((edit, e))
+
+    @staticmethod
+    async def _apply_channel(edits: List[OverwriteEdit], reason: Optional[str], result: BulkResult) -> None:
+        """make all of one channel's edits with a single channel edit."""
+        channel = edits[0].channel
+        # start from the channel's overwrites as they are now so untouched targets are kept
+        overwrites = {target.id: (target, overwrite) for target, overwrite in channel.overwrites.items()}
+        for edit in edits:
+            if edit.after is None:
+                overwrites.pop(edit.target.id, None)
+            else:
+                overwrites[edit.target.id] = (edit.target, edit.after)
+        try:
+            await channel.edit(overwrites=dict(overwrites.values()), reason=reason)
+            result.applied += len(edits)
+        except discord.NotFound:
+            result.missing += len(edits)
+        except (discord.Forbidden, discord.HTTPException) as e:
+            logger.warning(f"failed to edit {len(edits)} overwrites in {channel}: {e}")
+            result.failed.extend((edit, e) for edit in edits)
+
+
+# snapshots of the overwrites a plan replaced, so it can be rolled back after a restart
+_snapshot_table_ready = False
+
+
+def _ensure_snapshot_table() -> None:
+    global _snapshot_table_ready
+    if _snapshot_table_ready:
+        return
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS permission_snapshots (
+            snapshot_key TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            target_id INTEGER NOT NULL,
+            target_type TEXT NOT NULL, -- 'role' or 'member'
+            allow INTEGER, -- NULL means there was no overwrite
+            deny INTEGER,
+            PRIMARY KEY (snapshot_key, channel_id, target_id)
+        )
+    """, commit=True)
+    _snapshot_table_ready = True
+
+
+async def save_snapshot(key: str, guild_id: int, plan: PermissionPlan) -> None:
+    """store the before-state of every edit in the plan under key, replacing any older snapshot."""
+    _ensure_snapshot_table()
+    rows = []
+    for edit in plan.edits.values():
+        target_type = 'role' if isinstance(edit.target, discord.Role) else 'member'
+        if edit.before is None:
+            allow = deny = None
+        else:
+            allow, deny = (p.value for p in edit.before.pair())
+        rows.append((key, guild_id, edit.channel.id, edit.target.id, target_type, allow, deny))
+
+    def store(connection):
+        connection.execute("DELETE FROM permission_snapshots WHERE snapshot_key = ?", (key,))
+        connection.executemany(
+            """
+            INSERT INTO permission_snapshots
+            (snapshot_key, guild_id, channel_id, target_id, target_type, allow, deny)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+
+    await db.run_in_transaction(store)
+
+
+async def has_snapshot(key: str) -> bool:
+    """whether a snapshot is stored under key."""
+    _ensure_snapshot_table()
+    row = await db.fetchone("SELECT 1 FROM permission_snapshots WHERE snapshot_key = ? LIMIT 1", (key,))
+    return row is not None
+
+
+async def load_rollback(key: str, guild: discord.Guild) -> Optional[PermissionPlan]:
+    """build a plan that restores the overwrites saved under key, or None if there is no snapshot."""
+    _ensure_snapshot_table()
+    rows = await db.fetch(
+        "SELECT channel_id, target_id, target_type, allow, deny FROM permission_snapshots WHERE snapshot_key = ?",
+        (key,)
+    )
+    if not rows:
+        return None
+
+    plan = PermissionPlan()
+    for row in rows:
+        channel = guild.get_channel(row['channel_id'])
+        if row['target_type'] == 'role':
+            target = guild.get_role(row['target_id'])
+        else:
+            target = guild.get_member(row['target_id'])
+        if channel is None or target is None:
+            continue
+        if row['allow'] is None:
+            before = None
+        else:
+            before = discord.PermissionOverwrite.from_pair(
+                discord.Permissions(row['allow']), discord.Permissions(row['deny'])
+            )
+        plan.replace(channel, target, before)
+    return plan
+
+
+async def delete_snapshot(key: str) -> None:
+    _ensure_snapshot_table()
+    await db.execute("DELETE FROM permission_snapshots WHERE snapshot_key = ?", (key,))
+
+
+# create a global instance for easy import
+permission_engine = PermissionBulkEngine()
@@ -0,0 +1,135 @@
+"""
+heap-based timer queue.
+
+items are kept in a min-heap keyed on their due time, so finding the next item is
+O(1) and scheduling or cancelling is O(log n). `run` sleeps exactly until the next
+item is due (or until something earlier is scheduled) instead of polling.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TimerQueue:
+    """a cancellable priority queue of timers.
+
+    every timer has a unique key; scheduling an existing key replaces it. the
+    clock returns seconds and can be swapped out for tests and benchmarks.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, max_sleep: float = 300.0):
+        self.clock = clock
+        # cap on a single sleep so wall-clock jumps are noticed eventually
+        self.max_sleep = max_sleep
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[float, int, Any]] = {}
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def schedule(self, key: Hashable, due: float, payload: Any = None) -> None:
+        """schedule (or reschedule) key to fire at due."""
+        seq = next(self._counter)
+        self._entries[key] = (due, seq, payload)
+        heapq.heappush(self._heap, (due, seq, key))
+        if self._changed is not None and self._heap[0][1] == seq:
+            # the new item is now first in line, wake the runner
+            self._changed.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        """cancel a timer. the heap entry is dropped lazily when it reaches the top."""
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """drop every timer."""
+        self._heap.clear()
+        self._entries.clear()
+
+    def keys(self) -> List[Hashable]:
+        return list(self._entries)
+
+    def due_time(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def _discard_stale(self) -> None:
+        heap = self._heap
+        while heap:
+            due, seq, key = heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == seq:
+                return
+            heapq.heappop(heap)
+
+    def next_due(self) -> Optional[float]:
+        """when the earliest live timer is due, or None if there are none."""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[Hashable, Any]]:
+        """remove and return every (key, payload) due at or before now, earliest first."""
+        now = self.clock() if now is None else now
+        due_items = []
+        heap = self._heap
+        while True:
+            self._discard_stale()
+            if not heap or heap[0][0] > now:
+                return due_items
+            _, _, key = heapq.heappop(heap)
+            _, _, payload = self._entries.pop(key)
+            due_items.append((key, payload))
+
+    async def run_due(self, handler: Callable[[Hashable, Any], Awaitable[None]], now: Optional[float] = None) -> int:
+        """fire every timer due at now. returns how many fired."""
+        fired = 0
+        for key, payload in self.pop_due(now):
+            fired += 1
+            try:
+                await handler(key, payload)
+            except Exception as e:
+                logger.error(f'timer {key!r} failed: {e}', exc_info=True)
+        return fired
+
+    async def run(self, handler: Callable[[Hashable, Any], Awaitable[None]]) -> None:
+        """fire timers as they come due, forever.
+
+        each handler runs in its own task so a slow one doesn't delay the rest.
+        """
+        self._changed = asyncio.Event()
+        running = set()
+
+        async def fire(key, payload):
+            task = asyncio.create_task(self._call(handler, key, payload))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        while True:
+            self._changed.clear()
+            due = self.next_due()
+            if due is None:
+                await self._changed.wait()
+            else:
+                delay = min(due - self.clock(), self.max_sleep)
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            await self.run_due(fire)
+
+    @staticmethod
+    async def _call(handler, key, payload) -> None:
+        try:
+            await handler(key, payload)
+        except Exception as e:
+            logger.error(f'timer {key!r} failed: {e}', exc_info=True)